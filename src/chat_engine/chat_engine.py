@@ -54,6 +54,7 @@ class ChatEngine(object):
                 # client create_context and data_sink creation of handler is not called here,
                 # they are created by its internal logic after every other handlers are ready.
                 continue
+            self.handler_manager.ensure_loaded(registry)
             session.prepare_handler(registry.handler, registry.base_info, registry.handler_config)
         self.sessions[session_info.session_id] = session
         return session
@@ -9,6 +9,7 @@ from chat_engine.contexts.handler_context import HandlerContext
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel, HandlerBaseConfigModel
+from chat_engine.data_models.chat_signal import ChatSignal
 from chat_engine.data_models.runtime_data.data_bundle import DataBundleDefinition
 
 
@@ -32,6 +33,9 @@ class HandlerDataInfo:
     definition: Optional[DataBundleDefinition] = None
     input_priority: int = 0
     input_consume_mode: ChatDataConsumeMode = ChatDataConsumeMode.DEFAULT
+    # video inputs only, longest frame side and frame rate the handler can use, 0 for unlimited
+    max_frame_size: int = 0
+    max_frame_rate: float = 0
 
     def __lt__(self, other):
         if self.input_priority == other.input_priority:
@@ -81,6 +85,10 @@ class HandlerBase(ABC):
                      output_definitions: Dict[ChatDataType, HandlerDataInfo]):
         pass
 
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        # Called on the signal thread of the session, implementations should only flag or cancel work and return.
+        pass
+
     @abstractmethod
     def destroy_context(self, context: HandlerContext):
         pass
@@ -1,18 +1,26 @@
 import time
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, TYPE_CHECKING
 
 from loguru import logger
 
+from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.data_models.chat_engine_config_data import EngineChannelType
 from chat_engine.data_models.runtime_data.data_bundle import DataBundleDefinition, DataBundleEntry
 from chat_engine.data_models.session_info_data import SessionInfoData, IOQueueType
 
+if TYPE_CHECKING:
+    from chat_engine.common.handler_base import HandlerDataInfo
+
 
 @dataclass
 class SharedStates:
     active: bool = False
     enable_vad: bool = True
+    # advanced on every interrupt, avatar data of older epochs is discarded
+    turn_epoch: int = 0
+    # set once every handler context of the session is warm, client input is dropped before
+    ready: bool = False
 
 
 class SessionContext(object):
@@ -25,6 +33,8 @@ class SessionContext(object):
         self.shared_states = SharedStates()
         self.input_definitions: Dict[EngineChannelType, DataBundleDefinition] = {}
         self.input_start_time: float = -1.0
+        # merged requirements of the handlers consuming each data type, missing types have no consumer
+        self.input_consumers: Dict[ChatDataType, "HandlerDataInfo"] = {}
 
     def get_input_audio_definition(self, sample_rate: int, channel_num: int = 1, entry_name: str = "mic_audio"):
         definition = self.input_definitions.get(EngineChannelType.AUDIO, None)
@@ -30,6 +30,7 @@ class HandlerEnv:
     context: Optional[HandlerContext] = None
     input_queue: Optional[queue.Queue] = None
     output_info: Optional[Dict[ChatDataType, HandlerDataInfo]] = None
+    stale_dropped: int = 0
 
 
 @dataclass
@@ -59,25 +60,18 @@ class ChatDataSubmitter:
         self.session_context = session_context
         self.sinks = sinks
         self.outputs = outputs
+        # turn of the input the handler took last, data submitted from its worker threads belongs to it
+        self.epoch: Optional[int] = None
+        # data submitted on the pump thread while handling belongs to the turn of the input being handled
+        self._pump_local = threading.local()
 
-    def submit(self, data: HandlerResultType):
-        ChatSession.submit_data(
-            data,
-            self.handler_name,
-            self.output_info,
-            self.session_context,
-            self.sinks,
-            self.outputs
-        )
+    def begin_input(self, epoch: int):
+        self.epoch = epoch
+        self._pump_local.epoch = epoch
 
-
-class ChatDataSubmitter:
-    def __init__(self, handler_name: str, output_info, session_context, sinks, outputs):
-        self.handler_name = handler_name
-        self.output_info = output_info
-        self.session_context = session_context
-        self.sinks = sinks
-        self.outputs = outputs
+    def resume_current_turn(self):
+        # the handler processed the interrupt, what its workers submit from now on belongs to the new turn
+        self.epoch = None
 
     def submit(self, data: HandlerResultType):
         ChatSession.submit_data(
@@ -86,7 +80,8 @@ class ChatDataSubmitter:
             self.output_info,
             self.session_context,
             self.sinks,
-            self.outputs
+            self.outputs,
+            getattr(self._pump_local, "epoch", self.epoch)
         )
 
 
@@ -97,8 +92,21 @@ class ChatSession:
         EngineChannelType.TEXT: [ChatDataType.HUMAN_TEXT]
     }
 
+    # Avatar outputs still waiting in handler input queues are stale once the user interrupts
+    interruptible_data_types = {
+        ChatDataType.AVATAR_TEXT,
+        ChatDataType.AVATAR_AUDIO,
+        ChatDataType.AVATAR_VIDEO,
+        ChatDataType.AVATAR_MOTION_DATA,
+    }
+
     def __init__(self, session_context: SessionContext, engine_config: ChatEngineConfigModel):
         self.session_context = session_context
+        self.create_time = time.monotonic()
+        self.ready_timeout = engine_config.session_ready_timeout
+        self.ready_timer: Optional[threading.Timer] = None
+        self.ready_lock = threading.Lock()
+        self.handler_ready_times: Dict[str, float] = {}
 
         self.data_sinks: Dict[ChatDataType, List[DataSink]] = {}
         self.inputs: List[DataSource] = []
@@ -106,6 +114,10 @@ class ChatSession:
 
         self.handlers: Dict[str, HandlerRecord] = {}
         self.input_pump_thread: Optional[threading.Thread] = None
+        self.epoch_lock = threading.Lock()
+        # handlers process signals on the signal thread, emitters such as the rtc event loop never wait for them
+        self.signal_queue: queue.Queue = queue.Queue()
+        self.signal_thread: Optional[threading.Thread] = None
 
         for channel_type, input_queue in session_context.input_queues.items():
             target_types = self.input_type_mapping.get(channel_type, None)
@@ -226,11 +238,12 @@ class ChatSession:
                     if not chat_data.is_timestamp_valid():
                         chat_data.timestamp = timestamp
                     chat_data.source = input_source.owner
-                    cls.distribute_data(chat_data, sinks, outputs)
+                    chat_data.epoch = shared_states.turn_epoch
+                    cls.distribute_data(chat_data, sinks, outputs, session_context)
 
     @classmethod
     def _packet_chat_data(cls, handler_name: str, output_info, session_context: SessionContext,
-                          data: HandlerResultType):
+                          data: HandlerResultType, epoch: Optional[int] = None):
         if data is None:
             return None
         timestamp = session_context.get_timestamp()
@@ -270,11 +283,22 @@ class ChatSession:
         if not chat_data.is_timestamp_valid():
             chat_data.timestamp = timestamp
         chat_data.source = handler_name
+        if chat_data.epoch is None:
+            chat_data.epoch = epoch if epoch is not None else session_context.shared_states.turn_epoch
         return chat_data
 
+    @classmethod
+    def is_stale_data(cls, data: ChatData, session_context: Optional[SessionContext]) -> bool:
+        if session_context is None or data.epoch is None or data.type not in cls.interruptible_data_types:
+            return False
+        return data.epoch < session_context.shared_states.turn_epoch
+
     @classmethod
     def distribute_data(cls, data: ChatData, sinks: Dict[ChatDataType, List[DataSink]],
-                       outputs: Dict[Tuple[str, ChatDataType], DataSink]):
+                       outputs: Dict[Tuple[str, ChatDataType], DataSink],
+                       session_context: Optional[SessionContext] = None):
+        if cls.is_stale_data(data, session_context):
+            return
         source_key = (data.source, data.type)
         data_sink = outputs.get(source_key, None)
         if data_sink is not None:
@@ -289,10 +313,11 @@ class ChatSession:
 
     @classmethod
     def submit_data(cls, data: HandlerResultType, handler_name: str, output_info, session_context: SessionContext,
-                    sinks: Dict[ChatDataType, List[DataSink]], outputs: Dict[Tuple[str, ChatDataType], DataSink]):
-        chat_data = cls._packet_chat_data(handler_name, output_info, session_context, data)
+                    sinks: Dict[ChatDataType, List[DataSink]], outputs: Dict[Tuple[str, ChatDataType], DataSink],
+                    epoch: Optional[int] = None):
+        chat_data = cls._packet_chat_data(handler_name, output_info, session_context, data, epoch)
         if chat_data is not None:
-            cls.distribute_data(chat_data, sinks, outputs)
+            cls.distribute_data(chat_data, sinks, outputs, session_context)
 
     @classmethod
     def handler_pumper(cls, session_context: SessionContext, handler_env: HandlerEnv,
@@ -310,6 +335,17 @@ class ChatSession:
             except (queue.Empty, asyncio.QueueEmpty):
                 time.sleep(0.03)
                 continue
+            # outputs belong to the turn of their input, avatar data carries it and other inputs belong to the
+            # turn current when they are taken. Outputs made after an interrupt during handle are then stale
+            output_epoch = shared_states.turn_epoch
+            if cls.is_stale_data(input_data, session_context):
+                handler_env.stale_dropped += 1
+                continue
+            if input_data.type in cls.interruptible_data_types and input_data.epoch is not None:
+                output_epoch = input_data.epoch
+            submitter = handler_env.context.data_submitter
+            if submitter is not None:
+                submitter.begin_input(output_epoch)
             handler_result = handler.handle(handler_env.context, input_data, output_info)
             if not isinstance(handler_result, Iterable):
                 handler_result = [handler_result]
@@ -320,11 +356,12 @@ class ChatSession:
                     handler_env.handler_info.name,
                     output_info,
                     session_context,
-                    handler_output
+                    handler_output,
+                    output_epoch
                 )
                 if chat_data is None:
                     continue
-                cls.distribute_data(chat_data, sinks, outputs)
+                cls.distribute_data(chat_data, sinks, outputs, session_context)
 
     def prepare_handler(self, handler: HandlerBase, handler_info: HandlerBaseInfo,
                         handler_config: HandlerBaseConfigModel):
@@ -347,11 +384,29 @@ class ChatSession:
         for input_type, sink_list in self.data_sinks.items():
             sink_list.sort(key=lambda x: x.consume_info)
 
+    @classmethod
+    def merge_consume_info(cls, data_type: ChatDataType, sink_list: List[DataSink]) -> HandlerDataInfo:
+        merged_info = HandlerDataInfo(type=data_type)
+        consume_infos = [sink.consume_info for sink in sink_list]
+        if all(info.max_frame_size > 0 for info in consume_infos):
+            merged_info.max_frame_size = max(info.max_frame_size for info in consume_infos)
+        if all(info.max_frame_rate > 0 for info in consume_infos):
+            merged_info.max_frame_rate = max(info.max_frame_rate for info in consume_infos)
+        return merged_info
+
+    def collect_input_consumers(self):
+        self.session_context.input_consumers = {
+            data_type: self.merge_consume_info(data_type, sink_list)
+            for data_type, sink_list in self.data_sinks.items() if len(sink_list) > 0
+        }
+
     def start(self):
         if self.session_context.shared_states.active:
             return
         self.session_context.shared_states.active = True
         self.sort_sinks()
+        self.collect_input_consumers()
+        self.start_signal_pump()
         for handler_name, handler_record in self.handlers.items():
             start_args = (self.session_context, handler_record.env,
                           self.data_sinks, self.outputs)
@@ -363,23 +418,67 @@ class ChatSession:
                 self.outputs,
             )
             handler_record.env.context.data_submitter = handler_submitter
+            handler_record.env.context.signal_emitter = self.emit_signal
+            handler_record.env.context.ready_callback = self.on_handler_ready
             handler_record.env.handler.start_context(self.session_context, handler_record.env.context)
+            if not handler_record.env.context.deferred_ready:
+                handler_record.env.context.set_ready()
             handler_record.pump_thread = threading.Thread(target=self.handler_pumper, args=start_args)
             handler_record.pump_thread.start()
         input_pumper_args = (self.session_context, self.inputs, self.data_sinks, self.outputs)
         self.input_pump_thread = threading.Thread(target=self.inputs_pumper, args=input_pumper_args)
         self.input_pump_thread.start()
         self.session_context.set_input_start()
+        self.check_ready()
+        if not self.session_context.shared_states.ready:
+            self.ready_timer = threading.Timer(self.ready_timeout, self.on_ready_timeout)
+            self.ready_timer.daemon = True
+            self.ready_timer.start()
+
+    def on_handler_ready(self, context: HandlerContext):
+        self.handler_ready_times[context.owner] = (time.monotonic() - self.create_time) * 1000
+        self.check_ready()
+
+    def check_ready(self):
+        if not self.session_context.shared_states.active:
+            return
+        if not all(x.env.context.ready_event.is_set() for x in self.handlers.values()):
+            return
+        self.mark_ready()
+
+    def mark_ready(self):
+        with self.ready_lock:
+            if self.session_context.shared_states.ready:
+                return
+            self.session_context.shared_states.ready = True
+        if self.ready_timer is not None:
+            self.ready_timer.cancel()
+        ready_times = {name: round(ready_time, 2) for name, ready_time in self.handler_ready_times.items()}
+        logger.info(f"Session {self.session_context.session_info.session_id} ready in "
+                    f"{(time.monotonic() - self.create_time) * 1000:.2f} milli, handler ready times {ready_times}")
+
+    def on_ready_timeout(self):
+        pending = [name for name, record in self.handlers.items() if not record.env.context.ready_event.is_set()]
+        if len(pending) == 0 or not self.session_context.shared_states.active:
+            return
+        logger.warning(f"Handlers {pending} not ready after {self.ready_timeout}s, accepting input anyway")
+        self.mark_ready()
 
     def stop(self):
         self.session_context.shared_states.active = False
+        if self.ready_timer is not None:
+            self.ready_timer.cancel()
+            self.ready_timer = None
         if self.input_pump_thread:
             self.input_pump_thread.join()
             self.input_pump_thread = None
+        self.stop_signal_pump()
         for handler_name, handler_record in self.handlers.items():
             if handler_record.pump_thread:
                 handler_record.pump_thread.join()
                 handler_record.pump_thread = None
+            if handler_record.env.stale_dropped > 0:
+                logger.info(f"Handler {handler_name} skipped {handler_record.env.stale_dropped} stale chat data")
             handler_record.env.handler.destroy_context(handler_record.env.context)
         self.handlers.clear()
         self.session_context.cleanup()
@@ -388,7 +487,79 @@ class ChatSession:
     def get_timestamp(self):
         return self.session_context.get_timestamp()
 
+    def start_signal_pump(self):
+        if self.signal_thread is not None:
+            return
+        self.signal_thread = threading.Thread(target=self.signal_pumper, daemon=True)
+        self.signal_thread.start()
+
+    def stop_signal_pump(self):
+        if self.signal_thread is None:
+            return
+        # signals queued before stop are still delivered, handler contexts are destroyed after this
+        self.signal_queue.put(None)
+        if self.signal_thread is not threading.current_thread():
+            self.signal_thread.join()
+        self.signal_thread = None
+
+    def signal_pumper(self):
+        while True:
+            signal = self.signal_queue.get()
+            try:
+                if signal is None:
+                    return
+                if signal.type == ChatSignalType.INTERRUPT:
+                    self.interrupt(signal)
+                else:
+                    self.dispatch_signal(signal)
+            finally:
+                self.signal_queue.task_done()
+
+    def interrupt(self, signal: ChatSignal):
+        t_start = time.monotonic()
+        shared_states = self.session_context.shared_states
+        # producers are stopped first, so nothing new is queued behind the drop below
+        self.dispatch_signal(signal)
+        dropped_count = 0
+        for handler_record in list(self.handlers.values()):
+            submitter = handler_record.env.context.data_submitter
+            if submitter is not None:
+                submitter.resume_current_turn()
+            input_queue = handler_record.env.input_queue
+            if input_queue is not None:
+                dropped_count += self.drop_stale_data(input_queue)
+        logger.info(f"Session {self.session_context.session_info.session_id} interrupted by "
+                    f"{signal.source_name or signal.source_type}, turn epoch {shared_states.turn_epoch}, "
+                    f"dropped {dropped_count} queued chat data, "
+                    f"took {(time.monotonic() - t_start) * 1000:.2f} milli")
+
+    def drop_stale_data(self, data_queue: queue.Queue) -> int:
+        # data of the new turn may already be queued when the signal thread gets to the interrupt
+        turn_epoch = self.session_context.shared_states.turn_epoch
+        with data_queue.mutex:
+            kept_data = [data for data in data_queue.queue if data.type not in self.interruptible_data_types
+                         or (data.epoch is not None and data.epoch >= turn_epoch)]
+            dropped_count = len(data_queue.queue) - len(kept_data)
+            if dropped_count > 0:
+                data_queue.queue.clear()
+                data_queue.queue.extend(kept_data)
+        return dropped_count
+
+    def dispatch_signal(self, signal: ChatSignal):
+        for handler_name, handler_record in list(self.handlers.items()):
+            try:
+                handler_record.env.handler.on_signal(handler_record.env.context, signal)
+            except Exception as e:
+                logger.opt(exception=True).error(f"Handler {handler_name} failed to process signal {signal}: {e}")
+
     def emit_signal(self, signal: ChatSignal):
-        # TODO this is temp implementation a full signal infrastructure is needed.
-        if signal.source_type == ChatSignalSourceType.CLIENT and signal.type == ChatSignalType.END:
-            self.session_context.shared_states.enable_vad = True
+        shared_states = self.session_context.shared_states
+        if signal.type == ChatSignalType.INTERRUPT:
+            # barge in ends the avatar turn, listen to the user again. The epoch is advanced right away so
+            # stale data is skipped even before the handlers got the signal
+            shared_states.enable_vad = True
+            with self.epoch_lock:
+                shared_states.turn_epoch += 1
+        elif signal.source_type == ChatSignalSourceType.CLIENT and signal.type == ChatSignalType.END:
+            shared_states.enable_vad = True
+        self.signal_queue.put_nowait(signal)
@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Callable, Dict, List, Sequence, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class HandlerLoadPlanner:
+    """
+    Load handlers stage by stage, one stage per load_priority value in ascending order.
+    Handlers in the same stage do not depend on each other and are loaded in parallel threads,
+    a stage starts only after the previous one finished.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, max_workers)
+        # [handler_name, load seconds]
+        self.load_times: Dict[str, float] = {}
+
+    @staticmethod
+    def plan(items: Sequence[T], priority_of: Callable[[T], int]) -> List[List[T]]:
+        ordered = sorted(items, key=priority_of)
+        return [list(stage) for _, stage in groupby(ordered, key=priority_of)]
+
+    def _timed_load(self, name: str, load_func: Callable[[], None]):
+        load_start = time.monotonic()
+        try:
+            load_func()
+        except Exception:
+            logger.opt(exception=True).error(f"Handler {name} failed to load")
+            raise
+        dur_load = time.monotonic() - load_start
+        self.load_times[name] = dur_load
+        logger.info(f"Handler {name} loaded in {round(dur_load * 1e3)} milliseconds")
+
+    def run(self, items: Sequence[T],
+            priority_of: Callable[[T], int],
+            name_of: Callable[[T], str],
+            load_of: Callable[[T], Callable[[], None]]) -> Dict[str, float]:
+        total_start = time.monotonic()
+        for stage in self.plan(items, priority_of):
+            if self.max_workers == 1 or len(stage) == 1:
+                for item in stage:
+                    self._timed_load(name_of(item), load_of(item))
+                continue
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stage)),
+                                    thread_name_prefix="handler_load") as executor:
+                futures = [executor.submit(self._timed_load, name_of(item), load_of(item)) for item in stage]
+            # executor exit waited for the whole stage, raise the first failure like a serial load would
+            for future in futures:
+                future.result()
+        dur_total = time.monotonic() - total_start
+        logger.info(f"{len(self.load_times)} handlers loaded in {round(dur_total * 1e3)} milliseconds, "
+                    f"{round(sum(self.load_times.values()) * 1e3)} milliseconds if loaded serially")
+        return self.load_times
@@ -2,6 +2,7 @@ import importlib
 import inspect
 import os.path
 import sys
+import threading
 import time
 import weakref
 from dataclasses import dataclass, field
@@ -15,6 +16,7 @@ from loguru import logger
 
 from chat_engine.common.client_handler_base import ClientHandlerBase
 from chat_engine.common.handler_base import HandlerBaseInfo, HandlerBase
+from chat_engine.core.handler_load_planner import HandlerLoadPlanner
 from chat_engine.data_models.chat_engine_config_data import HandlerBaseConfigModel, ChatEngineConfigModel
 from engine_utils.directory_info import DirectoryInfo
 
@@ -24,6 +26,8 @@ class HandlerRegistry:
     base_info: Optional[HandlerBaseInfo] = field(default=None)
     handler: Optional[HandlerBase] = field(default=None)
     handler_config: Optional[HandlerBaseConfigModel] = field(default=None)
+    loaded: bool = field(default=False)
+    load_lock: threading.Lock = field(default_factory=threading.Lock)
 
 
 class HandlerManager:
@@ -36,6 +40,8 @@ class HandlerManager:
         self.handler_configs: Dict[str, Dict] = {}
         self.concurrent_limit = 1
         self.search_path = []
+        self.engine_config: Optional[ChatEngineConfigModel] = None
+        self.preload_thread: Optional[threading.Thread] = None
 
         self.engine_ref = weakref.ref(engine)
 
@@ -133,21 +139,72 @@ class HandlerManager:
                       app: Optional[FastAPI] = None,
                       ui: Optional[gradio.blocks.Block] = None,
                       parent_block: Optional[gradio.blocks.Block] = None):
+        self.engine_config = engine_config
         enabled_handlers = self.get_enabled_handler_registries()
         client_handlers = []
+        startup_handlers = []
+        lazy_handlers = []
+        # handlers loaded later may depend on ones with lower priority, so those can not be deferred past startup
+        last_startup_priority = max((x.base_info.load_priority for x in enabled_handlers
+                                     if isinstance(x.handler, ClientHandlerBase) or not x.handler_config.lazy_load),
+                                    default=None)
         for registry in enabled_handlers:
             if isinstance(registry.handler, ClientHandlerBase):
                 client_handlers.append(registry)
-            load_start = time.monotonic()
-            registry.handler.load(engine_config, registry.handler_config)
-            dur_load = time.monotonic() - load_start
-            logger.info(f"Handler {registry.base_info.name} loaded in {round(dur_load * 1e3)} milliseconds")
+            elif registry.handler_config.lazy_load:
+                if last_startup_priority is not None and registry.base_info.load_priority < last_startup_priority:
+                    logger.warning(f"Handler {registry.base_info.name} has lower load priority than handlers loaded "
+                                   f"at startup, lazy_load is ignored and it is loaded at startup")
+                else:
+                    logger.info(f"Handler {registry.base_info.name} will be loaded in background after startup")
+                    lazy_handlers.append(registry)
+                    continue
+            startup_handlers.append(registry)
+        planner = HandlerLoadPlanner(engine_config.handler_load_workers)
+        planner.run(startup_handlers,
+                    priority_of=lambda x: x.base_info.load_priority,
+                    name_of=lambda x: x.base_info.name,
+                    load_of=lambda x: lambda: self._load_registry(x))
         if app is not None or ui is not None:
             for registry in client_handlers:
                 setup_start = time.monotonic()
                 registry.handler.on_setup_app(app, ui, parent_block)
                 dur_setup = time.monotonic() - setup_start
-                logger.info(f"Setup client handler {registry.base_info.name} loaded in {round(dur_setup * 1e3)} milliseconds")
+                logger.info(f"Setup client handler {registry.base_info.name} loaded in "
+                            f"{round(dur_setup * 1e3)} milliseconds")
+        if lazy_handlers:
+            # sessions are accepted meanwhile, only one created before its handlers are loaded waits for them
+            self.preload_thread = threading.Thread(target=self._preload_handlers, args=(lazy_handlers,),
+                                                   name="handler_preload", daemon=True)
+            self.preload_thread.start()
+
+    def _preload_handlers(self, registries):
+        planner = HandlerLoadPlanner(self.engine_config.handler_load_workers)
+        try:
+            planner.run(registries,
+                        priority_of=lambda x: x.base_info.load_priority,
+                        name_of=lambda x: x.base_info.name,
+                        load_of=lambda x: lambda: self.ensure_loaded(x))
+        except Exception:
+            logger.warning("Background handler loading stopped, remaining handlers are loaded by the first session")
+
+    def _load_registry(self, registry: HandlerRegistry):
+        registry.handler.load(self.engine_config, registry.handler_config)
+        registry.loaded = True
+
+    def ensure_loaded(self, registry: HandlerRegistry):
+        if registry.loaded:
+            return
+        if registry.load_lock.locked():
+            logger.warning(f"Handler {registry.base_info.name} is still loading, session creation waits for it")
+        with registry.load_lock:
+            if registry.loaded:
+                return
+            load_start = time.monotonic()
+            self._load_registry(registry)
+            dur_load = time.monotonic() - load_start
+            logger.info(f"Handler {registry.base_info.name} loaded after startup in "
+                        f"{round(dur_load * 1e3)} milliseconds")
 
     def get_enabled_handler_registries(self, order_by_priority=True):
         result = []
@@ -178,6 +235,8 @@ class HandlerManager:
                 continue
             if not registry.handler_config.enabled:
                 continue
+            if not registry.loaded:
+                continue
             logger.info(f"Destroying handler {handler_name}")
             registry.handler.destroy()
             logger.info(f"Handler {handler_name} destroyed")
\ No newline at end of file
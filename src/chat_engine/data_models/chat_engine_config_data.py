@@ -10,6 +10,9 @@ class HandlerBaseConfigModel(BaseModel):
     enabled: bool = Field(default=True)
     module: Optional[str] = Field(default=None)
     concurrent_limit: int = Field(default=1)
+    # load the model in background once startup finished instead of before it, a session created earlier waits
+    # for it. Client handlers are always loaded at startup
+    lazy_load: bool = Field(default=False)
 
 
 class ChatEngineOutputSource(BaseModel):
@@ -24,3 +27,7 @@ class ChatEngineConfigModel(BaseModel):
     handler_configs: Optional[Dict[str, Dict]] = None
     outputs: Dict[EngineChannelType, ChatEngineOutputSource] = Field(default_factory=dict)
     turn_config: Optional[Dict] = Field(default=None)
+    # input is accepted anyway if a handler context is not ready after this many seconds
+    session_ready_timeout: float = Field(default=10.0)
+    # handlers with the same load_priority are loaded in parallel by this many threads, 1 loads serially
+    handler_load_workers: int = Field(default=4)
@@ -0,0 +1,115 @@
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class FrameSamplerStats:
+    offered: int = 0
+    accepted: int = 0
+    skipped_rate: int = 0
+    skipped_static: int = 0
+    skipped_budget: int = 0
+    scene_cuts: int = 0
+    turn_accepted: int = 0
+    last_difference: float = 0.0
+    current_interval_ms: float = 0.0
+
+
+class AdaptiveFrameSampler:
+    """
+    Decide which camera frames are worth sending to a vision model.
+
+    Each offered frame is reduced to a small grayscale thumbnail and compared with the last accepted one.
+    While the scene is static the sending interval grows towards max_interval_ms, motion shrinks it back
+    towards min_interval_ms, and a scene cut is sent right away once min_interval_ms has passed.
+    Accepted frames are limited by frame_budget_per_turn (0 for unlimited) until new_turn() is called.
+    """
+
+    def __init__(self, min_interval_ms: float = 500, max_interval_ms: float = 4000,
+                 motion_threshold: float = 0.02, scene_cut_threshold: float = 0.2,
+                 frame_budget_per_turn: int = 0, thumbnail_size: int = 32):
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max(min_interval_ms, max_interval_ms)
+        self.motion_threshold = motion_threshold
+        self.scene_cut_threshold = scene_cut_threshold
+        self.frame_budget_per_turn = frame_budget_per_turn
+        self.thumbnail_size = thumbnail_size
+
+        self.stats = FrameSamplerStats(current_interval_ms=min_interval_ms)
+        self._current_interval_ms = float(min_interval_ms)
+        self._last_accepted_ms: Optional[float] = None
+        self._last_thumbnail: Optional[np.ndarray] = None
+
+    def _make_thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        frame = np.squeeze(frame)
+        step_y = max(1, frame.shape[0] // self.thumbnail_size)
+        step_x = max(1, frame.shape[1] // self.thumbnail_size)
+        thumbnail = frame[::step_y, ::step_x]
+        if thumbnail.ndim == 3:
+            thumbnail = thumbnail.mean(axis=2, dtype=np.float32)
+        else:
+            thumbnail = thumbnail.astype(np.float32)
+        if frame.dtype == np.uint8:
+            thumbnail *= 1.0 / 255.0
+        return thumbnail
+
+    def _difference(self, thumbnail: np.ndarray) -> float:
+        if self._last_thumbnail is None or self._last_thumbnail.shape != thumbnail.shape:
+            return 1.0
+        return float(np.abs(thumbnail - self._last_thumbnail).mean())
+
+    def offer(self, frame: np.ndarray, timestamp_ms: float) -> bool:
+        """
+        Return True if the frame should be sent, timestamps have to come from a monotonic clock.
+        """
+        stats = self.stats
+        stats.offered += 1
+        elapsed_ms = None if self._last_accepted_ms is None else timestamp_ms - self._last_accepted_ms
+        if elapsed_ms is not None and elapsed_ms < self.min_interval_ms:
+            stats.skipped_rate += 1
+            return False
+
+        thumbnail = self._make_thumbnail(frame)
+        difference = self._difference(thumbnail)
+        stats.last_difference = difference
+        scene_cut = difference >= self.scene_cut_threshold
+        if scene_cut:
+            self._current_interval_ms = self.min_interval_ms
+        elif difference >= self.motion_threshold:
+            self._current_interval_ms = max(self.min_interval_ms, self._current_interval_ms * 0.5)
+        stats.current_interval_ms = self._current_interval_ms
+
+        if not scene_cut and elapsed_ms is not None and elapsed_ms < self._current_interval_ms:
+            stats.skipped_static += 1
+            return False
+        if 0 < self.frame_budget_per_turn <= stats.turn_accepted:
+            stats.skipped_budget += 1
+            return False
+
+        if scene_cut:
+            if self._last_thumbnail is not None:
+                stats.scene_cuts += 1
+        elif difference < self.motion_threshold:
+            # nothing changed since the last sent frame, send the next one later
+            self._current_interval_ms = min(self.max_interval_ms, self._current_interval_ms * 2)
+            stats.current_interval_ms = self._current_interval_ms
+        stats.accepted += 1
+        stats.turn_accepted += 1
+        self._last_accepted_ms = timestamp_ms
+        self._last_thumbnail = thumbnail
+        return True
+
+    def input_frame_rate(self) -> float:
+        """
+        Frame rate worth feeding into offer(), twice the fastest sending rate so arrival jitter does not
+        push a frame just below min_interval_ms.
+        """
+        return 2000.0 / self.min_interval_ms if self.min_interval_ms > 0 else 0.0
+
+    def new_turn(self):
+        self.stats.turn_accepted = 0
+
+    def get_stats(self) -> dict:
+        return asdict(self.stats)
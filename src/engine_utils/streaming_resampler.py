@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+
+
+class StreamingResampler:
+    """
+    Stateful polyphase resampler for audio that arrives in chunks, keeping the filter history between
+    chunks so chunk boundaries leave no artifacts and the output equals resampling the whole stream at once.
+
+    The windowed sinc filter is causal, the output lags the input by delay output samples (below a millisecond
+    at the default zero_crossings for speech rates). After N input samples exactly ceil(N * target_sr / orig_sr)
+    output samples have been returned, so fixed size input chunks map to fixed size output chunks.
+    """
+    MIN_OUTPUTS_PER_PHASE = 32
+
+    def __init__(self, orig_sr: int, target_sr: int, zero_crossings: int = 12,
+                 rolloff: float = 0.945, kaiser_beta: float = 8.6):
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        g = math.gcd(int(orig_sr), int(target_sr))
+        self._up = int(target_sr) // g
+        self._down = int(orig_sr) // g
+
+        # filter center on the upsampled grid, a multiple of down so the delay is a whole output sample count
+        ratio = max(self._up, self._down)
+        self._center = self._down * math.ceil(zero_crossings * ratio / self._down)
+        length = 2 * self._center + 1
+        cutoff = rolloff / ratio
+        k = np.arange(length) - self._center
+        h = self._up * cutoff * np.sinc(cutoff * k) * np.kaiser(length, kaiser_beta)
+        self._taps = math.ceil(length / self._up)
+        h = np.pad(h, (0, self._taps * self._up - length))
+        # phase p uses h[p + j * up] on x[i - j], stored reversed to dot with the window x[i - taps + 1 .. i]
+        self._phases = np.ascontiguousarray(h.reshape(self._taps, self._up).T[:, ::-1], dtype=np.float32)
+        self.reset()
+
+    @property
+    def delay(self) -> int:
+        """output samples the output lags behind the input"""
+        return self._center // self._down if self._up != self._down else 0
+
+    def reset(self):
+        # history of the last taps - 1 input samples, zeros before the stream starts
+        self._buffer = np.zeros(self._taps - 1, dtype=np.float32)
+        self._buffer_start = -(self._taps - 1)
+        self._input_count = 0
+        self._output_count = 0
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if self._up == self._down:
+            return audio
+        self._input_count += len(audio)
+        self._buffer = np.concatenate((self._buffer, audio))
+        output_end = -(-self._input_count * self._up // self._down)
+        if output_end == self._output_count:
+            return np.zeros(0, dtype=np.float32)
+        windows = np.lib.stride_tricks.sliding_window_view(self._buffer, self._taps)
+        output_count = output_end - self._output_count
+        if output_count < self.MIN_OUTPUTS_PER_PHASE * self._up:
+            # few outputs per phase, gather all windows at once rather than loop over the phases
+            position = np.arange(self._output_count, output_end, dtype=np.int64) * self._down
+            rows = windows[position // self._up - (self._taps - 1) - self._buffer_start]
+            output = np.einsum("ij,ij->i", rows, self._phases[position % self._up])
+        else:
+            output = np.empty(output_count, dtype=np.float32)
+            # outputs r, r + up, r + 2 * up ... share a phase and step down inputs, one matrix vector product each
+            for r in range(self._up):
+                position = (self._output_count + r) * self._down
+                first = position // self._up - (self._taps - 1) - self._buffer_start
+                rows = windows[first::self._down][:len(output[r::self._up])]
+                output[r::self._up] = rows @ self._phases[position % self._up]
+        self._output_count = output_end
+
+        # keep the history the next output needs
+        next_start = self._output_count * self._down // self._up - (self._taps - 1)
+        self._buffer = self._buffer[next_start - self._buffer_start:]
+        self._buffer_start = next_start
+        return output
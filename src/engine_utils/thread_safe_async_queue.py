@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Deque, Optional, Tuple
+
+from loguru import logger
+
+
+@dataclass
+class AsyncQueueStats:
+    put_count: int = 0
+    get_count: int = 0
+    dropped: int = 0
+    max_depth: int = 0
+    max_latency_ms: float = 0.0
+    total_latency_ms: float = 0.0
+
+    @property
+    def avg_latency_ms(self) -> float:
+        return self.total_latency_ms / self.get_count if self.get_count > 0 else 0.0
+
+
+class ThreadSafeAsyncQueue:
+    """
+    Queue fed from any thread and consumed by coroutines of one event loop.
+
+    put_nowait() never blocks and may be called from handler threads, a waiting get() is woken through
+    loop.call_soon_threadsafe only when a consumer is actually waiting. With capacity > 0 the oldest item
+    is dropped when the queue is full, so a stalled consumer can not grow latency or memory without bound.
+    The time every item spends in the queue is recorded in stats.
+    """
+
+    def __init__(self, name: str = "", capacity: int = 0):
+        self.name = name
+        self.capacity = capacity
+        self.stats = AsyncQueueStats()
+
+        self._items: Deque[Tuple[float, Any]] = deque()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._waiting = 0
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return len(self._items) == 0
+
+    def put_nowait(self, item):
+        dropped = False
+        with self._lock:
+            if 0 < self.capacity <= len(self._items):
+                self._items.popleft()
+                self.stats.dropped += 1
+                dropped = True
+            self._items.append((time.monotonic(), item))
+            self.stats.put_count += 1
+            self.stats.max_depth = max(self.stats.max_depth, len(self._items))
+            loop = self._loop if self._waiting > 0 else None
+        if dropped and self.stats.dropped % 100 == 1:
+            logger.warning(f"Queue {self.name} is full with {self.capacity} items, "
+                           f"{self.stats.dropped} oldest items dropped so far")
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wakeup_next)
+            except RuntimeError:
+                # loop already closed, nobody is left to wake
+                pass
+
+    def get_nowait(self):
+        with self._lock:
+            if len(self._items) == 0:
+                raise asyncio.QueueEmpty
+            put_time, item = self._items.popleft()
+            latency_ms = (time.monotonic() - put_time) * 1000
+            self.stats.get_count += 1
+            self.stats.total_latency_ms += latency_ms
+            self.stats.max_latency_ms = max(self.stats.max_latency_ms, latency_ms)
+        return item
+
+    async def get(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            with self._lock:
+                self._loop = loop
+                if len(self._items) > 0:
+                    continue
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+                self._waiting += 1
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # hand a wakeup this consumer will not use to the next waiting one
+                if waiter.done() and not waiter.cancelled() and len(self._items) > 0:
+                    self._wakeup_next()
+                raise
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+                if not waiter.done():
+                    waiter.cancel()
+
+    def _wakeup_next(self):
+        # runs on the consumer loop, cancelled waiters of timed out get() calls are skipped
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._items)
+            self._items.clear()
+        return count
+
+    def get_stats(self) -> dict:
+        stats = asdict(self.stats)
+        stats["avg_latency_ms"] = round(self.stats.avg_latency_ms, 3)
+        stats["max_latency_ms"] = round(self.stats.max_latency_ms, 3)
+        stats.pop("total_latency_ms")
+        stats["depth"] = self.qsize()
+        return stats
@@ -0,0 +1,131 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+class TimestampedFrameBuffer:
+    """
+    Frame store indexed by timestamp.
+
+    Frames live in one preallocated array, a sorted index of slot ids and timestamps is kept beside it,
+    so out of order frames are placed correctly and range queries are a binary search. Returned frames
+    are views into the storage, they stay valid until their slot is evicted or overwritten.
+
+    Frames are needed until release_before passes them or, with retention, until they are retention older
+    than the newest frame. A full buffer first drops frames no longer needed, then grows up to max_capacity,
+    and only then evicts its oldest frame.
+    """
+
+    def __init__(self, capacity: int, max_capacity: Optional[int] = None, retention: Optional[int] = None):
+        self.capacity = max(1, capacity)
+        self.max_capacity = max(self.capacity, max_capacity or 0)
+        self.retention = retention
+        self._frames: Optional[np.ndarray] = None
+        self._sorted_timestamps = np.empty(self.capacity, dtype=np.int64)
+        self._sorted_slots = np.empty(self.capacity, dtype=np.int64)
+        self._free_slots: List[int] = []
+        self._count = 0
+        # frames older than this were already consumed, they can not be used any more
+        self._released_before: Optional[int] = None
+
+        self.late_dropped = 0
+        self.expired_dropped = 0
+        self.overflow_dropped = 0
+
+    def __len__(self):
+        return self._count
+
+    def _allocate(self, frame: np.ndarray):
+        if self._frames is not None:
+            logger.warning(f"Frame shape changed from {self._frames.shape[1:]} to {frame.shape}, cache cleared")
+        self._frames = np.empty((self.capacity,) + frame.shape, dtype=frame.dtype)
+        self._free_slots = list(range(self.capacity - 1, -1, -1))
+        self._count = 0
+
+    def _remove_front(self, num: int):
+        if num <= 0:
+            return
+        self._free_slots.extend(self._sorted_slots[:num].tolist())
+        remain = self._count - num
+        self._sorted_timestamps[:remain] = self._sorted_timestamps[num:self._count]
+        self._sorted_slots[:remain] = self._sorted_slots[num:self._count]
+        self._count = remain
+
+    def _grow(self, capacity: int):
+        frames = np.empty((capacity,) + self._frames.shape[1:], dtype=self._frames.dtype)
+        # slot ids stay valid, views returned earlier keep the old storage alive
+        frames[:self.capacity] = self._frames
+        self._frames = frames
+        self._free_slots = list(range(capacity - 1, self.capacity - 1, -1)) + self._free_slots
+        for name in ["_sorted_timestamps", "_sorted_slots"]:
+            index = np.empty(capacity, dtype=np.int64)
+            index[:self._count] = getattr(self, name)[:self._count]
+            setattr(self, name, index)
+        logger.info(f"Frame buffer grown from {self.capacity} to {capacity} frames")
+        self.capacity = capacity
+
+    def _make_room(self, timestamp: int):
+        if self.retention is not None:
+            newest = max(timestamp, int(self._sorted_timestamps[self._count - 1]))
+            expired = self._range(newest - self.retention, newest - self.retention)[0]
+            self._remove_front(expired)
+            self.expired_dropped += expired
+        if self._count == self.capacity and self.capacity < self.max_capacity:
+            self._grow(min(self.max_capacity, self.capacity * 2))
+
+    def put(self, timestamp: int, frame: np.ndarray) -> bool:
+        if self._released_before is not None and timestamp < self._released_before:
+            self.late_dropped += 1
+            return False
+        if self._frames is None or self._frames.shape[1:] != frame.shape or self._frames.dtype != frame.dtype:
+            self._allocate(frame)
+
+        if self._count == self.capacity:
+            self._make_room(timestamp)
+        position = int(np.searchsorted(self._sorted_timestamps[:self._count], timestamp, side="right"))
+        if self._count == self.capacity:
+            if position == 0:
+                # older than everything kept in a full buffer
+                self.overflow_dropped += 1
+                return False
+            self._remove_front(1)
+            self.overflow_dropped += 1
+            position -= 1
+
+        slot = self._free_slots.pop()
+        self._frames[slot] = frame
+        if position < self._count:
+            self._sorted_timestamps[position + 1:self._count + 1] = self._sorted_timestamps[position:self._count]
+            self._sorted_slots[position + 1:self._count + 1] = self._sorted_slots[position:self._count]
+        self._sorted_timestamps[position] = timestamp
+        self._sorted_slots[position] = slot
+        self._count += 1
+        return True
+
+    def _range(self, start: int, end: int) -> Tuple[int, int]:
+        timestamps = self._sorted_timestamps[:self._count]
+        return (int(np.searchsorted(timestamps, start, side="left")),
+                int(np.searchsorted(timestamps, end, side="left")))
+
+    def query(self, start: int, end: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Timestamps and frame views within [start, end), ordered by timestamp.
+        """
+        begin, stop = self._range(start, end)
+        timestamps = self._sorted_timestamps[begin:stop].copy()
+        frames = [self._frames[slot] for slot in self._sorted_slots[begin:stop]]
+        return timestamps, frames
+
+    def release_before(self, timestamp: int):
+        """
+        Drop frames before timestamp, frames arriving later with an older timestamp are rejected as late.
+        """
+        if self._released_before is None or timestamp > self._released_before:
+            self._released_before = timestamp
+        self._remove_front(self._range(timestamp, timestamp)[0])
+
+    def latest_timestamp(self) -> Optional[int]:
+        if self._count == 0:
+            return None
+        return int(self._sorted_timestamps[self._count - 1])
@@ -0,0 +1,51 @@
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class VideoIngestStats:
+    received: int = 0
+    passed: int = 0
+    decimated: int = 0
+    resized: int = 0
+
+
+class VideoIngestFilter:
+    """
+    Reduce incoming camera frames to what the consuming handlers declared before they enter the session.
+
+    A frame passes only if at least 1 / max_frame_rate seconds passed since the last passed frame, passed
+    frames are downscaled once so their longest side is at most max_frame_size. 0 disables either limit.
+    """
+
+    def __init__(self, max_frame_size: int = 0, max_frame_rate: float = 0):
+        self.max_frame_size = max_frame_size
+        self.min_interval = 1.0 / max_frame_rate if max_frame_rate > 0 else 0.0
+        self.stats = VideoIngestStats()
+        self._last_passed_time: Optional[float] = None
+
+    def process(self, frame: np.ndarray, timestamp: float) -> Optional[np.ndarray]:
+        """
+        Frame to submit or None if it is not needed, timestamp is in seconds.
+        """
+        self.stats.received += 1
+        if self._last_passed_time is not None and timestamp - self._last_passed_time < self.min_interval:
+            self.stats.decimated += 1
+            return None
+        self._last_passed_time = timestamp
+        self.stats.passed += 1
+
+        height, width = frame.shape[:2]
+        longest_side = max(height, width)
+        if 0 < self.max_frame_size < longest_side:
+            scale = self.max_frame_size / longest_side
+            frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+            self.stats.resized += 1
+        return frame
+
+    def get_stats(self) -> dict:
+        return asdict(self.stats)
@@ -15,6 +15,8 @@ from chat_engine.contexts.handler_context import HandlerContext
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_engine_config_data import HandlerBaseConfigModel, ChatEngineConfigModel
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.data_models.runtime_data.data_bundle import DataBundleDefinition, DataBundleEntry, DataBundle
 from engine_utils.directory_info import DirectoryInfo
 from engine_utils.general_slicer import SliceContext, slice_data
@@ -33,6 +35,9 @@ class AvatarLAMContext(HandlerContext):
         self.inference_context = None
         self.input_slice_context: Optional[SliceContext] = None
         self.last_speech_id: Optional[str] = None
+        # set by interrupt, streaming state is reset on the handling thread
+        self.interrupted_speech_id: Optional[str] = None
+        self.reset_requested: bool = False
 
 
 class HandlerAvatarLAM(HandlerBase):
@@ -156,6 +161,14 @@ class HandlerAvatarLAM(HandlerBase):
         speech_end = inputs.data.get_meta("avatar_speech_end", False)
         speech_text = inputs.data.get_meta("avatar_speech_text")
 
+        if context.reset_requested:
+            context.reset_requested = False
+            context.input_slice_context.flush()
+            context.inference_context = None
+            context.last_speech_id = None
+        if speech_id is not None and speech_id == context.interrupted_speech_id:
+            return
+
         audio = inputs.data.get_main_data()
         audio_segments = queue.Queue()
         for audio_segment in slice_data(context.input_slice_context, audio.squeeze()):
@@ -166,7 +179,7 @@ class HandlerAvatarLAM(HandlerBase):
                 audio_segments.put_nowait(end_segment)
         if audio_segments.empty() and speech_end:
             audio_segments.put_nowait(np.zeros([50], dtype=np.float32))
-        while not audio_segments.empty():
+        while not audio_segments.empty() and not context.reset_requested:
             t_start = time.monotonic()
             audio_segment = audio_segments.get_nowait()
             result, context_update = self.infer.infer_streaming_audio(
@@ -202,5 +215,12 @@ class HandlerAvatarLAM(HandlerBase):
             if need_flush:
                 context.last_speech_id = None
 
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        if signal.type != ChatSignalType.INTERRUPT:
+            return
+        context = cast(AvatarLAMContext, context)
+        context.interrupted_speech_id = context.last_speech_id
+        context.reset_requested = True
+
     def destroy_context(self, context: HandlerContext):
         pass
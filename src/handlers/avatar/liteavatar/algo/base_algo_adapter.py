@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 
+from handlers.avatar.liteavatar.algo.idle_frame_cache import IdleFrameCache
 from handlers.avatar.liteavatar.model.algo_model import (
     AvatarInitOption, AudioSlice, AvatarAlgoConfig,
     AvatarStatus, SignalType)
@@ -13,6 +14,13 @@ class BaseAlgoAdapter(ABC):
     def init(self, init_option: AvatarInitOption):
         pass
 
+    def fork(self) -> "BaseAlgoAdapter":
+        """
+        adapter for another session sharing the loaded model, per session state is reset,
+        adapters without per session state return themselves
+        """
+        return self
+
     @abstractmethod
     def audio2signal(self, audio_slice: AudioSlice) -> List[SignalType]:
         pass
@@ -23,6 +31,14 @@ class BaseAlgoAdapter(ABC):
                    avatar_status: AvatarStatus) -> tuple[np.ndarray, int]:
         pass
 
+    def signal2img_batch(self,
+                         signal_data_list: List[SignalType],
+                         avatar_status: AvatarStatus) -> List[tuple[np.ndarray, int]]:
+        """
+        render consecutive frames at once, adapters able to batch model calls override it
+        """
+        return [self.signal2img(signal_data, avatar_status) for signal_data in signal_data_list]
+
     @abstractmethod
     def mouth2full(self, mouth_image: np.ndarray, bg_frame_id: int) -> np.ndarray:
         pass
@@ -31,6 +47,24 @@ class BaseAlgoAdapter(ABC):
     def get_idle_signal(self, idle_frame_count) -> List[SignalType]:
         pass
 
+    def get_idle_frame_cache(self) -> Optional[IdleFrameCache]:
+        """
+        cache of final idle frames keyed by the background frame id, None if idle frames are not cacheable
+        """
+        return None
+
+    def peek_bg_frame_id(self) -> int:
+        """
+        background frame the next rendered frame uses
+        """
+        return 0
+
+    def skip_bg_frame(self):
+        """
+        advance the background frame without rendering, used when the frame is taken from the idle frame cache
+        """
+        pass
+
     @abstractmethod
     def get_algo_config(self) -> AvatarAlgoConfig:
         """
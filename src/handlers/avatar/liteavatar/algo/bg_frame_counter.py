@@ -10,6 +10,14 @@ class BgFrameCounter:
         self._current_bg_index = 0
         self._total_bg_count = total_bg_count
 
+    def peek_bg_index(self):
+        """
+        bg index the next get_and_update_bg_index returns
+        """
+        if self._total_bg_count <= 1:
+            return 0
+        return self._current_bg_index
+
     def get_and_update_bg_index(self):
         """
         get bg index in a front-end-front loop
@@ -0,0 +1,86 @@
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+
+class IdleFrameCache:
+    """
+    Final idle frames by background frame id, the idle param is constant so an idle frame only depends on
+    its background frame. Frames are filled lazily as idle frames are rendered.
+
+    With file_path the frames are kept in a memory-mapped .npy file, a complete file is reused read only by
+    later processes, so workers of the same avatar share its pages through the page cache.
+    """
+
+    def __init__(self, frame_count: int, file_path: Optional[str] = None):
+        self.frame_count = frame_count
+        self.file_path = file_path
+        self._frames: Optional[np.ndarray] = None
+        self._filled = np.zeros(frame_count, dtype=bool)
+        self._tmp_path: Optional[str] = None
+        self._lock = threading.Lock()
+        if file_path is not None and os.path.exists(file_path):
+            self._load(file_path)
+
+    def _load(self, file_path: str):
+        try:
+            frames = np.load(file_path, mmap_mode="r")
+        except Exception as e:
+            logger.warning(f"Failed to load idle frame cache {file_path}: {e}")
+            return
+        if frames.ndim != 4 or frames.shape[0] != self.frame_count:
+            logger.warning(f"Idle frame cache {file_path} has shape {frames.shape}, "
+                           f"expected {self.frame_count} frames, it is rebuilt")
+            return
+        self._frames = frames
+        self._filled[:] = True
+        logger.info(f"Loaded {self.frame_count} idle frames from {file_path}")
+
+    def is_complete(self) -> bool:
+        return bool(self._filled.all())
+
+    def get(self, bg_frame_id: int) -> Optional[np.ndarray]:
+        if 0 <= bg_frame_id < self.frame_count and self._filled[bg_frame_id]:
+            return self._frames[bg_frame_id]
+        return None
+
+    def put(self, bg_frame_id: int, frame: np.ndarray):
+        with self._lock:
+            if not 0 <= bg_frame_id < self.frame_count or self._filled[bg_frame_id]:
+                return
+            if self._frames is None:
+                self._frames = self._allocate(frame.shape, frame.dtype)
+            if self._frames.shape[1:] != frame.shape:
+                logger.warning(f"Idle frame shape {frame.shape} differs from cached {self._frames.shape[1:]}")
+                return
+            self._frames[bg_frame_id] = frame
+            self._filled[bg_frame_id] = True
+            if self._tmp_path is not None and self.is_complete():
+                self._persist()
+
+    def _allocate(self, frame_shape, dtype) -> np.ndarray:
+        shape = (self.frame_count, *frame_shape)
+        if self.file_path is not None:
+            # every process builds into its own file, the complete one atomically replaces the cache file
+            tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+            try:
+                frames = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+                self._tmp_path = tmp_path
+                return frames
+            except OSError as e:
+                logger.warning(f"Failed to create idle frame cache {tmp_path}, keep it in memory: {e}")
+        return np.empty(shape, dtype=dtype)
+
+    def _persist(self):
+        try:
+            self._frames.flush()
+            os.replace(self._tmp_path, self.file_path)
+            # drop the writable mapping, readers share the clean pages of the file
+            self._frames = np.load(self.file_path, mmap_mode="r")
+            logger.info(f"Saved {self.frame_count} idle frames to {self.file_path}")
+        except OSError as e:
+            logger.warning(f"Failed to save idle frame cache {self.file_path}: {e}")
+        self._tmp_path = None
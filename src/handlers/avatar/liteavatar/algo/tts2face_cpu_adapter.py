@@ -1,7 +1,9 @@
 
+import copy
 import os
 import shutil
 import sys
+import threading
 from typing import Optional
 import subprocess as sp
 
@@ -9,6 +11,7 @@ from loguru import logger
 
 from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
 from handlers.avatar.liteavatar.algo.bg_frame_counter import BgFrameCounter
+from handlers.avatar.liteavatar.algo.idle_frame_cache import IdleFrameCache
 from handlers.avatar.liteavatar.algo.liteavatar.lite_avatar import liteAvatar
 from handlers.avatar.liteavatar.model.algo_model import AvatarAlgoConfig, AvatarInitOption, AvatarStatus
 from engine_utils.directory_info import DirectoryInfo
@@ -19,11 +22,18 @@ from engine_utils.inspect_utils import InspectUtils
 class Tts2faceCpuAdapter(BaseAlgoAdapter):
 
     TARGET_FPS = 30
+    # audio2param window in seconds, low latency slices are completed to it with preceding audio
+    AUDIO_WINDOW_DURATION = 1
 
     def __init__(self, handler_root: Optional[str] = None):
         super().__init__()
         self.tts2face = None
         self._bg_counter = None
+        self._bg_step = 1
+        self._idle_frame_cache: Optional[IdleFrameCache] = None
+        self._low_latency_slice_duration = 0
+        # model calls of sessions sharing the model are interleaved one call at a time
+        self._model_lock = threading.Lock()
         self.handler_root = handler_root
         if self.handler_root is None:
             self.handler_root = os.path.join(DirectoryInfo.get_project_dir(),
@@ -43,27 +53,51 @@ class Tts2faceCpuAdapter(BaseAlgoAdapter):
                 data_dir=data_dir,
                 fps=init_option.video_frame_rate
             )
-        bg_step = self.TARGET_FPS // init_option.video_frame_rate
+        self._bg_step = self.TARGET_FPS // init_option.video_frame_rate
+        if init_option.low_latency_slice_duration > 0:
+            # whole video frames per slice so signals and audio stay aligned
+            slice_frame_count = max(1, round(init_option.low_latency_slice_duration * init_option.video_frame_rate))
+            self._low_latency_slice_duration = min(slice_frame_count / init_option.video_frame_rate,
+                                                   self.AUDIO_WINDOW_DURATION)
         self.tts2face.load_dynamic_model(data_dir)
-        self._bg_counter = BgFrameCounter(len(self.tts2face.ref_img_list), bg_step)
+        self._bg_counter = BgFrameCounter(len(self.tts2face.ref_img_list), self._bg_step)
+        if init_option.idle_frame_cache and not init_option.debug:
+            cache_path = os.path.join(data_dir, "idle_frames.npy") if init_option.idle_frame_cache_mmap else None
+            self._idle_frame_cache = IdleFrameCache(len(self.tts2face.ref_img_list), cache_path)
         self.warm_up()
         return super().init(init_option)
 
+    def fork(self):
+        session_adapter = copy.copy(self)
+        session_adapter._bg_counter = BgFrameCounter(len(self.tts2face.ref_img_list), self._bg_step)
+        return session_adapter
+
     @timeit
     def audio2signal(self, audio_slice):
-        signal_list = self.tts2face.audio2param(
-            input_audio_byte=audio_slice.algo_audio_data,
-            prefix_padding_size=0,
-            is_complete=audio_slice.end_of_speech,
-        )
+        with self._model_lock:
+            signal_list = self.tts2face.audio2param(
+                input_audio_byte=audio_slice.algo_audio_data,
+                prefix_padding_size=0,
+                is_complete=audio_slice.end_of_speech,
+            )
         return signal_list
 
     @timeit
     def signal2img(self, signal_data, avatar_status: AvatarStatus):
         bg_frame_id = self._bg_counter.get_and_update_bg_index()
-        mouth_img = self.tts2face.param2img(signal_data, bg_frame_id)
+        with self._model_lock:
+            mouth_img = self.tts2face.param2img(signal_data, bg_frame_id)
         return mouth_img, bg_frame_id
 
+    @timeit
+    def signal2img_batch(self, signal_data_list, avatar_status: AvatarStatus):
+        bg_frame_ids = [self._bg_counter.get_and_update_bg_index() for _ in signal_data_list]
+        # one lock round for the whole batch, sessions sharing the model render ahead so they absorb the wait
+        with self._model_lock:
+            mouth_imgs = [self.tts2face.param2img(signal_data, bg_frame_id)
+                          for signal_data, bg_frame_id in zip(signal_data_list, bg_frame_ids)]
+        return list(zip(mouth_imgs, bg_frame_ids))
+
     @timeit
     def mouth2full(self, mouth_image, bg_frame_id, use_bg=False):
         full_img, _ = self.tts2face.merge_mouth_to_bg(mouth_image, bg_frame_id, use_bg)
@@ -76,10 +110,25 @@ class Tts2faceCpuAdapter(BaseAlgoAdapter):
             idle_signal_list.append(idle_param)
         return idle_signal_list
 
+    def get_idle_frame_cache(self):
+        return self._idle_frame_cache
+
+    def peek_bg_frame_id(self):
+        return self._bg_counter.peek_bg_index()
+
+    def skip_bg_frame(self):
+        self._bg_counter.get_and_update_bg_index()
+
     def get_algo_config(self):
+        if self._low_latency_slice_duration > 0:
+            return AvatarAlgoConfig(
+                input_audio_sample_rate=16000,
+                input_audio_slice_duration=self._low_latency_slice_duration,
+                input_audio_context_duration=self.AUDIO_WINDOW_DURATION - self._low_latency_slice_duration
+            )
         return AvatarAlgoConfig(
             input_audio_sample_rate=16000,
-            input_audio_slice_duration=1
+            input_audio_slice_duration=self.AUDIO_WINDOW_DURATION
         )
 
     def _get_avatar_data_dir(self, avatar_name):
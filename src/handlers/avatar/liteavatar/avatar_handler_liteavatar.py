@@ -15,7 +15,9 @@ from chat_engine.contexts.handler_context import HandlerContext
 from chat_engine.contexts.session_context import SessionContext, SharedStates
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel
-from handlers.avatar.liteavatar.liteavatar_worker import Tts2FaceConfigModel
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
+from handlers.avatar.liteavatar.liteavatar_worker import Tts2FaceConfigModel, Tts2FaceEvent
 from handlers.avatar.liteavatar.liteavatar_handler_context import HandlerTts2FaceContext
 from handlers.avatar.liteavatar.liteavatar_worker_manager import LiteAvatarWorkerManager
 
@@ -71,14 +73,16 @@ class HandlerTts2Face(HandlerBase, ABC):
         
         worker = self.lite_avatar_worker_manager.start_worker()
         if worker is None:
-            raise Exception("No available lite avatar worker")
+            raise Exception("No idle lite avatar worker, more are being spawned if the pool is not at max_workers")
 
         context = HandlerTts2FaceContext("session", worker, self.shared_state)
         context.output_data_definitions = self.output_data_definitions
         return context
 
     def start_context(self, session_context, handler_context):
-        pass
+        # rendering starts once output can be submitted, the context is ready with the first frame
+        context = cast(HandlerTts2FaceContext, handler_context)
+        context.lite_avatar_worker.event_in_queue.put_nowait(Tts2FaceEvent.START)
 
     def get_handler_detail(self, session_context: SessionContext,
                            context: HandlerContext) -> HandlerDetail:
@@ -127,10 +131,15 @@ class HandlerTts2Face(HandlerBase, ABC):
         )
         context.lite_avatar_worker.audio_in_queue.put(speech_audio)
 
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        if signal.type == ChatSignalType.INTERRUPT and isinstance(context, HandlerTts2FaceContext):
+            context.interrupt()
+
     def destroy_context(self, context: HandlerContext):
         if isinstance(context, HandlerTts2FaceContext):
             logger.info("destroy context with session id: {}", context.session_id)
             context.clear()
+            self.lite_avatar_worker_manager.release_worker(context.lite_avatar_worker)
     
     def destroy(self):
         if self.lite_avatar_worker_manager is not None:
@@ -1,6 +1,6 @@
 
 from fractions import Fraction
-from queue import Queue
+from queue import Empty, Queue
 import sys
 from threading import Thread
 import threading
@@ -16,6 +16,7 @@ from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
 from handlers.avatar.liteavatar.media.speech_audio_aligner import SpeechAudioAligner
 from handlers.avatar.liteavatar.media.speech_audio_processor import SpeechAudioProcessor
 from handlers.avatar.liteavatar.avatar_output_handler import AvatarOutputHandler
+from handlers.avatar.liteavatar.media.frame_compositor import FrameCompositor
 from handlers.avatar.liteavatar.media.video_audio_aligner import VideoAudioAligner
 from handlers.avatar.liteavatar.model.algo_model import (
     AvatarInitOption, AudioResult, AudioSlice, AvatarStatus, MouthResult, SignalResult, VideoResult)
@@ -24,9 +25,20 @@ from src.engine_utils.interval_counter import IntervalCounter
 
 
 class AvatarProcessor:
+    # mouth images rendered ahead of output, speech fills up to RENDER_AHEAD_FRAMES,
+    # idle frames only keep IDLE_RENDER_AHEAD_FRAMES so new speech is not queued behind them
+    RENDER_AHEAD_FRAMES = 25
+    IDLE_RENDER_AHEAD_FRAMES = 2
+    RENDER_BATCH_SIZE = 5
+    # output frames are reused after this many frames, output handlers copy what they keep
+    FRAME_POOL_SIZE = 4
+    # signals of a slice are generated in this share of its duration, so generation stays ahead of output
+    SIGNAL_PACE_RATIO = 0.9
+
     def __init__(self,
                  algo_adapter: BaseAlgoAdapter,
-                 init_option: AvatarInitOption):
+                 init_option: AvatarInitOption,
+                 init_algo: bool = True):
         
         ## TODO remove debugger logger
         logger.remove()
@@ -40,6 +52,7 @@ class AvatarProcessor:
         self._signal_queue: Queue = None
         self._mouth_img_queue: Queue = None
         self._speech_audio_processor: SpeechAudioProcessor = None
+        self._frame_compositor: FrameCompositor = None
 
         # running context
         self._session_running = False
@@ -51,8 +64,13 @@ class AvatarProcessor:
         self._current_video_pts = 0
         self._last_speech_ended = True
         self._current_speech_id = ""
+        self._interrupted_speech_ids = set()
         self._session_start_time = 0
         self._callback_avatar_status: AvatarStatus = None
+        # latest speech and arrival time of its first audio until its first frame is output,
+        # for time to first lip motion
+        self._timed_speech_id = None
+        self._first_audio_time = None
 
         # other helpers
         self._audio2signal_speed_limiter = None
@@ -66,7 +84,8 @@ class AvatarProcessor:
         # for debug
         self._debug_mode = init_option.debug
 
-        self._init_algo()
+        if init_algo:
+            self._init_algo()
 
     def start(self):
         self._session_running = True
@@ -91,6 +110,11 @@ class AvatarProcessor:
         logger.info("avatar processor stopped")
 
     def add_audio(self, speech_audio: SpeechAudio):
+        if speech_audio.speech_id in self._interrupted_speech_ids:
+            return
+        if speech_audio.speech_id != self._timed_speech_id:
+            self._timed_speech_id = speech_audio.speech_id
+            self._first_audio_time = time.time()
         audio_slices = self._speech_audio_processor.get_speech_audio_slice(speech_audio)
         for audio_slice in audio_slices:
             self._audio_slice_queue.put(audio_slice)
@@ -104,10 +128,23 @@ class AvatarProcessor:
 
     def interrupt(self):
         """
-        clear input audio
+        drop pending audio, signals and mouth images of the current speech,
+        later audio of the same speech is ignored and idle frames are generated
         """
-        if self._audio_slice_queue is not None:
-            self._audio_slice_queue.queue.clear()
+        self._interrupted_speech_ids.add(self._current_speech_id)
+        if self._speech_audio_processor is not None:
+            self._interrupted_speech_ids.add(self._speech_audio_processor.reset())
+        for data_queue in [self._audio_slice_queue, self._signal_queue, self._mouth_img_queue]:
+            if data_queue is None:
+                continue
+            with data_queue.mutex:
+                for item in data_queue.queue:
+                    self._interrupted_speech_ids.add(item.speech_id)
+                data_queue.queue.clear()
+        self._interrupted_speech_ids.discard("")
+        self._first_audio_time = None
+        self._last_speech_ended = True
+        logger.info("avatar processor interrupted, speech {}", self._interrupted_speech_ids)
 
     def _audio2signal_loop(self):
         """
@@ -122,11 +159,12 @@ class AvatarProcessor:
             start_time = time.time()
             try:
                 audio_slice: AudioSlice = self._audio_slice_queue.get(timeout=0.1)
-                target_round_time = audio_slice.get_audio_duration() - 0.1
             except Exception:
                 continue
 
             speech_id = audio_slice.speech_id
+            if speech_id in self._interrupted_speech_ids:
+                continue
             if speech_id != self._current_speech_id:
                 self._last_speech_ended = False
                 self._current_speech_id = speech_id
@@ -139,9 +177,13 @@ class AvatarProcessor:
 
             self._speech_audio_aligner.add_audio(audio_slice.play_audio_data, speech_id)
 
+            # remove frames of the context audio in front of the slice
+            context_frame_count = round(audio_slice.algo_context_duration * self._init_option.video_frame_rate)
+            signal_vals = signal_vals[context_frame_count:]
+
             # remove front padding audio and relative frames
             front_padding_duration = audio_slice.front_padding_duration
-            target_round_time = audio_slice.get_audio_duration() - front_padding_duration - 0.1
+            target_round_time = (audio_slice.get_audio_duration() - front_padding_duration) * self.SIGNAL_PACE_RATIO
             padding_frame_count = int(front_padding_duration * self._init_option.video_frame_rate)
             signal_vals = signal_vals[padding_frame_count:]
             padding_audio_count = int(front_padding_duration) * self._init_option.audio_sample_rate * 2
@@ -151,6 +193,9 @@ class AvatarProcessor:
             #     audio_slice.play_audio_data, audio_slice.play_audio_sample_rate, len(signal_vals),
             #     audio_slice.speech_id, audio_slice.end_of_speech)
 
+            if speech_id in self._interrupted_speech_ids:
+                # interrupted while generating signals of this slice
+                continue
             for i, signal in enumerate(signal_vals):
                 frame_end_of_speech = audio_slice.end_of_speech and i == len(signal_vals) - 1
                 audio_slice = self._speech_audio_aligner.get_speech_level_algined_audio(end_of_speech=frame_end_of_speech)
@@ -173,69 +218,114 @@ class AvatarProcessor:
 
     def _signal2img_loop(self):
         """
-        generate image and do callbacks
+        render mouth images ahead into the mouth image queue, output is paced by mouth2full
         """
         logger.info("signal2img loop started")
-        start_time = -1
-        timestamp = 0
-        
-        # delay start to ensure no extra audio and video generated
-        time.sleep(0.5)
-        
+        frame_interval = 1 / self._init_option.video_frame_rate
+
         while self._session_running:
-            if self._signal_queue.empty():
+            buffered = self._mouth_img_queue.qsize()
+            signals = []
+            while len(signals) < min(self.RENDER_BATCH_SIZE, self.RENDER_AHEAD_FRAMES - buffered):
+                try:
+                    signals.append(self._signal_queue.get_nowait())
+                except Empty:
+                    break
+            if not signals:
+                if buffered >= self.IDLE_RENDER_AHEAD_FRAMES:
+                    time.sleep(frame_interval / 2)
+                    continue
+                avatar_status = AvatarStatus.LISTENING if self._last_speech_ended else AvatarStatus.SPEAKING
+                if self._put_cached_idle_frame(avatar_status):
+                    continue
                 # generate idle
                 signal_val = self._algo_adapter.get_idle_signal(1)[0]
-                avatar_status = AvatarStatus.LISTENING if self._last_speech_ended else AvatarStatus.SPEAKING
-                signal = SignalResult(
+                signals.append(SignalResult(
                     speech_id=self._current_speech_id,
                     end_of_speech=False,
                     middle_data=signal_val,
                     frame_id=0,
                     avatar_status=avatar_status,
-                    audio_slice=self._get_idle_audio_slice(1)
+                    audio_slice=self._get_idle_audio_slice(1),
+                    is_idle=True,
+                ))
+
+            render_results = self._algo_adapter.signal2img_batch(
+                [signal.middle_data for signal in signals], signals[0].avatar_status)
+            for signal, (out_image, bg_frame_id) in zip(signals, render_results):
+                if signal.speech_id and signal.speech_id in self._interrupted_speech_ids:
+                    # interrupted while rendering this batch
+                    continue
+                # create mouth result
+                mouth_result = MouthResult(
+                    speech_id=signal.speech_id,
+                    mouth_image=out_image,
+                    bg_frame_id=bg_frame_id,
+                    end_of_speech=signal.end_of_speech,
+                    avatar_status=signal.avatar_status,
+                    audio_slice=signal.audio_slice,
+                    global_frame_id=self._global_frame_count,
+                    is_idle=signal.is_idle,
                 )
-            else:
-                signal: SignalResult = self._signal_queue.get_nowait()
-
-            out_image, bg_frame_id = self._algo_adapter.signal2img(signal.middle_data, signal.avatar_status)
-            # create mouth result
-            mouth_result = MouthResult(
-                speech_id=signal.speech_id,
-                mouth_image=out_image,
-                bg_frame_id=bg_frame_id,
-                end_of_speech=signal.end_of_speech,
-                avatar_status=signal.avatar_status,
-                audio_slice=signal.audio_slice,
-                global_frame_id=self._global_frame_count
-            )
-            
-            self._global_frame_count += 1
-
-            self._mouth_img_queue.put(mouth_result)
-            self._callback_counter.add_property("signal2img")
-
-            if start_time == -1:
-                start_time = time.time()
-                timestamp = 0
-            else:
-                timestamp += 1 / self._init_option.video_frame_rate
-                wait = start_time + timestamp - time.time()
-                if wait > 0:
-                    time.sleep(wait)
+                self._global_frame_count += 1
+                self._mouth_img_queue.put(mouth_result)
+                self._callback_counter.add_property("signal2img")
 
         logger.info("signal2img loop ended")
 
+    def _put_cached_idle_frame(self, avatar_status: AvatarStatus) -> bool:
+        """
+        queue the idle frame from the idle frame cache without running the model, False on cache miss
+        """
+        idle_frame_cache = self._algo_adapter.get_idle_frame_cache()
+        if idle_frame_cache is None:
+            return False
+        bg_frame_id = self._algo_adapter.peek_bg_frame_id()
+        full_image = idle_frame_cache.get(bg_frame_id)
+        if full_image is None:
+            return False
+        self._algo_adapter.skip_bg_frame()
+        self._mouth_img_queue.put(MouthResult(
+            speech_id=self._current_speech_id,
+            mouth_image=None,
+            full_image=full_image,
+            bg_frame_id=bg_frame_id,
+            end_of_speech=False,
+            avatar_status=avatar_status,
+            audio_slice=self._get_idle_audio_slice(1),
+            global_frame_id=self._global_frame_count,
+            is_idle=True,
+        ))
+        self._global_frame_count += 1
+        self._callback_counter.add_property("idle_cache")
+        return True
+
     def _mouth2full_loop(self):
         logger.info("combine img loop started")
+        start_time = -1
+        timestamp = 0
         while self._session_running:
             try:
                 mouth_reusult: MouthResult = self._mouth_img_queue.get(timeout=0.1)
             except Exception:
                 continue
-            image = mouth_reusult.mouth_image
             bg_frame_id = mouth_reusult.bg_frame_id
-            full_img = self._algo_adapter.mouth2full(image, bg_frame_id)
+            full_img = mouth_reusult.full_image
+            if full_img is None:
+                full_img = self._compose_frame(mouth_reusult.mouth_image, bg_frame_id)
+                idle_frame_cache = self._algo_adapter.get_idle_frame_cache()
+                if mouth_reusult.is_idle and idle_frame_cache is not None:
+                    idle_frame_cache.put(bg_frame_id, full_img)
+
+            # pace output to fps, rendering runs ahead
+            if start_time == -1:
+                start_time = time.time()
+                timestamp = 0
+            else:
+                timestamp += 1 / self._init_option.video_frame_rate
+                wait = start_time + timestamp - time.time()
+                if wait > 0:
+                    time.sleep(wait)
             
             if mouth_reusult.audio_slice is not None:
                 # create audio result
@@ -263,21 +353,24 @@ class AvatarProcessor:
                 full_img = cv2.putText(
                     full_img, f"{mouth_reusult.avatar_status} {mouth_reusult.global_frame_id}",
                     (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            full_img = cv2.flip(full_img, 1)
-            video_frame = av.VideoFrame.from_ndarray(full_img, format="bgr24")
-            video_frame.time_base = Fraction(1, self._init_option.video_frame_rate)
-            video_frame.pts = self._current_video_pts
-            self._current_video_pts += 1
-
             image_result = VideoResult(
-                video_frame=video_frame,
+                video_data=full_img,
+                pts=self._current_video_pts,
+                frame_rate=self._init_option.video_frame_rate,
                 speech_id=mouth_reusult.speech_id,
                 avatar_status=mouth_reusult.avatar_status,
                 end_of_speech=mouth_reusult.end_of_speech,
                 bg_frame_id=bg_frame_id
             )
+            self._current_video_pts += 1
 
             self._callback_image(image_result)
+            first_audio_time = self._first_audio_time
+            if first_audio_time is not None and not mouth_reusult.is_idle \
+                    and mouth_reusult.speech_id == self._timed_speech_id:
+                self._first_audio_time = None
+                logger.info("speech {} first lip motion {:.0f}ms after its first audio",
+                            mouth_reusult.speech_id, (time.time() - first_audio_time) * 1e3)
             
             if self._callback_avatar_status != image_result.avatar_status and self._callback_avatar_status is not None:
                 self._callback_avatar_status_changed(mouth_reusult.speech_id, image_result.avatar_status)
@@ -285,16 +378,27 @@ class AvatarProcessor:
             
         logger.info("combine img loop ended")
 
+    def _compose_frame(self, mouth_image, bg_frame_id: int) -> np.ndarray:
+        """
+        flipped full frame in a pooled buffer
+        """
+        return self._frame_compositor.flip(self._algo_adapter.mouth2full(mouth_image, bg_frame_id))
+
     def _reset_processor_status(self):
+        self._interrupted_speech_ids = set()
+        self._timed_speech_id = None
+        self._first_audio_time = None
         self._audio_slice_queue = Queue()
         self._signal_queue = Queue()
         self._mouth_img_queue = Queue()
+        self._frame_compositor = FrameCompositor(self.FRAME_POOL_SIZE)
         algo_config = self._algo_adapter.get_algo_config()
         self._speech_audio_processor = SpeechAudioProcessor(
             self._init_option.audio_sample_rate,
             algo_config.input_audio_sample_rate,
             algo_config.input_audio_slice_duration,
-            enable_fast_mode=self._init_option.enable_fast_mode
+            enable_fast_mode=self._init_option.enable_fast_mode,
+            context_duration=algo_config.input_audio_context_duration
         )
         self._audio2signal_speed_limiter = Audio2SignalSpeedLimiter(self._init_option.video_frame_rate)
         self._video_audio_aligner = VideoAudioAligner(self._init_option.video_frame_rate)
@@ -1,4 +1,7 @@
+from typing import List
+
 from loguru import logger
+from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
 from handlers.avatar.liteavatar.model.algo_model import AvatarInitOption
 from handlers.avatar.liteavatar.avatar_processor import AvatarProcessor
 
@@ -11,14 +14,32 @@ class AvatarAlgoType:
 class AvatarProcessorFactory:
 
     @staticmethod
-    def create_avatar_processor(handler_root: str, algo_type: AvatarAlgoType,
-                                init_option: AvatarInitOption) -> AvatarProcessor:
+    def create_algo_adapter(handler_root: str, algo_type: AvatarAlgoType) -> BaseAlgoAdapter:
         algo_adapter = None
-        logger.info("create avatar processor with init option: {}", init_option)
         if algo_type == AvatarAlgoType.SAMPLE:
             from tests.inttest.avatar.sample_adapter import SampleAdapter
             algo_adapter = SampleAdapter()
         if algo_type == AvatarAlgoType.TTS2FACE_CPU:
             from handlers.avatar.liteavatar.algo.tts2face_cpu_adapter import Tts2faceCpuAdapter
             algo_adapter = Tts2faceCpuAdapter(handler_root)
+        return algo_adapter
+
+    @staticmethod
+    def create_avatar_processor(handler_root: str, algo_type: AvatarAlgoType,
+                                init_option: AvatarInitOption) -> AvatarProcessor:
+        logger.info("create avatar processor with init option: {}", init_option)
+        algo_adapter = AvatarProcessorFactory.create_algo_adapter(handler_root, algo_type)
         return AvatarProcessor(algo_adapter, init_option)
+
+    @staticmethod
+    def create_avatar_processors(handler_root: str, algo_type: AvatarAlgoType,
+                                 init_option: AvatarInitOption, count: int) -> List[AvatarProcessor]:
+        """
+        processors for count concurrent sessions, the algo model is loaded once and shared by all of them
+        """
+        logger.info("create {} avatar processors with init option: {}", count, init_option)
+        algo_adapter = AvatarProcessorFactory.create_algo_adapter(handler_root, algo_type)
+        processors = [AvatarProcessor(algo_adapter, init_option)]
+        for _ in range(count - 1):
+            processors.append(AvatarProcessor(algo_adapter.fork(), init_option, init_algo=False))
+        return processors
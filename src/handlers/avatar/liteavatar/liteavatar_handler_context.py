@@ -1,3 +1,4 @@
+import queue
 import threading
 import time
 from typing import Dict
@@ -10,20 +11,22 @@ from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.common.engine_channel_type import EngineChannelType
-from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarWorker, Tts2FaceEvent
+from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarWorkerSlot, Tts2FaceEvent
 
 
 class HandlerTts2FaceContext(HandlerContext):
     def __init__(self,
                  session_id: str,
-                 lite_avatar_worker: LiteAvatarWorker,
+                 lite_avatar_worker: LiteAvatarWorkerSlot,
                  shared_status):
         super().__init__(session_id)
-        self.lite_avatar_worker: LiteAvatarWorker = lite_avatar_worker
+        self.lite_avatar_worker: LiteAvatarWorkerSlot = lite_avatar_worker
         self.shared_state: SharedStates = shared_status
 
         self.output_data_definitions: Dict[ChatDataType, DataBundleDefinition] = {}
-        
+        # ready once the worker rendered the first frame of this session
+        self.deferred_ready = True
+
         self.media_out_thread: threading.Thread = None
         self.event_out_thread: threading.Thread = None
 
@@ -84,14 +87,25 @@ class HandlerTts2FaceContext(HandlerContext):
                 logger.info("receive output event: {}", event)
                 if event == Tts2FaceEvent.SPEAKING_TO_LISTENING:
                     self.shared_state.enable_vad = True
+                elif event == Tts2FaceEvent.SESSION_READY:
+                    self.set_ready()
             except Exception:
                 continue
         logger.info("event out loop exit")
     
+    def interrupt(self):
+        # the worker drops its pending audio and rendered output, frames already fetched here are dropped too
+        self.lite_avatar_worker.event_in_queue.put_nowait(Tts2FaceEvent.INTERRUPT)
+        for data_queue in [self.lite_avatar_worker.audio_out_queue, self.lite_avatar_worker.video_out_queue]:
+            try:
+                while True:
+                    data_queue.get_nowait()
+            except queue.Empty:
+                pass
+
     def clear(self):
         logger.info("clear tts2face context")
         self.loop_running = False
         self.lite_avatar_worker.event_in_queue.put_nowait(Tts2FaceEvent.STOP)
         self.media_out_thread.join()
-        self.event_out_thread.join()
-        self.lite_avatar_worker.release()
\ No newline at end of file
+        self.event_out_thread.join()
\ No newline at end of file
@@ -1,5 +1,6 @@
 from loguru import logger
 import torch.multiprocessing as mp
+import queue
 import threading
 import time
 from typing import Optional
@@ -32,14 +33,29 @@ class Tts2FaceConfigModel(HandlerBaseConfigModel, BaseModel):
     fps: int = Field(default=25)
     enable_fast_mode: bool = Field(default=False)
     use_gpu: bool = Field(default=True)
+    # replay cached idle frames while listening instead of rendering them, mmap keeps them in a file per avatar
+    idle_frame_cache: bool = Field(default=True)
+    idle_frame_cache_mmap: bool = Field(default=False)
+    # worker pool, min_idle_workers counts idle session slots, max_workers 0 follows concurrent_limit
+    min_idle_workers: int = Field(default=1)
+    max_workers: int = Field(default=0)
+    worker_idle_ttl: float = Field(default=300.0)
+    # sessions rendered by one worker process, they share the model and background frames
+    sessions_per_worker: int = Field(default=1)
+    # low latency mode, audio is sliced into slices of this many seconds (e.g. 0.2-0.4) instead of 1s,
+    # each fed with the preceding audio as context, 0 disables it
+    low_latency_slice_duration: float = Field(default=0.0)
 
 
 class Tts2FaceEvent(Enum):
     START = 1001
     STOP = 1002
+    INTERRUPT = 1003
 
     LISTENING_TO_SPEAKING = 2001
     SPEAKING_TO_LISTENING = 2002
+    # first frame of the session is rendered
+    SESSION_READY = 2003
 
 class Tts2FaceOutputHandler(AvatarOutputHandler):
     def __init__(self, audio_output_queue, video_output_queue,
@@ -48,6 +64,7 @@ class Tts2FaceOutputHandler(AvatarOutputHandler):
         self.video_output_queue = video_output_queue
         self.event_out_queue = event_out_queue
         self._video_producer_counter = IntervalCounter("video_producer")
+        self._first_frame_sent = False
 
     def on_start(self, init_option: AvatarInitOption):
         logger.info("on algo processor start")
@@ -63,10 +80,12 @@ class Tts2FaceOutputHandler(AvatarOutputHandler):
 
     def on_video(self, video_result: VideoResult):
         self._video_producer_counter.add()
-        video_frame = video_result.video_frame
-        video_data = video_frame.to_ndarray(format="bgr24")
-        video_tensor = torch.from_numpy(video_data)
+        # the frame buffer is reused by the processor, share_memory_ copies it for the queue right away
+        video_tensor = torch.from_numpy(video_result.video_data).share_memory_()
         self.video_output_queue.put_nowait(video_tensor)
+        if not self._first_frame_sent:
+            self._first_frame_sent = True
+            self.event_out_queue.put_nowait(Tts2FaceEvent.SESSION_READY)
 
     def on_avatar_status_change(self, speech_id, avatar_status: AvatarStatus):
         logger.info(f"Avatar status changed: {speech_id} {avatar_status}")
@@ -79,10 +98,11 @@ class WorkerStatus(Enum):
     BUSY = 1002
  
 
-class LiteAvatarWorker:
-    def __init__(self,
-                 handler_root: str,
-                 config: Tts2FaceConfigModel):
+class LiteAvatarWorkerSlot:
+    """
+    One session of a worker process, the queues and stop acknowledgement are shared with the process.
+    """
+    def __init__(self):
         self.event_in_queue = mp.Queue()
         self.event_out_queue = mp.Queue()
         self.audio_in_queue = mp.Queue()
@@ -99,33 +119,26 @@ class LiteAvatarWorker:
         self.session_running = False
         self.audio_input_thread = None
         self.worker_status = WorkerStatus.IDLE
+        self.idle_since = time.monotonic()
 
         # Event synchronization: stop acknowledgement
         self._stop_ack_event = mp.Event()
         self._stop_ack_event.set()  # Initial state: idle
 
-        self._avatar_process = mp.Process(target=self.start_avatar, args=[handler_root, config])
-        self._avatar_process.start()
-    
-    
     def get_status(self):
         return self.worker_status
-    
-    def recruit(self):
-        """Acquire worker for a new session"""
-        # Ensure process is still alive
-        if self._avatar_process is not None and not self._avatar_process.is_alive():
-            raise RuntimeError("Avatar process is not alive")
 
+    def recruit(self):
+        """Acquire slot for a new session"""
         # Clear previous stop acknowledgement if present
         if self._stop_ack_event.is_set():
             self._stop_ack_event.clear()
 
         self.worker_status = WorkerStatus.BUSY
         logger.info("Avatar worker recruited for new session")
-    
+
     def release(self):
-        """Release worker and wait for session to stop"""
+        """Release slot and wait for session to stop"""
         logger.info("Releasing avatar worker for next session")
 
         # Wait for stop acknowledgement (timeout: 2 seconds)
@@ -135,34 +148,14 @@ class LiteAvatarWorker:
             logger.info("Stop acknowledgement received")
 
         self.worker_status = WorkerStatus.IDLE
+        self.idle_since = time.monotonic()
         logger.info("Avatar worker released and ready for next session")
 
-    def start_avatar(self,
-                     handler_root: str,
-                     config: Tts2FaceConfigModel):
+    def run_event_loop(self, processor: AvatarProcessor):
+        """Runs in the avatar process"""
+        self.processor = processor
+        threading.Thread(target=self._event_input_loop).start()
 
-        self.processor = AvatarProcessorFactory.create_avatar_processor(
-            handler_root,
-            AvatarAlgoType.TTS2FACE_CPU,
-            AvatarInitOption(
-                audio_sample_rate=24000,
-                video_frame_rate=config.fps,
-                avatar_name=config.avatar_name,
-                debug=config.debug,
-                enable_fast_mode=config.enable_fast_mode,
-                use_gpu=config.use_gpu
-            )
-        )
-        logger.info("Avatar process is ready")
-        
-        # Start event input loop
-        event_in_loop = threading.Thread(target=self._event_input_loop)
-        event_in_loop.start()
-        
-        # Keep process alive
-        while True:
-            time.sleep(1)
-    
     def _event_input_loop(self):
         while True:
             event: Tts2FaceEvent = self.event_in_queue.get()
@@ -184,6 +177,13 @@ class LiteAvatarWorker:
                 else:
                     logger.warning("Received START event but session is already active, ignoring")
 
+            elif event == Tts2FaceEvent.INTERRUPT:
+                if self.session_running and self.processor is not None:
+                    self._clear_queue(self.audio_in_queue)
+                    self.processor.interrupt()
+                    self._clear_queue(self.audio_out_queue)
+                    self._clear_queue(self.video_out_queue)
+
             elif event == Tts2FaceEvent.STOP:
                 # Stop session only when one is active
                 if self.session_running:
@@ -196,7 +196,6 @@ class LiteAvatarWorker:
                         self.audio_input_thread.join()
                         self.audio_input_thread = None
                     self._clear_mp_queues()
-                    self.context = None
                     logger.info("Avatar session stopped")
                     # Signal stop acknowledgement
                     self._stop_ack_event.set()
@@ -215,6 +214,73 @@ class LiteAvatarWorker:
         for q in self.io_queues:
             while not q.empty():
                 q.get()
+
+    @staticmethod
+    def _clear_queue(q):
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+
+
+class LiteAvatarWorker:
+    """
+    Avatar process hosting sessions_per_worker sessions, one slot each. The slots share the loaded model
+    and background frames, their model calls are interleaved.
+    """
+    def __init__(self,
+                 handler_root: str,
+                 config: Tts2FaceConfigModel):
+        self.slots = [LiteAvatarWorkerSlot() for _ in range(max(1, config.sessions_per_worker))]
+        # set by the avatar process once the processors are loaded
+        self._process_ready_event = mp.Event()
+
+        self._avatar_process = mp.Process(target=self.start_avatar, args=[handler_root, config])
+        self._avatar_process.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._process_ready_event.wait(timeout)
+
+    def is_ready(self) -> bool:
+        return self._process_ready_event.is_set()
+
+    def is_alive(self) -> bool:
+        return self._avatar_process is not None and self._avatar_process.is_alive()
+
+    def get_pid(self) -> Optional[int]:
+        return self._avatar_process.pid if self._avatar_process is not None else None
+
+    def start_avatar(self,
+                     handler_root: str,
+                     config: Tts2FaceConfigModel):
+
+        processors = AvatarProcessorFactory.create_avatar_processors(
+            handler_root,
+            AvatarAlgoType.TTS2FACE_CPU,
+            AvatarInitOption(
+                audio_sample_rate=24000,
+                video_frame_rate=config.fps,
+                avatar_name=config.avatar_name,
+                debug=config.debug,
+                enable_fast_mode=config.enable_fast_mode,
+                use_gpu=config.use_gpu,
+                idle_frame_cache=config.idle_frame_cache,
+                idle_frame_cache_mmap=config.idle_frame_cache_mmap,
+                low_latency_slice_duration=config.low_latency_slice_duration,
+            ),
+            len(self.slots)
+        )
+        logger.info("Avatar process is ready with {} session slots", len(self.slots))
+
+        # Start event input loops
+        for slot, processor in zip(self.slots, processors):
+            slot.run_event_loop(processor)
+        self._process_ready_event.set()
+        
+        # Keep process alive
+        while True:
+            time.sleep(1)
     
     def destroy(self):
         """terminate avatar process when object is destroyed"""
@@ -1,30 +1,173 @@
+import math
+import threading
 import time
+from typing import Callable, List, Optional
+
 from loguru import logger
 
-from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarWorker, \
-    Tts2FaceConfigModel, Tts2FaceEvent, WorkerStatus
+from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarWorker, LiteAvatarWorkerSlot, \
+    Tts2FaceConfigModel, WorkerStatus
 
 
 class LiteAvatarWorkerManager:
-    
-    def __init__(self, concurrent_limit: int, handler_root: str, config: Tts2FaceConfigModel):
+    """
+    Elastic pool of avatar worker processes, each hosting sessions_per_worker session slots.
+
+    A maintenance thread keeps min_idle_workers idle slots ready in advance, spawns more for sessions that
+    found no idle slot up to max_workers processes, replaces crashed processes and reaps processes whose slots all
+    stayed idle longer than worker_idle_ttl while more than min_idle_workers slots are idle.
+    """
+    # workers load one after another to avoid competing for memory, the next starts once the previous is ready
+    WORKER_READY_TIMEOUT = 120
+    MAINTAIN_INTERVAL = 1.0
+
+    def __init__(self, concurrent_limit: int, handler_root: str, config: Tts2FaceConfigModel,
+                 worker_factory: Optional[Callable[[], LiteAvatarWorker]] = None):
         self.cocurrent_limit = concurrent_limit
         self.handler_root = handler_root
         self.config = config
-        self.lite_avatar_workers = []
-        for _ in range(concurrent_limit):
-            self.lite_avatar_workers.append(LiteAvatarWorker(handler_root, config))
-            time.sleep(5)
-    
-    def start_worker(self):
-        for worker in self.lite_avatar_workers:
-            if worker.get_status() == WorkerStatus.IDLE:
-                worker.recruit()
-                worker.event_in_queue.put_nowait(Tts2FaceEvent.START)
-                return worker
+        self.sessions_per_worker = max(1, config.sessions_per_worker)
+        self.max_workers = config.max_workers if config.max_workers > 0 \
+            else math.ceil(concurrent_limit / self.sessions_per_worker)
+        self.min_idle_workers = min(max(config.min_idle_workers, 0), self.max_workers * self.sessions_per_worker)
+        self.worker_factory = worker_factory or (lambda: LiteAvatarWorker(self.handler_root, self.config))
+
+        self.lite_avatar_workers: List[LiteAvatarWorker] = []
+        self.spawning_count = 0
+        self.waiting_count = 0
+        # sessions turned away for lack of an idle slot, slots are spawned for them so a retry finds one
+        self.missed_count = 0
+        self.condition = threading.Condition()
+        self.running = True
+        self.maintain_thread = threading.Thread(target=self._maintain_loop, name="liteavatar_pool", daemon=True)
+        self.maintain_thread.start()
+
+    @staticmethod
+    def _is_idle(worker: LiteAvatarWorker) -> bool:
+        return all(slot.get_status() == WorkerStatus.IDLE for slot in worker.slots)
+
+    def _idle_slots(self) -> List[LiteAvatarWorkerSlot]:
+        # fill busy workers first so whole workers become idle and can be reaped
+        workers = [worker for worker in self.lite_avatar_workers if worker.is_ready() and worker.is_alive()]
+        workers.sort(key=self._is_idle)
+        return [slot for worker in workers for slot in worker.slots if slot.get_status() == WorkerStatus.IDLE]
+
+    def _spawn_needed(self) -> bool:
+        if len(self.lite_avatar_workers) + self.spawning_count >= self.max_workers:
+            return False
+        idle_count = len(self._idle_slots()) + self.spawning_count * self.sessions_per_worker
+        return idle_count < self.min_idle_workers + self.waiting_count + self.missed_count
+
+    def _check_health(self):
+        for worker in list(self.lite_avatar_workers):
+            if worker.is_alive():
+                continue
+            if self._is_idle(worker):
+                logger.warning("Idle lite avatar worker process died, it is replaced")
+            else:
+                logger.error("Lite avatar worker process died during a session, it is replaced")
+            self.lite_avatar_workers.remove(worker)
+            worker.destroy()
+
+    def _reap_idle(self, now: float):
+        excess = len(self._idle_slots()) - self.min_idle_workers - self.waiting_count - self.missed_count
+        idle_workers = [(max(slot.idle_since for slot in worker.slots), worker)
+                        for worker in self.lite_avatar_workers
+                        if worker.is_ready() and self._is_idle(worker)]
+        # reap the longest idle first
+        for idle_since, worker in sorted(idle_workers, key=lambda x: x[0]):
+            if excess < len(worker.slots):
+                break
+            if now - idle_since < self.config.worker_idle_ttl:
+                break
+            logger.info(f"Reap lite avatar worker idle for {round(now - idle_since)}s")
+            self.lite_avatar_workers.remove(worker)
+            worker.destroy()
+            excess -= len(worker.slots)
+
+    def _spawn_worker(self):
+        spawn_start = time.monotonic()
+        worker = self.worker_factory()
+        if not worker.wait_ready(self.WORKER_READY_TIMEOUT) or not worker.is_alive():
+            logger.error(f"Lite avatar worker not ready after {self.WORKER_READY_TIMEOUT}s, it is discarded")
+            worker.destroy()
+            return None
+        logger.info(f"Lite avatar worker with {len(worker.slots)} session slots spawned in "
+                    f"{round((time.monotonic() - spawn_start) * 1e3)} milliseconds")
+        return worker
+
+    def _maintain_loop(self):
+        while self.running:
+            with self.condition:
+                self._check_health()
+                self._reap_idle(time.monotonic())
+                spawn = self._spawn_needed()
+                if spawn:
+                    self.spawning_count += 1
+                else:
+                    self.condition.wait(self.MAINTAIN_INTERVAL)
+                    continue
+            worker = None
+            try:
+                worker = self._spawn_worker()
+            except Exception as e:
+                logger.opt(exception=True).error(f"Failed to spawn lite avatar worker: {e}")
+            with self.condition:
+                self.spawning_count -= 1
+                if worker is not None:
+                    if self.running:
+                        self.lite_avatar_workers.append(worker)
+                        self.missed_count = max(0, self.missed_count - len(worker.slots))
+                    else:
+                        worker.destroy()
+                elif self.running:
+                    # do not retry a failing spawn in a tight loop
+                    self.condition.wait(self.MAINTAIN_INTERVAL)
+                self.condition.notify_all()
+
+    def start_worker(self, timeout: float = 0.0) -> Optional[LiteAvatarWorkerSlot]:
+        """
+        Recruit an idle session slot, waiting up to timeout seconds for one to be spawned or released. None if
+        none became available, the pool then grows so a later request finds one. Session creation does not
+        wait, it runs on the event loop of the rtc service.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.waiting_count += 1
+            try:
+                while self.running:
+                    idle_slots = self._idle_slots()
+                    if idle_slots:
+                        slot = idle_slots[0]
+                        slot.recruit()
+                        # let the pool prepare the next idle slot
+                        self.condition.notify_all()
+                        return slot
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.notify_all()
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting_count -= 1
+            if self.running and len(self.lite_avatar_workers) + self.spawning_count < self.max_workers:
+                self.missed_count += 1
+                self.condition.notify_all()
+        logger.warning(f"No lite avatar worker available after waiting {timeout}s, "
+                       f"{len(self.lite_avatar_workers)}/{self.max_workers} workers running")
         return None
-    
+
+    def release_worker(self, slot: LiteAvatarWorkerSlot):
+        slot.release()
+        with self.condition:
+            self.condition.notify_all()
+
     def destroy(self):
         logger.info("destroy LiteAvatarWorkerManager")
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.maintain_thread.join()
         for worker in self.lite_avatar_workers:
             worker.destroy()
+        self.lite_avatar_workers.clear()
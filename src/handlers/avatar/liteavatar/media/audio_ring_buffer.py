@@ -0,0 +1,77 @@
+from typing import Union
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Preallocated int16 sample ring buffer with read and write cursors, it grows when a write does not fit.
+
+    read and peek return a view into the buffer when the samples do not wrap around its end, the view is
+    only valid until the next write.
+    """
+
+    def __init__(self, capacity: int):
+        self._buffer = np.zeros(max(1, int(capacity)), dtype=np.int16)
+        # absolute sample positions, the buffer index is position % capacity
+        self._read_pos = 0
+        self._write_pos = 0
+
+    def __len__(self):
+        return self._write_pos - self._read_pos
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+    def write(self, data: Union[bytes, bytearray, np.ndarray]):
+        samples = data if isinstance(data, np.ndarray) else np.frombuffer(data, dtype=np.int16)
+        count = len(samples)
+        if count == 0:
+            return
+        buffered = self._write_pos - self._read_pos
+        if buffered + count > len(self._buffer):
+            self._grow(buffered + count)
+        capacity = len(self._buffer)
+        start = self._write_pos % capacity
+        first = min(count, capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        if first < count:
+            self._buffer[:count - first] = samples[first:]
+        self._write_pos += count
+
+    def peek(self, count: int) -> np.ndarray:
+        count = min(count, self._write_pos - self._read_pos)
+        capacity = len(self._buffer)
+        start = self._read_pos % capacity
+        if start + count <= capacity:
+            return self._buffer[start:start + count]
+        return np.concatenate((self._buffer[start:], self._buffer[:start + count - capacity]))
+
+    def skip(self, count: int):
+        self._read_pos += min(count, len(self))
+        if self._read_pos == self._write_pos:
+            # restart at the buffer front so following reads stay contiguous
+            self.clear()
+
+    def read(self, count: int) -> np.ndarray:
+        samples = self.peek(count)
+        self._read_pos += len(samples)
+        if self._read_pos == self._write_pos:
+            self.clear()
+        return samples
+
+    def clear(self):
+        self._read_pos = 0
+        self._write_pos = 0
+
+    def _grow(self, min_capacity: int):
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        buffered = len(self)
+        buffer = np.zeros(capacity, dtype=np.int16)
+        buffer[:buffered] = self.peek(buffered)
+        self._buffer = buffer
+        self._read_pos = 0
+        self._write_pos = buffered
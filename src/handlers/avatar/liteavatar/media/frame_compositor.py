@@ -0,0 +1,42 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+
+class FramePool:
+    """
+    Preallocated output frame buffers handed out round robin, a buffer is written again after size more
+    frames of the same shape, so consumers copy what they keep beyond that.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._buffers: List[np.ndarray] = []
+        self._next = 0
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        if self._buffers and (self._buffers[0].shape != tuple(shape) or self._buffers[0].dtype != dtype):
+            # frame size changed, the old buffers are dropped
+            self._buffers = []
+        if len(self._buffers) < self.size:
+            self._buffers.append(np.empty(shape, dtype=dtype))
+            return self._buffers[-1]
+        buffer = self._buffers[self._next]
+        self._next = (self._next + 1) % self.size
+        return buffer
+
+
+class FrameCompositor:
+    """
+    Builds horizontally flipped output frames in pooled buffers, cv2 flips straight into the buffer so a frame
+    costs no intermediate copy.
+    """
+
+    def __init__(self, pool_size: int):
+        self._pool = FramePool(pool_size)
+
+    def flip(self, image: np.ndarray) -> np.ndarray:
+        frame = self._pool.acquire(image.shape, image.dtype)
+        cv2.flip(image, 1, dst=frame)
+        return frame
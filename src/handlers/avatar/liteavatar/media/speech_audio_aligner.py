@@ -1,5 +1,6 @@
 from threading import Lock
 
+from handlers.avatar.liteavatar.media.audio_ring_buffer import AudioRingBuffer
 from handlers.avatar.liteavatar.model.algo_model import AudioSlice
 from loguru import logger
 
@@ -8,8 +9,8 @@ class SpeechAudioAligner:
     
     def __init__(self, fps, audio_sample_rate):
         self._speech_id = ""
-        self._audio_data = bytearray()
-        self._audio_start_idx = 0
+        # audio of the current speech not yet taken by frames
+        self._audio_buffer = AudioRingBuffer(2 * audio_sample_rate)
         self._audio_sample_rate = audio_sample_rate
         self._fps = fps
         self._audio_length_per_frame = audio_sample_rate / fps * 2
@@ -21,17 +22,15 @@ class SpeechAudioAligner:
             if speech_id != self._speech_id:
                 # new speech
                 self._speech_id = speech_id
-                self._audio_data = bytearray()
-                self._audio_start_idx = 0
-            self._audio_data += audio_data
+                self._audio_buffer.clear()
+            self._audio_buffer.write(audio_data)
     
     def get_speech_level_algined_audio(self, video_frame_count = 1, end_of_speech = False) -> AudioSlice:
-        audio_duration = int(video_frame_count * self._audio_length_per_frame)
-        audio_end_idx = self._audio_start_idx + audio_duration
-        audio_data = self._audio_data[self._audio_start_idx:audio_end_idx]
-        if len(audio_data) < audio_duration:
-            audio_data = audio_data + bytearray(audio_duration - len(audio_data))
-        self._audio_start_idx = audio_end_idx
+        audio_sample_count = int(video_frame_count * self._audio_length_per_frame) // 2
+        with self._audio_lock:
+            audio_data = self._audio_buffer.read(audio_sample_count).tobytes()
+        if len(audio_data) < audio_sample_count * 2:
+            audio_data = audio_data + bytes(audio_sample_count * 2 - len(audio_data))
         return AudioSlice(
             speech_id=self._speech_id,
             play_audio_data=audio_data,
@@ -5,6 +5,8 @@ from typing import List
 import librosa
 from loguru import logger
 import numpy as np
+from engine_utils.streaming_resampler import StreamingResampler
+from handlers.avatar.liteavatar.media.audio_ring_buffer import AudioRingBuffer
 from handlers.avatar.liteavatar.model.algo_model import AudioSlice
 from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
 
@@ -13,14 +15,23 @@ class SpeechAudioProcessor:
     def __init__(self,
                  input_sample_rate: int,
                  output_sample_rate: int,
-                 audio_slice_duration: int,
-                 enable_fast_mode: bool = False):
+                 audio_slice_duration: float,
+                 enable_fast_mode: bool = False,
+                 context_duration: float = 0):
         self._input_sample_rate = input_sample_rate
         self._output_sample_rate = output_sample_rate
         self._audio_slice_duration = audio_slice_duration
+        self._slice_sample_count = round(input_sample_rate * audio_slice_duration)
         self._enable_fast_mode = enable_fast_mode
+        # algo audio of the preceding slices, put in front of each slice, silence at the start of a speech
+        self._context_duration = context_duration
+        self._algo_context = np.zeros(round(output_sample_rate * context_duration), dtype=np.int16)
 
+        # speech id, sample rate and end of speech of the current speech, its audio is kept in _audio_buffer
         self._current_audio = SpeechAudio()
+        self._audio_buffer = AudioRingBuffer(2 * input_sample_rate * audio_slice_duration)
+        # slices of one speech are resampled as a stream, so slice boundaries leave no artifacts
+        self._resampler = StreamingResampler(input_sample_rate, output_sample_rate)
 
     def get_speech_audio_slice(self, speech_audio: SpeechAudio) \
             -> List[AudioSlice]:
@@ -33,11 +44,14 @@ class SpeechAudioProcessor:
             # new speech, extend this to audio slice duration,
             # so that algo can start immediately
             logger.info("generate first audio slice for speech {}", speech_audio.speech_id)
-            self._current_audio = speech_audio.model_copy()
+            self._current_audio = speech_audio.model_copy(update={"audio_data": bytes()})
+            self._audio_buffer.clear()
+            self._resampler.reset()
+            self._algo_context[:] = 0
             if self._enable_fast_mode:
-                audio_data = self._current_audio.audio_data
+                audio_data = speech_audio.audio_data
 
-                target_length = int(2 * speech_audio.sample_rate * self._audio_slice_duration)
+                target_length = 2 * round(speech_audio.sample_rate * self._audio_slice_duration)
                 padding_length = target_length - len(audio_data)
                 audio_data = bytes(padding_length) + audio_data
                 
@@ -50,31 +64,28 @@ class SpeechAudioProcessor:
                     end_of_speech=speech_audio.end_of_speech,
                     front_padding_duration=padding_duration
                 )
-                self._current_audio.audio_data = bytes()
                 return [audio_slice]
+            self._audio_buffer.write(speech_audio.audio_data)
         else:
             self._extend_current_audio(speech_audio)
         
         logger.info("input speech audio {}, end of speech {}, duration {:.3f}s, current audio length {}",
                     speech_audio.speech_id, speech_audio.end_of_speech, speech_audio.get_audio_duration(),
-                    len(self._current_audio.audio_data))
+                    2 * len(self._audio_buffer))
 
         output_audio_list = []
-        while self._current_audio.get_audio_duration() >= self._audio_slice_duration:
-            play_audio_data_length = int(2 * self._input_sample_rate *
-                                         self._audio_slice_duration)
-            play_audio_data = self._current_audio.audio_data[:play_audio_data_length]
-            self._current_audio.audio_data = self._current_audio.audio_data[play_audio_data_length:]
-            end_of_speech = len(self._current_audio.audio_data) == 0 and speech_audio.end_of_speech
+        while len(self._audio_buffer) >= self._slice_sample_count:
+            play_audio_data = self._audio_buffer.read(self._slice_sample_count).tobytes()
+            end_of_speech = len(self._audio_buffer) == 0 and speech_audio.end_of_speech
             audio_slice = self._create_audio_slice(
                 speech_audio.speech_id,
                 play_audio_data,
                 self._input_sample_rate,
                 end_of_speech)
             output_audio_list.append(audio_slice)
-        if self._current_audio.end_of_speech and len(self._current_audio.audio_data) > 0:
+        if self._current_audio.end_of_speech and len(self._audio_buffer) > 0:
             play_audio_data, end_padding_duration = self.extend_audio_to_duration(
-                self._current_audio.audio_data,
+                self._audio_buffer.read(len(self._audio_buffer)).tobytes(),
                 self._input_sample_rate,
                 self._audio_slice_duration,
                 False
@@ -86,11 +97,23 @@ class SpeechAudioProcessor:
                 True,
                 end_padding_duration=end_padding_duration))
             self._current_audio = SpeechAudio()
+            self._audio_buffer.clear()
         return output_audio_list
 
+    def reset(self) -> str:
+        """
+        drop buffered audio of current speech, return its speech id
+        """
+        speech_id = self._current_audio.speech_id
+        self._current_audio = SpeechAudio()
+        self._audio_buffer.clear()
+        self._resampler.reset()
+        self._algo_context[:] = 0
+        return speech_id
+
     def _extend_current_audio(self, speech_audio: SpeechAudio):
         assert self._current_audio.speech_id == speech_audio.speech_id
-        self._current_audio.audio_data += speech_audio.audio_data
+        self._audio_buffer.write(speech_audio.audio_data)
         self._current_audio.end_of_speech = speech_audio.end_of_speech
 
     def _create_audio_slice(self,
@@ -100,9 +123,10 @@ class SpeechAudioProcessor:
                             end_of_speech: bool,
                             front_padding_duration: float = 0,
                             end_padding_duration: float = 0) -> AudioSlice:
-        algo_audio = self.resample_audio(play_audio_data,
-                                         self._input_sample_rate,
-                                         self._output_sample_rate)
+        algo_audio = self._stream_resample(play_audio_data)
+        if len(self._algo_context) > 0:
+            algo_audio = self._algo_context.tobytes() + algo_audio
+            self._algo_context = np.frombuffer(algo_audio, dtype=np.int16)[-len(self._algo_context):].copy()
         return AudioSlice(
             algo_audio_data=algo_audio,
             algo_audio_sample_rate=self._output_sample_rate,
@@ -111,15 +135,24 @@ class SpeechAudioProcessor:
             play_audio_sample_rate=play_audio_sample_rate,
             speech_id=speech_id,
             front_padding_duration=front_padding_duration,
-            end_padding_duration=end_padding_duration
+            end_padding_duration=end_padding_duration,
+            algo_context_duration=self._context_duration
         )
 
+    def _stream_resample(self, audio_data: bytes) -> bytes:
+        if self._input_sample_rate == self._output_sample_rate:
+            return audio_data
+        audio_float32 = np.frombuffer(audio_data, np.short).astype(np.float32) / np.iinfo(np.int16).max
+        resampled_float = self._resampler.process(audio_float32)
+        resampled_pcm = (np.clip(resampled_float, -1, 1) * np.iinfo(np.short).max).astype(np.int16)
+        return resampled_pcm.tobytes()
+
     @staticmethod
     def extend_audio_to_duration(audio_data: bytes,
                                  sample_rate: int,
                                  duration: int,
                                  padding_front: bool):
-        target_length = int(2 * sample_rate * duration)
+        target_length = 2 * round(sample_rate * duration)
         padding_length = target_length - len(audio_data)
         if padding_length < 0:
             return audio_data
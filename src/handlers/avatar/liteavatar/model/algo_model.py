@@ -1,6 +1,7 @@
 
 
 from enum import Enum
+from fractions import Fraction
 from typing import Any, Optional, TypeVar
 import av
 from pydantic import BaseModel
@@ -18,6 +19,10 @@ class AvatarInitOption(BaseModel):
     debug: bool = False
     enable_fast_mode: bool = False
     use_gpu: bool = True
+    idle_frame_cache: bool = True
+    idle_frame_cache_mmap: bool = False
+    # audio slice duration in seconds for low latency mode, 0 keeps the algo slice duration
+    low_latency_slice_duration: float = 0
 
 
 class AudioSlice(BaseModel):
@@ -29,6 +34,8 @@ class AudioSlice(BaseModel):
     end_of_speech: bool
     front_padding_duration: float = 0
     end_padding_duration: float = 0
+    # algo audio of the preceding slices in front of this slice, not part of play audio
+    algo_context_duration: float = 0
 
     def get_audio_duration(self) -> float:
         return len(self.play_audio_data) / self.play_audio_sample_rate / 2
@@ -45,6 +52,7 @@ class SignalResult(BaseModel):
     frame_id: int
     global_frame_id: int = 0
     middle_data: SignalType
+    is_idle: bool = False
 
 
 class MouthResult(BaseModel):
@@ -55,6 +63,9 @@ class MouthResult(BaseModel):
     mouth_image: Any
     audio_slice: Optional[AudioSlice] = None
     global_frame_id: int
+    is_idle: bool = False
+    # final idle frame from the idle frame cache, mouth_image is None then
+    full_image: Any = None
 
     model_config = {
         "arbitrary_types_allowed": True
@@ -64,7 +75,10 @@ class MouthResult(BaseModel):
 class VideoResult(BaseModel):
     speech_id: Any
     avatar_status: AvatarStatus
-    video_frame: Any | av.VideoFrame
+    # contiguous bgr24 frame from the processor frame pool, only valid until on_video returns
+    video_data: Any
+    pts: int
+    frame_rate: int
     end_of_speech: bool
     bg_frame_id: int
 
@@ -72,6 +86,13 @@ class VideoResult(BaseModel):
         "arbitrary_types_allowed": True
     }
 
+    @property
+    def video_frame(self) -> av.VideoFrame:
+        video_frame = av.VideoFrame.from_ndarray(self.video_data, format="bgr24")
+        video_frame.time_base = Fraction(1, self.frame_rate)
+        video_frame.pts = self.pts
+        return video_frame
+
 
 class AudioResult(BaseModel):
     speech_id: Any
@@ -85,3 +106,4 @@ class AudioResult(BaseModel):
 class AvatarAlgoConfig(BaseModel):
     input_audio_sample_rate: int
     input_audio_slice_duration: float     # input audio duration in second
+    input_audio_context_duration: float = 0     # preceding audio fed along with each slice in second
@@ -15,10 +15,12 @@ from chat_engine.contexts.handler_context import HandlerContext
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.data_models.runtime_data.data_bundle import DataBundleDefinition, DataBundleEntry, DataBundle, VariableSize
 from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
 from handlers.avatar.liteavatar.liteavatar_worker import Tts2FaceEvent
-from handlers.avatar.musetalk.avatar_musetalk_processor import AvatarMuseTalkProcessor
+from handlers.avatar.musetalk.avatar_musetalk_server import AvatarMuseTalkServer
 from handlers.avatar.musetalk.avatar_musetalk_algo import MuseAvatarV15
 from handlers.avatar.musetalk.avatar_musetalk_config import AvatarMuseTalkConfig
 from engine_utils.general_slicer import slice_data, SliceContext
@@ -152,6 +154,14 @@ class AvatarMuseTalkContext(HandlerContext):
                 logger.opt(exception=True).error(f"Exception: {e}")
         logger.info("Event out loop exit")
     
+    def drop_output(self) -> None:
+        """
+        Drop rendered audio and video not yet returned to the engine.
+        """
+        for data_queue in [self.audio_out_queue, self.video_out_queue]:
+            with data_queue.mutex:
+                data_queue.queue.clear()
+
     def clear(self) -> None:
         """
         Clean up context and stop threads.
@@ -175,15 +185,10 @@ class HandlerAvatarMusetalk(HandlerBase):
         Initialize MuseTalk avatar handler.
         """
         super().__init__()
-        self.processor: Optional[AvatarMuseTalkProcessor] = None
+        # One avatar serves all sessions, the server batches UNet inference across them
+        self.server: Optional[AvatarMuseTalkServer] = None
         self.avatar: Optional[MuseAvatarV15] = None
-        self.audio_input_thread = None
-        self.event_in_queue = queue.Queue()
-        self.event_out_queue = queue.Queue()
-        self.audio_out_queue = queue.Queue()
-        self.video_out_queue = queue.Queue()
         self.output_data_definitions: Dict[ChatDataType, DataBundleDefinition] = {}
-        self.shared_state = None
         self._debug_cache = {}
 
     def _save_debug_cache(self, speech_id: str, debug_root: str) -> None:
@@ -209,7 +214,7 @@ class HandlerAvatarMusetalk(HandlerBase):
 
     def load(self, engine_config: ChatEngineConfigModel, handler_config: Optional[AvatarMuseTalkConfig] = None):
         """
-        Load and initialize model and processor, setup output data structure.
+        Load and initialize model and the MuseTalk server, setup output data structure.
         """
         if not isinstance(handler_config, AvatarMuseTalkConfig):
             handler_config = AvatarMuseTalkConfig()
@@ -266,11 +271,12 @@ class HandlerAvatarMusetalk(HandlerBase):
             gpu_id=0,
             debug=handler_config.debug
         )
-        self.processor = AvatarMuseTalkProcessor(
+        self.server = AvatarMuseTalkServer(
             self.avatar,
             handler_config
         )
-        logger.info("HandlerAvatarMusetalk loaded and processor initialized.")
+        self.server.start()
+        logger.info("HandlerAvatarMusetalk loaded and server started.")
 
     def create_context(self, session_context: SessionContext,
                       handler_config: Optional[AvatarMuseTalkConfig] = None) -> HandlerContext:
@@ -280,17 +286,19 @@ class HandlerAvatarMusetalk(HandlerBase):
         logger.info(f"HandlerAvatarMusetalk.create_context called, session_context={session_context}, handler_config={handler_config}")
         if not isinstance(handler_config, AvatarMuseTalkConfig):
             handler_config = AvatarMuseTalkConfig()
-        self.shared_state = session_context.shared_states
-        self.processor.audio_output_queue = self.audio_out_queue
-        self.processor.video_output_queue = self.video_out_queue
-        self.processor.event_out_queue = self.event_out_queue
         context = AvatarMuseTalkContext(
             session_context.session_info.session_id,
-            self.event_in_queue,
-            self.event_out_queue,
-            self.audio_out_queue,
-            self.video_out_queue,
-            self.shared_state
+            queue.Queue(),
+            queue.Queue(),
+            queue.Queue(),
+            queue.Queue(),
+            session_context.shared_states
+        )
+        self.server.open_session(
+            context.session_id,
+            context.audio_out_queue,
+            context.video_out_queue,
+            context.event_out_queue
         )
         context.output_data_definitions = self.output_data_definitions
         context.config = handler_config
@@ -305,15 +313,15 @@ class HandlerAvatarMusetalk(HandlerBase):
             slice_size=output_audio_sample_rate,
             slice_axis=0,
         )
-        logger.info("Context created and processor started.")
+        logger.info("Context created and session opened.")
         return context
 
     def start_context(self, session_context: SessionContext, handler_context: HandlerContext):
         """
         Start context.
         """
-        self.processor.start()
-        logger.info("Context started and processor started.")
+        self.server.start_session(handler_context.session_id)
+        logger.info("Context started and session frame clock started.")
         if hasattr(handler_context, 'config') and getattr(handler_context.config, 'debug_replay_speech_id', None):
             speech_id = handler_context.config.debug_replay_speech_id
             def _delayed_replay():
@@ -348,8 +356,8 @@ class HandlerAvatarMusetalk(HandlerBase):
     def handle(self, context: HandlerContext, inputs: ChatData,
                output_definitions: Dict[ChatDataType, HandlerDataInfo]):
         """
-        Main handler logic for processing audio input and sending to processor.
-        Receives audio data, slices it, wraps it as SpeechAudio, and sends to processor.
+        Main handler logic for processing audio input and sending to the server.
+        Receives audio data, slices it, wraps it as SpeechAudio, and sends it to the session on the server.
         """
         # Efficient debug data storage, write once at speech_end, record simplified inputs and output_definitions
         if hasattr(context, 'config') and getattr(context.config, 'debug_save_handler_audio', False):
@@ -414,8 +422,8 @@ class HandlerAvatarMusetalk(HandlerBase):
                 audio_data=audio_segment.tobytes(),
                 sample_rate=input_sample_rate
             )
-            if self.processor:
-                self.processor.add_audio(speech_audio)
+            if self.server:
+                self.server.add_audio(context.session_id, speech_audio)
         if speech_end:
             # On speech end, flush remaining audio, fill with zeros if empty
             end_segment = context.input_slice_context.flush()
@@ -434,8 +442,20 @@ class HandlerAvatarMusetalk(HandlerBase):
                 audio_data=audio_data,
                 sample_rate=input_sample_rate
             )
-            if self.processor:
-                self.processor.add_audio(speech_audio)
+            if self.server:
+                self.server.add_audio(context.session_id, speech_audio)
+
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        """
+        Stop lip sync of the interrupted speech, partial input slices are dropped with it.
+        """
+        if signal.type != ChatSignalType.INTERRUPT or not isinstance(context, AvatarMuseTalkContext):
+            return
+        if context.input_slice_context is not None:
+            context.input_slice_context.flush()
+        if self.server:
+            self.server.interrupt(context.session_id)
+        context.drop_output()
 
     def _pack_debug_record(self, inputs: ChatData, output_definitions: Dict[ChatDataType, HandlerDataInfo]):
         """
@@ -512,14 +532,15 @@ class HandlerAvatarMusetalk(HandlerBase):
 
     def destroy_context(self, context: HandlerContext):
         """
-        Clean up and stop processor and related threads.
+        Close the session on the server and stop the context threads.
         """
         if isinstance(context, AvatarMuseTalkContext):
-            if self.processor:
-                self.processor.stop()
-            if self.audio_input_thread:
-                self.audio_input_thread.join()
-                self.audio_input_thread = None
+            if self.server:
+                self.server.close_session(context.session_id)
             context.clear()
 
+    def destroy(self):
+        if self.server:
+            self.server.stop()
+
 
@@ -13,7 +13,6 @@ from transformers import WhisperModel
 import argparse
 import shutil
 import json
-import pickle
 import glob
 import builtins
 from pydantic import BaseModel
@@ -32,6 +31,7 @@ if handlers_dir not in sys.path:
     sys.path.append(handlers_dir)
 
 from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+from handlers.avatar.musetalk.avatar_musetalk_asset_store import AvatarAssetStore, convert_pickle_assets
 from handlers.avatar.musetalk.musetalk_utils_preprocessing import get_landmark_and_bbox
 
 # Now you can correctly import MuseTalk modules
@@ -132,6 +132,7 @@ class MuseAvatarV15:
         self.avatar_info_path = os.path.join(self.avatar_path, "avator_info.json")
         self.frames_path = os.path.join(self.avatar_path, "frames.pkl")
         self.masks_path = os.path.join(self.avatar_path, "masks.pkl")
+        self.assets_path = os.path.join(self.avatar_path, "assets")
         
         self.avatar_info = {
             "avatar_id": avatar_id,
@@ -166,20 +167,16 @@ class MuseAvatarV15:
         
         Automatically determine whether to regenerate data by checking the integrity of files in the avatar directory.
         If force_preparation is True, force regeneration.
-        Files to check include:
-        1. latents.pt - latent features file
-        2. coords.pkl - face coordinates file
-        3. mask_coords.pkl - mask coordinates file
-        4. avator_info.json - config info file
-        5. frames.pkl - frame data file
-        6. masks.pkl - mask data file
+        The avatar data is complete when avator_info.json exists together with either
+        1. assets/index.json - memory-mapped asset store
+        2. or the pickle layout of older versions, converted to an asset store on load:
+           latents.pt, coords.pkl, mask_coords.pkl, frames.pkl, masks.pkl
         """
         # 1. Check if data preparation is needed
-        required_files = [
+        pickle_files = [
             self.latents_out_path,      # latent features file
             self.coords_path,           # face coordinates file
             self.mask_coords_path,      # mask coordinates file
-            self.avatar_info_path,      # config info file
             self.frames_path,           # frame data file
             self.masks_path,            # mask data file
         ]
@@ -188,11 +185,12 @@ class MuseAvatarV15:
         need_preparation = self.force_preparation  # If force regeneration, set to True
         
         if not need_preparation and os.path.exists(self.avatar_path):
-            # Check if all required files exist
-            for file_path in required_files:
-                if not os.path.exists(file_path):
-                    need_preparation = True
-                    break
+            # Check if the asset store or all pickle files exist
+            if not os.path.exists(self.avatar_info_path):
+                need_preparation = True
+            elif not AvatarAssetStore.exists(self.assets_path) and \
+                    not all(os.path.exists(file_path) for file_path in pickle_files):
+                need_preparation = True
             
             # If config file exists, check if bbox_shift has changed
             if os.path.exists(self.avatar_info_path):
@@ -254,22 +252,28 @@ class MuseAvatarV15:
             self.prepare_material()
         else:
             logger.info(f"Avatar {self.avatar_id} exists and is complete, loading existing data...")
-            # Load existing data
-            self.input_latent_list_cycle = torch.load(self.latents_out_path)
-            with open(self.coords_path, 'rb') as f:
-                self.coord_list_cycle = pickle.load(f)
-            with open(self.frames_path, 'rb') as f:
-                self.frame_list_cycle = pickle.load(f)
-            with open(self.mask_coords_path, 'rb') as f:
-                self.mask_coords_list_cycle = pickle.load(f)
-            with open(self.masks_path, 'rb') as f:
-                self.mask_list_cycle = pickle.load(f)
+            if not AvatarAssetStore.exists(self.assets_path):
+                logger.info(f"Converting pickled data of avatar {self.avatar_id} to an asset store")
+                convert_pickle_assets(self.avatar_path, self.assets_path)
+            self._load_assets()
 
         # Warm up models is only needed in current thread
         # logger.info("Warming up models...")
         # self._warmup_models()
         # logger.info("Warmup complete")
 
+    def _load_assets(self):
+        """Map the avatar asset store, frames and masks are read from the page cache shared by all processes."""
+        t0 = time.time()
+        store = AvatarAssetStore.open(self.assets_path, self.device)
+        self.frame_list_cycle = store.frames
+        self.mask_list_cycle = store.masks
+        self.coord_list_cycle = store.coords
+        self.mask_coords_list_cycle = store.mask_coords
+        self.input_latent_list_cycle = store.latents
+        logger.info(f"Avatar assets mapped from {self.assets_path}: {len(store.frames)} frames, "
+                    f"time: {(time.time() - t0)*1000:.1f} ms")
+
     def _warmup_models(self):
         """
         Warm up all models and feature extraction pipeline to avoid first-frame delay.
@@ -404,25 +408,10 @@ class MuseAvatarV15:
             self.mask_coords_list_cycle += [crop_box]
             self.mask_list_cycle.append(mask)
 
-        # Step 7: Save all processed data
-        # Save mask coordinates
-        with open(self.mask_coords_path, 'wb') as f:
-            pickle.dump(self.mask_coords_list_cycle, f)
-
-        # Save face coordinates
-        with open(self.coords_path, 'wb') as f:
-            pickle.dump(self.coord_list_cycle, f)
-
-        # Save latent features
-        torch.save(self.input_latent_list_cycle, self.latents_out_path)
-
-        # Save frame data
-        with open(self.frames_path, 'wb') as f:
-            pickle.dump(self.frame_list_cycle, f)
-
-        # Save mask data
-        with open(self.masks_path, 'wb') as f:
-            pickle.dump(self.mask_list_cycle, f)
+        # Step 7: Save all processed data to the asset store and map it, the in-memory lists are released
+        AvatarAssetStore.write(self.assets_path, self.frame_list_cycle, self.mask_list_cycle, self.coord_list_cycle,
+                               self.mask_coords_list_cycle, self.input_latent_list_cycle)
+        self._load_assets()
 
 
     def acc_get_image_blending(self, image, face, face_box, mask_array, crop_box):
@@ -474,7 +463,8 @@ class MuseAvatarV15:
         t0 = time.time()
         # Get the face bbox and original frame for the current frame
         bbox = self.coord_list_cycle[idx % len(self.coord_list_cycle)]
-        ori_frame = copy.deepcopy(self.frame_list_cycle[idx % len(self.frame_list_cycle)])
+        # frames are read only views of the asset store, blending copies before it writes
+        ori_frame = self.frame_list_cycle[idx % len(self.frame_list_cycle)]
         t1 = time.time()
         x1, y1, x2, y2 = bbox
         try:
@@ -674,12 +664,14 @@ class MuseAvatarV15:
         return [(recon[i], idx_list[i]) for i in range(B)]
 
     @torch.no_grad()
-    def generate_frames_unet(self, whisper_chunks: torch.Tensor, start_idx: int, batch_size: int) -> list:
+    def generate_frames_unet(self, whisper_chunks: torch.Tensor, start_idx: int, batch_size: int,
+                             idx_list: Optional[list] = None) -> list:
         """
         Batch generate multiple frames based on whisper features and frame index
         whisper_chunks: [B, 50, 384]
         start_idx: start frame index
         batch_size: batch size
+        idx_list: frame index of each batch item, overrides start_idx when the batch mixes sessions
         Return: [pred_latents, idx_list]
         """
         t0 = time.time()
@@ -690,7 +682,9 @@ class MuseAvatarV15:
             pass
         B = whisper_chunks.shape[0]
         assert B == batch_size, f"whisper_chunks.shape[0] ({B}) != batch_size ({batch_size})"
-        idx_list = [start_idx + i for i in range(batch_size)]
+        if idx_list is None:
+            idx_list = [start_idx + i for i in range(batch_size)]
+        assert len(idx_list) == batch_size, f"len(idx_list) ({len(idx_list)}) != batch_size ({batch_size})"
         latent_list = []
         t1 = time.time()
         for idx in idx_list:
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import pickle
+import shutil
+from collections.abc import Sequence
+from typing import List, Optional
+
+import numpy as np
+import torch
+from loguru import logger
+
+ASSET_STORE_FORMAT = "musetalk-avatar-assets"
+ASSET_STORE_VERSION = 1
+INDEX_FILE = "index.json"
+# block offsets are aligned so every frame and mask view starts on a cache line
+BLOCK_ALIGNMENT = 64
+
+
+class BlockSequence(Sequence):
+    """
+    Read only arrays of varying shape stored back to back in one raw file, the items are views into a shared
+    np.memmap so every process mapping the file reads the same page cache.
+    """
+
+    def __init__(self, path: str, dtype: str, blocks: List[dict], order: List[int]):
+        self._dtype = np.dtype(dtype)
+        self._data = np.memmap(path, dtype=np.uint8, mode="r") if blocks else np.zeros(0, dtype=np.uint8)
+        self._blocks = [(block["offset"], tuple(block["shape"])) for block in blocks]
+        self._order = order
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        offset, shape = self._blocks[self._order[index]]
+        size = int(np.prod(shape)) * self._dtype.itemsize
+        # plain ndarray view, a memmap subclass would survive copies and keep the file referenced
+        return np.asarray(self._data[offset:offset + size]).view(self._dtype).reshape(shape)
+
+
+class AvatarAssetStore:
+    """
+    Versioned on-disk store of the prepared MuseTalk avatar data.
+
+    Frames and masks are raw blocks opened with np.memmap, cycle positions that reference the same array (the
+    reversed half of the frame cycle) share one block. Coordinates and latents are small .npy files. index.json
+    holds the block offsets and shapes and is written last, a store without it is incomplete.
+    """
+
+    def __init__(self, store_dir: str, frames: BlockSequence, masks: BlockSequence, coords: List[tuple],
+                 mask_coords: List[tuple], latents: List[torch.Tensor]):
+        self.store_dir = store_dir
+        self.frames = frames
+        self.masks = masks
+        self.coords = coords
+        self.mask_coords = mask_coords
+        self.latents = latents
+
+    @staticmethod
+    def exists(store_dir: str) -> bool:
+        return os.path.isfile(os.path.join(store_dir, INDEX_FILE))
+
+    @classmethod
+    def open(cls, store_dir: str, device: Optional[torch.device] = None) -> "AvatarAssetStore":
+        with open(os.path.join(store_dir, INDEX_FILE), "r") as f:
+            index = json.load(f)
+        if index.get("format") != ASSET_STORE_FORMAT or index.get("version") != ASSET_STORE_VERSION:
+            raise ValueError(f"Unsupported avatar asset store {index.get('format')} version {index.get('version')} "
+                             f"in {store_dir}, expected version {ASSET_STORE_VERSION}")
+        blocks = {}
+        for name in ["frames", "masks"]:
+            entry = index[name]
+            blocks[name] = BlockSequence(os.path.join(store_dir, entry["file"]), entry["dtype"], entry["blocks"],
+                                         entry["order"])
+        coords = [tuple(int(v) for v in row) for row in np.load(os.path.join(store_dir, "coords.npy"))]
+        mask_coords = [tuple(int(v) for v in row) for row in np.load(os.path.join(store_dir, "mask_coords.npy"))]
+        latents = torch.from_numpy(np.load(os.path.join(store_dir, "latents.npy")))
+        if device is not None:
+            latents = latents.to(device)
+        return cls(store_dir, blocks["frames"], blocks["masks"], coords, mask_coords, list(latents))
+
+    @staticmethod
+    def write(store_dir: str, frames: List[np.ndarray], masks: List[np.ndarray], coords: List,
+              mask_coords: List, latents: List[torch.Tensor]):
+        """
+        Write a store, replacing any store in store_dir. The data is staged in a sibling directory and moved in
+        place, so a crash leaves either the old store or none.
+        """
+        staging_dir = store_dir.rstrip(os.sep) + ".tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+        index = {
+            "format": ASSET_STORE_FORMAT,
+            "version": ASSET_STORE_VERSION,
+            "frames": _write_blocks(os.path.join(staging_dir, "frames.bin"), frames),
+            "masks": _write_blocks(os.path.join(staging_dir, "masks.bin"), masks),
+        }
+        np.save(os.path.join(staging_dir, "coords.npy"), np.asarray(coords, dtype=np.int32).reshape(-1, 4))
+        np.save(os.path.join(staging_dir, "mask_coords.npy"), np.asarray(mask_coords, dtype=np.int32).reshape(-1, 4))
+        latent_batch = torch.stack([latent.detach().cpu() for latent in latents])
+        np.save(os.path.join(staging_dir, "latents.npy"), latent_batch.numpy())
+        with open(os.path.join(staging_dir, INDEX_FILE), "w") as f:
+            json.dump(index, f)
+        shutil.rmtree(store_dir, ignore_errors=True)
+        os.replace(staging_dir, store_dir)
+
+
+def _write_blocks(path: str, arrays: List[np.ndarray]) -> dict:
+    # arrays repeated by identity, as in frame_list + frame_list[::-1] or a loaded pickle of it, are stored once
+    block_ids = {}
+    blocks = []
+    order = []
+    dtype = np.dtype(arrays[0].dtype).str if arrays else np.dtype(np.uint8).str
+    offset = 0
+    with open(path, "wb") as f:
+        for array in arrays:
+            key = id(array)
+            block_id = block_ids.get(key)
+            if block_id is None:
+                array = np.ascontiguousarray(array)
+                if array.dtype.str != dtype:
+                    raise ValueError(f"Mixed dtypes in avatar asset blocks: {array.dtype.str} and {dtype}")
+                padding = -offset % BLOCK_ALIGNMENT
+                f.write(b"\0" * padding)
+                offset += padding
+                f.write(array.tobytes())
+                blocks.append({"offset": offset, "shape": list(array.shape)})
+                offset += array.nbytes
+                block_id = len(blocks) - 1
+                block_ids[key] = block_id
+            order.append(block_id)
+    return {"file": os.path.basename(path), "dtype": dtype, "blocks": blocks, "order": order}
+
+
+def convert_pickle_assets(avatar_path: str, store_dir: Optional[str] = None) -> str:
+    """
+    Convert the pickle layout of an avatar directory (frames.pkl, masks.pkl, coords.pkl, mask_coords.pkl and
+    latents.pt) into an asset store, the pickle files are left in place.
+    """
+    store_dir = store_dir or os.path.join(avatar_path, "assets")
+    with open(os.path.join(avatar_path, "frames.pkl"), "rb") as f:
+        frames = pickle.load(f)
+    with open(os.path.join(avatar_path, "masks.pkl"), "rb") as f:
+        masks = pickle.load(f)
+    with open(os.path.join(avatar_path, "coords.pkl"), "rb") as f:
+        coords = pickle.load(f)
+    with open(os.path.join(avatar_path, "mask_coords.pkl"), "rb") as f:
+        mask_coords = pickle.load(f)
+    latents = torch.load(os.path.join(avatar_path, "latents.pt"), map_location="cpu")
+    AvatarAssetStore.write(store_dir, frames, masks, coords, mask_coords, latents)
+    logger.info(f"Converted avatar assets of {avatar_path} to {store_dir}: {len(frames)} frames, "
+                f"{len(masks)} masks, {len(latents)} latents")
+    return store_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled MuseTalk avatar data into a memory-mapped asset store")
+    parser.add_argument("avatar_path", nargs="+", help="Avatar directory holding frames.pkl, masks.pkl, coords.pkl, "
+                                                       "mask_coords.pkl and latents.pt")
+    args = parser.parse_args()
+    for avatar_path in args.avatar_path:
+        convert_pickle_assets(avatar_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,3 +15,4 @@ class AvatarMuseTalkConfig(HandlerBaseConfigModel, BaseModel):
     output_audio_sample_rate: int = Field(default=24000)  # Output audio sample rate (for resampling)
     model_dir: str = Field(default="models/musetalk")  # Root directory for models
     multi_thread_inference: bool = Field(default=True)  # Whether to use multi-thread inference
+    unet_batch_wait: float = Field(default=0.02, ge=0)  # Seconds a partly filled UNet batch waits for chunks of other sessions before it is padded
@@ -0,0 +1,517 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from queue import Queue
+from threading import Thread
+from typing import Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+import torch
+from loguru import logger
+
+from engine_utils.streaming_resampler import StreamingResampler
+from handlers.avatar.liteavatar.liteavatar_worker import Tts2FaceEvent
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+from handlers.avatar.musetalk.avatar_musetalk_config import AvatarMuseTalkConfig
+
+
+class MuseTalkSession:
+    """
+    State of one session served by AvatarMuseTalkServer: its output queues, its frame clock and the whisper
+    chunks waiting for a UNet batch.
+    """
+
+    def __init__(self, session_id: str, audio_output_queue: Queue, video_output_queue: Queue,
+                 event_out_queue: Queue, output_audio_sample_rate: int, algo_audio_sample_rate: int):
+        self.session_id = session_id
+        self.audio_output_queue = audio_output_queue
+        self.video_output_queue = video_output_queue
+        self.event_out_queue = event_out_queue
+        self.resampler = StreamingResampler(output_audio_sample_rate, algo_audio_sample_rate)
+        self.resample_speech_id = None
+        # whisper chunks of this session not yet taken into a UNet batch, guarded by lock together with
+        # interrupted_speech_ids so no chunk of an interrupted speech is queued after the interrupt drained them
+        self.whisper_chunks = deque()
+        self.lock = threading.Lock()
+        # composed frames waiting for their tick of the frame clock
+        self.output_queue = Queue()
+        self.interrupted_speech_ids = set()
+        # speeches added but not yet ended by the frame clock, an interrupt of any of them ends the speaking
+        self.speaking_speech_ids = set()
+        self.audio_cache = {}
+        # frames emitted by the collector so far, the session frame clock
+        self.frame_tick = 0
+        self._next_frame_id = 0
+        self.collect_thread: Optional[Thread] = None
+        self.closed = False
+
+    def allocate_frame_id(self) -> int:
+        frame_id = max(self._next_frame_id, self.frame_tick)
+        self._next_frame_id = frame_id + 1
+        return frame_id
+
+    def frames_ahead(self) -> int:
+        """speaking frames allocated but not yet emitted by the frame clock"""
+        return self._next_frame_id - self.frame_tick
+
+    def reset_frame_clock(self):
+        self._next_frame_id = self.frame_tick
+
+
+class AvatarMuseTalkServer:
+    """
+    Serves several sessions with one MuseTalk avatar.
+
+    Audio features are extracted per session, whisper chunks of all sessions are batched into shared
+    generate_frames_unet calls so the batch_size slots are filled by other sessions rather than padded with
+    zeros, and the VAE outputs are composed and dispatched back to the session they belong to. Every session
+    has its own collector thread emitting frames on its own frame clock.
+    """
+
+    def __init__(self, avatar, config: AvatarMuseTalkConfig):
+        self._avatar = avatar
+        self._config = config
+        self._algo_audio_sample_rate = config.algo_audio_sample_rate
+        self._output_audio_sample_rate = config.output_audio_sample_rate
+        self._sessions: Dict[str, MuseTalkSession] = {}
+        self._sessions_lock = threading.Lock()
+        self._round_robin = 0
+        # Internal queues, items carry the session they belong to
+        self._audio_queue = Queue()
+        self._unet_queue = Queue()
+        self._compose_queue = Queue()
+        self._chunk_ready = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads: List[Thread] = []
+        self._running = False
+        # UNet batch statistics
+        self.unet_batch_count = 0
+        self.unet_valid_count = 0
+
+    def start(self):
+        """Start the shared feature, inference and compose threads."""
+        if self._running:
+            logger.error("MuseTalk server already running.")
+            return
+        self._running = True
+        self._stop_event.clear()
+        targets = [self._feature_extractor_worker, self._unet_worker, self._compose_worker]
+        if self._config.multi_thread_inference:
+            targets.append(self._vae_worker)
+        self._threads = [threading.Thread(target=target, daemon=True) for target in targets]
+        for thread in self._threads:
+            thread.start()
+        logger.info("MuseTalk server started.")
+
+    def stop(self):
+        """Stop all threads and close the remaining sessions."""
+        if not self._running:
+            return
+        self._running = False
+        self._stop_event.set()
+        with self._chunk_ready:
+            self._chunk_ready.notify_all()
+        with self._sessions_lock:
+            session_ids = list(self._sessions.keys())
+        for session_id in session_ids:
+            self.close_session(session_id)
+        for thread in self._threads:
+            thread.join(timeout=5)
+            if thread.is_alive():
+                logger.warning(f"MuseTalk server thread {thread.name} did not exit in time.")
+        self._threads = []
+        logger.info("MuseTalk server stopped.")
+
+    @property
+    def session_count(self) -> int:
+        return len(self._sessions)
+
+    def open_session(self, session_id: str, audio_output_queue: Queue, video_output_queue: Queue,
+                     event_out_queue: Queue) -> MuseTalkSession:
+        session = MuseTalkSession(session_id, audio_output_queue, video_output_queue, event_out_queue,
+                                  self._output_audio_sample_rate, self._algo_audio_sample_rate)
+        with self._sessions_lock:
+            if session_id in self._sessions:
+                logger.warning(f"MuseTalk session {session_id} already open, replacing it.")
+                self._sessions[session_id].closed = True
+            self._sessions[session_id] = session
+        logger.info(f"MuseTalk session {session_id} opened, {self.session_count} sessions served.")
+        return session
+
+    def start_session(self, session_id: str):
+        """Start the frame clock of a session."""
+        session = self._sessions.get(session_id)
+        if session is None or session.collect_thread is not None:
+            return
+        session.collect_thread = threading.Thread(target=self._frame_collector_worker, args=(session,), daemon=True)
+        session.collect_thread.start()
+
+    def close_session(self, session_id: str):
+        with self._sessions_lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+        session.closed = True
+        self._drop_session_audio(session)
+        with session.lock:
+            session.whisper_chunks.clear()
+        if session.collect_thread is not None:
+            session.collect_thread.join(timeout=5)
+            if session.collect_thread.is_alive():
+                logger.warning(f"Frame collector of session {session_id} did not exit in time.")
+        logger.info(f"MuseTalk session {session_id} closed, {self.session_count} sessions served.")
+
+    def add_audio(self, session_id: str, speech_audio: SpeechAudio):
+        """
+        Add an audio segment of a session, the segment length must not exceed 1 second.
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            logger.warning(f"Audio for unknown MuseTalk session {session_id} dropped.")
+            return
+        if speech_audio.speech_id in session.interrupted_speech_ids:
+            return
+        session.speaking_speech_ids.add(speech_audio.speech_id)
+        audio_data = speech_audio.audio_data
+        if isinstance(audio_data, bytes):
+            audio_data = np.frombuffer(audio_data, dtype=np.float32)
+        elif isinstance(audio_data, np.ndarray):
+            audio_data = audio_data.astype(np.float32)
+        else:
+            logger.error(f"audio_data must be bytes or np.ndarray, got {type(audio_data)}")
+            return
+        if len(audio_data) == 0:
+            logger.error(f"Input audio is empty, speech_id={speech_audio.speech_id}")
+            return
+        if len(audio_data) > self._output_audio_sample_rate:
+            logger.error(f"Audio segment too long: {len(audio_data)} > {self._output_audio_sample_rate}, "
+                         f"speech_id={speech_audio.speech_id}")
+            return
+        assert speech_audio.sample_rate == self._output_audio_sample_rate
+        self._audio_queue.put({
+            'session': session,
+            'audio_data': audio_data,
+            'speech_id': speech_audio.speech_id,
+            'end_of_speech': speech_audio.end_of_speech,
+        })
+
+    def interrupt(self, session_id: str):
+        """
+        Drop queued audio, features and frames of the speech a session is generating, other sessions are not
+        affected. Batches still in inference are discarded when they reach the session.
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        speech_ids = self._drop_session_audio(session)
+        with session.lock:
+            speech_ids.update(session.speaking_speech_ids)
+            session.speaking_speech_ids.clear()
+            speech_ids.update(chunk['speech_id'] for chunk in session.whisper_chunks)
+            session.whisper_chunks.clear()
+            with session.output_queue.mutex:
+                speech_ids.update(item['speech_id'] for item in session.output_queue.queue)
+                session.output_queue.queue.clear()
+            speech_ids.discard(None)
+            session.interrupted_speech_ids.update(speech_ids)
+        for speech_id in speech_ids:
+            session.audio_cache.pop(speech_id, None)
+        session.reset_frame_clock()
+        if not speech_ids:
+            return
+        logger.info(f"MuseTalk session {session_id} interrupted, dropped speech {speech_ids}")
+        session.event_out_queue.put_nowait(Tts2FaceEvent.SPEAKING_TO_LISTENING)
+
+    def _drop_session_audio(self, session: MuseTalkSession) -> set:
+        with self._audio_queue.mutex:
+            dropped = [item for item in self._audio_queue.queue if item['session'] is session]
+            if dropped:
+                kept = [item for item in self._audio_queue.queue if item['session'] is not session]
+                self._audio_queue.queue.clear()
+                self._audio_queue.queue.extend(kept)
+        return {item['speech_id'] for item in dropped}
+
+    def _feature_extractor_worker(self):
+        """
+        Extract whisper features of all sessions, chunks are queued per session.
+        """
+        if torch.cuda.is_available():
+            t0 = time.time()
+            warmup_sr = 16000
+            self._avatar.extract_whisper_feature(np.zeros(warmup_sr, dtype=np.float32), warmup_sr)
+            torch.cuda.synchronize()
+            logger.info(f"[THREAD_WARMUP] _feature_extractor_worker whisper feature warmup done, "
+                        f"time: {(time.time()-t0)*1000:.1f} ms")
+        fps = self._config.fps
+        orig_samples_per_frame = self._output_audio_sample_rate // fps
+        while not self._stop_event.is_set():
+            try:
+                item = self._audio_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            session: MuseTalkSession = item['session']
+            audio_data = item['audio_data']
+            speech_id = item['speech_id']
+            end_of_speech = item['end_of_speech']
+            if session.closed or speech_id in session.interrupted_speech_ids:
+                continue
+            try:
+                # Resample to algorithm sample rate, segments of one speech are resampled as a stream
+                if speech_id != session.resample_speech_id:
+                    session.resampler.reset()
+                    session.resample_speech_id = speech_id
+                segment = session.resampler.process(audio_data)
+                target_len = self._algo_audio_sample_rate
+                if len(segment) > target_len:
+                    raise ValueError(f"Segment too long: {len(segment)} > {target_len}")
+                if len(segment) < target_len:
+                    segment = np.pad(segment, (0, target_len - len(segment)), mode='constant')
+                whisper_chunks = self._avatar.extract_whisper_feature(segment, self._algo_audio_sample_rate)
+                num_frames = int(np.ceil(len(audio_data) / orig_samples_per_frame))
+                whisper_chunks = whisper_chunks[:num_frames]
+                target_audio_len = num_frames * orig_samples_per_frame
+                audio_data = np.pad(audio_data, (0, max(0, target_audio_len - len(audio_data))), mode='constant')
+                num_chunks = len(whisper_chunks)
+                chunks = [{
+                    'whisper_chunk': whisper_chunks[i:i + 1],  # Single chunk as [1, 50, 384]
+                    'speech_id': speech_id,
+                    'end_of_speech': end_of_speech and i == num_chunks - 1,
+                    'audio_data': audio_data[i * orig_samples_per_frame:(i + 1) * orig_samples_per_frame],
+                } for i in range(num_chunks)]
+                with session.lock:
+                    if speech_id in session.interrupted_speech_ids:
+                        continue
+                    session.whisper_chunks.extend(chunks)
+                with self._chunk_ready:
+                    self._chunk_ready.notify_all()
+            except Exception as e:
+                logger.opt(exception=True).error(f"Exception in _feature_extractor_worker: {e}, "
+                                                 f"session_id={session.session_id}, speech_id={speech_id}")
+
+    def _max_frames_ahead(self) -> int:
+        return max(self._config.batch_size * 5, self._config.fps)
+
+    def _has_ready_chunks(self) -> bool:
+        max_ahead = self._max_frames_ahead()
+        with self._sessions_lock:
+            return any(session.whisper_chunks and session.frames_ahead() < max_ahead
+                       for session in self._sessions.values())
+
+    def _collect_batch(self, batch: list, batch_size: int):
+        """
+        Take whisper chunks into the batch one session at a time, sessions with the fewest frames buffered ahead
+        of their frame clock first, sessions far enough ahead are skipped.
+        """
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+        if not sessions:
+            return
+        max_ahead = self._max_frames_ahead()
+        start = self._round_robin % len(sessions)
+        self._round_robin += 1
+        sessions = sorted(sessions[start:] + sessions[:start], key=lambda session: session.frames_ahead())
+        progress = True
+        while len(batch) < batch_size and progress:
+            progress = False
+            for session in sessions:
+                if len(batch) >= batch_size:
+                    break
+                if session.closed or session.frames_ahead() >= max_ahead:
+                    continue
+                with session.lock:
+                    if not session.whisper_chunks:
+                        continue
+                    chunk = session.whisper_chunks.popleft()
+                progress = True
+                if chunk['speech_id'] in session.interrupted_speech_ids:
+                    continue
+                chunk['session'] = session
+                chunk['frame_id'] = session.allocate_frame_id()
+                batch.append(chunk)
+
+    def _unet_worker(self):
+        """
+        Batch whisper chunks across sessions into generate_frames_unet calls. A batch runs when it is full,
+        when it ends a speech, or when unet_batch_wait passed without other sessions filling it.
+        """
+        batch_size = self._config.batch_size
+        if torch.cuda.is_available():
+            t0 = time.time()
+            dummy_whisper = torch.zeros(batch_size, 50, 384, device=self._avatar.device,
+                                        dtype=self._avatar.weight_dtype)
+            self._avatar.generate_frames_unet(dummy_whisper, 0, batch_size)
+            torch.cuda.synchronize()
+            logger.info(f"[THREAD_WARMUP] _unet_worker self-warmup done, time: {(time.time()-t0)*1000:.1f} ms")
+        while not self._stop_event.is_set():
+            with self._chunk_ready:
+                self._chunk_ready.wait_for(lambda: self._stop_event.is_set() or self._has_ready_chunks(), timeout=0.01)
+            batch = []
+            self._collect_batch(batch, batch_size)
+            if not batch:
+                continue
+            deadline = time.perf_counter() + self._config.unet_batch_wait
+            while (len(batch) < batch_size and not any(chunk['end_of_speech'] for chunk in batch)
+                   and not self._stop_event.is_set()):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                with self._chunk_ready:
+                    self._chunk_ready.wait_for(self._has_ready_chunks, timeout=remaining)
+                self._collect_batch(batch, batch_size)
+            self._run_unet_batch(batch, batch_size)
+
+    def _run_unet_batch(self, batch: list, batch_size: int):
+        valid_num = len(batch)
+        whisper_chunks = [chunk['whisper_chunk'] for chunk in batch]
+        idx_list = [chunk['frame_id'] for chunk in batch]
+        if valid_num < batch_size:
+            pad_num = batch_size - valid_num
+            if isinstance(whisper_chunks[0], torch.Tensor):
+                whisper_chunks.append(torch.zeros((pad_num,) + tuple(whisper_chunks[0].shape[1:]),
+                                                  dtype=whisper_chunks[0].dtype, device=whisper_chunks[0].device))
+            else:
+                whisper_chunks.append(np.zeros((pad_num,) + whisper_chunks[0].shape[1:], dtype=whisper_chunks[0].dtype))
+            idx_list.extend([idx_list[-1]] * pad_num)
+        if isinstance(whisper_chunks[0], torch.Tensor):
+            whisper_batch = torch.cat(whisper_chunks, dim=0)
+        else:
+            whisper_batch = np.concatenate(whisper_chunks, axis=0)
+        batch_start_time = time.time()
+        try:
+            pred_latents, idx_list = self._avatar.generate_frames_unet(whisper_batch, idx_list[0], batch_size,
+                                                                       idx_list=idx_list)
+        except Exception as e:
+            logger.opt(exception=True).error(f"[GEN_FRAME_ERROR] frame_id={idx_list[0]}, error: {e}")
+            pred_latents = torch.zeros((batch_size, 4, 32, 32), dtype=self._avatar.weight_dtype,
+                                       device=self._avatar.device)
+        self.unet_batch_count += 1
+        self.unet_valid_count += valid_num
+        if self._config.debug:
+            session_count = len({id(chunk['session']) for chunk in batch})
+            logger.info(f"[FRAME_GEN] UNet batch: valid_num={valid_num}/{batch_size}, sessions={session_count}, "
+                        f"batch_time={(time.time() - batch_start_time)*1000:.1f}ms")
+        unet_item = {
+            'pred_latents': pred_latents,  # torch.Tensor: [B, 4, 32, 32]
+            'idx_list': idx_list,
+            'chunks': batch,
+        }
+        if self._config.multi_thread_inference:
+            self._unet_queue.put(unet_item)
+        else:
+            self._run_vae_batch(unet_item)
+
+    def _vae_worker(self):
+        batch_size = self._config.batch_size
+        if torch.cuda.is_available():
+            t0 = time.time()
+            dummy_latents = torch.zeros(batch_size, 4, 32, 32, device=self._avatar.device,
+                                        dtype=self._avatar.weight_dtype)
+            self._avatar.generate_frames_vae(dummy_latents, list(range(batch_size)), batch_size)
+            torch.cuda.synchronize()
+            logger.info(f"[THREAD_WARMUP] _vae_worker self-warmup done, time: {(time.time()-t0)*1000:.1f} ms")
+        while not self._stop_event.is_set():
+            try:
+                unet_item = self._unet_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self._run_vae_batch(unet_item)
+
+    def _run_vae_batch(self, unet_item: dict):
+        """Decode a batch and dispatch its valid frames back to their sessions."""
+        pred_latents = unet_item['pred_latents']
+        idx_list = unet_item['idx_list']
+        cur_batch = pred_latents.shape[0]
+        try:
+            recon_idx_list = self._avatar.generate_frames_vae(pred_latents, idx_list, cur_batch)
+        except Exception as e:
+            logger.opt(exception=True).error(f"[GEN_FRAME_ERROR] frame_id={idx_list[0]}, error: {e}")
+            recon_idx_list = [(np.zeros((256, 256, 3), dtype=np.uint8), idx) for idx in idx_list]
+        for chunk, (recon, idx) in zip(unet_item['chunks'], recon_idx_list):
+            self._compose_queue.put({
+                'session': chunk['session'],
+                'recon': recon,
+                'idx': idx,
+                'speech_id': chunk['speech_id'],
+                'end_of_speech': chunk['end_of_speech'],
+                'audio_segment': chunk['audio_data'],
+            })
+
+    def _compose_worker(self):
+        """
+        Blend generated faces into full frames and queue them to the session they belong to.
+        """
+        while not self._stop_event.is_set():
+            try:
+                item = self._compose_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            session: MuseTalkSession = item.pop('session')
+            if session.closed or item['speech_id'] in session.interrupted_speech_ids:
+                continue
+            item['frame'] = self._avatar.res2combined(item.pop('recon'), item['idx'])
+            session.output_queue.put(item)
+
+    def _frame_collector_worker(self, session: MuseTalkSession):
+        """
+        Frame clock of one session, outputs a speaking frame when one is ready and an idle frame otherwise.
+        """
+        fps = self._config.fps
+        frame_interval = 1.0 / fps
+        start_time = time.perf_counter()
+        current_speech_id = None
+        while not self._stop_event.is_set() and not session.closed:
+            sleep_time = start_time + session.frame_tick * frame_interval - time.perf_counter()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            try:
+                item = session.output_queue.get_nowait()
+                if item['speech_id'] in session.interrupted_speech_ids:
+                    raise queue.Empty
+                frame = item['frame']
+                speech_id = item['speech_id']
+                end_of_speech = item['end_of_speech']
+                audio_segment = item['audio_segment']
+            except queue.Empty:
+                frame = self._avatar.generate_idle_frame(session.frame_tick)
+                speech_id = None
+                end_of_speech = False
+                audio_segment = None
+            if speech_id is not None and speech_id != current_speech_id:
+                logger.info(f"[SPEAKING_FRAME] Start: session_id={session.session_id}, "
+                            f"frame_id={session.frame_tick}, speech_id={speech_id}")
+                current_speech_id = speech_id
+            try:
+                session.video_output_queue.put_nowait(frame)
+                if audio_segment is not None and len(audio_segment) > 0:
+                    audio_np = np.asarray(audio_segment, dtype=np.float32)
+                    if getattr(self._config, 'debug_save_handler_audio', False):
+                        session.audio_cache.setdefault(speech_id, []).append(audio_np)
+                    session.audio_output_queue.put_nowait(audio_np[np.newaxis, :])
+            except Exception as e:
+                logger.opt(exception=True).error(f"Exception in _frame_collector_worker: {e}")
+            if end_of_speech:
+                logger.info(f"Status change: SPEAKING -> LISTENING, session_id={session.session_id}, "
+                            f"speech_id={speech_id}")
+                current_speech_id = None
+                with session.lock:
+                    session.speaking_speech_ids.discard(speech_id)
+                self._save_speech_audio(session, speech_id)
+                session.event_out_queue.put_nowait(Tts2FaceEvent.SPEAKING_TO_LISTENING)
+            session.frame_tick += 1
+        logger.info(f"Frame collector of session {session.session_id} exit")
+
+    def _save_speech_audio(self, session: MuseTalkSession, speech_id: str):
+        segments = session.audio_cache.pop(speech_id, None)
+        if not segments:
+            return
+        try:
+            save_dir = "logs/audio_segments"
+            os.makedirs(save_dir, exist_ok=True)
+            wav_path = os.path.join(save_dir, f"{speech_id}_all.wav")
+            sf.write(wav_path, np.concatenate(segments), self._output_audio_sample_rate, subtype='PCM_16')
+            logger.info(f"[AUDIO_FRAME] saved full wav: {wav_path}")
+        except Exception as e:
+            logger.error(f"[AUDIO_FRAME] save full wav error: {e}")
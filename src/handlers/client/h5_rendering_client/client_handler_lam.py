@@ -30,7 +30,7 @@ from handlers.client.rtc_client.client_handler_rtc import RtcClientSessionDelega
 class LamClientSessionDelegate(RtcClientSessionDelegate):
     def __init__(self):
         super().__init__()
-        self.output_queues[EngineChannelType.MOTION_DATA] = asyncio.Queue()
+        self.add_output_queue(EngineChannelType.MOTION_DATA)
         self.quit = asyncio.Event()
 
     async def _ws_output_task(self, websocket: WebSocket):
@@ -44,11 +44,10 @@ class LamClientSessionDelegate(RtcClientSessionDelegate):
         )
         welcome_message_sent = False
         while not self.quit.is_set():
-            try:
-                chat_data: ChatData = await asyncio.wait_for(self.get_data(EngineChannelType.MOTION_DATA), timeout=0.1)
-                logger.info(f"Got chat data {str(chat_data)}")
-            except asyncio.TimeoutError:
+            chat_data: Optional[ChatData] = await self.get_data(EngineChannelType.MOTION_DATA, timeout=0.1)
+            if chat_data is None:
                 continue
+            logger.info(f"Got chat data {str(chat_data)}")
             if not welcome_message_sent:
                 welcome_message = self.motion_data_serializer.serialize(chat_data.data.definition)
                 await websocket.send_bytes(welcome_message)
@@ -207,3 +206,4 @@ class ClientHandlerLam(ClientHandlerRtc):
         context = cast(ClientLamContext, context)
         client_session_delegate = cast(LamClientSessionDelegate, context.client_session_delegate)
         client_session_delegate.quit.set()
+        client_session_delegate.log_queue_stats()
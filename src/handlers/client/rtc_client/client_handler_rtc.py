@@ -1,11 +1,13 @@
 import asyncio
 from pathlib import Path
-from typing import Dict, Optional, cast, Union, Tuple
+from typing import Dict, Optional, cast, Union, Tuple, List
 from uuid import uuid4
 
 from loguru import logger
 
 from engine_utils.directory_info import DirectoryInfo
+from engine_utils.thread_safe_async_queue import ThreadSafeAsyncQueue
+from engine_utils.video_ingest_filter import VideoIngestFilter
 from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 import gradio
@@ -25,28 +27,48 @@ from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.data_models.chat_engine_config_data import HandlerBaseConfigModel, ChatEngineConfigModel
 from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.data_models.runtime_data.data_bundle import DataBundleDefinition, DataBundleEntry, VariableSize, \
     DataBundle
 from service.rtc_service.rtc_provider import RTCProvider
 from service.rtc_service.rtc_stream import RtcStream
+from service.rtc_service.video_encoding import VideoEncodingProfile, DEFAULT_VIDEO_ENCODING_PROFILES, \
+    apply_encoder_bitrate_bounds
 
 
 class RtcClientSessionDelegate(ClientSessionDelegate):
+    # output queues are filled by handler pump threads and drained on the rtc event loop,
+    # oldest items are dropped beyond these limits, 0 for unbounded
+    output_queue_capacities = {
+        EngineChannelType.AUDIO: 2000,
+        EngineChannelType.VIDEO: 300,
+        EngineChannelType.TEXT: 0,
+        EngineChannelType.MOTION_DATA: 2000,
+    }
+
     def __init__(self):
         self.timestamp_generator = None
         self.data_submitter = None
+        self.signal_emitter = None
         self.shared_states = None
-        self.output_queues = {
-            EngineChannelType.AUDIO: asyncio.Queue(),
-            EngineChannelType.VIDEO: asyncio.Queue(),
-            EngineChannelType.TEXT: asyncio.Queue(),
-        }
+        self.output_queues: Dict[EngineChannelType, ThreadSafeAsyncQueue] = {}
+        for modality in [EngineChannelType.AUDIO, EngineChannelType.VIDEO, EngineChannelType.TEXT]:
+            self.add_output_queue(modality)
         self.input_data_definitions: Dict[EngineChannelType, DataBundleDefinition] = {}
         self.modality_mapping = {
             EngineChannelType.AUDIO: ChatDataType.MIC_AUDIO,
             EngineChannelType.VIDEO: ChatDataType.CAMERA_VIDEO,
             EngineChannelType.TEXT: ChatDataType.HUMAN_TEXT,
         }
+        # camera frames are only submitted if a handler consumes them, reduced by video_ingest_filter
+        self.video_consumed = True
+        self.video_ingest_filter: Optional[VideoIngestFilter] = None
+
+    def add_output_queue(self, modality: EngineChannelType):
+        self.output_queues[modality] = ThreadSafeAsyncQueue(
+            name=f"rtc_{modality.name.lower()}_output",
+            capacity=self.output_queue_capacities.get(modality, 0),
+        )
 
     async def get_data(self, modality: EngineChannelType, timeout: Optional[float] = 0.1) -> Optional[ChatData]:
         data_queue = self.output_queues.get(modality)
@@ -61,6 +83,18 @@ class RtcClientSessionDelegate(ClientSessionDelegate):
             data = await data_queue.get()
         return data
 
+    def get_pending_count(self, modality: EngineChannelType) -> int:
+        data_queue = self.output_queues.get(modality)
+        return 0 if data_queue is None else data_queue.qsize()
+
+    def drop_data(self, modality: EngineChannelType, count: int):
+        data_queue = self.output_queues.get(modality)
+        for _ in range(count if data_queue is not None else 0):
+            try:
+                data_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+
     def put_data(self, modality: EngineChannelType, data: Union[np.ndarray, str],
                  timestamp: Optional[Tuple[int, int]] = None, samplerate: Optional[int] = None, loopback: bool = False):
         if timestamp is None:
@@ -71,6 +105,13 @@ class RtcClientSessionDelegate(ClientSessionDelegate):
         chat_data_type = self.modality_mapping.get(modality)
         if chat_data_type is None or definition is None:
             return
+        if modality == EngineChannelType.VIDEO:
+            if not self.video_consumed:
+                return
+            if self.video_ingest_filter is not None:
+                data = self.video_ingest_filter.process(data, timestamp[0] / timestamp[1])
+                if data is None:
+                    return
         data_bundle = DataBundle(definition)
         if modality == EngineChannelType.AUDIO:
             data_bundle.set_main_data(data.squeeze()[np.newaxis, ...])
@@ -96,17 +137,48 @@ class RtcClientSessionDelegate(ClientSessionDelegate):
         return self.timestamp_generator()
 
     def emit_signal(self, signal: ChatSignal):
-        pass
+        if signal.type == ChatSignalType.INTERRUPT:
+            # called on the rtc event loop, queued avatar media is gone before the next frame is sent
+            self.clear_media_data()
+        if self.signal_emitter is not None:
+            self.signal_emitter(signal)
+
+    def clear_media_data(self):
+        for modality, data_queue in self.output_queues.items():
+            if modality == EngineChannelType.TEXT:
+                continue
+            data_queue.clear()
 
     def clear_data(self):
         for data_queue in self.output_queues.values():
-            while not data_queue.empty():
-                data_queue.get_nowait()
+            data_queue.clear()
+
+    def setup_video_ingest(self, consume_info: Optional[HandlerDataInfo], enable_filter: bool = True):
+        self.video_consumed = consume_info is not None
+        self.video_ingest_filter = None
+        if not self.video_consumed:
+            logger.info("No handler consumes camera video, incoming frames are dropped")
+        elif enable_filter and (consume_info.max_frame_size > 0 or consume_info.max_frame_rate > 0):
+            self.video_ingest_filter = VideoIngestFilter(consume_info.max_frame_size, consume_info.max_frame_rate)
+            logger.info(f"Camera video is reduced to max size {consume_info.max_frame_size} "
+                        f"at max {consume_info.max_frame_rate}fps at ingest")
+
+    def log_queue_stats(self):
+        for modality, data_queue in self.output_queues.items():
+            logger.info(f"Output queue {modality.name} stats: {data_queue.get_stats()}")
+        if self.video_ingest_filter is not None:
+            logger.info(f"Camera video ingest stats: {self.video_ingest_filter.get_stats()}")
 
 
 class ClientRtcConfigModel(HandlerBaseConfigModel, BaseModel):
     connection_ttl: int = Field(default=900)
     turn_config: Optional[Dict] = Field(default=None)
+    # name of a profile in video_encoding_profiles, auto follows the bandwidth of each client
+    video_encoding_profile: str = Field(default="auto")
+    # decimate and downscale camera frames at ingest to what the consuming handlers declared
+    enable_camera_ingest_filter: bool = Field(default=True)
+    video_encoding_profiles: List[VideoEncodingProfile] = Field(
+        default_factory=lambda: list(DEFAULT_VIDEO_ENCODING_PROFILES))
 
 
 class ClientRtcContext(HandlerContext):
@@ -139,7 +211,8 @@ class ClientHandlerRtc(ClientHandlerBase):
             output_sample_rate=24000,
             output_frame_size=480,
             fps=30,
-            stream_start_delay=0.5,
+            video_encoding_profiles=self.handler_config.video_encoding_profiles,
+            video_encoding_profile=self.handler_config.video_encoding_profile,
         )
         self.rtc_streamer_factory.client_handler_delegate = self.handler_delegate
 
@@ -172,6 +245,7 @@ class ClientHandlerRtc(ClientHandlerBase):
     def load(self, engine_config: ChatEngineConfigModel, handler_config: Optional[HandlerBaseConfigModel] = None):
         self.engine_config = engine_config
         self.handler_config = cast(ClientRtcConfigModel, handler_config)
+        apply_encoder_bitrate_bounds(self.handler_config.video_encoding_profiles)
         self.prepare_rtc_definitions()
 
     def setup_rtc_ui(self, ui, parent_block, fastapi: FastAPI, avatar_config):
@@ -188,6 +262,7 @@ class ClientHandlerRtc(ClientHandlerBase):
             concurrency_limit=self.handler_config.concurrent_limit,
         )
         webrtc.mount(fastapi)
+        self.rtc_streamer_factory.peer_connection_getter = lambda webrtc_id: getattr(webrtc, "pcs", {}).get(webrtc_id)
 
         @fastapi.get('/openavatarchat/initconfig')
         async def init_config():
@@ -249,8 +324,11 @@ class ClientHandlerRtc(ClientHandlerBase):
 
         session_delegate.timestamp_generator = session_context.get_timestamp
         session_delegate.data_submitter = handler_context.data_submitter
+        session_delegate.signal_emitter = handler_context.emit_signal
         session_delegate.input_data_definitions = self.output_bundle_definitions
         session_delegate.shared_states = session_context.shared_states
+        session_delegate.setup_video_ingest(session_context.input_consumers.get(ChatDataType.CAMERA_VIDEO),
+                                            handler_context.config.enable_camera_ingest_filter)
 
         handler_context.client_session_delegate = session_delegate
 
@@ -301,4 +379,6 @@ class ClientHandlerRtc(ClientHandlerBase):
             data_queue.put_nowait(inputs)
 
     def destroy_context(self, context: HandlerContext):
-        pass
+        context = cast(ClientRtcContext, context)
+        if context.client_session_delegate is not None:
+            context.client_session_delegate.log_queue_stats()
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import aiohttp
+from loguru import logger
+
+
+@dataclass
+class SSEEvent:
+    event: str = "message"
+    data: str = ""
+    id: Optional[str] = None
+
+
+class SSEParser:
+    """
+    Incremental text/event-stream parser, chunks can be split at any byte position.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._event_type = ""
+        self._data_lines: List[str] = []
+        self._last_event_id: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        events = []
+        self._buffer += chunk
+        while True:
+            lf_index = self._buffer.find(b"\n")
+            cr_index = self._buffer.find(b"\r")
+            if lf_index < 0 and cr_index < 0:
+                break
+            line_end = min(x for x in (lf_index, cr_index) if x >= 0)
+            # a trailing \r may be followed by \n in the next chunk, wait for it
+            if self._buffer[line_end] == 0x0D and line_end == len(self._buffer) - 1:
+                break
+            line = bytes(self._buffer[:line_end]).decode("utf-8", errors="replace")
+            sep_len = 2 if self._buffer[line_end:line_end + 2] == b"\r\n" else 1
+            del self._buffer[:line_end + sep_len]
+            event = self._process_line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        events = []
+        if len(self._buffer) > 0:
+            line = bytes(self._buffer).decode("utf-8", errors="replace")
+            self._buffer.clear()
+            self._process_line(line)
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _process_line(self, line: str) -> Optional[SSEEvent]:
+        if len(line) == 0:
+            return self._dispatch()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data_lines.append(value)
+        elif field == "event":
+            self._event_type = value
+        elif field == "id":
+            self._last_event_id = value
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if len(self._data_lines) == 0:
+            self._event_type = ""
+            return None
+        event = SSEEvent(
+            event=self._event_type or "message",
+            data="\n".join(self._data_lines),
+            id=self._last_event_id,
+        )
+        self._event_type = ""
+        self._data_lines = []
+        return event
+
+
+class DifyClient:
+    """
+    Dify chatflow client backed by a single pooled aiohttp session.
+
+    The session lives on a private event loop thread, so synchronous handler threads can share it
+    through chat(), which yields parsed stream events as soon as they arrive.
+    """
+
+    _STREAM_END = object()
+
+    def __init__(self, api_url: str, api_key: str, timeout: float = 30, connection_limit: int = 16):
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.connection_limit = connection_limit
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, name="DifyClientLoop", daemon=True)
+            self._loop_thread.start()
+            asyncio.run_coroutine_threadsafe(self._create_session(), self._loop).result()
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._close_session(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            self._loop_thread = None
+
+    async def _create_session(self):
+        connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout),
+        )
+
+    async def _close_session(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def upload_file(self, user: str, file_bytes: bytes, file_name: str = "image.jpg",
+                          content_type: str = "image/jpeg") -> Optional[str]:
+        form = aiohttp.FormData()
+        form.add_field("file", file_bytes, filename=file_name, content_type=content_type)
+        form.add_field("user", user)
+        async with self._session.post(f"{self.api_url}/files/upload", data=form) as response:
+            if response.status >= 400:
+                logger.error(f"Failed to upload image:{response.status} {await response.text()}")
+                return None
+            result = await response.json()
+            return result.get("id")
+
+    async def _upload_image(self, user: str, image: Any,
+                            encode_image: Optional[Callable[[Any], bytes]]) -> Optional[str]:
+        if encode_image is not None:
+            # encoding runs on the executor, so images are encoded and uploaded side by side
+            image = await asyncio.get_running_loop().run_in_executor(None, encode_image, image)
+        return await self.upload_file(user, image)
+
+    async def _chat_events(self, payload: Dict, images: List[Any],
+                           encode_image: Optional[Callable[[Any], bytes]] = None):
+        # uploads run while the chat payload is assembled, only awaited right before sending
+        upload_tasks = [asyncio.ensure_future(self._upload_image(payload["user"], image, encode_image))
+                        for image in images]
+        payload = dict(payload)
+        files = []
+        if len(upload_tasks) > 0:
+            for file_id in await asyncio.gather(*upload_tasks):
+                if file_id:
+                    files.append({
+                        "type": "image",
+                        "transfer_method": "local_file",
+                        "upload_file_id": file_id,
+                    })
+        if len(files) > 0:
+            payload["files"] = files
+        logger.info(f"payload: {payload}")
+
+        url = f"{self.api_url}/chat-messages"
+        async with self._session.post(url, json=payload) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"Dify API error: {response.status} - {error_text}")
+                yield {"event": "error", "status": response.status, "message": error_text}
+                return
+            if payload.get("response_mode") != "streaming":
+                yield await response.json()
+                return
+            parser = SSEParser()
+            async for chunk in response.content.iter_any():
+                for event in parser.feed(chunk):
+                    parsed = self._parse_event(event)
+                    if parsed is not None:
+                        yield parsed
+            for event in parser.flush():
+                parsed = self._parse_event(event)
+                if parsed is not None:
+                    yield parsed
+
+    @staticmethod
+    def _parse_event(event: SSEEvent) -> Optional[Dict]:
+        if event.data.strip() == "[DONE]":
+            return None
+        try:
+            json_data = json.loads(event.data)
+        except json.JSONDecodeError:
+            logger.warning(f"Failed to parse JSON: {event.data}")
+            return None
+        if not isinstance(json_data, dict):
+            return None
+        json_data.setdefault("event", event.event)
+        return json_data
+
+    async def _pump_chat(self, payload: Dict, images: List[Any], encode_image: Optional[Callable[[Any], bytes]],
+                         output_queue: queue.Queue):
+        try:
+            async for item in self._chat_events(payload, images, encode_image):
+                output_queue.put(item)
+        except asyncio.TimeoutError:
+            logger.error("Dify API timeout")
+            output_queue.put({"event": "error", "message": "Request to Dify API timed out"})
+        except aiohttp.ClientError as e:
+            logger.error(f"Dify API request error: {str(e)}")
+            output_queue.put({"event": "error", "message": f"Failed to connect to Dify API: {str(e)}"})
+        except Exception as e:
+            logger.opt(exception=True).error(f"Unexpected error when calling Dify API: {str(e)}")
+            output_queue.put({"event": "error", "message": f"Unexpected error occurred: {str(e)}"})
+        finally:
+            output_queue.put(self._STREAM_END)
+
+    def chat(self, payload: Dict, images: Optional[List[Any]] = None,
+             encode_image: Optional[Callable[[Any], bytes]] = None) -> Iterator[Dict]:
+        """
+        Send a chat-messages request and yield decoded events from the calling thread.
+
+        images are uploaded as they are, or encoded by encode_image first when it is given.
+        """
+        self.start()
+        output_queue = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._pump_chat(payload, images or [], encode_image, output_queue), self._loop)
+        try:
+            while True:
+                item = output_queue.get()
+                if item is self._STREAM_END:
+                    break
+                yield item
+        finally:
+            # consumer stopped early, do not keep reading the response in background
+            if not future.done():
+                future.cancel()
@@ -2,10 +2,9 @@
 
 import os
 import re
-import json
+import threading
 import PIL
 import numpy as np
-import requests
 from typing import Dict, Optional, cast
 from loguru import logger
 from pydantic import BaseModel, Field
@@ -15,16 +14,22 @@ from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigMode
 from chat_engine.common.handler_base import HandlerBase, HandlerBaseInfo, HandlerDataInfo, HandlerDetail
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from handlers.llm.dify.dify_client import DifyClient
 
 # only support chatflow
 class DifyConfig(HandlerBaseConfigModel, BaseModel):
     api_key: str = Field(default=os.getenv("DIFY_API_KEY"))
     api_url: str = Field(default="https://api.dify.ai/v1")
     enable_video_input: bool = Field(default=False)
+    video_input_max_size: int = Field(default=1280)  # 发送给Dify的摄像头画面最长边
+    video_input_fps: float = Field(default=2)  # 每次提问只发送最新一帧
     response_mode: str = Field(default="streaming")  # streaming or blocking
     timeout: int = Field(default=30)
+    connection_limit: int = Field(default=16)  # 连接池大小，所有会话共享
 
 
 class DifyContext(HandlerContext):
@@ -40,11 +45,13 @@ class DifyContext(HandlerContext):
         self.current_image = None
         self.enable_video_input = False
         self.conversation_id = None  # Dify 特有的对话ID
+        self.interrupt_event = threading.Event()  # 用户打断时停止读取流式回复
 
 
 class HandlerDify(HandlerBase, ABC):
     def __init__(self):
         super().__init__()
+        self.client: Optional[DifyClient] = None
 
     def get_handler_info(self) -> HandlerBaseInfo:
         return HandlerBaseInfo(
@@ -55,14 +62,18 @@ class HandlerDify(HandlerBase, ABC):
                            context: HandlerContext) -> HandlerDetail:
         definition = DataBundleDefinition()
         definition.add_entry(DataBundleEntry.create_text_entry("avatar_text"))
+        context = cast(DifyContext, context)
         inputs = {
             ChatDataType.HUMAN_TEXT: HandlerDataInfo(
                 type=ChatDataType.HUMAN_TEXT,
             ),
-            ChatDataType.CAMERA_VIDEO: HandlerDataInfo(
-                type=ChatDataType.CAMERA_VIDEO,
-            ),
         }
+        if context.enable_video_input:
+            inputs[ChatDataType.CAMERA_VIDEO] = HandlerDataInfo(
+                type=ChatDataType.CAMERA_VIDEO,
+                max_frame_size=context.config.video_input_max_size,
+                max_frame_rate=context.config.video_input_fps,
+            )
         outputs = {
             ChatDataType.AVATAR_TEXT: HandlerDataInfo(
                 type=ChatDataType.AVATAR_TEXT,
@@ -79,11 +90,21 @@ class HandlerDify(HandlerBase, ABC):
                 error_message = 'api_key is required in config/xxx.yaml, when use handler_dify'
                 logger.error(error_message)
                 raise ValueError(error_message)
+        else:
+            handler_config = DifyConfig()
+        self.client = DifyClient(
+            api_url=handler_config.api_url,
+            api_key=handler_config.api_key,
+            timeout=handler_config.timeout,
+            connection_limit=handler_config.connection_limit,
+        )
+        self.client.start()
 
     def create_context(self, session_context, handler_config=None):
         if not isinstance(handler_config, DifyConfig):
             handler_config = DifyConfig()
         context = DifyContext(session_context.session_info.session_id)
+        context.config = handler_config
         context.api_key = handler_config.api_key
         context.api_url = handler_config.api_url
         context.response_mode = handler_config.response_mode
@@ -94,122 +115,45 @@ class HandlerDify(HandlerBase, ABC):
     def start_context(self, session_context, handler_context):
         pass
 
-    def _upload_image_to_dify(self, context: DifyContext, image_data):
+    @staticmethod
+    def _encode_image(image_data) -> bytes:
         """
-        上传图像到 Dify 并返回文件信息
+        将摄像头帧编码为 JPEG
         """
-        upload_url = f"{context.api_url}/files/upload"
-        headers = {
-            "Authorization": f"Bearer {context.api_key}"
-        }
-
-        # 假设 image_data 是 PIL 图像或 numpy 数组，需先保存为临时文件
         from io import BytesIO
         buffered = BytesIO()
-
         image = PIL.Image.fromarray(np.squeeze(image_data)[..., ::-1])
         image.save(buffered, format="JPEG")  # 可根据需要调整格式
-        img_bytes = buffered.getvalue()
-
-        files = {
-            'file': ('image.jpg', img_bytes, 'image/jpeg'),
-        }
-
-        response = requests.post(upload_url, headers=headers, files=files, data={'user': context.session_id})
-        if response.status_code < 400:
-            result = response.json()
-            return result.get("id")  # 返回文件 ID
-        else:
-            logger.error(f"Failed to upload image:{response.status_code} {response.text}")
-            return None
+        return buffered.getvalue()
 
     def _send_dify_request(self, context: DifyContext, chat_text: str, images=None):
         """
-        发送请求到 Dify API
+        发送请求到 Dify API，流式模式下每个 message 事件到达即产出
         """
-        url = f"{context.api_url}/chat-messages"
-        headers = {
-            "Authorization": f"Bearer {context.api_key}",
-            "Content-Type": "application/json"
-        }
-
-        # 构建消息内容
         query = chat_text
-        inputs = {"query": query}
-
-        # 如果有图片，需要特殊处理
-        files = []
-        if images and len(images) > 0:
-            for img in images:
-                if img is not None:
-                    file_id = self._upload_image_to_dify(context, img)
-                    if file_id:
-                        files.append({
-                            "type": "image",
-                            "transfer_method": "local_file",  
-                            "upload_file_id": file_id  # 使用上传后的文件 ID
-                        })
-
         payload = {
-            "inputs": inputs,
+            "inputs": {"query": query},
             "query": query,
             "response_mode": context.response_mode,
             "conversation_id": context.conversation_id,
             "user": context.session_id
         }
-
-        if files and len(files) > 0:
-            payload["files"] = files
-            # payload["inputs"]['files'] = files
-
-        logger.info(f"payload: {payload}")
-        try:
-            if context.response_mode == "streaming":
-                with requests.post(url, headers=headers, json=payload, stream=True, timeout=context.timeout) as response:
-                    if response.status_code != 200:
-                        error_text = response.text
-                        logger.error(f"Dify API error: {response.status_code} - {error_text}")
-                        yield f"Error: {response.status_code} - {error_text}"
-                        return
-
-                    for line in response.iter_lines():
-                        if line:
-                            line_str = line.decode('utf-8')
-                            if line_str.startswith("data: "):
-                                data = line_str[6:]  # 移除 "data: " 前缀
-                                if data.strip() == "[DONE]":
-                                    break
-                                try:
-                                    json_data = json.loads(data)
-                                    if "answer" in json_data:
-                                        yield json_data["answer"]
-                                    elif "conversation_id" in json_data and json_data["conversation_id"]:
-                                        context.conversation_id = json_data["conversation_id"]
-                                except json.JSONDecodeError:
-                                    logger.warning(f"Failed to parse JSON: {data}")
-            else:  # blocking mode
-                response = requests.post(url, headers=headers, json=payload, timeout=context.timeout)
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"Dify API error: {response.status_code} - {error_text}")
-                    yield f"Error: {response.status_code} - {error_text}"
-                    return
-
-                json_data = response.json()
-                if "answer" in json_data:
-                    yield json_data["answer"]
-                if "conversation_id" in json_data and json_data["conversation_id"]:
-                    context.conversation_id = json_data["conversation_id"]
-
-        except requests.exceptions.Timeout:
-            logger.error("Dify API timeout")
-            yield "Error: Request to Dify API timed out"
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Dify API request error: {str(e)}")
-            yield f"Error: Failed to connect to Dify API: {str(e)}"
-        except Exception as e:
-            logger.error(f"Unexpected error when calling Dify API: {str(e)}")
-            yield f"Error: Unexpected error occurred: {str(e)}"
+        images = [img for img in (images or []) if img is not None]
+
+        for event in self.client.chat(payload, images, encode_image=self._encode_image):
+            conversation_id = event.get("conversation_id")
+            if conversation_id:
+                context.conversation_id = conversation_id
+            event_type = event.get("event")
+            if event_type == "error":
+                status = event.get("status")
+                message = event.get("message", "")
+                yield f"Error: {status} - {message}" if status is not None else f"Error: {message}"
+                return
+            if event_type in ("message", "agent_message") or "answer" in event:
+                answer = event.get("answer")
+                if answer:
+                    yield answer
 
     def handle(self, context: HandlerContext, inputs: ChatData,
                output_definitions: Dict[ChatDataType, HandlerDataInfo]):
@@ -242,10 +186,15 @@ class HandlerDify(HandlerBase, ABC):
 
         logger.info(f'Dify input: {chat_text}')
 
+        context.interrupt_event.clear()
         try:
             context.output_texts = ''
             for output_text in self._send_dify_request(context, chat_text,
                                                        [context.current_image] if context.current_image is not None else []):
+                if context.interrupt_event.is_set():
+                    # leaving the generator cancels the request
+                    logger.info(f'Dify stream of speech {speech_id} interrupted')
+                    break
                 if output_text:
                     context.output_texts += output_text
                     logger.info(output_text)
@@ -272,5 +221,14 @@ class HandlerDify(HandlerBase, ABC):
         end_output.add_meta("speech_id", speech_id)
         yield end_output
 
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        if signal.type == ChatSignalType.INTERRUPT:
+            cast(DifyContext, context).interrupt_event.set()
+
     def destroy_context(self, context: HandlerContext):
         pass
+
+    def destroy(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
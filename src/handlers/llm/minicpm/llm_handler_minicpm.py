@@ -2,9 +2,11 @@ import importlib
 import os
 import queue
 import sys
+import threading
 import time
 from abc import ABC
-from typing import Optional, cast, Dict, List
+from contextlib import contextmanager
+from typing import Optional, cast, Dict, List, Tuple
 
 import PIL.Image
 import librosa
@@ -21,9 +23,15 @@ from chat_engine.contexts.handler_context import HandlerContext
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel, HandlerBaseConfigModel
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from engine_utils.adaptive_frame_sampler import AdaptiveFrameSampler
 from engine_utils.directory_info import DirectoryInfo
 from engine_utils.general_slicer import SliceContext, slice_data
+from engine_utils.interval_counter import IntervalCounter
+from engine_utils.timestamped_frame_buffer import TimestampedFrameBuffer
+from handlers.llm.minicpm.minicpm_session_cache import MiniCPMSessionCacheManager
 
 
 class MiniCPMConfig(HandlerBaseConfigModel, BaseModel):
@@ -32,6 +40,18 @@ class MiniCPMConfig(HandlerBaseConfigModel, BaseModel):
     assistant_prompt: str = Field(default="作为助手，你将使用这种声音风格说话。")
     enable_video_input: bool = Field(default=False)
     skip_video_frame: int = Field(default=-1)
+    # adaptive sampling replaces skip_video_frame when enabled
+    enable_adaptive_video_sampling: bool = Field(default=True)
+    video_min_frame_interval_ms: int = Field(default=500)
+    video_max_frame_interval_ms: int = Field(default=3000)
+    video_frame_budget_per_turn: int = Field(default=0)
+    video_input_max_size: int = Field(default=1344)  # image slicing of the model covers up to 3x3 448px slices
+    # camera frames are kept until the audio they belong to is prefilled, or until they are this much older than
+    # the newest frame, audio lagging further behind the camera gets no frames
+    video_frame_retention_ms: int = Field(default=10000)
+    # kv caches of idle sessions above the device budget move to host memory, above the host budget they are dropped
+    kv_cache_device_budget_mb: int = Field(default=4096)
+    kv_cache_host_budget_mb: int = Field(default=16384)
 
 
 class MiniCPMContext(HandlerContext):
@@ -45,6 +65,8 @@ class MiniCPMContext(HandlerContext):
 
         self.prefilling = False
         self.generating = False
+        # set when the user interrupts, generation stops at the next segment
+        self.interrupt_event = threading.Event()
 
         if self.dump_audio:
             dump_file_path = os.path.join(DirectoryInfo.get_project_dir(),
@@ -62,45 +84,60 @@ class MiniCPMContext(HandlerContext):
             slice_axis=0,
         )
 
-        self.video_frame_cache = queue.Queue(maxsize=50)
-        self.video_frame_head_cache: Optional[ChatData] = None
+        self.session_context: Optional[SessionContext] = None
+        self.video_frame_cache: Optional[TimestampedFrameBuffer] = None
 
-    def put_video_frame(self, frame):
+        # audio slices are prefilled by a worker thread while the user is still speaking
+        self.prefill_queue = queue.Queue()
+        self.prefill_thread: Optional[threading.Thread] = None
+        self.prefill_lag_counter = IntervalCounter("minicpm prefill lag")
+        self.turn_max_prefill_lag = 0.0
+        self.video_sampler: Optional[AdaptiveFrameSampler] = None
+
+    def put_video_frame(self, frame: ChatData):
         if self.config is None or not self.config.enable_video_input:
             return
-        if self.video_frame_cache.full():
-            self.video_frame_head_cache = self.video_frame_cache.get_nowait()
-        self.video_frame_cache.put_nowait(frame)
-
-    def fetch_video_frames(self, start_time: int, end_time: int):
-        result = []
+        frame_array = frame.data.get_main_data()
+        if frame_array is None:
+            return
+        # frames without a valid timestamp are placed at their arrival in the session timebase of the audio
+        timestamp = frame.timestamp if frame.is_timestamp_valid() else self.session_context.get_timestamp()
+        if timestamp[1] <= 0:
+            return
+        if self.video_sampler is not None:
+            timestamp_ms = timestamp[0] * 1000 / timestamp[1]
+            if not self.video_sampler.offer(frame_array, timestamp_ms):
+                return
+        if not self.video_frame_cache.put(timestamp[0], frame_array):
+            logger.warning(f"Video frame at {timestamp[0]} dropped, late: {self.video_frame_cache.late_dropped}, "
+                           f"overflow: {self.video_frame_cache.overflow_dropped}")
+
+    def fetch_video_frames(self, start_time: int, end_time: int) -> Tuple[List[int], List[np.ndarray]]:
         if self.config is None or not self.config.enable_video_input:
-            return result
-        while True:
-            if self.video_frame_head_cache is not None and self.video_frame_head_cache.timestamp[0] >= start_time:
-                result.append(self.video_frame_head_cache)
-            self.video_frame_head_cache = None
-            try:
-                self.video_frame_head_cache = self.video_frame_cache.get_nowait()
-            except queue.Empty:
-                break
-            if self.video_frame_head_cache.timestamp[0] >= end_time:
-                break
-        if len(result) == 0:
-            return result
+            return [], []
+        timestamps, frames = self.video_frame_cache.query(start_time, end_time)
+        timestamps = timestamps.tolist()
+        # audio before end_time is prefilled, frames in this range are not needed any more
+        self.video_frame_cache.release_before(end_time)
+        if len(frames) == 0:
+            return timestamps, frames
         frame_skip: Optional[int] = None
-        if self.config is not None:
+        if self.config is not None and self.video_sampler is None:
             frame_skip = self.config.skip_video_frame
 
         if frame_skip is not None and frame_skip > 0:
-            return result[::frame_skip+1]
+            return timestamps[::frame_skip+1], frames[::frame_skip+1]
         elif frame_skip == -1:
-            return result[-1:]
+            return timestamps[-1:], frames[-1:]
         else:
-            return result
+            return timestamps, frames
 
 
 class HandlerS2SMiniCPM(HandlerBase, ABC):
+    # frames kept for prefill grow the cache up to the max size before the oldest one is evicted
+    VIDEO_FRAME_CACHE_SIZE = 16
+    VIDEO_FRAME_CACHE_MAX_SIZE = 128
+
     def __init__(self):
         super().__init__()
         self.device = 'cuda:0'
@@ -108,6 +145,7 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
         self.tokenizer = None
         self.ref_audio = None
         self.created_session_num = 0
+        self.session_cache: Optional[MiniCPMSessionCacheManager] = None
 
     def get_handler_info(self) -> HandlerBaseInfo:
         return HandlerBaseInfo(
@@ -130,9 +168,9 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
         importlib.invalidate_caches()
 
     def load(self, engine_config: ChatEngineConfigModel, handler_config: Optional[BaseModel] = None):
-        model_name = "MiniCPM-o-2_6"
-        if isinstance(handler_config, MiniCPMConfig):
-            model_name = handler_config.model_name
+        if not isinstance(handler_config, MiniCPMConfig):
+            handler_config = MiniCPMConfig()
+        model_name = handler_config.model_name
         project_dir = DirectoryInfo.get_project_dir()
         model_path = os.path.join(project_dir, engine_config.model_root, model_name)
         if model_name == "MiniCPM-o-2_6-int4":
@@ -171,6 +209,12 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
         self.model.to(self.device).eval()
         ref_audio_path = os.path.join(self.handler_root, "MiniCPM-o", "assets", "ref_audios", 'default.wav')
         self.ref_audio, _ = librosa.load(ref_audio_path, sr=16000, mono=True)
+        self.session_cache = MiniCPMSessionCacheManager(
+            model=self.model,
+            device=self.device,
+            device_budget_bytes=handler_config.kv_cache_device_budget_mb * 2 ** 20,
+            host_budget_bytes=handler_config.kv_cache_host_budget_mb * 2 ** 20,
+        )
 
     def create_context(self, session_context: SessionContext,
                        handler_config: Optional[BaseModel] = None) -> HandlerContext:
@@ -178,38 +222,92 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
             handler_config = MiniCPMConfig()
         context = MiniCPMContext(session_context.session_info.session_id)
         context.config = handler_config
+        context.session_context = session_context
+        timestamp_base = session_context.session_info.timestamp_base
+        context.video_frame_cache = TimestampedFrameBuffer(
+            capacity=self.VIDEO_FRAME_CACHE_SIZE, max_capacity=self.VIDEO_FRAME_CACHE_MAX_SIZE,
+            retention=handler_config.video_frame_retention_ms * timestamp_base // 1000)
+        if handler_config.enable_adaptive_video_sampling:
+            context.video_sampler = AdaptiveFrameSampler(
+                min_interval_ms=handler_config.video_min_frame_interval_ms,
+                max_interval_ms=handler_config.video_max_frame_interval_ms,
+                frame_budget_per_turn=handler_config.video_frame_budget_per_turn,
+            )
         context.local_session_id = self.created_session_num + 235
         self.created_session_num += 1
-        self.model.reset_session()
         context.sys_msg = {"role": "user", "content": [
             handler_config.voice_prompt + "\n",
             self.ref_audio,
             "\n" + handler_config.assistant_prompt
         ]}
 
+        self.session_cache.register(str(context.local_session_id))
+        with self.session_cache.use(str(context.local_session_id)):
+            self._prefill_system_prompt(context)
+        return context
+
+    def _prefill_system_prompt(self, context: MiniCPMContext):
         with torch.inference_mode():
             self.model.config.stream_input = True
         self._do_prefill(context, [context.sys_msg])
         zero_audio = np.zeros(shape=(context.audio_prefill_length,), dtype=np.float32)
         zero_audio_msg = self._create_message(zero_audio)
         self._do_prefill(context, [zero_audio_msg])
-        return context
+
+    @contextmanager
+    def _use_session(self, context: MiniCPMContext):
+        # waits for the model in request order and brings back the kv cache of this session
+        with self.session_cache.use(str(context.local_session_id)) as cache_entry:
+            if cache_entry.evicted:
+                logger.warning(f"Kv cache of session {context.session_id} was evicted, dialog history is lost")
+                self._prefill_system_prompt(context)
+                cache_entry.evicted = False
+            yield cache_entry
 
     def start_context(self, session_context, handler_context):
-        pass
+        context = cast(MiniCPMContext, handler_context)
+        context.prefill_thread = threading.Thread(target=self._prefill_worker, args=(context,), daemon=True)
+        context.prefill_thread.start()
+
+    def _prefill_worker(self, context: MiniCPMContext):
+        while True:
+            item = context.prefill_queue.get()
+            try:
+                if item is None:
+                    break
+                msgs, max_slice_nums, enqueue_time = item
+                with self._use_session(context):
+                    self._do_prefill(context, msgs, max_slice_nums=max_slice_nums)
+                # time from slice arrival to the end of its prefill
+                lag = time.monotonic() - enqueue_time
+                context.turn_max_prefill_lag = max(context.turn_max_prefill_lag, lag)
+                context.prefill_lag_counter.add_property("prefill_slices")
+                context.prefill_lag_counter.add_property("prefill_lag_ms", lag * 1000)
+            except Exception as e:
+                logger.opt(exception=True).error(f"Prefill failed for session {context.session_id}: {e}")
+            finally:
+                context.prefill_queue.task_done()
+
+    @staticmethod
+    def _submit_prefill(context: MiniCPMContext, msgs, max_slice_nums=None):
+        context.prefill_queue.put((msgs, max_slice_nums, time.monotonic()))
 
     def get_handler_detail(self, session_context: SessionContext,
                            context: HandlerContext) -> HandlerDetail:
         definition = DataBundleDefinition()
         definition.add_entry(DataBundleEntry.create_audio_entry("avatar_audio", 1, 24000))
+        context = cast(MiniCPMContext, context)
         inputs = {
             ChatDataType.HUMAN_AUDIO: HandlerDataInfo(
                 type=ChatDataType.HUMAN_AUDIO,
             ),
-            ChatDataType.CAMERA_VIDEO: HandlerDataInfo(
-                type=ChatDataType.CAMERA_VIDEO,
-            ),
         }
+        if context.config.enable_video_input:
+            inputs[ChatDataType.CAMERA_VIDEO] = HandlerDataInfo(
+                type=ChatDataType.CAMERA_VIDEO,
+                max_frame_size=context.config.video_input_max_size,
+                max_frame_rate=context.video_sampler.input_frame_rate() if context.video_sampler else 0,
+            )
         outputs = {
             ChatDataType.AVATAR_AUDIO: HandlerDataInfo(
                 type=ChatDataType.AVATAR_AUDIO,
@@ -221,16 +319,14 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
         )
 
     @staticmethod
-    def _create_message(audio: Optional[np.ndarray], video_frames: Optional[List[ChatData]] = None):
+    def _create_message(audio: Optional[np.ndarray], video_frames: Optional[List[np.ndarray]] = None):
         if audio is None:
             return None
         contents = []
         if video_frames is not None and len(video_frames) > 0:
             contents.append("<unit>")
-            for video_frame in video_frames:
-                frame_array = video_frame.data.get_main_data()
-                if frame_array is None:
-                    continue
+            for frame_array in video_frames:
+                # frames are views into the frame cache, the image keeps its own copy
                 image = PIL.Image.fromarray(np.squeeze(frame_array)[..., ::-1])
                 contents.append(image)
 
@@ -274,9 +370,12 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
             speech_id = context.session_id
 
         if audio is not None:
+            if not context.prefilling:
+                # a new turn starts, interrupts from now on apply to its generation
+                context.interrupt_event.clear()
+                context.prefilling = True
             # prefill audio
-            if audio is not None:
-                audio = audio.squeeze()
+            audio = audio.squeeze()
             context.audio_prefill_slice_context.update_start_id(inputs.timestamp[0])
             for audio_segment in slice_data(context.audio_prefill_slice_context, audio):
                 segment_size = audio_segment.shape[0]
@@ -284,12 +383,10 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
                     continue
                 segment_start_id = context.audio_prefill_slice_context.get_last_slice_start_index()
                 segment_end_id = segment_start_id + segment_size
-                video_frames = context.fetch_video_frames(segment_start_id, segment_end_id)
-                logger.info(f"Got {len(video_frames)} video frames with time {[x.timestamp[0] for x in video_frames]}")
+                frame_times, video_frames = context.fetch_video_frames(segment_start_id, segment_end_id)
+                logger.info(f"Got {len(video_frames)} video frames with time {frame_times}")
                 msg = self._create_message(audio_segment, video_frames)
-                self._do_prefill(context, [msg], max_slice_nums=1)
-                if not context.prefilling:
-                    context.prefilling = True
+                self._submit_prefill(context, [msg], max_slice_nums=1)
 
         if video is not None:
             context.put_video_frame(video)
@@ -308,47 +405,56 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
                     [remainder_audio,
                      np.zeros(shape=(context.audio_prefill_slice_context.slice_size - remainder_audio.shape[0]))])
             end_segment_end_id = end_segment_start_id + segment_size
-            video_frames = context.fetch_video_frames(end_segment_start_id, end_segment_end_id)
-            logger.info(f"Got {len(video_frames)} video frames with time {[x.timestamp[0] for x in video_frames]}")
-            self._do_prefill(context, [self._create_message(remainder_audio, video_frames)], max_slice_nums=1)
-
+            frame_times, video_frames = context.fetch_video_frames(end_segment_start_id, end_segment_end_id)
+            logger.info(f"Got {len(video_frames)} video frames with time {frame_times}")
+            self._submit_prefill(context, [self._create_message(remainder_audio, video_frames)], max_slice_nums=1)
+
+        # generation has to see every slice of this speech
+        t_drain = time.monotonic()
+        context.prefill_queue.join()
+        logger.info(f"Prefill drained in {(time.monotonic() - t_drain) * 1000:.2f} milli, "
+                    f"max prefill lag of speech {speech_id}: {context.turn_max_prefill_lag * 1000:.2f} milli")
+        context.turn_max_prefill_lag = 0.0
         context.prefilling = False
+        if context.video_sampler is not None and context.config.enable_video_input:
+            logger.info(f"Video sampling stats for speech {speech_id}: {context.video_sampler.get_stats()}")
+            context.video_sampler.new_turn()
 
         logger.info(f"Start s2s inference for speech {speech_id}")
         t_start = time.monotonic()
         is_first_result = True
         result_audio = []
         result_text = ""
-        if not context.generating:
-            context.generating = True
-        with torch.no_grad():
-            self.model.config.stream_input = True
-            logger.info(f"Generating start with session={str(context.local_session_id)}")
-            for result in self.model.streaming_generate(
-                session_id=str(context.local_session_id),
-                tokenizer=self.tokenizer,
-                generate_audio=True,
-            ):
-                if is_first_result:
-                    is_first_result = False
-                    dur_first_segment = time.monotonic() - t_start
-                    logger.info(f"First segment took {dur_first_segment*1000:.2f} milli")
-                out_audio, sr, text = result["audio_wav"], result["sampling_rate"], result["text"]
-                out_audio = cast(torch.Tensor, out_audio)
-                out_audio = out_audio.numpy()
-                result_audio.append(out_audio)
-                result_text += text
-                if context.dump_audio:
-                    dump_audio = librosa.resample(out_audio, orig_sr=24000, target_sr=16000)
-                    context.audio_dump_file.write(dump_audio.tobytes())
-                out_audio = out_audio[np.newaxis, ...]
-                output = DataBundle(output_definition)
-                output.set_main_data(out_audio)
-                output.add_meta("avatar_speech_text", text)
-                output.add_meta("speech_id", speech_id)
-                logger.info(f"Generated audio of size {out_audio.shape[-1]}, sample_rate={sr}")
-                context.submit_data(output)
-                # yield output
+        context.generating = True
+        logger.info(f"Generating start with session={str(context.local_session_id)}")
+        steps = self._generate_steps(context)
+        for result in steps:
+            if context.interrupt_event.is_set():
+                logger.info(f"Generation of speech {speech_id} interrupted")
+                break
+            if is_first_result:
+                is_first_result = False
+                dur_first_segment = time.monotonic() - t_start
+                logger.info(f"First segment took {dur_first_segment*1000:.2f} milli")
+            out_audio, sr, text = result["audio_wav"], result["sampling_rate"], result["text"]
+            out_audio = cast(torch.Tensor, out_audio)
+            out_audio = out_audio.numpy()
+            result_audio.append(out_audio)
+            result_text += text
+            if context.dump_audio:
+                dump_audio = librosa.resample(out_audio, orig_sr=24000, target_sr=16000)
+                context.audio_dump_file.write(dump_audio.tobytes())
+            out_audio = out_audio[np.newaxis, ...]
+            output = DataBundle(output_definition)
+            output.set_main_data(out_audio)
+            output.add_meta("avatar_speech_text", text)
+            output.add_meta("speech_id", speech_id)
+            logger.info(f"Generated audio of size {out_audio.shape[-1]}, sample_rate={sr}")
+            context.submit_data(output)
+            # yield output
+        steps.close()
+        if context.interrupt_event.is_set() and is_first_result:
+            logger.info(f"Generation of speech {speech_id} interrupted before start")
         end_output = DataBundle(output_definition)
         end_output.set_main_data(np.zeros(shape=(1, 50), dtype=np.float32))
         end_output.add_meta("avatar_speech_end", True)
@@ -357,5 +463,44 @@ class HandlerS2SMiniCPM(HandlerBase, ABC):
         context.submit_data(end_output)
         # yield end_output
 
+    def _generate_steps(self, context: MiniCPMContext):
+        """
+        Yields generated chunks, the model is only held while a chunk is generated so prefills of other
+        sessions can run in between.
+        """
+        generator = None
+        try:
+            # an interrupt during the prefill drain ends the turn before anything is generated
+            while not context.interrupt_event.is_set():
+                with self._use_session(context), torch.no_grad():
+                    if generator is None:
+                        self.model.config.stream_input = True
+                        generator = self.model.streaming_generate(
+                            session_id=str(context.local_session_id),
+                            tokenizer=self.tokenizer,
+                            generate_audio=True,
+                        )
+                    try:
+                        result = next(generator)
+                    except StopIteration:
+                        return
+                yield result
+        finally:
+            if generator is not None:
+                # an interrupted generation is closed with the session state of its own session loaded
+                with self._use_session(context), torch.no_grad():
+                    generator.close()
+
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        if signal.type == ChatSignalType.INTERRUPT:
+            cast(MiniCPMContext, context).interrupt_event.set()
+
     def destroy_context(self, context: HandlerContext):
-        pass
+        context = cast(MiniCPMContext, context)
+        if context.prefill_thread is not None:
+            context.prefill_queue.put(None)
+            context.prefill_thread.join(timeout=5)
+            context.prefill_thread = None
+        if self.session_cache is not None:
+            self.session_cache.remove(str(context.local_session_id))
+            logger.info(f"Session kv cache stats: {self.session_cache.get_stats()}")
@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# noinspection PyPackageRequirements
+import torch
+from loguru import logger
+
+# Streaming state the MiniCPM-o model keeps for the session it currently serves, reset_session() clears it.
+MINICPM_SESSION_STATE_ATTRIBUTES: Tuple[str, ...] = (
+    "session_id",
+    "new_user_msg",
+    "llm_generated",
+    "llm_generate_completed",
+    "llm_past_key_values",
+    "audio_past_key_values",
+)
+
+
+class FairLock:
+    """
+    Lock granted in request order, so one busy session can not starve the others.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+    def acquire(self):
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving:
+                self._condition.wait()
+
+    def release(self):
+        with self._condition:
+            self._serving += 1
+            self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def map_tensors(obj: Any, func: Callable[[torch.Tensor], torch.Tensor]) -> Any:
+    """
+    Apply func to every tensor in a kv cache structure, cache objects are updated in place.
+    """
+    if isinstance(obj, torch.Tensor):
+        return func(obj)
+    if isinstance(obj, tuple):
+        return tuple(map_tensors(x, func) for x in obj)
+    if isinstance(obj, list):
+        return [map_tensors(x, func) for x in obj]
+    if isinstance(obj, dict):
+        return {k: map_tensors(v, func) for k, v in obj.items()}
+    # transformers DynamicCache style objects
+    for attr in ("key_cache", "value_cache"):
+        if isinstance(getattr(obj, attr, None), list):
+            setattr(obj, attr, [map_tensors(x, func) for x in getattr(obj, attr)])
+    return obj
+
+
+def tensor_bytes(obj: Any, device_type: Optional[str] = None) -> int:
+    total = [0]
+
+    def _count(tensor: torch.Tensor):
+        if device_type is None or tensor.device.type == device_type:
+            total[0] += tensor.numel() * tensor.element_size()
+        return tensor
+
+    map_tensors(obj, _count)
+    return total[0]
+
+
+@dataclass
+class SessionCacheEntry:
+    session_key: str
+    state: Dict[str, Any] = field(default_factory=dict)
+    offloaded: bool = False
+    evicted: bool = False
+    nbytes: int = 0
+    last_used: float = 0.0
+
+
+class MiniCPMSessionCacheManager:
+    """
+    Lets several sessions share one MiniCPM-o model that only holds one streaming session state.
+
+    use(session_key) waits for the model in request order, swaps the session state in and keeps it
+    accounted afterwards. When resident caches exceed device_budget_bytes, least recently used idle
+    sessions are offloaded to host memory, beyond host_budget_bytes they are evicted and the session
+    has to be initialized again, see SessionCacheEntry.evicted.
+    """
+
+    def __init__(self, model, device: str, device_budget_bytes: int, host_budget_bytes: int,
+                 state_attributes: Tuple[str, ...] = MINICPM_SESSION_STATE_ATTRIBUTES):
+        self.model = model
+        self.device = device
+        self.device_budget_bytes = device_budget_bytes
+        self.host_budget_bytes = host_budget_bytes
+        self.state_attributes = state_attributes
+
+        self._entries: "OrderedDict[str, SessionCacheEntry]" = OrderedDict()
+        self._active_key: Optional[str] = None
+        self._lock = FairLock()
+
+    def register(self, session_key: str):
+        with self._lock:
+            self._entries[session_key] = SessionCacheEntry(session_key=session_key, last_used=time.monotonic())
+
+    def remove(self, session_key: str):
+        with self._lock:
+            self._entries.pop(session_key, None)
+            if self._active_key == session_key:
+                self._reset_model_state()
+                self._active_key = None
+
+    def get_entry(self, session_key: str) -> Optional[SessionCacheEntry]:
+        return self._entries.get(session_key)
+
+    def _reset_model_state(self):
+        if hasattr(self.model, "reset_session"):
+            self.model.reset_session()
+
+    def _save_active(self):
+        entry = self._entries.get(self._active_key)
+        if entry is None:
+            return
+        entry.state = {name: getattr(self.model, name) for name in self.state_attributes
+                       if hasattr(self.model, name)}
+
+    def _load(self, entry: SessionCacheEntry):
+        self._reset_model_state()
+        if entry.offloaded:
+            self._restore(entry)
+        for name, value in entry.state.items():
+            setattr(self.model, name, value)
+        self._active_key = entry.session_key
+
+    def _offload(self, entry: SessionCacheEntry):
+        entry.state = map_tensors(entry.state, lambda x: x.to("cpu"))
+        entry.offloaded = True
+        logger.info(f"Offloaded kv cache of session {entry.session_key} ({entry.nbytes / 2 ** 20:.1f}MB) to host")
+
+    def _restore(self, entry: SessionCacheEntry):
+        t_start = time.monotonic()
+        entry.state = map_tensors(entry.state, lambda x: x.to(self.device))
+        entry.offloaded = False
+        logger.info(f"Restored kv cache of session {entry.session_key} in "
+                    f"{(time.monotonic() - t_start) * 1000:.2f} milli")
+
+    def _evict(self, entry: SessionCacheEntry):
+        entry.state = {}
+        entry.offloaded = False
+        entry.evicted = True
+        entry.nbytes = 0
+        logger.warning(f"Evicted kv cache of session {entry.session_key}")
+
+    def _enforce_budget(self):
+        device_bytes = sum(x.nbytes for x in self._entries.values() if not x.offloaded)
+        host_bytes = sum(x.nbytes for x in self._entries.values() if x.offloaded)
+        # entries are kept in lru order, the active session is never offloaded
+        for entry in self._entries.values():
+            if device_bytes <= self.device_budget_bytes:
+                break
+            if entry.session_key == self._active_key or entry.offloaded or entry.nbytes == 0:
+                continue
+            self._offload(entry)
+            device_bytes -= entry.nbytes
+            host_bytes += entry.nbytes
+        for entry in self._entries.values():
+            if host_bytes <= self.host_budget_bytes:
+                break
+            if not entry.offloaded:
+                continue
+            host_bytes -= entry.nbytes
+            self._evict(entry)
+
+    @contextmanager
+    def use(self, session_key: str):
+        """
+        Exclusive use of the model with the state of session_key loaded.
+        """
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is None:
+                entry = SessionCacheEntry(session_key=session_key)
+                self._entries[session_key] = entry
+            if self._active_key != session_key:
+                self._save_active()
+                self._load(entry)
+            try:
+                yield entry
+            finally:
+                self._save_active()
+                entry.nbytes = tensor_bytes(entry.state)
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(session_key)
+                self._enforce_budget()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._entries),
+            "active": self._active_key,
+            "device_bytes": sum(x.nbytes for x in self._entries.values() if not x.offloaded),
+            "host_bytes": sum(x.nbytes for x in self._entries.values() if x.offloaded),
+            "offloaded": [x.session_key for x in self._entries.values() if x.offloaded],
+        }
@@ -2,6 +2,7 @@
 
 import os
 import re
+import threading
 from typing import Dict, Optional, cast
 from loguru import logger
 from pydantic import BaseModel, Field
@@ -12,6 +13,8 @@ from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigMode
 from chat_engine.common.handler_base import HandlerBase, HandlerBaseInfo, HandlerDataInfo, HandlerDetail
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
 from handlers.llm.openai_compatible.chat_history_manager import ChatHistory, HistoryMessage
@@ -23,6 +26,8 @@ class LLMConfig(HandlerBaseConfigModel, BaseModel):
     api_key: str = Field(default=os.getenv("DASHSCOPE_API_KEY"))
     api_url: str = Field(default=None)
     enable_video_input: bool = Field(default=False)
+    video_input_max_size: int = Field(default=1280)  # longest side of camera frames sent to the model
+    video_input_fps: float = Field(default=2)  # only the latest frame is sent with each question
     history_length: int = Field(default=20)
 
 
@@ -41,6 +46,7 @@ class LLMContext(HandlerContext):
         self.current_image = None
         self.history = None
         self.enable_video_input = False
+        self.interrupt_event = threading.Event()
 
 
 class HandlerLLM(HandlerBase, ABC):
@@ -56,14 +62,18 @@ class HandlerLLM(HandlerBase, ABC):
                            context: HandlerContext) -> HandlerDetail:
         definition = DataBundleDefinition()
         definition.add_entry(DataBundleEntry.create_text_entry("avatar_text"))
+        context = cast(LLMContext, context)
         inputs = {
             ChatDataType.HUMAN_TEXT: HandlerDataInfo(
                 type=ChatDataType.HUMAN_TEXT,
             ),
-            ChatDataType.CAMERA_VIDEO: HandlerDataInfo(
-                type=ChatDataType.CAMERA_VIDEO,
-            ),
         }
+        if context.enable_video_input:
+            inputs[ChatDataType.CAMERA_VIDEO] = HandlerDataInfo(
+                type=ChatDataType.CAMERA_VIDEO,
+                max_frame_size=context.config.video_input_max_size,
+                max_frame_rate=context.config.video_input_fps,
+            )
         outputs = {
             ChatDataType.AVATAR_TEXT: HandlerDataInfo(
                 type=ChatDataType.AVATAR_TEXT,
@@ -85,6 +95,7 @@ class HandlerLLM(HandlerBase, ABC):
         if not isinstance(handler_config, LLMConfig):
             handler_config = LLMConfig()
         context = LLMContext(session_context.session_info.session_id)
+        context.config = handler_config
         context.model_name = handler_config.model_name
         context.system_prompt = {'role': 'system', 'content': handler_config.system_prompt}
         context.api_key = handler_config.api_key
@@ -134,6 +145,7 @@ class HandlerLLM(HandlerBase, ABC):
         current_content = context.history.generate_next_messages(chat_text, 
                                                                  [context.current_image] if context.current_image is not None else [])
         logger.debug(f'llm input {context.model_name} {current_content} ')
+        context.interrupt_event.clear()
         try:
             completion = context.client.chat.completions.create(
                 model=context.model_name,  # 此处以qwen-plus为例，可按需更换模型名称。模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
@@ -147,6 +159,10 @@ class HandlerLLM(HandlerBase, ABC):
             context.input_texts = ''
             context.output_texts = ''
             for chunk in completion:
+                if context.interrupt_event.is_set():
+                    logger.info(f'llm stream of speech {speech_id} interrupted')
+                    completion.close()
+                    break
                 if (chunk and chunk.choices and chunk.choices[0] and chunk.choices[0].delta.content):
                     output_text = chunk.choices[0].delta.content
                     context.output_texts += output_text
@@ -179,6 +195,10 @@ class HandlerLLM(HandlerBase, ABC):
         end_output.add_meta("speech_id", speech_id)
         yield end_output
 
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        if signal.type == ChatSignalType.INTERRUPT:
+            cast(LLMContext, context).interrupt_event.set()
+
     def destroy_context(self, context: HandlerContext):
         pass
 
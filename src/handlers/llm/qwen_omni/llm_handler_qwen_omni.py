@@ -20,7 +20,13 @@ from chat_engine.contexts.handler_context import HandlerContext
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel, HandlerBaseConfigModel
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
+from engine_utils.adaptive_frame_sampler import AdaptiveFrameSampler
+from handlers.llm.qwen_omni.qwen_omni_audio_codec import Pcm16Encoder, Pcm16DeltaDecoder, describe_audio_chunk
+from handlers.llm.qwen_omni.qwen_omni_connection_pool import HeartbeatScheduler, PooledConversation, \
+    QwenOmniConnectionPool
 
 
 class QwenOmniConfig(HandlerBaseConfigModel, BaseModel):
@@ -34,7 +40,12 @@ class QwenOmniConfig(HandlerBaseConfigModel, BaseModel):
     enable_turn_detection: bool = Field(default=False)  # Enable server-side turn detection
     enable_input_transcription: bool = Field(default=False)  # Control input audio transcription
     transcription_model: str = Field(default="gummy-realtime-v1")  # Model for audio transcription
-    video_frame_interval_ms: int = Field(default=1000, ge=500)  # Video frame sending interval in milliseconds
+    video_frame_interval_ms: int = Field(default=1000, ge=500)  # Minimum video frame sending interval in milliseconds
+    video_max_frame_interval_ms: int = Field(default=4000, ge=500)  # Sending interval reached for a static scene
+    video_frame_budget_per_turn: int = Field(default=0, ge=0)  # Max video frames sent per turn, 0 for unlimited
+    video_input_max_size: int = Field(default=1280, ge=0)  # Longest side of sent video frames, 0 keeps camera size
+    output_audio_chunk_ms: int = Field(default=40, ge=20)  # Coalesce audio deltas into chunks of at least this length
+    connection_pool_size: int = Field(default=1, ge=0)  # Pre-connected conversations kept ready, 0 connects on demand
 
 
 
@@ -51,6 +62,8 @@ class QwenOmniContext(HandlerContext):
         
         # ==================== Core Conversation ====================
         self.conversation: Optional[OmniRealtimeConversation] = None
+        self.pooled_conversation: Optional[PooledConversation] = None  # Checked out from the connection pool
+        self.has_user_input: bool = False  # Conversation carried user data, recycle instead of reuse
         self.callback = None
         self.session_update_params: Optional[Dict] = None  # Cached session params for heartbeat
         
@@ -63,6 +76,9 @@ class QwenOmniContext(HandlerContext):
         # Processing queues
         self.recv_audio_queue = queue.Queue()
         self.recv_text_queue = queue.Queue()
+        # Reused PCM16 codec state
+        self.audio_encoder = Pcm16Encoder()
+        self.audio_decoder: Optional[Pcm16DeltaDecoder] = None
         # Processing threads
         self.audio_processing_thread: Optional[threading.Thread] = None
         self.text_processing_thread: Optional[threading.Thread] = None
@@ -70,9 +86,10 @@ class QwenOmniContext(HandlerContext):
         # ==================== Turn State Management ====================
         self.current_speech_id: Optional[str] = None
         self.current_turn_audio_started: bool = False
+        self.response_cancelled: bool = False  # Deltas of a cancelled response are dropped until the next one
         
         # ==================== Video Processing ====================
-        self._last_video_sent_ms: float = 0.0
+        self.video_sampler: Optional[AdaptiveFrameSampler] = None
         
         # ==================== Auto-Reconnection ====================
         self.reconnect_enabled: bool = True  # Enable/disable auto-reconnection
@@ -89,7 +106,6 @@ class QwenOmniContext(HandlerContext):
         # ==================== Heartbeat/Keepalive ====================
         self.is_processing = False
         self.heartbeat_interval_sec: int = 25  # Heartbeat interval, default 25s
-        self.heartbeat_thread: Optional[threading.Thread] = None
         
         # ==================== Data Definitions Cache ====================
         self.output_definitions: Dict[ChatDataType, DataBundleDefinition] = {}  # Cached for efficiency
@@ -367,6 +383,11 @@ class QwenOmniCallback(OmniRealtimeCallback):
                 error_message = error_info.get('message', 'unknown')
                 logger.error(f"Audio transcription failed: {error_code} - {error_message}")
                 
+            elif event_type in ['response.audio_transcript.delta', 'response.text.delta',
+                                'response.audio.delta'] and self.context.response_cancelled:
+                # Late deltas of a response cancelled by user interrupt
+                pass
+
             elif event_type in ['response.audio_transcript.delta', 'response.text.delta']:
                 # Real-time text output
                 text_delta = response.get('delta', '')
@@ -419,6 +440,7 @@ class QwenOmniCallback(OmniRealtimeCallback):
                 logger.debug(f"Audio buffer committed: item_id={item_id}")
                 
             elif event_type == 'response.created':
+                self.context.response_cancelled = False
                 response_id = response.get('response', {}).get('id', '')
                 logger.debug(f"Response created: response_id={response_id}")
                 
@@ -526,6 +548,8 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
     def __init__(self):
         super().__init__()
         self.output_definitions: Dict[ChatDataType, DataBundleDefinition] = {}
+        self.heartbeat_scheduler = HeartbeatScheduler()
+        self.connection_pool: Optional[QwenOmniConnectionPool] = None
 
     def get_handler_info(self) -> HandlerBaseInfo:
         return HandlerBaseInfo(
@@ -540,26 +564,67 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
                 raise ValueError(error_message)
             
             dashscope.api_key = handler_config.api_key
+
+            self.heartbeat_scheduler.start()
+            self.connection_pool = QwenOmniConnectionPool(
+                conversation_factory=lambda callback: OmniRealtimeConversation(
+                    model=handler_config.model_name,
+                    callback=callback,
+                ),
+                session_update_params=self._build_session_update_params(handler_config),
+                pool_size=handler_config.connection_pool_size,
+                heartbeat_scheduler=self.heartbeat_scheduler,
+            )
+            self.connection_pool.start()
             logger.info("Qwen-Omni handler loaded successfully")
 
+    @staticmethod
+    def _build_session_update_params(config: QwenOmniConfig) -> Dict:
+        output_modalities = [MultiModality.AUDIO, MultiModality.TEXT]
+
+        try:
+            input_format = getattr(AudioFormat, config.input_audio_format)
+            output_format = getattr(AudioFormat, config.output_audio_format)
+        except AttributeError as e:
+            logger.opt(exception=True).error(f"Invalid audio format: {e}")
+            input_format = AudioFormat.PCM_16000HZ_MONO_16BIT
+            output_format = AudioFormat.PCM_24000HZ_MONO_16BIT
+
+        return dict(
+            output_modalities=output_modalities,
+            voice=config.voice,
+            input_audio_format=input_format,
+            output_audio_format=output_format,
+            enable_input_audio_transcription=config.enable_input_transcription,
+            input_audio_transcription_model=config.transcription_model,
+            enable_turn_detection=config.enable_turn_detection,
+        )
+
     def create_context(self, session_context: SessionContext,
                        handler_config: Optional[BaseModel] = None) -> HandlerContext:
         """
         Create processing context for the handler.
-        Initializes conversation, callback, and context configuration.
+        Initializes callback and context configuration, the conversation is checked out on start.
         """
         if not isinstance(handler_config, QwenOmniConfig):
             handler_config = QwenOmniConfig()
             
         context = QwenOmniContext(session_context.session_info.session_id)
         context.config = handler_config
+        # Output is 24kHz, align chunks to the 20ms rtc output frame
+        context.audio_decoder = Pcm16DeltaDecoder(
+            sample_rate=24000,
+            frame_size=480,
+            chunk_samples=24000 * handler_config.output_audio_chunk_ms // 1000,
+        )
         
-        context.callback = QwenOmniCallback(context)
-    
-        context.conversation = OmniRealtimeConversation(
-            model=handler_config.model_name,
-            callback=context.callback,
+        context.video_sampler = AdaptiveFrameSampler(
+            min_interval_ms=handler_config.video_frame_interval_ms,
+            max_interval_ms=handler_config.video_max_frame_interval_ms,
+            frame_budget_per_turn=handler_config.video_frame_budget_per_turn,
         )
+        
+        context.callback = QwenOmniCallback(context)
         return context
 
     def start_context(self, session_context, handler_context):
@@ -581,47 +646,26 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
                 context.text_processing_thread = threading.Thread(target=self._text_processing_worker, args=(context,), daemon=True)
                 context.text_processing_thread.start()
             
-            # Connect to Qwen-Omni service
+            # Check out a pre-connected and configured conversation
+            if self.connection_pool is None:
+                raise ValueError("Qwen-Omni handler is not loaded")
             logger.info("Connecting to Qwen-Omni service...")
-            context.conversation.connect()
-            
-            # Wait for connection establishment
-            if not context.connection_ready_event.wait(timeout=15):
-                raise TimeoutError("Timeout waiting for Qwen-Omni connection")
-            
-            if not context.is_connected:
+            pooled = self.connection_pool.acquire(context.callback)
+            if pooled is None:
                 raise ConnectionError("Failed to establish connection to Qwen-Omni service")
-            
-            output_modalities = [MultiModality.AUDIO, MultiModality.TEXT]
-            
-            try:
-                input_format = getattr(AudioFormat, context.config.input_audio_format)
-                output_format = getattr(AudioFormat, context.config.output_audio_format)
-            except AttributeError as e:
-                logger.opt(exception=True).error(f"Invalid audio format: {e}")
-                input_format = AudioFormat.PCM_16000HZ_MONO_16BIT
-                output_format = AudioFormat.PCM_24000HZ_MONO_16BIT
-                
-            session_update_params = dict(
-                output_modalities=output_modalities,
-                voice=context.config.voice,
-                input_audio_format=input_format,
-                output_audio_format=output_format,
-                enable_input_audio_transcription=context.config.enable_input_transcription,
-                input_audio_transcription_model=context.config.transcription_model,
-                enable_turn_detection=context.config.enable_turn_detection,
-            )
-            context.session_update_params = session_update_params
-            context.conversation.update_session(**session_update_params)
+            context.pooled_conversation = pooled
+            context.conversation = pooled.conversation
+            context.session_update_params = self.connection_pool.session_update_params
+            context.is_connected = True
+            context.connection_ready_event.set()
             
             # Reset reconnection state after successful initial connection
             context.reconnect_attempts = 0
             context.is_reconnecting = False
             
-            # Start heartbeat thread for periodic session.update (only when connection alive and not generating)
-            if context.heartbeat_thread is None or not context.heartbeat_thread.is_alive():
-                context.heartbeat_thread = threading.Thread(target=self._heartbeat_loop, args=(context,), daemon=True)
-                context.heartbeat_thread.start()
+            # Periodic session.update from the shared scheduler (only when connection alive and not generating)
+            self.heartbeat_scheduler.register(context.session_id, lambda: self._send_heartbeat(context),
+                                              max(20, int(context.heartbeat_interval_sec or 25)))
 
             logger.info(f"Qwen-Omni context started successfully for session {context.session_id}")  
         except Exception as e:
@@ -636,27 +680,50 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
                 context.is_processing = False
             raise RuntimeError(f"Qwen-Omni context startup failed: {e}") from e
 
-    def _heartbeat_loop(self, context: QwenOmniContext):
-        interval = max(20, int(context.heartbeat_interval_sec or 25))
-        while not context.shutdown_event.is_set():
-            time.sleep(interval)
-            if context.shutdown_event.is_set():
-                break
-            # Only send heartbeat when connection is alive and not generating
-            if context.is_connected and (not context.is_processing) and context.session_update_params is not None:
-                try:
-                    context.conversation.update_session(**context.session_update_params)
-                    logger.debug("Sent heartbeat session.update")
-                except Exception as e:
-                    logger.opt(exception=True).warning(f"Heartbeat failed: {e}")
+    def _send_heartbeat(self, context: QwenOmniContext):
+        if context.shutdown_event.is_set():
+            return
+        # Only send heartbeat when connection is alive and not generating
+        if context.is_connected and (not context.is_processing) and context.session_update_params is not None:
+            try:
+                context.conversation.update_session(**context.session_update_params)
+                logger.debug("Sent heartbeat session.update")
+            except Exception as e:
+                logger.opt(exception=True).warning(f"Heartbeat failed: {e}")
+
+    def _submit_avatar_audio(self, context: QwenOmniContext, audio_array: np.ndarray):
+        output_definition = context.output_definitions.get(ChatDataType.AVATAR_AUDIO)
+        # Use session_id as default speech_id to ensure always have valid identifier
+        speech_id = context.current_speech_id or context.session_id
+
+        # Create output data bundle and wrap as ChatData
+        output = DataBundle(output_definition)
+        output.set_main_data(audio_array)
+        output.add_meta("speech_id", speech_id)
+        output.add_meta("avatar_speech_end", False)
+        chat_data = ChatData(type=ChatDataType.AVATAR_AUDIO, data=output)
+
+        logger.opt(lazy=True).debug("Submitting audio: {}, speech_id={}",
+                                    lambda: describe_audio_chunk(audio_array, 24000), lambda: speech_id)
+        context.submit_data(chat_data)
 
     def _audio_processing_worker(self, context: QwenOmniContext):
         logger.info("Audio processing worker thread started")
+        decoder = context.audio_decoder
         while not context.shutdown_event.is_set():
             try:
                 queue_item = context.recv_audio_queue.get(timeout=1.0)
                 
                 if queue_item.get('avatar_speech_end', False) == True:
+                    # Deliver the coalesced tail before the end marker, unless the response was cancelled
+                    if context.response_cancelled:
+                        decoder.reset()
+                    tail = decoder.flush()
+                    if tail is not None:
+                        try:
+                            self._submit_avatar_audio(context, tail)
+                        except Exception as e:
+                            logger.opt(exception=True).error(f"Error submitting audio: {e}")
                     speech_id = context.current_speech_id
                     if speech_id:
                         audio_def = context.output_definitions.get(ChatDataType.AVATAR_AUDIO)
@@ -677,50 +744,13 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
                 if not audio_b64_str:
                     continue
                 
-                # Decode base64 audio data
-                audio_bytes = base64.b64decode(audio_b64_str)
-                
-                # Check if audio data is empty
-                if len(audio_bytes) == 0:
-                    logger.error("Received empty audio data")
-                    continue
-                
-                # Check if audio data length is aligned to int16
-                if len(audio_bytes) % 2 != 0:
-                    logger.error(f"Audio data length is not aligned to int16: {len(audio_bytes)} bytes (should be even)")
-                    continue
-                
-                # Log audio data length information
-                audio_samples = len(audio_bytes) // 2  # int16 = 2 bytes
-                audio_duration_ms = (audio_samples / 24000) * 1000  # 24kHz sample rate
-                audio_array = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32767.0
-                logger.debug(
-                    f"Processing audio chunk: {len(audio_bytes)} bytes, {audio_samples} samples, {audio_duration_ms:.1f}ms | "
-                    f"Audio array: shape={audio_array.shape}, min={audio_array.min():.4f}, max={audio_array.max():.4f}, mean={audio_array.mean():.4f}"
-                )
-                
-                # Ensure audio data format is correct (1, N) for output
-                if audio_array.ndim == 1:
-                    audio_array = audio_array[np.newaxis, ...]
-                
-                try:
-                    output_definition = context.output_definitions.get(ChatDataType.AVATAR_AUDIO)
-                    # Use session_id as default speech_id to ensure always have valid identifier
-                    speech_id = context.current_speech_id or context.session_id
-                    
-                    # Create output data bundle and wrap as ChatData
-                    output = DataBundle(output_definition)
-                    output.set_main_data(audio_array)
-                    output.add_meta("speech_id", speech_id)
-                    output.add_meta("avatar_speech_end", False)
-                    chat_data = ChatData(type=ChatDataType.AVATAR_AUDIO, data=output)
-                    
-                    logger.debug(f"Submitting audio: shape={audio_array.shape}, speech_id={speech_id}")
-                    context.submit_data(chat_data)
-                    
-                except Exception as e:
-                    logger.opt(exception=True).error(f"Error submitting audio: {e}")
-                    # Log error but don't cache, avoiding complex recovery logic
+                # Decode and coalesce small deltas into frame aligned chunks
+                for audio_array in decoder.feed_base64(audio_b64_str):
+                    try:
+                        self._submit_avatar_audio(context, audio_array)
+                    except Exception as e:
+                        logger.opt(exception=True).error(f"Error submitting audio: {e}")
+                        # Log error but don't cache, avoiding complex recovery logic
                 
             except queue.Empty:
                 continue
@@ -794,14 +824,18 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
                 ChatDataType.AVATAR_TEXT: text_def,
             }
 
+        context = cast(QwenOmniContext, context)
         inputs = {
             ChatDataType.HUMAN_AUDIO: HandlerDataInfo(
                 type=ChatDataType.HUMAN_AUDIO,
             ),
-            ChatDataType.CAMERA_VIDEO: HandlerDataInfo(
-                type=ChatDataType.CAMERA_VIDEO,
-            ),
         }
+        if context.config.enable_video_input:
+            inputs[ChatDataType.CAMERA_VIDEO] = HandlerDataInfo(
+                type=ChatDataType.CAMERA_VIDEO,
+                max_frame_size=context.config.video_input_max_size,
+                max_frame_rate=context.video_sampler.input_frame_rate(),
+            )
 
         outputs = {
             ChatDataType.HUMAN_TEXT: HandlerDataInfo(
@@ -854,25 +888,18 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
             
         # Convert audio format and send
         if audio_data is not None:
-            # Ensure audio is in correct format (16kHz, mono, int16)
-            if audio_data.dtype != np.int16:
-                # If float32 format, convert to int16
-                if audio_data.dtype == np.float32:
-                    audio_data = np.clip(audio_data, -1.0, 1.0)
-                    audio_data = (audio_data * 32767).astype(np.int16)
-                else:
-                    audio_data = audio_data.astype(np.int16)
+            # Ensure audio is in correct format (16kHz, mono, int16), converted in reused buffers
+            int16_audio = context.audio_encoder.to_int16(audio_data)
             
             # Debug: Save audio data for debugging if enabled
             if context.enable_debug_audio:
-                context.debug_audio_buffer.append(audio_data.copy())
+                context.debug_audio_buffer.append(int16_audio.copy())
             
-            # Convert to bytes and encode as base64
-            audio_bytes = audio_data.tobytes()
-            audio_b64 = base64.b64encode(audio_bytes).decode('ascii')
+            audio_b64 = context.audio_encoder.encode_base64(int16_audio)
             
 
             context.conversation.append_audio(audio_b64)
+            context.has_user_input = True
             # Mark that this turn has started audio
             if not context.current_turn_audio_started:
                 context.current_turn_audio_started = True
@@ -883,6 +910,9 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
         if speech_end:
             # Set current turn identifier
             context.current_speech_id = speech_id
+            if context.config.enable_video_input:
+                logger.info(f"Video sampling stats for speech_id {speech_id}: {context.video_sampler.get_stats()}")
+                context.video_sampler.new_turn()
             
             # Debug: Save complete audio file when speech ends if enabled
             if context.enable_debug_audio:
@@ -991,7 +1021,7 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
     def _handle_video_input(self, context: QwenOmniContext, inputs: ChatData):
         """
         Process video input and send directly if conditions are met.
-        Ensures audio-first constraint and FPS throttling.
+        Ensures audio-first constraint and adaptive frame sampling.
         """
         # Check if video input is enabled
         if not context.config.enable_video_input:
@@ -1006,11 +1036,8 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
             logger.debug("Skipping video: audio not started yet (audio-first constraint)")
             return
         
-        # Throttle video sending based on FPS interval
-        current_time_ms = time.time() * 1000.0
-        time_since_last_sent = current_time_ms - context._last_video_sent_ms
-        if time_since_last_sent < context.config.video_frame_interval_ms:
-            logger.debug(f"Skipping video: throttling (last sent {time_since_last_sent:.0f}ms ago)")
+        # Send more frames on motion and fewer on a static scene, within the per turn budget
+        if not context.video_sampler.offer(video_frame, time.monotonic() * 1000.0):
             return
         
         # Process and send the video frame directly
@@ -1018,7 +1045,7 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
         if processed_b64:
             try:
                 context.conversation.append_video(processed_b64)
-                context._last_video_sent_ms = current_time_ms
+                context.has_user_input = True
                 logger.debug(f"📹 Sent video frame directly from handle_video_input")
                 
             except Exception as e:
@@ -1028,6 +1055,31 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
 
 
 
+    @staticmethod
+    def _drop_pending_deltas(data_queue: queue.Queue, end_key: str):
+        # keep completion markers, the turn still has to end downstream
+        with data_queue.mutex:
+            end_items = [item for item in data_queue.queue if item.get(end_key, False)]
+            data_queue.queue.clear()
+            data_queue.queue.extend(end_items)
+
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        """
+        Cancel the running response on user interrupt, received audio and text not yet submitted are dropped.
+        """
+        if signal.type != ChatSignalType.INTERRUPT:
+            return
+        context = cast(QwenOmniContext, context)
+        if context.is_processing and context.conversation is not None:
+            context.response_cancelled = True
+            try:
+                context.conversation.cancel_response()
+                logger.info(f"Cancelled response of speech_id {context.current_speech_id}")
+            except Exception as e:
+                logger.opt(exception=True).warning(f"Failed to cancel response: {e}")
+        self._drop_pending_deltas(context.recv_audio_queue, 'avatar_speech_end')
+        self._drop_pending_deltas(context.recv_text_queue, 'avatar_text_end')
+
     def destroy_context(self, context: HandlerContext):
         """
         Destroy context and clean up resources.
@@ -1048,10 +1100,21 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
             if hasattr(context, 'connection_ready_event'):
                 context.connection_ready_event.set()
 
-            # Close connection
-            if context.conversation and context.is_connected:
+            self.heartbeat_scheduler.unregister(context.session_id)
+
+            # Return or recycle the pooled conversation, close one created by reconnection
+            pooled = context.pooled_conversation
+            if pooled is not None and self.connection_pool is not None:
+                if context.conversation is pooled.conversation:
+                    self.connection_pool.release(pooled, reusable=not context.has_user_input)
+                else:
+                    self.connection_pool.release(pooled, reusable=False)
+                    if context.conversation and context.is_connected:
+                        context.conversation.close()
+                context.pooled_conversation = None
+            elif context.conversation and context.is_connected:
                 context.conversation.close()
-                context.is_connected = False
+            context.is_connected = False
                 
             # Clear audio processing queue
             while not context.recv_audio_queue.empty():
@@ -1067,13 +1130,6 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
                 except queue.Empty:
                     break
             
-            # Wait for heartbeat thread to finish
-            try:
-                if context.heartbeat_thread and context.heartbeat_thread.is_alive():
-                    context.heartbeat_thread.join(timeout=2)
-            except Exception as e:
-                logger.opt(exception=True).debug(f"Error while joining heartbeat thread: {e}")
-            
             # Wait for audio processing thread to finish
             try:
                 if context.audio_processing_thread and context.audio_processing_thread.is_alive():
@@ -1105,3 +1161,9 @@ class HandlerSeq2SeqQwenOmni(HandlerBase, ABC):
             
         except Exception as e:
             logger.opt(exception=True).error(f"Error destroying context: {e}")
+
+    def destroy(self):
+        if self.connection_pool is not None:
+            self.connection_pool.stop()
+            self.connection_pool = None
+        self.heartbeat_scheduler.stop()
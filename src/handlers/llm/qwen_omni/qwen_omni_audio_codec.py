@@ -0,0 +1,129 @@
+import base64
+import binascii
+from typing import List, Optional
+
+import numpy as np
+from loguru import logger
+
+
+class Pcm16Encoder:
+    """
+    Convert engine audio (float32 in [-1, 1] or int16) to base64 PCM16 for the realtime connection.
+    Conversion happens in place inside reused scratch buffers, the int16 view is valid until next call.
+    """
+
+    def __init__(self, initial_capacity: int = 16000):
+        self._float_buffer = np.empty(initial_capacity, dtype=np.float32)
+        self._int16_buffer = np.empty(initial_capacity, dtype=np.int16)
+
+    def _ensure_capacity(self, sample_num: int):
+        if sample_num <= self._int16_buffer.shape[0]:
+            return
+        capacity = max(sample_num, self._int16_buffer.shape[0] * 2)
+        self._float_buffer = np.empty(capacity, dtype=np.float32)
+        self._int16_buffer = np.empty(capacity, dtype=np.int16)
+
+    def to_int16(self, audio: np.ndarray) -> np.ndarray:
+        audio = audio.reshape(-1)
+        if audio.dtype == np.int16:
+            return audio
+        sample_num = audio.shape[0]
+        self._ensure_capacity(sample_num)
+        int16_view = self._int16_buffer[:sample_num]
+        if audio.dtype == np.float32:
+            float_view = self._float_buffer[:sample_num]
+            np.minimum(audio, 1.0, out=float_view)
+            np.maximum(float_view, -1.0, out=float_view)
+            np.multiply(float_view, 32767, out=float_view)
+            int16_view[...] = float_view
+        else:
+            int16_view[...] = audio
+        return int16_view
+
+    def encode_base64(self, audio: np.ndarray) -> str:
+        int16_audio = self.to_int16(audio)
+        if not int16_audio.flags.c_contiguous:
+            int16_audio = np.ascontiguousarray(int16_audio)
+        # base64 reads the buffer directly, no intermediate bytes object
+        return base64.b64encode(int16_audio.data).decode("ascii")
+
+
+class Pcm16DeltaDecoder:
+    """
+    Decode base64 PCM16 deltas and coalesce them into frame aligned float32 chunks.
+
+    Deltas are staged as int16 in a preallocated buffer, every returned chunk holds a whole number of
+    frames and at least chunk_samples samples, so small deltas do not become tiny downstream bundles.
+    """
+
+    _INT16_SCALE = np.float32(1.0 / 32767.0)
+
+    def __init__(self, sample_rate: int = 24000, frame_size: int = 480, chunk_samples: int = 960,
+                 initial_capacity: int = 24000):
+        self.sample_rate = sample_rate
+        self.frame_size = max(1, frame_size)
+        self.chunk_samples = max(self.frame_size, chunk_samples // self.frame_size * self.frame_size)
+        self._staging = np.empty(max(initial_capacity, self.chunk_samples * 2), dtype=np.int16)
+        self._staged_num = 0
+
+    @property
+    def staged_samples(self) -> int:
+        return self._staged_num
+
+    def reset(self):
+        self._staged_num = 0
+
+    def _stage(self, samples: np.ndarray):
+        required = self._staged_num + samples.shape[0]
+        if required > self._staging.shape[0]:
+            new_staging = np.empty(max(required, self._staging.shape[0] * 2), dtype=np.int16)
+            new_staging[:self._staged_num] = self._staging[:self._staged_num]
+            self._staging = new_staging
+        self._staging[self._staged_num:required] = samples
+        self._staged_num = required
+
+    def _emit(self, sample_num: int) -> np.ndarray:
+        output = np.empty((1, sample_num), dtype=np.float32)
+        np.multiply(self._staging[:sample_num], self._INT16_SCALE, out=output[0], dtype=np.float32)
+        remain = self._staged_num - sample_num
+        if remain > 0:
+            self._staging[:remain] = self._staging[sample_num:self._staged_num]
+        self._staged_num = remain
+        return output
+
+    def feed(self, pcm_bytes: bytes) -> List[np.ndarray]:
+        if len(pcm_bytes) % 2 != 0:
+            logger.error(f"Audio data length is not aligned to int16: {len(pcm_bytes)} bytes (should be even)")
+            return []
+        self._stage(np.frombuffer(pcm_bytes, dtype=np.int16))
+        outputs = []
+        if self._staged_num >= self.chunk_samples:
+            aligned_num = self._staged_num // self.frame_size * self.frame_size
+            outputs.append(self._emit(aligned_num))
+        return outputs
+
+    def feed_base64(self, audio_b64: str) -> List[np.ndarray]:
+        try:
+            pcm_bytes = binascii.a2b_base64(audio_b64)
+        except binascii.Error as e:
+            logger.error(f"Failed to decode audio delta: {e}")
+            return []
+        if len(pcm_bytes) == 0:
+            logger.error("Received empty audio data")
+            return []
+        return self.feed(pcm_bytes)
+
+    def flush(self) -> Optional[np.ndarray]:
+        if self._staged_num == 0:
+            return None
+        return self._emit(self._staged_num)
+
+
+def describe_audio_chunk(audio: np.ndarray, sample_rate: int) -> str:
+    """
+    Statistics string for debug logs, only meant to be evaluated lazily.
+    """
+    sample_num = audio.shape[-1]
+    return (f"{sample_num} samples, {sample_num / sample_rate * 1000:.1f}ms | "
+            f"Audio array: shape={audio.shape}, min={audio.min():.4f}, max={audio.max():.4f}, "
+            f"mean={audio.mean():.4f}")
@@ -0,0 +1,256 @@
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from dashscope.audio.qwen_omni import OmniRealtimeCallback, OmniRealtimeConversation
+from loguru import logger
+
+
+class HeartbeatScheduler:
+    """
+    One thread running the periodic heartbeat of every registered target,
+    replacing a sleeping thread per session.
+    """
+
+    def __init__(self, name: str = "QwenOmni-Heartbeat"):
+        self.name = name
+        # key -> (next due time, interval, heartbeat function)
+        self._targets: Dict[Hashable, Tuple[float, float, Callable[[], None]]] = {}
+        self._lock = threading.Lock()
+        self._wakeup_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def register(self, key: Hashable, heartbeat: Callable[[], None], interval_sec: float):
+        with self._lock:
+            self._targets[key] = (time.monotonic() + interval_sec, interval_sec, heartbeat)
+        self._wakeup_event.set()
+
+    def unregister(self, key: Hashable):
+        with self._lock:
+            self._targets.pop(key, None)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            due_heartbeats: List[Tuple[Hashable, Callable[[], None]]] = []
+            with self._lock:
+                next_due = now + 60.0
+                for key, (due_time, interval, heartbeat) in self._targets.items():
+                    if due_time <= now:
+                        due_time = now + interval
+                        self._targets[key] = (due_time, interval, heartbeat)
+                        due_heartbeats.append((key, heartbeat))
+                    next_due = min(next_due, due_time)
+            for key, heartbeat in due_heartbeats:
+                try:
+                    heartbeat()
+                except Exception as e:
+                    logger.opt(exception=True).warning(f"Heartbeat of {key} failed: {e}")
+            self._wakeup_event.wait(timeout=max(0.01, next_due - time.monotonic()))
+            self._wakeup_event.clear()
+
+
+class PooledConversation(OmniRealtimeCallback):
+    """
+    Realtime conversation owned by the pool. It is its own callback and forwards events
+    to the session callback bound at checkout, events of an idle conversation are dropped.
+    """
+
+    def __init__(self, pool: "QwenOmniConnectionPool"):
+        super().__init__()
+        self.pool = pool
+        self.is_connected = False
+        self.connection_ready_event = threading.Event()
+        self.created_time = time.monotonic()
+        self._target: Optional[OmniRealtimeCallback] = None
+        self.conversation = pool.conversation_factory(self)
+
+    def bind(self, callback: Optional[OmniRealtimeCallback]):
+        self._target = callback
+
+    def on_open(self) -> None:
+        self.is_connected = True
+        self.connection_ready_event.set()
+        if self._target is not None:
+            self._target.on_open()
+
+    def on_close(self, close_status_code, close_msg) -> None:
+        self.is_connected = False
+        self.connection_ready_event.set()
+        if self._target is not None:
+            self._target.on_close(close_status_code, close_msg)
+        else:
+            self.pool.discard(self)
+
+    def on_event(self, message) -> None:
+        if self._target is not None:
+            self._target.on_event(message)
+
+    def close(self):
+        self._target = None
+        self.is_connected = False
+        try:
+            self.conversation.close()
+        except Exception as e:
+            logger.opt(exception=True).debug(f"Error closing pooled conversation: {e}")
+
+
+class QwenOmniConnectionPool:
+    """
+    Keeps pool_size realtime conversations connected and configured ahead of time, so a new session
+    skips the connect and session.update round trips. Idle conversations are kept alive and checked
+    by the shared heartbeat scheduler, conversations that carried a user turn are recycled instead of
+    being reused, since they keep the previous dialog on the server side.
+    """
+
+    HEARTBEAT_KEY = "qwen_omni_connection_pool"
+
+    def __init__(self, conversation_factory: Callable[[OmniRealtimeCallback], OmniRealtimeConversation],
+                 session_update_params: Dict, pool_size: int, heartbeat_scheduler: HeartbeatScheduler,
+                 heartbeat_interval_sec: float = 25, connect_timeout_sec: float = 15):
+        self.conversation_factory = conversation_factory
+        self.session_update_params = session_update_params
+        self.pool_size = max(0, pool_size)
+        self.heartbeat_scheduler = heartbeat_scheduler
+        self.heartbeat_interval_sec = heartbeat_interval_sec
+        self.connect_timeout_sec = connect_timeout_sec
+
+        self._idle: List[PooledConversation] = []
+        self._lock = threading.Lock()
+        self._refill_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._refill_thread: Optional[threading.Thread] = None
+
+    @property
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+    def start(self):
+        if self.pool_size <= 0:
+            return
+        self._stop_event.clear()
+        self._refill_thread = threading.Thread(target=self._refill_loop, name="QwenOmni-PoolRefill", daemon=True)
+        self._refill_thread.start()
+        self.heartbeat_scheduler.register(self.HEARTBEAT_KEY, self._heartbeat_idle, self.heartbeat_interval_sec)
+        self._refill_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._refill_event.set()
+        self.heartbeat_scheduler.unregister(self.HEARTBEAT_KEY)
+        if self._refill_thread is not None:
+            self._refill_thread.join(timeout=2)
+            self._refill_thread = None
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            pooled.close()
+
+    def connect_new(self) -> Optional[PooledConversation]:
+        pooled = PooledConversation(self)
+        try:
+            pooled.conversation.connect()
+            if not pooled.connection_ready_event.wait(timeout=self.connect_timeout_sec) or not pooled.is_connected:
+                raise TimeoutError("Timeout waiting for Qwen-Omni connection")
+            pooled.conversation.update_session(**self.session_update_params)
+            return pooled
+        except Exception as e:
+            logger.opt(exception=True).warning(f"Failed to connect Qwen-Omni conversation: {e}")
+            pooled.close()
+            return None
+
+    def acquire(self, callback: OmniRealtimeCallback) -> Optional[PooledConversation]:
+        """
+        Check out a connected and configured conversation bound to callback, connect one in place if
+        the pool is empty. Returns None if no connection can be established.
+        """
+        pooled = None
+        with self._lock:
+            while len(self._idle) > 0:
+                candidate = self._idle.pop(0)
+                if candidate.is_connected:
+                    pooled = candidate
+                    break
+                candidate.close()
+        self._refill_event.set()
+        if pooled is None:
+            logger.info("No pre-warmed Qwen-Omni conversation available, connecting on demand")
+            pooled = self.connect_new()
+            if pooled is None:
+                return None
+        else:
+            logger.info(f"Checked out pre-warmed Qwen-Omni conversation, "
+                        f"age {time.monotonic() - pooled.created_time:.1f}s")
+        pooled.bind(callback)
+        return pooled
+
+    def release(self, pooled: PooledConversation, reusable: bool):
+        """
+        Return a conversation at session end, it is kept only when it never carried a user turn.
+        """
+        pooled.bind(None)
+        if reusable and pooled.is_connected and not self._stop_event.is_set():
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(pooled)
+                    return
+        pooled.close()
+        self._refill_event.set()
+
+    def discard(self, pooled: PooledConversation):
+        with self._lock:
+            if pooled in self._idle:
+                self._idle.remove(pooled)
+        logger.info("Idle Qwen-Omni conversation closed, removed from pool")
+        self._refill_event.set()
+
+    def _heartbeat_idle(self):
+        with self._lock:
+            idle = list(self._idle)
+        for pooled in idle:
+            if not pooled.is_connected:
+                self.discard(pooled)
+                pooled.close()
+                continue
+            try:
+                pooled.conversation.update_session(**self.session_update_params)
+            except Exception as e:
+                logger.opt(exception=True).warning(f"Idle conversation heartbeat failed: {e}")
+                self.discard(pooled)
+                pooled.close()
+
+    def _refill_loop(self):
+        while not self._stop_event.is_set():
+            self._refill_event.wait(timeout=self.heartbeat_interval_sec)
+            self._refill_event.clear()
+            while not self._stop_event.is_set() and self.idle_count < self.pool_size:
+                pooled = self.connect_new()
+                if pooled is None:
+                    # back off before retrying a failing service
+                    self._stop_event.wait(timeout=5)
+                    break
+                with self._lock:
+                    if len(self._idle) < self.pool_size and not self._stop_event.is_set():
+                        self._idle.append(pooled)
+                        pooled = None
+                if pooled is not None:
+                    pooled.close()
+                else:
+                    logger.info(f"Pre-warmed Qwen-Omni conversation ready, idle {self.idle_count}/{self.pool_size}")
@@ -1,6 +1,7 @@
 import io
 import os
 import re
+import threading
 import time
 from typing import Dict, Optional, cast
 import librosa
@@ -13,6 +14,8 @@ from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigMode
 from chat_engine.common.handler_base import HandlerBase, HandlerBaseInfo, HandlerDataInfo, HandlerDetail
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
 from engine_utils.directory_info import DirectoryInfo
@@ -38,6 +41,9 @@ class TTSContext(HandlerContext):
         self.dump_audio = False
         self.audio_dump_file = None
         self.synthesizer = None
+        self.synthesizer_callback = None
+        self.current_speech_id = None
+        self.interrupted_speech_id = None
 
 
 class HandlerTTS(HandlerBase, ABC):
@@ -119,6 +125,9 @@ class HandlerTTS(HandlerBase, ABC):
         speech_id = inputs.data.get_meta("speech_id")
         if (speech_id is None):
             speech_id = context.session_id
+        if speech_id == context.interrupted_speech_id:
+            return
+        context.current_speech_id = speech_id
 
         if text is not None:
             text = re.sub(r"<\|.*?\|>", "", text)
@@ -129,6 +138,7 @@ class HandlerTTS(HandlerBase, ABC):
                 if context.synthesizer is None:
                     callback = CosyvoiceCallBack(
                         context=context, output_definition=output_definition, speech_id=speech_id)
+                    context.synthesizer_callback = callback
                     context.synthesizer = SpeechSynthesizer(
                         model=self.model_name, voice=self.voice, callback=callback, format=AudioFormat.PCM_24000HZ_MONO_16BIT)
                 logger.info(f'streaming_call {text}')
@@ -144,6 +154,27 @@ class HandlerTTS(HandlerBase, ABC):
             context.synthesizer.streaming_complete()
             context.synthesizer = None
 
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        if signal.type != ChatSignalType.INTERRUPT:
+            return
+        context = cast(TTSContext, context)
+        context.interrupted_speech_id = context.current_speech_id
+        synthesizer, context.synthesizer = context.synthesizer, None
+        if context.synthesizer_callback is not None:
+            context.synthesizer_callback.cancelled = True
+            context.synthesizer_callback = None
+        context.input_text = ''
+        if synthesizer is not None:
+            # cancel waits for the server to finish the task, keep it off the signal thread
+            threading.Thread(target=self._cancel_synthesizer, args=[synthesizer], daemon=True).start()
+
+    @staticmethod
+    def _cancel_synthesizer(synthesizer: SpeechSynthesizer):
+        try:
+            synthesizer.streaming_cancel()
+        except Exception as e:
+            logger.warning(f'cancel bailian tts failed: {e}')
+
     def destroy_context(self, context: HandlerContext):
         context = cast(TTSContext, context)
         logger.info('destroy context')
@@ -156,6 +187,8 @@ class CosyvoiceCallBack(ResultCallback):
         self.output_definition = output_definition
         self.speech_id = speech_id
         self.temp_bytes = b''
+        # set on user interrupt, audio still arriving is dropped
+        self.cancelled = False
 
     def on_open(self) -> None:
         logger.info('连接成功')
@@ -166,6 +199,8 @@ class CosyvoiceCallBack(ResultCallback):
         pass
 
     def on_data(self, data: bytes) -> None:
+        if self.cancelled:
+            return
         self.temp_bytes += data
         if len(self.temp_bytes) > 24000:
             # 实现接收合成二进制音频结果的逻辑
@@ -180,6 +215,9 @@ class CosyvoiceCallBack(ResultCallback):
             self.temp_bytes = b''
 
     def on_complete(self) -> None:
+        if self.cancelled:
+            logger.info('合成已取消')
+            return
         if len(self.temp_bytes) > 0:
             output_audio = np.array(np.frombuffer(self.temp_bytes, dtype=np.int16)).astype(np.float32)/32767
             output_audio = output_audio[np.newaxis, ...]
@@ -6,12 +6,12 @@ import torch.multiprocessing as mp
 import os
 import sys
 
-import librosa
 from loguru import logger
 import numpy as np
 import requests
 
 from engine_utils.directory_info import DirectoryInfo
+from engine_utils.streaming_resampler import StreamingResampler
 
 
 # @dataclass
@@ -26,7 +26,8 @@ from engine_utils.directory_info import DirectoryInfo
 spawn_context = mp.get_context('spawn')   
 
 class TTSCosyVoiceProcessor(spawn_context.Process):
-    def __init__(self, handler_root: str, config: any, input_queue: Queue, output_queue: Queue):
+    def __init__(self, handler_root: str, config: any, input_queue: Queue, output_queue: Queue,
+                 cancelled_tasks=None):
         super().__init__()
         self.handler_root = handler_root
         self.model = None
@@ -41,8 +42,12 @@ class TTSCosyVoiceProcessor(spawn_context.Process):
 
         self.input_queue = input_queue
         self.output_queue = output_queue
+        self.cancelled_tasks = cancelled_tasks
         self.dump_audio = False
 
+    def is_cancelled(self, key) -> bool:
+        return self.cancelled_tasks is not None and key in self.cancelled_tasks
+
     def run(self):
         logger.remove()
         logger.add(sys.stdout, level='INFO')
@@ -102,6 +107,8 @@ class TTSCosyVoiceProcessor(spawn_context.Process):
             if (len(input_text) < 1):
                 # ignore
                 logger.info('ignore empty input_text')
+            elif self.is_cancelled(key):
+                logger.info(f'skip cancelled tts task {key}')
             elif self.model is None and self.api_url is not None:
                 # if you start cosyvoice tts server through CosyVoice/runtime/python/fastapi/server.py
                 response = requests.get(self.api_url, data={
@@ -112,12 +119,17 @@ class TTSCosyVoiceProcessor(spawn_context.Process):
                     logger.info(f"Request failed with status code {response.status_code}")
                     continue
                 tts_audio = b''
+                # response chunks are resampled as one stream, so chunk boundaries leave no artifacts
+                resampler = StreamingResampler(22050, self.sample_rate)
                 for r in response.iter_content(chunk_size=16000):
+                    if self.is_cancelled(key):
+                        response.close()
+                        break
                     tts_audio = r
                     tts_speech = np.array(np.frombuffer(tts_audio, dtype=np.int16)).astype(np.float32)/32767
                     logger.debug(f'audio response {tts_speech.shape}')
 
-                    output_audio = librosa.resample(tts_speech, orig_sr=22050, target_sr=self.sample_rate)
+                    output_audio = resampler.process(tts_speech)
                     logger.debug(f'audio response resample {output_audio.shape}')
                     out_audio = output_audio[np.newaxis, ...]
                     output = {
@@ -149,6 +161,8 @@ class TTSCosyVoiceProcessor(spawn_context.Process):
                         return
 
                 for tts_speech in response:
+                    if self.is_cancelled(key):
+                        break
                     tts_audio = tts_speech['tts_speech'].numpy()
                     logger.debug(f'tts sample rate {self.model.sample_rate}')
                     tts_audio = tts_audio  # librosa.resample(tts_audio, orig_sr=self.model.sample_rate, target_sr=24000)
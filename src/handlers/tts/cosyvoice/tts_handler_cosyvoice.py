@@ -18,6 +18,8 @@ from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigMode
 from chat_engine.common.handler_base import HandlerBase, HandlerBaseInfo, HandlerDataInfo, HandlerDetail
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
 from handlers.tts.cosyvoice.cosyvoice_processor import TTSCosyVoiceProcessor
@@ -42,6 +44,7 @@ class HandlerTask:
     result_queue: queue.Queue = field(default_factory=queue.Queue)
     speech_id: str = field(default=None)
     speech_end: bool = field(default=False)
+    cancelled: bool = field(default=False)
 
 
 class TTSContext(HandlerContext):
@@ -55,6 +58,8 @@ class TTSContext(HandlerContext):
 
         self.task_queue: deque[HandlerTask]
         self.task_consumer_thread = None
+        self.current_speech_id = None
+        self.interrupted_speech_id = None
 
 
 class HandlerTTS(HandlerBase, ABC):
@@ -73,6 +78,8 @@ class HandlerTTS(HandlerBase, ABC):
         self.mp = Manager()
         self.tts_input_queue = self.mp.Queue()
         self.tts_output_queue = self.mp.Queue()
+        # ids of interrupted tasks, shared with the processes so they stop synthesizing
+        self.cancelled_tasks = self.mp.dict()
         self.multi_process = []
         self.consume_thread = None
         self.task_queue_map = {}
@@ -115,12 +122,13 @@ class HandlerTTS(HandlerBase, ABC):
             self.sample_rate = handler_config.sample_rate      
             for i in range(handler_config.process_num):
                 process = TTSCosyVoiceProcessor(self.handler_root, handler_config,
-                                                self.tts_input_queue, self.tts_output_queue)
+                                                self.tts_input_queue, self.tts_output_queue,
+                                                self.cancelled_tasks)
                 process.start()
                 self.multi_process.append(process)
             self.tts_output_queue.get()
 
-        def consumer(task_queue_map: dict[str, deque], tts_output_queue: Queue):
+        def consumer(task_queue_map: dict[str, deque], tts_output_queue: Queue, cancelled_tasks):
             while True:
                 logger.debug(f"tts output {len(task_queue_map.keys()), tts_output_queue.qsize()}")
                 output = None
@@ -133,6 +141,8 @@ class HandlerTTS(HandlerBase, ABC):
                 key = output['key']
                 audio = output['tts_speech']
                 session_id = output['session_id']
+                if audio is None:
+                    cancelled_tasks.pop(key, None)
                 taskDeque = task_queue_map.get(session_id)
                 if taskDeque is None:
                     continue
@@ -140,7 +150,8 @@ class HandlerTTS(HandlerBase, ABC):
                     if task is not None and task.id == key:
                         task.result_queue.put(audio)
                         break
-        self.consume_thread = threading.Thread(target=consumer, args=[self.task_queue_map, self.tts_output_queue])
+        self.consume_thread = threading.Thread(target=consumer, args=[self.task_queue_map, self.tts_output_queue,
+                                                                  self.cancelled_tasks])
         self.consume_thread.start()
         
     @staticmethod
@@ -175,9 +186,14 @@ class HandlerTTS(HandlerBase, ABC):
                 task = cast(HandlerTask, task)
                 if task is None:
                     break
+                if task.cancelled:
+                    task_inner_queue.popleft()
+                    continue
                 logger.debug(f'get task audio {len(task_inner_queue), task.result_queue.qsize()}')
                 try:
                     audio = task.result_queue.get(timeout=1)
+                    if task.cancelled:
+                        continue
                     if audio is not None:
                         output = DataBundle(output_definition)
                         output.set_main_data(audio)
@@ -212,6 +228,9 @@ class HandlerTTS(HandlerBase, ABC):
         speech_id = inputs.data.get_meta("speech_id")
         if (speech_id is None):
             speech_id = context.session_id
+        if speech_id == context.interrupted_speech_id:
+            return
+        context.current_speech_id = speech_id
 
         if text is not None:
             text = re.sub(r"<\|.*?\|>", "", text)
@@ -256,6 +275,18 @@ class HandlerTTS(HandlerBase, ABC):
             logger.info(f"speech end {end_task}")
             context.task_queue.append(end_task)
 
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        if signal.type != ChatSignalType.INTERRUPT:
+            return
+        context = cast(TTSContext, context)
+        context.interrupted_speech_id = context.current_speech_id
+        context.input_text = ''
+        for task in list(context.task_queue):
+            if task is not None and not task.cancelled:
+                task.cancelled = True
+                self.cancelled_tasks[task.id] = True
+        logger.info(f'tts tasks of speech {context.interrupted_speech_id} cancelled')
+
     def destroy_context(self, context: HandlerContext):
         context = cast(TTSContext, context)
         logger.info('destroy context')
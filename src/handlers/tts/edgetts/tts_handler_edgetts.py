@@ -14,6 +14,8 @@ from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigMode
 from chat_engine.common.handler_base import HandlerBase, HandlerBaseInfo, HandlerDataInfo, HandlerDetail
 from chat_engine.data_models.chat_data.chat_data_model import ChatData
 from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
 from engine_utils.directory_info import DirectoryInfo
@@ -33,6 +35,8 @@ class TTSContext(HandlerContext):
         self.input_text = ''
         self.dump_audio = False
         self.audio_dump_file = None
+        self.current_speech_id = None
+        self.interrupted_speech_id = None
 
 
 class HandlerTTS(HandlerBase, ABC):
@@ -109,6 +113,9 @@ class HandlerTTS(HandlerBase, ABC):
         speech_id = inputs.data.get_meta("speech_id")
         if (speech_id is None):
             speech_id = context.session_id
+        if speech_id == context.interrupted_speech_id:
+            return
+        context.current_speech_id = speech_id
 
         if text is not None:
             text = re.sub(r"<\|.*?\|>", "", text)
@@ -123,6 +130,8 @@ class HandlerTTS(HandlerBase, ABC):
 
                 # 对完整句子进行处理
                 for sentence in complete_sentences:
+                    if speech_id == context.interrupted_speech_id:
+                        break
                     if len(sentence.strip()) < 1:
                         continue
                     logger.info('current sentence' + sentence)
@@ -134,6 +143,8 @@ class HandlerTTS(HandlerBase, ABC):
                         if chunk['type'] == 'audio':
                             # tts_audio = chunk['data']
                             data += chunk['data']
+                    if speech_id == context.interrupted_speech_id:
+                        break
                     
                     output_audio = librosa.load(io.BytesIO(data), sr=None)[0]
                     output_audio = output_audio[np.newaxis, ...]
@@ -167,6 +178,13 @@ class HandlerTTS(HandlerBase, ABC):
             context.submit_data(output)
             logger.info(f"speech end")
 
+    def on_signal(self, context: HandlerContext, signal: ChatSignal):
+        if signal.type != ChatSignalType.INTERRUPT:
+            return
+        context = cast(TTSContext, context)
+        context.interrupted_speech_id = context.current_speech_id
+        context.input_text = ''
+
     def destroy_context(self, context: HandlerContext):
         context = cast(TTSContext, context)
         logger.info('destroy context')
@@ -0,0 +1,185 @@
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+
+@dataclass
+class JitterBufferStats:
+    frames: int = 0
+    underruns: int = 0
+    overruns: int = 0
+
+
+class AudioJitterBuffer:
+    """
+    Re-chunk output audio of arbitrary chunk sizes into frames of exactly frame_size samples.
+
+    Samples are kept in one preallocated ring buffer. Once playout started, a missing frame is filled with
+    silence for up to max_gap_frames frames, so the client timeline keeps running through short upstream
+    stalls, after that the buffer goes idle until new audio arrives. Writing beyond capacity drops the
+    oldest samples.
+    """
+
+    def __init__(self, frame_size: int, capacity_samples: int, max_gap_frames: int = 25):
+        self.frame_size = frame_size
+        self.capacity = max(capacity_samples, frame_size * 2)
+        self.max_gap_frames = max_gap_frames
+        self.stats = JitterBufferStats()
+        self.playing = False
+
+        self._ring: Optional[np.ndarray] = None
+        self._read_pos = 0
+        self._size = 0
+        self._gap_frames = 0
+
+    @property
+    def available(self) -> int:
+        return self._size
+
+    def has_frame(self) -> bool:
+        return self._size >= self.frame_size
+
+    def write(self, audio: np.ndarray):
+        audio = audio.reshape(-1)
+        if self._ring is None:
+            self._ring = np.zeros(self.capacity, dtype=audio.dtype)
+        elif audio.dtype != self._ring.dtype:
+            audio = audio.astype(self._ring.dtype)
+        if len(audio) > self.capacity:
+            audio = audio[-self.capacity:]
+        overflow = self._size + len(audio) - self.capacity
+        if overflow > 0:
+            self._read_pos = (self._read_pos + overflow) % self.capacity
+            self._size -= overflow
+            self.stats.overruns += 1
+            logger.warning(f"Audio jitter buffer overrun, dropped {overflow} samples")
+        write_pos = (self._read_pos + self._size) % self.capacity
+        first = min(len(audio), self.capacity - write_pos)
+        self._ring[write_pos:write_pos + first] = audio[:first]
+        self._ring[:len(audio) - first] = audio[first:]
+        self._size += len(audio)
+
+    def _consume(self, out: np.ndarray, num: int):
+        first = min(num, self.capacity - self._read_pos)
+        out[:first] = self._ring[self._read_pos:self._read_pos + first]
+        out[first:num] = self._ring[:num - first]
+        self._read_pos = (self._read_pos + num) % self.capacity
+        self._size -= num
+
+    def read_frame(self, pad: bool = False) -> Optional[np.ndarray]:
+        """
+        Next frame shaped [1, frame_size]. Without pad only a complete frame is returned, with pad an
+        incomplete frame is filled with silence, None means the buffer is idle.
+        """
+        if self._ring is None:
+            return None
+        if self._size >= self.frame_size:
+            frame = np.empty((1, self.frame_size), dtype=self._ring.dtype)
+            self._consume(frame[0], self.frame_size)
+            self.playing = True
+            self._gap_frames = 0
+            self.stats.frames += 1
+            return frame
+        if not pad:
+            return None
+        if self._size == 0 and (not self.playing or self._gap_frames >= self.max_gap_frames):
+            self.playing = False
+            self._gap_frames = 0
+            return None
+        frame = np.zeros((1, self.frame_size), dtype=self._ring.dtype)
+        if self.playing:
+            self.stats.underruns += 1
+        if self._size == 0:
+            self._gap_frames += 1
+        else:
+            self._consume(frame[0], self._size)
+        self.playing = True
+        self.stats.frames += 1
+        return frame
+
+    def clear(self):
+        self._read_pos = 0
+        self._size = 0
+        self._gap_frames = 0
+        self.playing = False
+
+    def get_stats(self) -> dict:
+        return asdict(self.stats)
+
+
+class VideoFramePacer:
+    """
+    Release output video frames at a fixed fps against a monotonic clock.
+
+    A frame arriving early waits for its slot, when no frame arrived in time the last frame is repeated for
+    up to max_repeat_frames slots. If more than max_lag_frames frames are waiting, the oldest ones are
+    dropped to catch up with the live stream.
+    """
+
+    def __init__(self, fps: float, max_repeat_frames: int = 15, max_lag_frames: int = 30):
+        self.frame_interval = 1.0 / fps
+        self.max_repeat_frames = max_repeat_frames
+        self.max_lag_frames = max_lag_frames
+        self.stats = JitterBufferStats()
+
+        self._next_frame_time: Optional[float] = None
+        self._last_frame: Optional[np.ndarray] = None
+        self._repeated_frames = 0
+
+    def set_fps(self, fps: float):
+        self.frame_interval = 1.0 / fps
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """
+        Seconds until the next frame slot.
+        """
+        if self._next_frame_time is None:
+            return 0.0
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self._next_frame_time - now)
+
+    def frames_to_drop(self, queued_frames: int) -> int:
+        if queued_frames <= self.max_lag_frames:
+            return 0
+        self.stats.overruns += 1
+        return queued_frames - self.max_lag_frames
+
+    def _advance(self, now: float):
+        if self._next_frame_time is None or now - self._next_frame_time > self.frame_interval:
+            # first frame or fell behind by more than one slot, restart the clock instead of bursting
+            self._next_frame_time = now
+        self._next_frame_time += self.frame_interval
+        self.stats.frames += 1
+
+    def on_frame(self, frame: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        if now is None:
+            now = time.monotonic()
+        self._advance(now)
+        self._last_frame = frame
+        self._repeated_frames = 0
+        return frame
+
+    def repeat_frame(self, now: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        The last frame again for a slot nothing arrived in, None once max_repeat_frames is reached.
+        """
+        if self._last_frame is None or self._repeated_frames >= self.max_repeat_frames:
+            return None
+        if now is None:
+            now = time.monotonic()
+        self._advance(now)
+        self._repeated_frames += 1
+        self.stats.underruns += 1
+        return self._last_frame
+
+    def reset(self):
+        self._next_frame_time = None
+        self._last_frame = None
+        self._repeated_frames = 0
+
+    def get_stats(self) -> dict:
+        return asdict(self.stats)
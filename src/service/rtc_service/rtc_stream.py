@@ -1,8 +1,9 @@
 import asyncio
 import json
+import time
 import uuid
 import weakref
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Callable, Any
 
 import numpy as np
 # noinspection PyPackageRequirements
@@ -16,10 +17,9 @@ from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.data_models.chat_signal import ChatSignal
 from chat_engine.data_models.chat_signal_type import ChatSignalType, ChatSignalSourceType
 from engine_utils.interval_counter import IntervalCounter
-from aiortc.codecs import vpx 
-vpx.DEFAULT_BITRATE = 5000000
-vpx.MIN_BITRATE = 1000000
-vpx.MAX_BITRATE = 10000000
+from service.rtc_service.output_jitter_buffer import AudioJitterBuffer, VideoFramePacer
+from service.rtc_service.video_encoding import EncoderBitrateControl, VideoEncodingProfile, \
+    VideoEncodingController
 
 # 🔥 关键修复：解决 video/rtx MIME类型解码器缺失问题
 try:
@@ -84,7 +84,8 @@ class RtcStream(AsyncAudioVideoStreamHandler):
                  output_sample_rate=24000,
                  output_frame_size=480,
                  fps=30,
-                 stream_start_delay = 0.5,
+                 video_encoding_profiles: Optional[List[VideoEncodingProfile]] = None,
+                 video_encoding_profile: str = "auto",
                  ):
         super().__init__(
             expected_layout=expected_layout,
@@ -99,7 +100,6 @@ class RtcStream(AsyncAudioVideoStreamHandler):
         self.weak_factory: Optional[weakref.ReferenceType[RtcStream]] = None
 
         self.session_id = session_id
-        self.stream_start_delay = stream_start_delay
 
         self.chat_channel = None
         self.first_audio_emitted = False
@@ -109,6 +109,16 @@ class RtcStream(AsyncAudioVideoStreamHandler):
 
         self.emit_counter = IntervalCounter("emit counter")
 
+        # output audio is re-chunked to output_frame_size and video is paced to fps, up to 30s of audio is kept
+        self.audio_jitter_buffer = AudioJitterBuffer(output_frame_size, output_sample_rate * 30)
+        self.video_frame_pacer = VideoFramePacer(fps, max_repeat_frames=int(fps // 2), max_lag_frames=int(fps))
+        self.video_encoding_profiles = video_encoding_profiles
+        self.video_encoding_profile = video_encoding_profile
+        self.video_encoding = VideoEncodingController(video_encoding_profiles, fps, video_encoding_profile)
+        # returns the peer connection of a webrtc id, used to read the receiver bandwidth estimate
+        self.peer_connection_getter: Optional[Callable[[str], Any]] = None
+        self.bandwidth_monitor_task: Optional[asyncio.Task] = None
+
         self.start_time = None
         self.timestamp_base = self.input_sample_rate
 
@@ -130,8 +140,10 @@ class RtcStream(AsyncAudioVideoStreamHandler):
                 output_sample_rate=self.output_sample_rate,
                 output_frame_size=self.output_frame_size,
                 fps=self.fps,
-                stream_start_delay=self.stream_start_delay,
+                video_encoding_profiles=self.video_encoding_profiles,
+                video_encoding_profile=self.video_encoding_profile,
             )
+            new_stream.peer_connection_getter = self.peer_connection_getter
             new_stream.weak_factory = weakref.ref(self)
             new_session_delegate = self.client_handler_delegate.start_session(
                 session_id=session_id,
@@ -156,16 +168,34 @@ class RtcStream(AsyncAudioVideoStreamHandler):
                 self.client_session_delegate.clear_data()
                 self.first_audio_emitted = True
 
+            audio_buffer = self.audio_jitter_buffer
+            frame_duration = self.output_frame_size / self.output_sample_rate
+            underrun_deadline = None
             while not self.quit.is_set():
-                chat_data = await self.client_session_delegate.get_data(EngineChannelType.AUDIO)
+                frame = audio_buffer.read_frame()
+                timeout = 0.1
+                if frame is None and (audio_buffer.available > 0 or audio_buffer.playing):
+                    # give upstream one frame time to deliver, then fill the gap with silence
+                    now = time.monotonic()
+                    if underrun_deadline is None:
+                        underrun_deadline = now + frame_duration
+                    if now >= underrun_deadline:
+                        underrun_deadline = None
+                        frame = audio_buffer.read_frame(pad=True)
+                        if frame is None:
+                            continue
+                    else:
+                        timeout = underrun_deadline - now
+                if frame is not None:
+                    self.emit_counter.add_property("audio_emit", frame_duration)
+                    return self.output_sample_rate, frame
+                chat_data = await self.client_session_delegate.get_data(EngineChannelType.AUDIO, timeout)
                 if chat_data is None or chat_data.data is None:
                     continue
                 audio_array = chat_data.data.get_main_data()
                 if audio_array is None:
                     continue
-                sample_num = audio_array.shape[-1]
-                self.emit_counter.add_property("audio_emit", sample_num / self.output_sample_rate)
-                return self.output_sample_rate, audio_array
+                audio_buffer.write(audio_array)
         except Exception as e:
             logger.opt(exception=e).error(f"Error in emit: ")
             raise
@@ -175,24 +205,75 @@ class RtcStream(AsyncAudioVideoStreamHandler):
             if not self.first_audio_emitted:
                 await asyncio.sleep(0.1)
             self.emit_counter.add_property("video_emit")
+            if self.bandwidth_monitor_task is None and self.peer_connection_getter is not None:
+                self.bandwidth_monitor_task = asyncio.create_task(self.monitor_video_bandwidth())
+            pacer = self.video_frame_pacer
             while not self.quit.is_set():
-                video_frame_data: ChatData = await self.client_session_delegate.get_data(EngineChannelType.VIDEO)
+                pacer.set_fps(self.video_encoding.fps)
+                wait_time = pacer.wait_time()
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+                drop_count = pacer.frames_to_drop(self.client_session_delegate.get_pending_count(
+                    EngineChannelType.VIDEO))
+                if drop_count > 0:
+                    self.client_session_delegate.drop_data(EngineChannelType.VIDEO, drop_count)
+                video_frame_data: ChatData = await self.client_session_delegate.get_data(
+                    EngineChannelType.VIDEO, pacer.frame_interval)
                 if video_frame_data is None or video_frame_data.data is None:
+                    frame_data = pacer.repeat_frame()
+                    if frame_data is not None:
+                        return frame_data
                     continue
                 frame_data = video_frame_data.data.get_main_data().squeeze()
                 if frame_data is None:
                     continue
-                return frame_data
+                frame_data = self.video_encoding.process(frame_data)
+                if frame_data is None:
+                    continue
+                return pacer.on_frame(frame_data)
         except Exception as e:
             logger.opt(exception=e).error(f"Error in video_emit: ")
             raise
 
+    async def monitor_video_bandwidth(self, interval: float = 1.0):
+        bitrate_controls: Dict[int, EncoderBitrateControl] = {}
+        while not self.quit.is_set():
+            await asyncio.sleep(interval)
+            try:
+                peer_connection = self.peer_connection_getter(self.session_id)
+                if peer_connection is None:
+                    continue
+                for sender in peer_connection.getSenders():
+                    if sender.track is None or sender.track.kind != "video":
+                        continue
+                    bitrate_control = bitrate_controls.get(id(sender))
+                    if bitrate_control is None or bitrate_control.sender is not sender:
+                        bitrate_control = EncoderBitrateControl(sender)
+                        bitrate_controls[id(sender)] = bitrate_control
+                    # a remb raising the bitrate over the profile is capped again within one interval
+                    estimate = bitrate_control.update(self.video_encoding.profile.bitrate)
+                    if estimate:
+                        self.video_encoding.update_bandwidth(estimate)
+                        bitrate_control.update(self.video_encoding.profile.bitrate)
+                        continue
+                    stats = await sender.getStats()
+                    for report in stats.values():
+                        if report.type == "remote-inbound-rtp" and report.fractionLost is not None:
+                            self.video_encoding.update_loss(report.fractionLost)
+            except Exception as e:
+                logger.warning(f"Failed to read video bandwidth of stream {self.session_id}: {e}")
+
+    def is_input_ready(self) -> bool:
+        # input is accepted once every handler of the session reported its context ready
+        shared_states = self.client_session_delegate.shared_states
+        return shared_states is not None and shared_states.ready
+
     async def receive(self, frame: tuple[int, np.ndarray]):
         if self.client_session_delegate is None:
             return
-        timestamp = self.client_session_delegate.get_timestamp()
-        if timestamp[0] / timestamp[1] < self.stream_start_delay:
+        if not self.is_input_ready():
             return
+        timestamp = self.client_session_delegate.get_timestamp()
         _, array = frame
         self.client_session_delegate.put_data(
             EngineChannelType.AUDIO,
@@ -204,11 +285,9 @@ class RtcStream(AsyncAudioVideoStreamHandler):
     async def video_receive(self, frame):
         if self.client_session_delegate is None:
             return
-        
-        timestamp = self.client_session_delegate.get_timestamp()
-        if timestamp[0] / timestamp[1] < self.stream_start_delay:
+        if not self.is_input_ready():
             return
-        
+        timestamp = self.client_session_delegate.get_timestamp()
         self.client_session_delegate.put_data(
             EngineChannelType.VIDEO,
             frame,
@@ -246,8 +325,7 @@ class RtcStream(AsyncAudioVideoStreamHandler):
 
                 if self.client_session_delegate is None:
                     return
-                timestamp = self.client_session_delegate.get_timestamp()
-                if timestamp[0] / timestamp[1] < self.stream_start_delay:
+                if not self.is_input_ready():
                     return
                 logger.info(f'on_chat_datachannel: {message}')
     
@@ -259,6 +337,8 @@ class RtcStream(AsyncAudioVideoStreamHandler):
                             source_name="rtc",
                         )
                     )
+                    self.audio_jitter_buffer.clear()
+                    self.video_frame_pacer.reset()
                 elif message['type'] == 'chat':
                     channel.send(json.dumps({'type': 'avatar_end'}))
                     if self.client_session_delegate.shared_states.enable_vad is False:
@@ -286,8 +366,18 @@ class RtcStream(AsyncAudioVideoStreamHandler):
         # {"type":"chat",id:"标识属于同一段话", "message":"Hello, world!"}
         # unique_id = uuid.uuid4().hex
         pass
+    def get_output_stats(self) -> Dict[str, dict]:
+        return {
+            "audio": self.audio_jitter_buffer.get_stats(),
+            "video": self.video_frame_pacer.get_stats(),
+            "video_encoding": self.video_encoding.get_stats(),
+        }
+
     def shutdown(self):
         self.quit.set()
+        if self.bandwidth_monitor_task is not None:
+            self.bandwidth_monitor_task.cancel()
+        logger.info(f"Stream {self.session_id} output stats: {self.get_output_stats()}")
         factory = None
         if self.weak_factory is not None:
             factory = self.weak_factory()
@@ -0,0 +1,188 @@
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+from loguru import logger
+from pydantic import BaseModel, Field
+
+
+class VideoEncodingProfile(BaseModel):
+    name: str
+    max_size: int = Field(default=0)  # longest side of the encoded frame, 0 keeps the avatar resolution
+    bitrate: int = Field(default=2500000)  # bandwidth estimate in bps needed to use this profile
+    fps: int = Field(default=30)
+
+
+# ordered from the highest to the lowest quality
+DEFAULT_VIDEO_ENCODING_PROFILES = [
+    VideoEncodingProfile(name="high", max_size=0, bitrate=2500000, fps=30),
+    VideoEncodingProfile(name="medium", max_size=720, bitrate=1200000, fps=25),
+    VideoEncodingProfile(name="low", max_size=540, bitrate=600000, fps=20),
+    VideoEncodingProfile(name="minimal", max_size=360, bitrate=300000, fps=15),
+]
+
+
+def apply_encoder_bitrate_bounds(profiles: List[VideoEncodingProfile]):
+    """
+    aiortc clamps every vp8 bitrate to module wide bounds, set them to the range of the profile ladder so the
+    per session caps of EncoderBitrateControl are not clamped.
+    """
+    try:
+        # noinspection PyPackageRequirements
+        from aiortc.codecs import vpx
+    except ImportError:
+        return
+    bitrates = [x.bitrate for x in profiles]
+    vpx.MIN_BITRATE = min(bitrates)
+    vpx.MAX_BITRATE = max(bitrates)
+    vpx.DEFAULT_BITRATE = max(bitrates)
+
+
+class EncoderBitrateControl:
+    """
+    Per session bitrate cap on the video encoder of an aiortc sender.
+
+    aiortc keeps the encoder private and overwrites its target_bitrate with every REMB estimate of the
+    receiver, so the cap is applied again on every update and a target_bitrate differing from the one set here
+    is taken as a new estimate. Without an accessible encoder update returns None and only the resolution and
+    fps of the profile apply.
+    """
+
+    def __init__(self, sender):
+        self.sender = sender
+        self.estimate: Optional[int] = None
+        self._applied: Optional[int] = None
+        self._warned = False
+
+    def _get_encoder(self):
+        # private to RTCRtpSender and created with the first encoded frame
+        encoder = getattr(self.sender, "_RTCRtpSender__encoder", None)
+        if encoder is None:
+            return None
+        if not hasattr(type(encoder), "target_bitrate"):
+            if not self._warned:
+                logger.warning(f"Encoder {type(encoder).__name__} has no target_bitrate, video bitrate is not "
+                               f"capped per session")
+                self._warned = True
+            return None
+        return encoder
+
+    def update(self, max_bitrate: int) -> Optional[int]:
+        """
+        Cap the encoder bitrate to max_bitrate, returns the latest receiver estimate or None if unknown.
+        """
+        encoder = self._get_encoder()
+        if encoder is None:
+            return None
+        current = encoder.target_bitrate
+        if current != self._applied:
+            self.estimate = current
+        target = min(self.estimate, max_bitrate)
+        if target != current:
+            encoder.target_bitrate = target
+        self._applied = encoder.target_bitrate
+        return self.estimate
+
+
+class VideoEncodingController:
+    """
+    Per session choice of the encoding profile and the frame preparation it implies.
+
+    With profile_name "auto" the profile follows the receiver bandwidth estimate, or the reported packet loss
+    when no estimate is available. Switching down is immediate, switching up waits for switch_interval
+    seconds of stable conditions. process() decimates frames to the profile fps and downscales them to
+    its max_size before they reach the encoder.
+    """
+
+    def __init__(self, profiles: Optional[List[VideoEncodingProfile]] = None, source_fps: float = 30,
+                 profile_name: str = "auto", switch_interval: float = 5.0):
+        self.profiles = sorted(profiles or DEFAULT_VIDEO_ENCODING_PROFILES, key=lambda x: -x.bitrate)
+        self.source_fps = source_fps
+        self.adaptive = profile_name == "auto"
+        self.switch_interval = switch_interval
+
+        self.profile_index = 0
+        if not self.adaptive:
+            names = [x.name for x in self.profiles]
+            if profile_name in names:
+                self.profile_index = names.index(profile_name)
+            else:
+                logger.warning(f"Video encoding profile {profile_name} not found in {names}, using {names[0]}")
+        self.switch_count = 0
+        self.decimated_frames = 0
+
+        self._last_switch_time = time.monotonic()
+        self._frame_credit = 0.0
+
+    @property
+    def profile(self) -> VideoEncodingProfile:
+        return self.profiles[self.profile_index]
+
+    @property
+    def fps(self) -> float:
+        return min(self.profile.fps, self.source_fps)
+
+    def _switch(self, index: int, now: float, reason: str):
+        index = max(0, min(len(self.profiles) - 1, index))
+        if index == self.profile_index:
+            return
+        if index < self.profile_index and now - self._last_switch_time < self.switch_interval:
+            return
+        logger.info(f"Video encoding profile {self.profile.name} -> {self.profiles[index].name}, {reason}")
+        self.profile_index = index
+        self.switch_count += 1
+        self._last_switch_time = now
+
+    def update_bandwidth(self, bitrate: float, now: Optional[float] = None):
+        if not self.adaptive:
+            return
+        if now is None:
+            now = time.monotonic()
+        index = len(self.profiles) - 1
+        for i, profile in enumerate(self.profiles):
+            if profile.bitrate <= bitrate:
+                index = i
+                break
+        self._switch(index, now, f"bandwidth estimate {bitrate / 1000:.0f}kbps")
+
+    def update_loss(self, fraction_lost: float, now: Optional[float] = None):
+        if not self.adaptive:
+            return
+        if now is None:
+            now = time.monotonic()
+        if fraction_lost > 0.1:
+            self._switch(self.profile_index + 1, now, f"packet loss {fraction_lost:.2f}")
+        elif fraction_lost < 0.02:
+            self._switch(self.profile_index - 1, now, f"packet loss {fraction_lost:.2f}")
+
+    def get_output_size(self, height: int, width: int):
+        max_size = self.profile.max_size
+        if max_size <= 0 or max(height, width) <= max_size:
+            return height, width
+        scale = max_size / max(height, width)
+        # i420 needs even dimensions
+        return max(2, int(height * scale) // 2 * 2), max(2, int(width * scale) // 2 * 2)
+
+    def process(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Frame prepared for the current profile, None if it is dropped to meet the profile fps.
+        """
+        if self.fps < self.source_fps:
+            self._frame_credit += self.fps / self.source_fps
+            if self._frame_credit < 1.0:
+                self.decimated_frames += 1
+                return None
+            self._frame_credit -= 1.0
+        height, width = frame.shape[:2]
+        output_height, output_width = self.get_output_size(height, width)
+        if (output_height, output_width) == (height, width):
+            return frame
+        return cv2.resize(frame, (output_width, output_height), interpolation=cv2.INTER_AREA)
+
+    def get_stats(self) -> dict:
+        return {
+            "profile": self.profile.name,
+            "switches": self.switch_count,
+            "decimated_frames": self.decimated_frames,
+        }
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import av
+import cv2
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from handlers.avatar.liteavatar.media.frame_compositor import FrameCompositor
+
+BG_FRAME_COUNT = 30
+MOUTH_SIZE = 256
+
+
+def make_backgrounds(height: int, width: int):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(BG_FRAME_COUNT)]
+
+
+def mouth_box(height: int, width: int):
+    y1 = height // 2
+    x1 = (width - MOUTH_SIZE) // 2
+    return y1, y1 + MOUTH_SIZE, x1, x1 + MOUTH_SIZE
+
+
+def merge_mouth_to_bg(backgrounds, box, patch, bg_frame_id):
+    # what merge_mouth_to_bg does, a copy of the background with the mouth patch pasted in
+    full_img = backgrounds[bg_frame_id].copy()
+    y1, y2, x1, x2 = box
+    full_img[y1:y2, x1:x2] = patch
+    return full_img
+
+
+def run_before(backgrounds, box, patch, frames):
+    for i in range(frames):
+        full_img = cv2.flip(merge_mouth_to_bg(backgrounds, box, patch, i % BG_FRAME_COUNT), 1)
+        video_frame = av.VideoFrame.from_ndarray(full_img, format="bgr24")
+        # worker on_video, the queue feeder then moves the tensor to shared memory
+        torch.from_numpy(video_frame.to_ndarray(format="bgr24")).share_memory_()
+
+
+def run_flip_into_pool(backgrounds, box, patch, frames):
+    compositor = FrameCompositor(4)
+    for i in range(frames):
+        full_img = compositor.flip(merge_mouth_to_bg(backgrounds, box, patch, i % BG_FRAME_COUNT))
+        torch.from_numpy(full_img).share_memory_()
+
+
+def main():
+    frames = 300
+    if len(sys.argv) > 1:
+        frames = int(sys.argv[1])
+    for height, width in [(720, 1280), (1080, 1920)]:
+        backgrounds = make_backgrounds(height, width)
+        box = mouth_box(height, width)
+        patch = np.full((MOUTH_SIZE, MOUTH_SIZE, 3), 128, dtype=np.uint8)
+        for name, func in [("before", run_before), ("flip into pool", run_flip_into_pool)]:
+            # first pass fills the pool
+            func(backgrounds, box, patch, BG_FRAME_COUNT)
+            start = time.perf_counter()
+            func(backgrounds, box, patch, frames)
+            duration = time.perf_counter() - start
+            print(f"{width}x{height} {name:15s}: {duration / frames * 1e3:6.2f}ms per frame")
+
+
+if __name__ == '__main__':
+    main()
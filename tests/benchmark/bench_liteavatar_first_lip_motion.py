@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+# avatar_processor also imports through the src package
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
+from handlers.avatar.liteavatar.avatar_output_handler import AvatarOutputHandler
+from handlers.avatar.liteavatar.avatar_processor import AvatarProcessor
+from handlers.avatar.liteavatar.model.algo_model import AvatarAlgoConfig, AvatarInitOption, AvatarStatus
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+
+SAMPLE_RATE = 24000
+FPS = 25
+
+
+class SimulatedAdapter(BaseAlgoAdapter):
+    """
+    stands in for Tts2faceCpuAdapter, same slicing, audio2param and param2img take the given time
+    """
+
+    def __init__(self, audio2param_cost: float, param2img_cost: float):
+        self.audio2param_cost = audio2param_cost
+        self.param2img_cost = param2img_cost
+        self.slice_duration = 1
+
+    def init(self, init_option: AvatarInitOption):
+        if init_option.low_latency_slice_duration > 0:
+            self.slice_duration = max(1, round(init_option.low_latency_slice_duration * FPS)) / FPS
+
+    def audio2signal(self, audio_slice):
+        time.sleep(self.audio2param_cost)
+        return [0] * round(len(audio_slice.algo_audio_data) / 2 / audio_slice.algo_audio_sample_rate * FPS)
+
+    def signal2img(self, signal_data, avatar_status: AvatarStatus):
+        time.sleep(self.param2img_cost)
+        return np.zeros((4, 4, 3), dtype=np.uint8), 0
+
+    def mouth2full(self, mouth_image, bg_frame_id):
+        return mouth_image
+
+    def get_idle_signal(self, idle_frame_count):
+        return [0] * idle_frame_count
+
+    def get_algo_config(self):
+        return AvatarAlgoConfig(input_audio_sample_rate=16000, input_audio_slice_duration=self.slice_duration,
+                                input_audio_context_duration=1 - self.slice_duration)
+
+
+class FirstLipMotionHandler(AvatarOutputHandler):
+    def __init__(self):
+        self.first_speaking_time = None
+
+    def on_audio(self, audio_result):
+        pass
+
+    def on_video(self, video_result):
+        if video_result.avatar_status == AvatarStatus.SPEAKING and self.first_speaking_time is None:
+            self.first_speaking_time = time.monotonic()
+
+    def on_start(self, init_option):
+        pass
+
+    def on_stop(self):
+        pass
+
+    def on_avatar_status_change(self, speech_id, avatar_status):
+        pass
+
+
+def run(init_option: AvatarInitOption, tts_speed: float, audio2param_cost: float, speeches: int = 3):
+    processor = AvatarProcessor(SimulatedAdapter(audio2param_cost, 0.01), init_option)
+    latencies = []
+    chunk_duration = 0.1
+    chunk = bytes(2 * int(SAMPLE_RATE * chunk_duration))
+    processor.start()
+    try:
+        for speech_index in range(speeches):
+            output_handler = FirstLipMotionHandler()
+            processor.clear_output_handlers()
+            processor.register_output_handler(output_handler)
+            time.sleep(0.5)
+            start_time = time.monotonic()
+            # tts streams 2 seconds of speech in 100ms chunks
+            for i in range(20):
+                processor.add_audio(SpeechAudio(speech_id=f"speech_{speech_index}", sample_rate=SAMPLE_RATE,
+                                                end_of_speech=i == 19, audio_data=chunk))
+                time.sleep(chunk_duration / tts_speed)
+            while output_handler.first_speaking_time is None:
+                time.sleep(0.01)
+            latencies.append(output_handler.first_speaking_time - start_time)
+            time.sleep(2)
+    finally:
+        processor.stop()
+    return latencies
+
+
+def main():
+    audio2param_cost = 0.06
+    if len(sys.argv) > 1:
+        audio2param_cost = float(sys.argv[1])
+    modes = {
+        "1s slices": {},
+        "1s slices, fast mode": {"enable_fast_mode": True},
+        "0.2s slices": {"low_latency_slice_duration": 0.2},
+        "0.32s slices": {"low_latency_slice_duration": 0.32},
+        "0.4s slices": {"low_latency_slice_duration": 0.4},
+    }
+    print(f"audio2param {audio2param_cost * 1e3:.0f}ms per call")
+    for tts_speed in [1, 2]:
+        for mode_name, options in modes.items():
+            init_option = AvatarInitOption(audio_sample_rate=SAMPLE_RATE, video_frame_rate=FPS, avatar_name="simulated",
+                                           **options)
+            latencies = run(init_option, tts_speed, audio2param_cost)
+            print(f"tts {tts_speed}x realtime, {mode_name:22s}: first lip motion "
+                  f"{np.mean(latencies) * 1e3:6.0f}ms (max {max(latencies) * 1e3:.0f}ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from handlers.avatar.liteavatar.liteavatar_worker import LiteAvatarWorker, Tts2FaceConfigModel, Tts2FaceEvent
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+
+
+def get_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def make_speech(sample_rate: int = 24000, duration: float = 1.0) -> bytes:
+    # syllable like bursts so audio2param produces mouth motion
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    envelope = (np.sin(2 * np.pi * 3 * t) > 0).astype(np.float32)
+    audio = 0.3 * envelope * np.sin(2 * np.pi * 220 * t)
+    return (audio * 32767).astype(np.int16).tobytes()
+
+
+def count_frames(slot, counter: list, running: threading.Event):
+    while running.is_set():
+        try:
+            slot.video_out_queue.get(timeout=0.1)
+            counter[0] += 1
+        except queue.Empty:
+            continue
+        # audio is not measured, keep its queue from growing
+        try:
+            while True:
+                slot.audio_out_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+
+def run(sessions: int, avatar_name: str, duration: float):
+    config = Tts2FaceConfigModel(avatar_name=avatar_name, sessions_per_worker=sessions)
+    worker = LiteAvatarWorker(os.path.join(os.path.dirname(__file__), "..", "..", "src", "handlers", "avatar",
+                                           "liteavatar"), config)
+    try:
+        if not worker.wait_ready(300):
+            raise RuntimeError("worker not ready")
+        loaded_rss = get_rss_mb(worker.get_pid())
+
+        running = threading.Event()
+        running.set()
+        counters = [[0] for _ in worker.slots]
+        threads = []
+        for slot, counter in zip(worker.slots, counters):
+            slot.recruit()
+            slot.event_in_queue.put(Tts2FaceEvent.START)
+            thread = threading.Thread(target=count_frames, args=(slot, counter, running))
+            thread.start()
+            threads.append(thread)
+
+        # warm up the render loops before measuring
+        time.sleep(3)
+        speech = make_speech()
+        start_counts = [counter[0] for counter in counters]
+        start_time = time.monotonic()
+        speech_index = 0
+        while time.monotonic() - start_time < duration:
+            for slot in worker.slots:
+                slot.audio_in_queue.put(SpeechAudio(speech_id=f"speech_{speech_index}", audio_data=speech,
+                                                    sample_rate=24000))
+            speech_index += 1
+            time.sleep(1)
+        elapsed = time.monotonic() - start_time
+        running_rss = get_rss_mb(worker.get_pid())
+        fps = [(counter[0] - start) / elapsed for counter, start in zip(counters, start_counts)]
+
+        running.clear()
+        for thread in threads:
+            thread.join()
+        return loaded_rss, running_rss, fps
+    finally:
+        worker.destroy()
+
+
+def main():
+    avatar_name = "20250408/sample_data"
+    duration = 20
+    if len(sys.argv) > 1:
+        avatar_name = sys.argv[1]
+    if len(sys.argv) > 2:
+        duration = float(sys.argv[2])
+
+    print(f"avatar {avatar_name}, {duration}s of continuous speech per session")
+    for sessions in [1, 2, 4, 8]:
+        loaded_rss, running_rss, fps = run(sessions, avatar_name, duration)
+        print(f"N={sessions}: rss {running_rss:.0f}MB ({running_rss / sessions:.0f}MB per session, "
+              f"{loaded_rss:.0f}MB after load), fps per session min {min(fps):.1f} "
+              f"mean {sum(fps) / len(fps):.1f}")
+
+
+if __name__ == '__main__':
+    main()
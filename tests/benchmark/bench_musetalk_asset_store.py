@@ -0,0 +1,86 @@
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from handlers.avatar.musetalk.avatar_musetalk_asset_store import AvatarAssetStore, convert_pickle_assets
+
+
+def get_rss_mb():
+    rss = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                key, value = line.split()[:2]
+                rss[key.rstrip(":")] = int(value) / 1024
+    return rss
+
+
+def make_pickle_avatar(avatar_path, frame_count, height, width):
+    rng = np.random.default_rng(0)
+    frame_list = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(frame_count)]
+    frames = frame_list + frame_list[::-1]
+    masks = [rng.integers(0, 255, (height // 3, width // 4), dtype=np.uint8) for _ in frames]
+    coords = [(width // 3, height // 4, width // 3 + 256, height // 4 + 256)] * len(frames)
+    mask_coords = [(0, 0, width // 4, height // 3)] * len(frames)
+    latents = [torch.randn(1, 8, 32, 32).half() for _ in frames]
+    for name, value in [("frames.pkl", frames), ("masks.pkl", masks), ("coords.pkl", coords),
+                        ("mask_coords.pkl", mask_coords)]:
+        with open(os.path.join(avatar_path, name), "wb") as f:
+            pickle.dump(value, f)
+    torch.save(latents, os.path.join(avatar_path, "latents.pt"))
+
+
+def load(mode, avatar_path):
+    # runs in a fresh process so the memory numbers only cover the avatar data
+    base = get_rss_mb()
+    start = time.perf_counter()
+    if mode == "pickle":
+        with open(os.path.join(avatar_path, "frames.pkl"), "rb") as f:
+            frames = pickle.load(f)
+        with open(os.path.join(avatar_path, "masks.pkl"), "rb") as f:
+            pickle.load(f)
+        torch.load(os.path.join(avatar_path, "latents.pt"))
+    else:
+        frames = AvatarAssetStore.open(os.path.join(avatar_path, "assets")).frames
+    load_time = time.perf_counter() - start
+    loaded = get_rss_mb()
+    # one pass over the frame cycle as the idle loop does
+    start = time.perf_counter()
+    checksum = 0
+    for i in range(len(frames)):
+        checksum += int(frames[i][::64, ::64].sum())
+    cycle_time = time.perf_counter() - start
+    cycled = get_rss_mb()
+    print(f"{mode:7s}: load {load_time * 1e3:8.1f}ms, private memory {loaded['RssAnon'] - base['RssAnon']:7.1f}MB "
+          f"after load, {cycled['RssAnon'] - base['RssAnon']:7.1f}MB private + "
+          f"{cycled['RssFile'] - base['RssFile']:7.1f}MB shared page cache after one cycle ({cycle_time * 1e3:.1f}ms)")
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] in ["pickle", "store"]:
+        load(sys.argv[1], sys.argv[2])
+        return
+    frame_count = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    height, width = 720, 1280
+    with tempfile.TemporaryDirectory() as avatar_path:
+        make_pickle_avatar(avatar_path, frame_count, height, width)
+        start = time.perf_counter()
+        convert_pickle_assets(avatar_path)
+        print(f"{frame_count} frames of {width}x{height} mirrored into a {2 * frame_count} frame cycle, "
+              f"conversion {time.perf_counter() - start:.1f}s")
+        for name in ["frames.pkl", "assets/frames.bin"]:
+            print(f"{name:18s}: {os.path.getsize(os.path.join(avatar_path, name)) / 1024 / 1024:7.1f}MB on disk")
+        for mode in ["pickle", "store"]:
+            subprocess.run([sys.executable, __file__, mode, avatar_path], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+from handlers.avatar.musetalk.avatar_musetalk_config import AvatarMuseTalkConfig
+from handlers.avatar.musetalk.avatar_musetalk_server import AvatarMuseTalkServer
+
+FPS = 25
+SAMPLE_RATE = 24000
+BATCH_SIZE = 8
+# GPU cost model: a UNet or VAE call costs about the same for any batch up to batch_size
+UNET_CALL_SECONDS = 0.020
+VAE_CALL_SECONDS = 0.015
+
+
+class SimulatedAvatar:
+    """MuseTalk avatar stand in, inference calls sleep by the cost model and share one device lock."""
+    device = "cpu"
+    weight_dtype = torch.float32
+
+    def __init__(self):
+        self.device_lock = threading.Lock()
+        self.unet_calls = 0
+        self.busy_seconds = 0.0
+
+    def extract_whisper_feature(self, segment, sampling_rate):
+        return torch.ones((FPS, 50, 384))
+
+    def _run(self, seconds):
+        with self.device_lock:
+            time.sleep(seconds)
+            self.busy_seconds += seconds
+
+    def generate_frames_unet(self, whisper_chunks, start_idx, batch_size, idx_list=None):
+        self._run(UNET_CALL_SECONDS)
+        self.unet_calls += 1
+        return [whisper_chunks[:, :4, :1].reshape(batch_size, 4, 1, 1).expand(batch_size, 4, 32, 32), idx_list]
+
+    def generate_frames_vae(self, pred_latents, idx_list, batch_size):
+        self._run(VAE_CALL_SECONDS)
+        return [(np.ones((4, 4, 3), dtype=np.float32), idx) for idx in idx_list]
+
+    def res2combined(self, res_frame, idx):
+        return res_frame
+
+    def generate_idle_frame(self, idx):
+        return np.zeros((4, 4, 3), dtype=np.float32)
+
+
+def speak(server, session_id, events, utterances, rng, send_times):
+    # TTS delivers audio at twice realtime in 1 second segments, as the handler slices it
+    for _ in range(utterances):
+        duration = rng.uniform(0.3, 2.5)
+        audio = (0.1 * np.ones(int(duration * SAMPLE_RATE))).astype(np.float32)
+        segments = [audio[i:i + SAMPLE_RATE] for i in range(0, len(audio), SAMPLE_RATE)]
+        speech_id = f"{session_id}-{rng.integers(1 << 30)}"
+        send_times.append(time.perf_counter())
+        for i, segment in enumerate(segments):
+            server.add_audio(session_id, SpeechAudio(speech_id=speech_id, end_of_speech=i == len(segments) - 1,
+                                                     audio_data=segment.tobytes(), sample_rate=SAMPLE_RATE))
+            time.sleep(len(segment) / SAMPLE_RATE / 2)
+        events.get(timeout=30)
+        time.sleep(0.3)
+
+
+def count_stalls(video, running, stats, first_frame_times):
+    # idle frames between two speaking frames less than a pause apart are frames the inference was late for
+    idle_run = None
+    pause = True
+    while running.is_set() or not video.empty():
+        try:
+            frame = video.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if frame[0, 0, 0] > 0:
+            stats["speaking"] += 1
+            if pause:
+                first_frame_times.append(time.perf_counter())
+            if idle_run is not None and idle_run < 5:
+                stats["stalls"] += idle_run
+            idle_run = 0
+            pause = False
+        elif idle_run is not None:
+            idle_run += 1
+            pause = pause or idle_run >= 5
+
+
+def run(sessions, shared, utterances):
+    avatar = SimulatedAvatar()
+    config = AvatarMuseTalkConfig(fps=FPS, batch_size=BATCH_SIZE, output_audio_sample_rate=SAMPLE_RATE)
+    # without sharing every session gets its own server, as one processor per session would
+    servers = [AvatarMuseTalkServer(avatar, config) for _ in range(1 if shared else sessions)]
+    running = threading.Event()
+    running.set()
+    stats = {"speaking": 0, "stalls": 0}
+    threads = []
+    send_times = [[] for _ in range(sessions)]
+    first_frame_times = [[] for _ in range(sessions)]
+    for i in range(sessions):
+        server = servers[0] if shared else servers[i]
+        audio, video, events = queue.Queue(), queue.Queue(), queue.Queue()
+        server.open_session(f"s{i}", audio, video, events)
+        server.start_session(f"s{i}")
+        threads.append(threading.Thread(target=speak, args=(server, f"s{i}", events, utterances,
+                                                             np.random.default_rng(i), send_times[i])))
+        threading.Thread(target=count_stalls, args=(video, running, stats, first_frame_times[i]),
+                         daemon=True).start()
+    for server in servers:
+        server.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    running.clear()
+    time.sleep(0.2)
+    batches = sum(server.unet_batch_count for server in servers)
+    valid = sum(server.unet_valid_count for server in servers)
+    for server in servers:
+        server.stop()
+    latency = np.mean([first - sent for sends, firsts in zip(send_times, first_frame_times)
+                       for sent, first in zip(sends, firsts)])
+    return batches, valid / max(1, batches), avatar.busy_seconds / elapsed, stats, latency
+
+
+def main():
+    utterances = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    print(f"batch_size={BATCH_SIZE}, simulated unet {UNET_CALL_SECONDS * 1e3:.0f}ms and vae "
+          f"{VAE_CALL_SECONDS * 1e3:.0f}ms per call, {utterances} utterances per session")
+    for sessions in [1, 2, 4, 8]:
+        for shared in [False, True]:
+            batches, fill, busy, stats, latency = run(sessions, shared, utterances)
+            name = "cross-session batches" if shared else "per-session batches"
+            print(f"{sessions} sessions, {name:22s}: {batches:5d} unet calls, {fill:4.1f}/{BATCH_SIZE} slots used, "
+                  f"device busy {busy * 100:5.1f}%, first frame {latency * 1e3:4.0f}ms, "
+                  f"{stats['stalls']:4d} stalled of {stats['speaking']} speaking frames")
+
+
+if __name__ == '__main__':
+    main()
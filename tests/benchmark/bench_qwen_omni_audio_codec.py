@@ -0,0 +1,61 @@
+import base64
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from handlers.llm.qwen_omni.qwen_omni_audio_codec import Pcm16Encoder, Pcm16DeltaDecoder
+
+
+def legacy_encode(audio: np.ndarray) -> str:
+    audio = np.clip(audio, -1.0, 1.0)
+    audio = (audio * 32767).astype(np.int16)
+    return base64.b64encode(audio.tobytes()).decode("ascii")
+
+
+def legacy_decode(audio_b64: str) -> np.ndarray:
+    audio_bytes = base64.b64decode(audio_b64)
+    audio_array = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32767.0
+    # statistics were always computed for the debug log
+    _ = f"{audio_array.min():.4f} {audio_array.max():.4f} {audio_array.mean():.4f}"
+    return audio_array[np.newaxis, ...]
+
+
+def main():
+    number = 2000
+    # vad output chunks are 20ms at 16kHz, server deltas vary in size
+    input_chunk = np.random.uniform(-1, 1, size=(1, 320)).astype(np.float32)
+    deltas = [base64.b64encode(np.random.randint(-32767, 32767, size=n, dtype=np.int16).tobytes()).decode("ascii")
+              for n in (240, 480, 960, 3840, 120)]
+
+    encoder = Pcm16Encoder()
+    legacy_enc = timeit.timeit(lambda: legacy_encode(input_chunk), number=number)
+    codec_enc = timeit.timeit(lambda: encoder.encode_base64(input_chunk), number=number)
+
+    def run_legacy_decode():
+        return [legacy_decode(x) for x in deltas]
+
+    decoder = Pcm16DeltaDecoder(frame_size=480, chunk_samples=960)
+
+    def run_codec_decode():
+        outputs = []
+        for x in deltas:
+            outputs.extend(decoder.feed_base64(x))
+        return outputs
+
+    legacy_dec = timeit.timeit(run_legacy_decode, number=number)
+    codec_dec = timeit.timeit(run_codec_decode, number=number)
+    legacy_bundles = len(run_legacy_decode())
+    decoder.reset()
+    codec_bundles = len(run_codec_decode())
+
+    print(f"encode 20ms chunk: legacy {legacy_enc / number * 1e6:.2f}us, codec {codec_enc / number * 1e6:.2f}us")
+    print(f"decode {len(deltas)} deltas: legacy {legacy_dec / number * 1e6:.2f}us ({legacy_bundles} bundles), "
+          f"codec {codec_dec / number * 1e6:.2f}us ({codec_bundles} bundles)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from handlers.avatar.liteavatar.media.audio_ring_buffer import AudioRingBuffer
+
+SAMPLE_RATE = 24000
+FPS = 25
+FRAME_SAMPLES = SAMPLE_RATE // FPS
+
+
+def run_bytes(chunks):
+    # bytes concatenation and slicing as SpeechAudioProcessor and SpeechAudioAligner did before
+    processor_data = bytes()
+    aligner_data = bytearray()
+    aligner_start_idx = 0
+    frames = 0
+    for chunk in chunks:
+        processor_data += chunk
+        while len(processor_data) >= 2 * SAMPLE_RATE:
+            audio_slice = processor_data[:2 * SAMPLE_RATE]
+            processor_data = processor_data[2 * SAMPLE_RATE:]
+            aligner_data += audio_slice
+            for _ in range(FPS):
+                bytes(aligner_data[aligner_start_idx:aligner_start_idx + FRAME_SAMPLES * 2])
+                aligner_start_idx += FRAME_SAMPLES * 2
+                frames += 1
+    return frames
+
+
+def run_ring(chunks):
+    # same access pattern on the ring buffers the processor and aligner use now
+    processor_buffer = AudioRingBuffer(2 * SAMPLE_RATE)
+    aligner_buffer = AudioRingBuffer(2 * SAMPLE_RATE)
+    frames = 0
+    for chunk in chunks:
+        processor_buffer.write(chunk)
+        while len(processor_buffer) >= SAMPLE_RATE:
+            aligner_buffer.write(processor_buffer.read(SAMPLE_RATE))
+            for _ in range(FPS):
+                aligner_buffer.read(FRAME_SAMPLES).tobytes()
+                frames += 1
+    return frames
+
+
+def measure(func, chunks):
+    tracemalloc.start()
+    start = time.perf_counter()
+    frames = func(chunks)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return frames, duration, peak
+
+
+def main():
+    utterance_seconds = [60, 600]
+    if len(sys.argv) > 1:
+        utterance_seconds = [int(x) for x in sys.argv[1:]]
+    print(f"{SAMPLE_RATE}Hz audio, {FPS}fps")
+    for seconds in utterance_seconds:
+        audio = np.random.default_rng(0).integers(-2000, 2000, SAMPLE_RATE * seconds, dtype=np.int16).tobytes()
+        chunk_cases = {
+            "one chunk": [audio],
+            "100ms chunks": [audio[i:i + SAMPLE_RATE // 5] for i in range(0, len(audio), SAMPLE_RATE // 5)],
+        }
+        for case_name, chunks in chunk_cases.items():
+            for impl_name, func in [("bytes", run_bytes), ("ring buffer", run_ring)]:
+                frames, duration, peak = measure(func, chunks)
+                print(f"{seconds}s utterance, {case_name:12s} {impl_name:12s}: {duration * 1e3:8.1f}ms "
+                      f"for {frames} frames, peak memory {peak / 1024 / 1024:.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
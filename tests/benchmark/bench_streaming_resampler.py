@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+
+import librosa
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from engine_utils.streaming_resampler import StreamingResampler
+
+RATE_PAIRS = [(24000, 16000), (16000, 24000), (22050, 24000), (48000, 16000)]
+
+
+def run_librosa(chunks, orig_sr, target_sr):
+    # every chunk resampled on its own as the call sites did before
+    return [librosa.resample(chunk, orig_sr=orig_sr, target_sr=target_sr) for chunk in chunks]
+
+
+def run_streaming(chunks, orig_sr, target_sr):
+    resampler = StreamingResampler(orig_sr, target_sr)
+    return [resampler.process(chunk) for chunk in chunks]
+
+
+def main():
+    seconds = 60
+    if len(sys.argv) > 1:
+        seconds = int(sys.argv[1])
+    for orig_sr, target_sr in RATE_PAIRS:
+        audio = np.random.default_rng(0).uniform(-0.3, 0.3, orig_sr * seconds).astype(np.float32)
+        for chunk_ms in [40, 200, 1000]:
+            chunk_size = orig_sr * chunk_ms // 1000
+            chunks = [audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)]
+            results = []
+            for impl_name, func in [("librosa", run_librosa), ("streaming", run_streaming)]:
+                start = time.perf_counter()
+                func(chunks, orig_sr, target_sr)
+                duration = time.perf_counter() - start
+                results.append(duration)
+                print(f"{orig_sr}->{target_sr} {chunk_ms:5d}ms chunks {impl_name:10s}: {duration * 1e3:8.1f}ms "
+                      f"for {seconds}s audio, {seconds / duration:7.0f}x realtime")
+            print(f"{orig_sr}->{target_sr} {chunk_ms:5d}ms chunks speedup {results[0] / results[1]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
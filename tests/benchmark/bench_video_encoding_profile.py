@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+from fractions import Fraction
+
+import av
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from service.rtc_service.video_encoding import VideoEncodingController, DEFAULT_VIDEO_ENCODING_PROFILES
+
+
+def make_frames(height: int, width: int, count: int):
+    # moving gradient with some noise, roughly as hard to encode as a talking avatar
+    y, x = np.mgrid[0:height, 0:width]
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (x + i * 4) % 256
+        frame[..., 1] = (y + i * 2) % 256
+        frame[..., 2] = 128
+        frame[height // 3:height // 2, width // 3:2 * width // 3] = rng.integers(0, 255, dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def encode_session(frames, profile_name: str, source_fps: int):
+    controller = VideoEncodingController(source_fps=source_fps, profile_name=profile_name)
+    profile = controller.profile
+    codec = av.CodecContext.create("libvpx", "w")
+    output_height, output_width = controller.get_output_size(*frames[0].shape[:2])
+    codec.width = output_width
+    codec.height = output_height
+    codec.pix_fmt = "yuv420p"
+    codec.bit_rate = profile.bitrate
+    codec.time_base = Fraction(1, int(controller.fps))
+    # same speed settings aiortc uses for vp8
+    codec.options = {"deadline": "realtime", "cpu-used": "-6", "lag-in-frames": "0"}
+    codec.open()
+
+    encoded_bytes = 0
+    encoded_frames = 0
+    cpu_start = time.process_time()
+    for frame in frames:
+        frame = controller.process(frame)
+        if frame is None:
+            continue
+        video_frame = av.VideoFrame.from_ndarray(frame, format="rgb24").reformat(format="yuv420p")
+        video_frame.pts = encoded_frames
+        for packet in codec.encode(video_frame):
+            encoded_bytes += packet.size
+        encoded_frames += 1
+    for packet in codec.encode(None):
+        encoded_bytes += packet.size
+    cpu_time = time.process_time() - cpu_start
+    return profile, output_width, output_height, encoded_frames, encoded_bytes, cpu_time
+
+
+def main():
+    height, width = 1280, 720
+    source_fps = 30
+    duration = 3
+    if len(sys.argv) > 2:
+        height, width = int(sys.argv[1]), int(sys.argv[2])
+    frames = make_frames(height, width, source_fps * duration)
+
+    print(f"source {width}x{height}@{source_fps}fps, {duration}s per profile")
+    for profile in DEFAULT_VIDEO_ENCODING_PROFILES:
+        profile, output_width, output_height, encoded_frames, encoded_bytes, cpu_time = \
+            encode_session(frames, profile.name, source_fps)
+        print(f"{profile.name:8s} {output_width}x{output_height}@{encoded_frames / duration:.0f}fps "
+              f"target {profile.bitrate / 1000:.0f}kbps: cpu {cpu_time / duration * 100:.1f}% of one core "
+              f"per session, {encoded_bytes * 8 / duration / 1000:.0f}kbps encoded")
+
+
+if __name__ == '__main__':
+    main()
@@ -39,10 +39,10 @@ class SampleOutputHandler(AvatarOutputHandler):
             logger.warning(e)
 
     def on_video(self, video_result: VideoResult):
+        video_frame = video_result.video_frame
         logger.info("receive image result {:.3f} with status {}",
-                    video_result.video_frame.pts * video_result.video_frame.time_base,
+                    video_frame.pts * video_frame.time_base,
                     video_result.avatar_status)
-        video_frame = video_result.video_frame
         if self.video_stream is None:
             self.video_stream = self.output_container.add_stream(
                 'h264', rate=self._init_option.video_frame_rate)
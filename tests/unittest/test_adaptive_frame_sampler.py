@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+
+from engine_utils.adaptive_frame_sampler import AdaptiveFrameSampler
+
+
+def _frame(value: int, noise_seed: int = None) -> np.ndarray:
+    frame = np.full((1, 120, 160, 3), value, dtype=np.uint8)
+    if noise_seed is not None:
+        rng = np.random.default_rng(noise_seed)
+        frame[0, 40:80, 40:120] = rng.integers(0, 255, size=(40, 80, 3), dtype=np.uint8)
+    return frame
+
+
+def _run(sampler: AdaptiveFrameSampler, frames, fps: int = 30):
+    accepted = []
+    for i, frame in enumerate(frames):
+        if sampler.offer(frame, i * 1000 / fps):
+            accepted.append(i)
+    return accepted
+
+
+class TestAdaptiveFrameSampler(unittest.TestCase):
+
+    def test_static_scene_backs_off(self):
+        sampler = AdaptiveFrameSampler(min_interval_ms=500, max_interval_ms=4000)
+        accepted = _run(sampler, [_frame(100)] * 300)
+        # 10 seconds of identical frames: intervals grow 0.5s, 1s, 2s, 4s...
+        self.assertLessEqual(len(accepted), 5)
+        self.assertEqual(sampler.get_stats()["current_interval_ms"], 4000)
+
+    def test_motion_raises_rate(self):
+        sampler = AdaptiveFrameSampler(min_interval_ms=500, max_interval_ms=4000)
+        _run(sampler, [_frame(100)] * 150)
+        moving = [_frame(100, noise_seed=i) for i in range(150)]
+        accepted = []
+        for i, frame in enumerate(moving):
+            if sampler.offer(frame, (150 + i) * 1000 / 30):
+                accepted.append(i)
+        # 5 seconds of motion are sampled close to the minimum interval
+        self.assertGreaterEqual(len(accepted), 8)
+        self.assertEqual(sampler.get_stats()["current_interval_ms"], 500)
+
+    def test_scene_cut_sent_immediately(self):
+        sampler = AdaptiveFrameSampler(min_interval_ms=500, max_interval_ms=4000)
+        _run(sampler, [_frame(20)] * 120)
+        self.assertFalse(sampler.offer(_frame(20), 120 * 1000 / 30))
+        self.assertTrue(sampler.offer(_frame(230), 121 * 1000 / 30))
+        self.assertEqual(sampler.get_stats()["scene_cuts"], 1)
+
+    def test_frame_budget_per_turn(self):
+        sampler = AdaptiveFrameSampler(min_interval_ms=100, frame_budget_per_turn=3)
+        frames = [_frame(0 if i % 2 == 0 else 255) for i in range(60)]
+        self.assertEqual(len(_run(sampler, frames, fps=5)), 3)
+        self.assertGreater(sampler.get_stats()["skipped_budget"], 0)
+        sampler.new_turn()
+        self.assertTrue(sampler.offer(_frame(0), 100000))
+
+
+if __name__ == '__main__':
+    unittest.main()
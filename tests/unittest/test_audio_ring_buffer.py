@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from handlers.avatar.liteavatar.media.audio_ring_buffer import AudioRingBuffer
+from handlers.avatar.liteavatar.media.speech_audio_aligner import SpeechAudioAligner
+from handlers.avatar.liteavatar.media.speech_audio_processor import SpeechAudioProcessor
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+
+
+class TestAudioRingBuffer(unittest.TestCase):
+    def test_wrap_around(self):
+        ring_buffer = AudioRingBuffer(8)
+        ring_buffer.write(np.arange(6, dtype=np.int16))
+        np.testing.assert_array_equal(ring_buffer.read(4), [0, 1, 2, 3])
+        ring_buffer.write(np.arange(6, 12, dtype=np.int16).tobytes())
+        self.assertEqual(ring_buffer.capacity, 8)
+        self.assertEqual(len(ring_buffer), 8)
+        np.testing.assert_array_equal(ring_buffer.read(100), np.arange(4, 12))
+        self.assertEqual(len(ring_buffer), 0)
+
+    def test_contiguous_read_is_view(self):
+        ring_buffer = AudioRingBuffer(8)
+        ring_buffer.write(np.arange(4, dtype=np.int16))
+        frame = ring_buffer.read(2)
+        self.assertIs(frame.base, ring_buffer._buffer)
+
+    def test_grow_keeps_unread(self):
+        ring_buffer = AudioRingBuffer(4)
+        ring_buffer.write(np.arange(3, dtype=np.int16))
+        ring_buffer.skip(2)
+        ring_buffer.write(np.arange(3, 10, dtype=np.int16))
+        self.assertEqual(ring_buffer.capacity, 8)
+        np.testing.assert_array_equal(ring_buffer.read(8), np.arange(2, 10))
+
+
+class TestSpeechAudioBuffers(unittest.TestCase):
+    def test_processor_slices_chunked_speech(self):
+        processor = SpeechAudioProcessor(input_sample_rate=16000, output_sample_rate=16000, audio_slice_duration=1)
+        audio = np.arange(40000, dtype=np.int16)
+        slices = []
+        for i in range(0, 40000, 3000):
+            chunk = audio[i:i + 3000]
+            slices += processor.get_speech_audio_slice(SpeechAudio(
+                speech_id="speech", sample_rate=16000, audio_data=chunk.tobytes(),
+                end_of_speech=i + 3000 >= 40000))
+        self.assertEqual(len(slices), 3)
+        played = np.concatenate([np.frombuffer(x.play_audio_data, dtype=np.int16) for x in slices])
+        np.testing.assert_array_equal(played[:40000], audio)
+        self.assertTrue(slices[-1].end_of_speech)
+        self.assertAlmostEqual(slices[-1].end_padding_duration, 0.5)
+
+    def test_aligner_frames_and_padding(self):
+        aligner = SpeechAudioAligner(fps=25, audio_sample_rate=16000)
+        audio = np.arange(1000, dtype=np.int16)
+        aligner.add_audio(audio.tobytes(), "speech")
+        first = np.frombuffer(aligner.get_speech_level_algined_audio().play_audio_data, dtype=np.int16)
+        second = np.frombuffer(aligner.get_speech_level_algined_audio().play_audio_data, dtype=np.int16)
+        np.testing.assert_array_equal(first, audio[:640])
+        np.testing.assert_array_equal(second[:360], audio[640:])
+        self.assertFalse(second[360:].any())
+
+        aligner.add_audio(audio.tobytes(), "next_speech")
+        third = aligner.get_speech_level_algined_audio()
+        self.assertEqual(third.speech_id, "next_speech")
+        np.testing.assert_array_equal(np.frombuffer(third.play_audio_data, dtype=np.int16), audio[:640])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import time
+import unittest
+
+import numpy as np
+
+from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
+from handlers.avatar.liteavatar.algo.bg_frame_counter import BgFrameCounter
+from handlers.avatar.liteavatar.algo.idle_frame_cache import IdleFrameCache
+from handlers.avatar.liteavatar.avatar_output_handler import AvatarOutputHandler
+from handlers.avatar.liteavatar.avatar_processor import AvatarProcessor
+from handlers.avatar.liteavatar.model.algo_model import AvatarAlgoConfig, AvatarInitOption, AvatarStatus
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+
+
+class FakeAdapter(BaseAlgoAdapter):
+    def __init__(self, idle_frame_cache=None):
+        self.batch_sizes = []
+        self.fps = 25
+        self.idle_frame_cache = idle_frame_cache
+        self.bg_counter = BgFrameCounter(4)
+
+    def init(self, init_option: AvatarInitOption):
+        self.fps = init_option.video_frame_rate
+
+    def audio2signal(self, audio_slice):
+        return [np.ones(4) for _ in range(round(audio_slice.get_audio_duration() * self.fps))]
+
+    def signal2img(self, signal_data, avatar_status: AvatarStatus):
+        return np.zeros((4, 4, 3), dtype=np.uint8), self.bg_counter.get_and_update_bg_index()
+
+    def signal2img_batch(self, signal_data_list, avatar_status: AvatarStatus):
+        self.batch_sizes.append(len(signal_data_list))
+        return super().signal2img_batch(signal_data_list, avatar_status)
+
+    def mouth2full(self, mouth_image, bg_frame_id):
+        return np.zeros((8, 8, 3), dtype=np.uint8)
+
+    def get_idle_signal(self, idle_frame_count):
+        return [np.zeros(4) for _ in range(idle_frame_count)]
+
+    def get_idle_frame_cache(self):
+        return self.idle_frame_cache
+
+    def peek_bg_frame_id(self):
+        return self.bg_counter.peek_bg_index()
+
+    def skip_bg_frame(self):
+        self.bg_counter.get_and_update_bg_index()
+
+    def get_algo_config(self):
+        # same rate as the speech input so no resampling is needed
+        return AvatarAlgoConfig(input_audio_sample_rate=24000, input_audio_slice_duration=1)
+
+
+class RecordingOutputHandler(AvatarOutputHandler):
+    def __init__(self):
+        self.video_times = []
+        self.frames = []
+
+    def on_audio(self, audio_result):
+        pass
+
+    def on_video(self, video_result):
+        self.video_times.append(time.monotonic())
+        self.frames.append((video_result.bg_frame_id, video_result.video_data.copy()))
+
+    def on_start(self, init_option):
+        pass
+
+    def on_stop(self):
+        pass
+
+    def on_avatar_status_change(self, speech_id, avatar_status):
+        pass
+
+
+class TestAvatarProcessorRender(unittest.TestCase):
+    @staticmethod
+    def _create_processor(adapter):
+        processor = AvatarProcessor(adapter, AvatarInitOption(audio_sample_rate=24000, video_frame_rate=25,
+                                                              avatar_name="fake"))
+        output_handler = RecordingOutputHandler()
+        processor.register_output_handler(output_handler)
+        return processor, output_handler
+
+    def test_speech_rendered_in_batches_and_output_paced(self):
+        adapter = FakeAdapter()
+        processor, output_handler = self._create_processor(adapter)
+        processor.start()
+        try:
+            processor.add_audio(SpeechAudio(speech_id="speech", end_of_speech=True, sample_rate=24000,
+                                            audio_data=bytes(24000 * 2)))
+            time.sleep(1.2)
+        finally:
+            processor.stop()
+
+        self.assertGreater(max(adapter.batch_sizes), 1)
+        # render ahead must not speed up output
+        video_times = output_handler.video_times
+        frame_interval = (video_times[-1] - video_times[0]) / (len(video_times) - 1)
+        self.assertAlmostEqual(frame_interval, 1 / 25, delta=0.005)
+
+    def test_listening_replays_cached_idle_frames(self):
+        adapter = FakeAdapter(IdleFrameCache(4))
+        processor, output_handler = self._create_processor(adapter)
+        processor.start()
+        try:
+            time.sleep(0.6)
+        finally:
+            processor.stop()
+
+        # the 4 background frames are rendered once, the rest comes from the cache
+        self.assertTrue(adapter.idle_frame_cache.is_complete())
+        self.assertLessEqual(len(adapter.batch_sizes), 4 + AvatarProcessor.IDLE_RENDER_AHEAD_FRAMES)
+        self.assertGreater(len(output_handler.video_times), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import time
+import unittest
+from typing import Dict
+
+from chat_engine.common.handler_base import HandlerBase, HandlerBaseInfo, HandlerDataInfo, HandlerDetail
+from chat_engine.contexts.handler_context import HandlerContext
+from chat_engine.contexts.session_context import SessionContext
+from chat_engine.core.chat_session import ChatSession
+from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel, HandlerBaseConfigModel
+from chat_engine.data_models.session_info_data import SessionInfoData
+
+
+class WarmupHandler(HandlerBase):
+    def __init__(self, deferred_ready: bool):
+        super().__init__()
+        self.deferred_ready = deferred_ready
+
+    def get_handler_info(self) -> HandlerBaseInfo:
+        return HandlerBaseInfo()
+
+    def load(self, engine_config, handler_config=None):
+        pass
+
+    def create_context(self, session_context, handler_config=None) -> HandlerContext:
+        context = HandlerContext(session_context.session_info.session_id)
+        context.deferred_ready = self.deferred_ready
+        return context
+
+    def start_context(self, session_context, handler_context):
+        pass
+
+    def get_handler_detail(self, session_context, context) -> HandlerDetail:
+        return HandlerDetail(inputs={ChatDataType.HUMAN_TEXT: HandlerDataInfo(type=ChatDataType.HUMAN_TEXT)})
+
+    def handle(self, context, inputs, output_definitions: Dict[ChatDataType, HandlerDataInfo]):
+        pass
+
+    def destroy_context(self, context):
+        pass
+
+
+class TestChatSessionReady(unittest.TestCase):
+    def _create_session(self, ready_timeout: float = 10.0):
+        session_context = SessionContext(SessionInfoData(session_id="test"), {}, {})
+        session = ChatSession(session_context, ChatEngineConfigModel(session_ready_timeout=ready_timeout))
+        self.addCleanup(session.stop)
+        return session
+
+    def test_ready_without_deferred_handlers(self):
+        session = self._create_session()
+        session.prepare_handler(WarmupHandler(False), HandlerBaseInfo(name="llm"), HandlerBaseConfigModel())
+        session.start()
+        self.assertTrue(session.session_context.shared_states.ready)
+
+    def test_ready_waits_for_deferred_handler(self):
+        session = self._create_session()
+        session.prepare_handler(WarmupHandler(False), HandlerBaseInfo(name="llm"), HandlerBaseConfigModel())
+        avatar_env = session.prepare_handler(WarmupHandler(True), HandlerBaseInfo(name="avatar"),
+                                             HandlerBaseConfigModel())
+        session.start()
+        self.assertFalse(session.session_context.shared_states.ready)
+
+        avatar_env.context.set_ready()
+        self.assertTrue(session.session_context.shared_states.ready)
+        self.assertIn("avatar", session.handler_ready_times)
+
+    def test_ready_timeout(self):
+        session = self._create_session(ready_timeout=0.05)
+        session.prepare_handler(WarmupHandler(True), HandlerBaseInfo(name="avatar"), HandlerBaseConfigModel())
+        session.start()
+        self.assertFalse(session.session_context.shared_states.ready)
+        deadline = time.monotonic() + 2
+        while not session.session_context.shared_states.ready and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(session.session_context.shared_states.ready)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,314 @@
+import threading
+import time
+import unittest
+from typing import Dict, List
+
+from chat_engine.common.handler_base import HandlerBase, HandlerBaseInfo, HandlerDataInfo, HandlerDetail
+from chat_engine.contexts.handler_context import HandlerContext
+from chat_engine.contexts.session_context import SessionContext
+from chat_engine.core.chat_session import ChatDataSubmitter, ChatSession
+from chat_engine.data_models.chat_data.chat_data_model import ChatData
+from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel, HandlerBaseConfigModel
+from chat_engine.data_models.chat_signal import ChatSignal
+from chat_engine.data_models.chat_signal_type import ChatSignalType, ChatSignalSourceType
+from chat_engine.data_models.session_info_data import SessionInfoData
+
+
+class RecordingHandler(HandlerBase):
+    def __init__(self, input_types: List[ChatDataType]):
+        super().__init__()
+        self.input_types = input_types
+        self.signals: List[ChatSignal] = []
+        self.signal_threads: List[str] = []
+        self.queue_sizes_at_signal: List[int] = []
+        self.input_queue = None
+        self.handled: List[ChatData] = []
+
+    def get_handler_info(self) -> HandlerBaseInfo:
+        return HandlerBaseInfo()
+
+    def load(self, engine_config, handler_config=None):
+        pass
+
+    def create_context(self, session_context, handler_config=None) -> HandlerContext:
+        return HandlerContext(session_context.session_info.session_id)
+
+    def start_context(self, session_context, handler_context):
+        pass
+
+    def get_handler_detail(self, session_context, context) -> HandlerDetail:
+        return HandlerDetail(inputs={x: HandlerDataInfo(type=x) for x in self.input_types})
+
+    def handle(self, context, inputs, output_definitions: Dict[ChatDataType, HandlerDataInfo]):
+        self.handled.append(inputs)
+        return ChatData(type=ChatDataType.AVATAR_AUDIO)
+
+    def on_signal(self, context, signal):
+        self.signals.append(signal)
+        self.signal_threads.append(threading.current_thread().name)
+        if self.input_queue is not None:
+            self.queue_sizes_at_signal.append(self.input_queue.qsize())
+
+    def destroy_context(self, context):
+        pass
+
+
+class FailingHandler(RecordingHandler):
+    def on_signal(self, context, signal):
+        raise RuntimeError("broken handler")
+
+
+class TestChatSessionSignal(unittest.TestCase):
+    def setUp(self):
+        session_context = SessionContext(SessionInfoData(session_id="test"), {}, {})
+        self.session = ChatSession(session_context, ChatEngineConfigModel())
+        self.session.start_signal_pump()
+
+    def tearDown(self):
+        self.session.stop_signal_pump()
+
+    def _emit_signal(self, signal: ChatSignal):
+        self.session.emit_signal(signal)
+        self.session.signal_queue.join()
+
+    def _add_handler(self, name: str, handler: RecordingHandler):
+        env = self.session.prepare_handler(handler, HandlerBaseInfo(name=name), HandlerBaseConfigModel())
+        handler.input_queue = env.input_queue
+        return env
+
+    def test_interrupt_drops_queued_avatar_data(self):
+        handler = RecordingHandler([ChatDataType.HUMAN_TEXT, ChatDataType.AVATAR_AUDIO])
+        env = self._add_handler("tts", handler)
+        env.input_queue.put(ChatData(type=ChatDataType.AVATAR_AUDIO))
+        env.input_queue.put(ChatData(type=ChatDataType.HUMAN_TEXT))
+        env.input_queue.put(ChatData(type=ChatDataType.AVATAR_AUDIO))
+        self.session.session_context.shared_states.enable_vad = False
+
+        self._emit_signal(ChatSignal(type=ChatSignalType.INTERRUPT, source_type=ChatSignalSourceType.CLIENT))
+
+        self.assertEqual(len(handler.signals), 1)
+        # producers are notified before their queued output is dropped
+        self.assertEqual(handler.queue_sizes_at_signal, [3])
+        self.assertEqual(env.input_queue.qsize(), 1)
+        self.assertEqual(env.input_queue.get_nowait().type, ChatDataType.HUMAN_TEXT)
+        self.assertTrue(self.session.session_context.shared_states.enable_vad)
+
+    def test_signal_reaches_every_handler_on_signal_thread(self):
+        failing = FailingHandler([ChatDataType.HUMAN_TEXT])
+        recording = RecordingHandler([ChatDataType.AVATAR_TEXT])
+        self._add_handler("failing", failing)
+        self._add_handler("recording", recording)
+
+        signal = ChatSignal(type=ChatSignalType.BEGIN, source_type=ChatSignalSourceType.CLIENT)
+        self._emit_signal(signal)
+
+        self.assertEqual(recording.signals, [signal])
+        self.assertEqual(recording.signal_threads, [self.session.signal_thread.name])
+
+    def test_emit_does_not_wait_for_handlers(self):
+        release = threading.Event()
+
+        class BlockingHandler(RecordingHandler):
+            def on_signal(self, context, signal):
+                release.wait(timeout=2)
+                super().on_signal(context, signal)
+
+        handler = BlockingHandler([ChatDataType.HUMAN_TEXT])
+        self._add_handler("llm", handler)
+        shared_states = self.session.session_context.shared_states
+        shared_states.enable_vad = False
+
+        t_start = time.monotonic()
+        self.session.emit_signal(ChatSignal(type=ChatSignalType.INTERRUPT))
+        self.session.emit_signal(ChatSignal(type=ChatSignalType.BEGIN))
+        self.assertLess(time.monotonic() - t_start, 0.5)
+        # turn state changes right away, handlers get the signals later and in order
+        self.assertEqual(shared_states.turn_epoch, 1)
+        self.assertTrue(shared_states.enable_vad)
+        self.assertEqual(handler.signals, [])
+        release.set()
+        self.session.signal_queue.join()
+        self.assertEqual([x.type for x in handler.signals], [ChatSignalType.INTERRUPT, ChatSignalType.BEGIN])
+
+    def test_interrupt_keeps_data_of_new_turn(self):
+        handler = RecordingHandler([ChatDataType.AVATAR_TEXT])
+        env = self._add_handler("tts", handler)
+        env.input_queue.put(ChatData(type=ChatDataType.AVATAR_TEXT, epoch=0))
+        env.input_queue.put(ChatData(type=ChatDataType.AVATAR_TEXT, epoch=1))
+
+        self._emit_signal(ChatSignal(type=ChatSignalType.INTERRUPT))
+
+        self.assertEqual([x.epoch for x in env.input_queue.queue], [1])
+
+    def test_client_end_enables_vad(self):
+        self.session.session_context.shared_states.enable_vad = False
+        self._emit_signal(ChatSignal(type=ChatSignalType.END, source_type=ChatSignalSourceType.CLIENT))
+        self.assertTrue(self.session.session_context.shared_states.enable_vad)
+
+    def test_handler_context_forwards_signal(self):
+        handler = RecordingHandler([ChatDataType.HUMAN_TEXT])
+        env = self._add_handler("llm", handler)
+        env.context.signal_emitter = self.session.emit_signal
+
+        env.context.emit_signal(ChatSignal(type=ChatSignalType.INTERRUPT))
+        self.session.signal_queue.join()
+
+        self.assertEqual([x.type for x in handler.signals], [ChatSignalType.INTERRUPT])
+
+    def test_interrupt_advances_turn_epoch(self):
+        shared_states = self.session.session_context.shared_states
+        self.assertEqual(shared_states.turn_epoch, 0)
+        self.session.emit_signal(ChatSignal(type=ChatSignalType.INTERRUPT))
+        self.session.emit_signal(ChatSignal(type=ChatSignalType.BEGIN))
+        self.assertEqual(shared_states.turn_epoch, 1)
+
+    def test_stale_avatar_data_is_not_distributed(self):
+        handler = RecordingHandler([ChatDataType.AVATAR_TEXT, ChatDataType.HUMAN_TEXT])
+        env = self._add_handler("tts", handler)
+        self.session.emit_signal(ChatSignal(type=ChatSignalType.INTERRUPT))
+        session_context = self.session.session_context
+
+        for data_type in (ChatDataType.AVATAR_TEXT, ChatDataType.HUMAN_TEXT):
+            ChatSession.distribute_data(ChatData(source="llm", type=data_type, epoch=0),
+                                        self.session.data_sinks, self.session.outputs, session_context)
+        ChatSession.distribute_data(ChatData(source="llm", type=ChatDataType.AVATAR_TEXT, epoch=1),
+                                    self.session.data_sinks, self.session.outputs, session_context)
+
+        self.assertEqual([(x.type, x.epoch) for x in env.input_queue.queue],
+                         [(ChatDataType.HUMAN_TEXT, 0), (ChatDataType.AVATAR_TEXT, 1)])
+
+    def test_handler_output_keeps_input_epoch(self):
+        session_context = self.session.session_context
+        session_context.shared_states.turn_epoch = 3
+        output_info = {ChatDataType.AVATAR_AUDIO: HandlerDataInfo(type=ChatDataType.AVATAR_AUDIO)}
+        chat_data = ChatSession._packet_chat_data("tts", output_info, session_context,
+                                                  ChatData(type=ChatDataType.AVATAR_AUDIO), 2)
+        self.assertEqual(chat_data.epoch, 2)
+        chat_data = ChatSession._packet_chat_data("tts", output_info, session_context,
+                                                  ChatData(type=ChatDataType.AVATAR_AUDIO))
+        self.assertEqual(chat_data.epoch, 3)
+
+    def test_pump_skips_stale_input(self):
+        tts = RecordingHandler([ChatDataType.AVATAR_TEXT])
+        avatar = RecordingHandler([ChatDataType.AVATAR_AUDIO])
+        tts_env = self._add_handler("tts", tts)
+        avatar_env = self._add_handler("avatar", avatar)
+        tts_env.output_info = {ChatDataType.AVATAR_AUDIO: HandlerDataInfo(type=ChatDataType.AVATAR_AUDIO)}
+        session_context = self.session.session_context
+        session_context.shared_states.turn_epoch = 1
+        tts_env.input_queue.put(ChatData(source="llm", type=ChatDataType.AVATAR_TEXT, epoch=0))
+        tts_env.input_queue.put(ChatData(source="llm", type=ChatDataType.AVATAR_TEXT, epoch=1))
+
+        session_context.shared_states.active = True
+        pump = threading.Thread(target=ChatSession.handler_pumper,
+                                args=(session_context, tts_env, self.session.data_sinks, self.session.outputs))
+        pump.start()
+        deadline = time.monotonic() + 2
+        while len(tts.handled) < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        session_context.shared_states.active = False
+        pump.join()
+
+        self.assertEqual([x.epoch for x in tts.handled], [1])
+        self.assertEqual(tts_env.stale_dropped, 1)
+        self.assertEqual([x.epoch for x in avatar_env.input_queue.queue], [1])
+
+
+    def test_outputs_after_interrupt_during_handle_are_stale(self):
+        session = self.session
+
+        class InterruptedLLM(RecordingHandler):
+            def handle(self, context, inputs, output_definitions):
+                self.handled.append(inputs)
+                yield ChatData(type=ChatDataType.AVATAR_TEXT)
+                # the user barges in while the turn is still streaming
+                session.emit_signal(ChatSignal(type=ChatSignalType.INTERRUPT))
+                yield ChatData(type=ChatDataType.AVATAR_TEXT)
+
+        llm = InterruptedLLM([ChatDataType.HUMAN_TEXT])
+        tts = RecordingHandler([ChatDataType.AVATAR_TEXT])
+        llm_env = self._add_handler("llm", llm)
+        tts_env = self._add_handler("tts", tts)
+        llm_env.output_info = {ChatDataType.AVATAR_TEXT: HandlerDataInfo(type=ChatDataType.AVATAR_TEXT)}
+        session_context = session.session_context
+        llm_env.input_queue.put(ChatData(source="asr", type=ChatDataType.HUMAN_TEXT, epoch=0))
+
+        session_context.shared_states.active = True
+        pump = threading.Thread(target=ChatSession.handler_pumper,
+                                args=(session_context, llm_env, session.data_sinks, session.outputs))
+        pump.start()
+        deadline = time.monotonic() + 2
+        while len(llm.handled) < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        session_context.shared_states.active = False
+        pump.join()
+        session.signal_queue.join()
+
+        self.assertEqual(session_context.shared_states.turn_epoch, 1)
+        # the chunk queued before the interrupt is dropped by it, the one after is never distributed
+        self.assertEqual(list(tts_env.input_queue.queue), [])
+
+
+    def _submitter(self, name, env):
+        env.context.data_submitter = ChatDataSubmitter(name, env.output_info, self.session.session_context,
+                                                       self.session.data_sinks, self.session.outputs)
+        return env.context.data_submitter
+
+    def test_context_submit_after_interrupt_is_stale(self):
+        session = self.session
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        class SubmittingTTS(RecordingHandler):
+            def handle(self, context, inputs, output_definitions):
+                self.handled.append(inputs)
+                context.submit_data(ChatData(type=ChatDataType.AVATAR_AUDIO))
+                session.emit_signal(ChatSignal(type=ChatSignalType.INTERRUPT))
+                context.submit_data(ChatData(type=ChatDataType.AVATAR_AUDIO))
+
+        class SlowAvatar(RecordingHandler):
+            def on_signal(self, context, signal):
+                release.wait(timeout=2)
+                super().on_signal(context, signal)
+
+        tts = SubmittingTTS([ChatDataType.AVATAR_TEXT])
+        tts_env = self._add_handler("tts", tts)
+        avatar_env = self._add_handler("avatar", SlowAvatar([ChatDataType.AVATAR_AUDIO]))
+        tts_env.output_info = {ChatDataType.AVATAR_AUDIO: HandlerDataInfo(type=ChatDataType.AVATAR_AUDIO)}
+        submitter = self._submitter("tts", tts_env)
+        session_context = session.session_context
+        tts_env.input_queue.put(ChatData(source="llm", type=ChatDataType.AVATAR_TEXT, epoch=0))
+
+        session_context.shared_states.active = True
+        pump = threading.Thread(target=ChatSession.handler_pumper,
+                                args=(session_context, tts_env, session.data_sinks, session.outputs))
+        pump.start()
+        deadline = time.monotonic() + 2
+        while len(tts.handled) < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        session_context.shared_states.active = False
+        pump.join()
+
+        # a worker thread of the handler submits for the input taken last while the interrupt is processed
+        worker = threading.Thread(target=tts_env.context.submit_data,
+                                  args=(ChatData(type=ChatDataType.AVATAR_AUDIO),))
+        worker.start()
+        worker.join()
+        self.assertEqual(submitter.epoch, 0)
+        release.set()
+        session.signal_queue.join()
+
+        # the chunk submitted before the interrupt is dropped by it, the ones after are never distributed
+        self.assertEqual(list(avatar_env.input_queue.queue), [])
+        # once the handlers processed the interrupt, worker output belongs to the new turn
+        self.assertIsNone(submitter.epoch)
+        tts_env.context.submit_data(ChatData(type=ChatDataType.AVATAR_AUDIO))
+        self.assertEqual([x.epoch for x in avatar_env.input_queue.queue], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
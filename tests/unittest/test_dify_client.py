@@ -0,0 +1,183 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from aiohttp import web
+
+from handlers.llm.dify.dify_client import DifyClient, SSEParser
+
+
+class StubDifyServer:
+    """
+    Minimal local stand-in for the Dify chatflow API.
+    """
+
+    def __init__(self, upload_delay: float = 0.0, chunk_delay: float = 0.0):
+        self.upload_delay = upload_delay
+        self.chunk_delay = chunk_delay
+        self.received_payloads = []
+        self.upload_times = []
+        self.peers = []
+        self.port = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    async def _handle_upload(self, request: web.Request):
+        self.peers.append(request.transport.get_extra_info("peername"))
+        form = await request.post()
+        assert form["user"]
+        start = time.monotonic()
+        await asyncio.sleep(self.upload_delay)
+        self.upload_times.append((start, time.monotonic()))
+        return web.json_response({"id": f"file-{len(self.upload_times)}"})
+
+    async def _handle_chat(self, request: web.Request):
+        self.peers.append(request.transport.get_extra_info("peername"))
+        payload = await request.json()
+        self.received_payloads.append(payload)
+        if payload["response_mode"] != "streaming":
+            return web.json_response({"event": "message", "answer": "blocking answer", "conversation_id": "conv-1"})
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        events = [
+            {"event": "workflow_started", "conversation_id": "conv-1"},
+            {"event": "message", "answer": "Hello", "conversation_id": "conv-1"},
+            {"event": "message", "answer": ", world", "conversation_id": "conv-1"},
+            {"event": "message_end", "conversation_id": "conv-1"},
+        ]
+        await response.write(b"event: ping\n\n")
+        for event in events:
+            raw = f"data: {json.dumps(event)}\n\n".encode()
+            # split events across writes to exercise the incremental parser
+            await response.write(raw[:7])
+            await asyncio.sleep(self.chunk_delay)
+            await response.write(raw[7:])
+        await response.write_eof()
+        return response
+
+    def start(self):
+        started = threading.Event()
+
+        async def _setup():
+            app = web.Application()
+            app.router.add_post("/v1/files/upload", self._handle_upload)
+            app.router.add_post("/v1/chat-messages", self._handle_chat)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(_setup())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+        started.wait(5)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+
+class TestSSEParser(unittest.TestCase):
+    def test_split_chunks(self):
+        parser = SSEParser()
+        raw = b'event: message\ndata: {"answer": "a"}\n\ndata: line1\r\ndata: line2\r\n\r\n'
+        events = []
+        for i in range(len(raw)):
+            events.extend(parser.feed(raw[i:i + 1]))
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0].event, "message")
+        self.assertEqual(json.loads(events[0].data), {"answer": "a"})
+        self.assertEqual(events[1].data, "line1\nline2")
+
+    def test_comment_and_flush(self):
+        parser = SSEParser()
+        self.assertEqual(parser.feed(b": keep-alive\n\ndata: tail"), [])
+        events = parser.flush()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].data, "tail")
+
+
+class TestDifyClient(unittest.TestCase):
+    def setUp(self):
+        self.server = StubDifyServer(upload_delay=0.3, chunk_delay=0.05)
+        self.server.start()
+        self.client = DifyClient(f"http://127.0.0.1:{self.server.port}/v1", "test-key", timeout=5)
+        self.client.start()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    @staticmethod
+    def _payload(mode="streaming"):
+        return {"inputs": {}, "query": "hi", "response_mode": mode, "conversation_id": None, "user": "user-1"}
+
+    def test_streaming_messages(self):
+        events = list(self.client.chat(self._payload()))
+        answers = [x["answer"] for x in events if x.get("event") == "message"]
+        self.assertEqual(answers, ["Hello", ", world"])
+        self.assertEqual(events[-1]["event"], "message_end")
+
+    def test_streaming_is_incremental(self):
+        arrival = []
+        for event in self.client.chat(self._payload()):
+            arrival.append(time.monotonic())
+        # events are delivered as they are received, not after the whole body
+        self.assertGreater(arrival[-1] - arrival[0], 0.1)
+
+    def test_blocking_mode(self):
+        events = list(self.client.chat(self._payload("blocking")))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["answer"], "blocking answer")
+
+    def test_concurrent_image_upload(self):
+        start = time.monotonic()
+        events = list(self.client.chat(self._payload(), [b"img0", b"img1", b"img2"]))
+        duration = time.monotonic() - start
+        self.assertTrue(any(x.get("event") == "message" for x in events))
+        self.assertEqual(len(self.server.upload_times), 3)
+        self.assertLess(duration, 0.3 * 3)
+        files = self.server.received_payloads[-1]["files"]
+        self.assertEqual(sorted(x["upload_file_id"] for x in files), ["file-1", "file-2", "file-3"])
+
+    def test_concurrent_image_encoding(self):
+        def slow_encode(image):
+            time.sleep(0.3)
+            return image.encode()
+
+        start = time.monotonic()
+        events = list(self.client.chat(self._payload(), ["img0", "img1", "img2"], encode_image=slow_encode))
+        duration = time.monotonic() - start
+        self.assertTrue(any(x.get("event") == "message" for x in events))
+        self.assertEqual(len(self.server.upload_times), 3)
+        # encoding and upload of each image overlap with the others
+        self.assertLess(duration, 0.6 * 3)
+
+    def test_connection_reuse(self):
+        list(self.client.chat(self._payload()))
+        list(self.client.chat(self._payload()))
+        self.assertEqual(len(self.server.peers), 2)
+        self.assertEqual(self.server.peers[0], self.server.peers[1])
+
+    def test_server_error(self):
+        client = DifyClient(f"http://127.0.0.1:{self.server.port}/v1/missing", "test-key", timeout=5)
+        try:
+            events = list(client.chat(self._payload()))
+        finally:
+            client.close()
+        self.assertEqual(events[0]["event"], "error")
+        self.assertEqual(events[0]["status"], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from handlers.avatar.liteavatar.media.frame_compositor import FrameCompositor, FramePool
+
+
+def make_background(bg_frame_id: int) -> np.ndarray:
+    return np.random.default_rng(bg_frame_id).integers(0, 255, (8, 10, 3), dtype=np.uint8)
+
+
+class TestFrameCompositor(unittest.TestCase):
+    def test_flip_into_pool(self):
+        compositor = FrameCompositor(2)
+        image = make_background(0)
+        frames = [compositor.flip(image) for _ in range(3)]
+        np.testing.assert_array_equal(frames[0], cv2.flip(image, 1))
+        self.assertIsNot(frames[0], frames[1])
+        self.assertIs(frames[0], frames[2])
+
+    def test_pool_follows_frame_shape(self):
+        pool = FramePool(2)
+        first = pool.acquire((4, 4, 3))
+        pool.acquire((4, 4, 3))
+        self.assertIs(pool.acquire((4, 4, 3)), first)
+        self.assertEqual(pool.acquire((2, 2, 3)).shape, (2, 2, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import threading
+import time
+import unittest
+
+from chat_engine.core.handler_load_planner import HandlerLoadPlanner
+
+
+class TestHandlerLoadPlanner(unittest.TestCase):
+    def test_plan_groups_by_priority(self):
+        items = [("asr", 0), ("avatar", -999), ("llm", 0), ("tts", 1)]
+        stages = HandlerLoadPlanner.plan(items, priority_of=lambda x: x[1])
+        self.assertEqual([[x[0] for x in stage] for stage in stages], [["avatar"], ["asr", "llm"], ["tts"]])
+
+    def test_stages_run_in_order_and_same_stage_in_parallel(self):
+        events = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(2, timeout=2)
+
+        def make_load(name, priority):
+            def load():
+                if priority == 0:
+                    # both handlers of this stage must be loading at the same time to pass the barrier
+                    barrier.wait()
+                with lock:
+                    events.append(name)
+            return load
+
+        items = [("asr", 0), ("avatar", -999), ("llm", 0), ("tts", 1)]
+        load_times = HandlerLoadPlanner(max_workers=4).run(items, priority_of=lambda x: x[1],
+                                                            name_of=lambda x: x[0],
+                                                            load_of=lambda x: make_load(*x))
+        self.assertEqual(events[0], "avatar")
+        self.assertEqual(set(events[1:3]), {"asr", "llm"})
+        self.assertEqual(events[3], "tts")
+        self.assertEqual(set(load_times), {"asr", "avatar", "llm", "tts"})
+
+    def test_failure_stops_later_stages(self):
+        loaded = []
+
+        def make_load(name):
+            def load():
+                if name == "asr":
+                    time.sleep(0.01)
+                    raise RuntimeError("model missing")
+                loaded.append(name)
+            return load
+
+        items = [("asr", 0), ("llm", 0), ("tts", 1)]
+        with self.assertRaises(RuntimeError):
+            HandlerLoadPlanner(max_workers=2).run(items, priority_of=lambda x: x[1], name_of=lambda x: x[0],
+                                                  load_of=lambda x: make_load(x[0]))
+        self.assertEqual(loaded, ["llm"])
+
+
+if __name__ == '__main__':
+    unittest.main()
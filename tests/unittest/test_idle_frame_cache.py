@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from handlers.avatar.liteavatar.algo.idle_frame_cache import IdleFrameCache
+
+
+class TestIdleFrameCache(unittest.TestCase):
+    @staticmethod
+    def _frame(value):
+        return np.full((4, 6, 3), value, dtype=np.uint8)
+
+    def test_lazy_fill(self):
+        cache = IdleFrameCache(3)
+        self.assertIsNone(cache.get(1))
+        cache.put(1, self._frame(1))
+        np.testing.assert_array_equal(cache.get(1), self._frame(1))
+        self.assertIsNone(cache.get(0))
+        self.assertIsNone(cache.get(5))
+        self.assertFalse(cache.is_complete())
+
+    def test_mmap_file_reused_when_complete(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "idle_frames.npy")
+            cache = IdleFrameCache(2, file_path)
+            cache.put(0, self._frame(10))
+            self.assertFalse(os.path.exists(file_path))
+            cache.put(1, self._frame(11))
+            self.assertTrue(os.path.exists(file_path))
+            self.assertEqual(os.listdir(tmp_dir), ["idle_frames.npy"])
+
+            reloaded = IdleFrameCache(2, file_path)
+            self.assertTrue(reloaded.is_complete())
+            np.testing.assert_array_equal(reloaded.get(1), self._frame(11))
+
+    def test_mismatched_file_rebuilt(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "idle_frames.npy")
+            np.save(file_path, np.zeros((5, 4, 6, 3), dtype=np.uint8))
+            cache = IdleFrameCache(2, file_path)
+            self.assertFalse(cache.is_complete())
+            self.assertIsNone(cache.get(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
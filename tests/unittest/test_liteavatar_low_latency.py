@@ -0,0 +1,132 @@
+import time
+import unittest
+
+import numpy as np
+
+from handlers.avatar.liteavatar.algo.base_algo_adapter import BaseAlgoAdapter
+from handlers.avatar.liteavatar.avatar_output_handler import AvatarOutputHandler
+from handlers.avatar.liteavatar.avatar_processor import AvatarProcessor
+from handlers.avatar.liteavatar.media.speech_audio_processor import SpeechAudioProcessor
+from handlers.avatar.liteavatar.model.algo_model import AvatarAlgoConfig, AvatarInitOption, AvatarStatus
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+
+SAMPLE_RATE = 24000
+
+
+class WindowAdapter(BaseAlgoAdapter):
+    """
+    one signal per frame of the whole algo audio like audio2param, the signal holds the audio level of its frame
+    """
+
+    def __init__(self, slice_duration=1.0, context_duration=0.0):
+        self.fps = 25
+        self.slice_duration = slice_duration
+        self.context_duration = context_duration
+
+    def init(self, init_option: AvatarInitOption):
+        self.fps = init_option.video_frame_rate
+
+    def audio2signal(self, audio_slice):
+        audio = np.frombuffer(audio_slice.algo_audio_data, dtype=np.int16)
+        frame_size = audio_slice.algo_audio_sample_rate // self.fps
+        return [int(audio[i:i + frame_size].max()) for i in range(0, len(audio), frame_size)]
+
+    def signal2img(self, signal_data, avatar_status: AvatarStatus):
+        return np.full((4, 4, 3), signal_data, dtype=np.uint8), 0
+
+    def mouth2full(self, mouth_image, bg_frame_id):
+        return mouth_image
+
+    def get_idle_signal(self, idle_frame_count):
+        return [0] * idle_frame_count
+
+    def get_algo_config(self):
+        return AvatarAlgoConfig(input_audio_sample_rate=SAMPLE_RATE, input_audio_slice_duration=self.slice_duration,
+                                input_audio_context_duration=self.context_duration)
+
+
+class RecordingOutputHandler(AvatarOutputHandler):
+    def __init__(self):
+        self.speaking_frames = []
+
+    def on_audio(self, audio_result):
+        pass
+
+    def on_video(self, video_result):
+        if video_result.avatar_status == AvatarStatus.SPEAKING:
+            self.speaking_frames.append((time.monotonic(), int(video_result.video_data.max())))
+
+    def on_start(self, init_option):
+        pass
+
+    def on_stop(self):
+        pass
+
+    def on_avatar_status_change(self, speech_id, avatar_status):
+        pass
+
+
+def make_speech(frame_count: int) -> bytes:
+    # every frame has its own audio level so dropped or repeated frames show up
+    frame_size = SAMPLE_RATE // 25
+    return np.repeat(np.arange(1, frame_count + 1, dtype=np.int16), frame_size).tobytes()
+
+
+class TestLowLatencySlices(unittest.TestCase):
+    def test_slices_carry_context(self):
+        processor = SpeechAudioProcessor(SAMPLE_RATE, SAMPLE_RATE, 0.32, context_duration=0.68)
+        audio = np.arange(SAMPLE_RATE, dtype=np.int16)
+        slices = processor.get_speech_audio_slice(
+            SpeechAudio(speech_id="speech", sample_rate=SAMPLE_RATE, audio_data=audio.tobytes()))
+        self.assertEqual(len(slices), 3)
+        slice_size = round(0.32 * SAMPLE_RATE)
+        context_size = round(0.68 * SAMPLE_RATE)
+        for i, audio_slice in enumerate(slices):
+            self.assertAlmostEqual(audio_slice.get_audio_duration(), 0.32)
+            self.assertEqual(audio_slice.algo_context_duration, 0.68)
+            algo_audio = np.frombuffer(audio_slice.algo_audio_data, dtype=np.int16)
+            self.assertEqual(len(algo_audio), slice_size + context_size)
+            # the window ends with the slice, preceded by earlier audio or silence at the speech start
+            expected = np.concatenate((np.zeros(context_size, dtype=np.int16), audio))
+            np.testing.assert_array_equal(algo_audio, expected[i * slice_size:(i + 1) * slice_size + context_size])
+
+        # a new speech starts with a silent context again
+        audio_slice = processor.get_speech_audio_slice(
+            SpeechAudio(speech_id="next", sample_rate=SAMPLE_RATE, audio_data=audio[:slice_size].tobytes()))[0]
+        self.assertFalse(np.frombuffer(audio_slice.algo_audio_data, dtype=np.int16)[:context_size].any())
+
+    def _run_speech(self, adapter: WindowAdapter, frame_count: int):
+        processor = AvatarProcessor(adapter, AvatarInitOption(audio_sample_rate=SAMPLE_RATE, video_frame_rate=25,
+                                                              avatar_name="fake"))
+        output_handler = RecordingOutputHandler()
+        processor.register_output_handler(output_handler)
+        processor.start()
+        try:
+            time.sleep(0.2)
+            speech = make_speech(frame_count)
+            chunk_size = len(speech) // 10
+            start_time = time.monotonic()
+            # tts delivers the speech in 10 chunks at twice realtime
+            for i in range(10):
+                processor.add_audio(SpeechAudio(speech_id="speech", sample_rate=SAMPLE_RATE, end_of_speech=i == 9,
+                                                audio_data=speech[i * chunk_size:(i + 1) * chunk_size]))
+                time.sleep(frame_count / 25 / 20)
+            time.sleep(frame_count / 25 + 0.5)
+        finally:
+            processor.stop()
+        first_lip_motion = output_handler.speaking_frames[0][0] - start_time
+        return first_lip_motion, [level for _, level in output_handler.speaking_frames]
+
+    def test_low_latency_starts_earlier_with_same_frames(self):
+        default_latency, default_frames = self._run_speech(WindowAdapter(), 50)
+        low_latency, low_latency_frames = self._run_speech(WindowAdapter(0.32, 0.68), 50)
+        self.assertEqual(default_frames, list(range(1, 51)))
+        # the last slice is padded to whole slices with silent frames
+        self.assertEqual(low_latency_frames[:50], list(range(1, 51)))
+        self.assertFalse(any(low_latency_frames[50:]))
+        self.assertLess(low_latency, default_latency - 0.2)
+        self.assertLess(low_latency, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import time
+import unittest
+from unittest import mock
+
+from handlers.avatar.liteavatar.liteavatar_worker import Tts2FaceConfigModel, WorkerStatus
+from handlers.avatar.liteavatar.liteavatar_worker_manager import LiteAvatarWorkerManager
+
+
+class FakeSlot:
+    def __init__(self):
+        self.worker_status = WorkerStatus.IDLE
+        self.idle_since = time.monotonic()
+
+    def get_status(self):
+        return self.worker_status
+
+    def recruit(self):
+        self.worker_status = WorkerStatus.BUSY
+
+    def release(self):
+        self.worker_status = WorkerStatus.IDLE
+        self.idle_since = time.monotonic()
+
+
+class FakeWorker:
+    def __init__(self, sessions_per_worker):
+        self.slots = [FakeSlot() for _ in range(sessions_per_worker)]
+        self.alive = True
+        self.destroyed = False
+
+    def wait_ready(self, timeout=None):
+        return True
+
+    def is_ready(self):
+        return True
+
+    def is_alive(self):
+        return self.alive
+
+    def destroy(self):
+        self.alive = False
+        self.destroyed = True
+
+
+class TestLiteAvatarWorkerPool(unittest.TestCase):
+    def setUp(self):
+        interval_patch = mock.patch.object(LiteAvatarWorkerManager, "MAINTAIN_INTERVAL", 0.01)
+        interval_patch.start()
+        self.addCleanup(interval_patch.stop)
+
+    def _create_manager(self, **kwargs):
+        config = Tts2FaceConfigModel(**kwargs)
+        self.spawned = []
+
+        def factory():
+            worker = FakeWorker(config.sessions_per_worker)
+            self.spawned.append(worker)
+            return worker
+
+        manager = LiteAvatarWorkerManager(3, "", config, worker_factory=factory)
+        self.addCleanup(manager.destroy)
+        return manager
+
+    @staticmethod
+    def _wait_for(predicate, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    def test_prefork_min_idle(self):
+        manager = self._create_manager(min_idle_workers=2)
+        self.assertTrue(self._wait_for(lambda: len(manager.lite_avatar_workers) == 2))
+        time.sleep(0.05)
+        self.assertEqual(len(self.spawned), 2)
+
+    def test_spawn_on_demand_up_to_max(self):
+        manager = self._create_manager(min_idle_workers=0, max_workers=2)
+        first = manager.start_worker(timeout=1)
+        second = manager.start_worker(timeout=1)
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(second)
+        self.assertIsNone(manager.start_worker(timeout=0.1))
+
+        manager.release_worker(first)
+        self.assertIs(manager.start_worker(timeout=1), first)
+
+    def test_no_idle_slot_fails_fast_and_grows_pool(self):
+        manager = self._create_manager(min_idle_workers=0, max_workers=2)
+        start = time.monotonic()
+        self.assertIsNone(manager.start_worker())
+        self.assertLess(time.monotonic() - start, 0.1)
+        # the turned away session gets a slot spawned for its retry
+        self.assertTrue(self._wait_for(lambda: len(manager.lite_avatar_workers) == 1))
+        self.assertIsNotNone(manager.start_worker())
+        time.sleep(0.05)
+        self.assertEqual(len(self.spawned), 1)
+
+    def test_sessions_share_worker(self):
+        manager = self._create_manager(min_idle_workers=0, sessions_per_worker=2)
+        self.assertEqual(manager.max_workers, 2)
+        first = manager.start_worker(timeout=1)
+        second = manager.start_worker(timeout=1)
+        self.assertEqual(len(self.spawned), 1)
+        self.assertEqual(self.spawned[0].slots, [first, second])
+        manager.start_worker(timeout=1)
+        self.assertEqual(len(self.spawned), 2)
+
+    def test_reap_only_fully_idle_worker(self):
+        manager = self._create_manager(min_idle_workers=0, sessions_per_worker=2, worker_idle_ttl=0.05)
+        first = manager.start_worker(timeout=1)
+        manager.start_worker(timeout=1)
+        manager.release_worker(first)
+        time.sleep(0.2)
+        self.assertEqual(len(manager.lite_avatar_workers), 1)
+
+    def test_crashed_worker_replaced(self):
+        manager = self._create_manager(min_idle_workers=1)
+        self.assertTrue(self._wait_for(lambda: len(manager.lite_avatar_workers) == 1))
+        crashed = manager.lite_avatar_workers[0]
+        crashed.alive = False
+        self.assertTrue(self._wait_for(lambda: len(self.spawned) == 2 and len(manager.lite_avatar_workers) == 1))
+        self.assertNotIn(crashed, manager.lite_avatar_workers)
+
+    def test_reap_idle_after_ttl(self):
+        manager = self._create_manager(min_idle_workers=0, worker_idle_ttl=0.05)
+        manager.release_worker(manager.start_worker(timeout=1))
+        self.assertTrue(self._wait_for(lambda: len(manager.lite_avatar_workers) == 0))
+        self.assertTrue(self.spawned[0].destroyed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+
+import torch
+
+from handlers.llm.minicpm.minicpm_session_cache import FairLock, MiniCPMSessionCacheManager, tensor_bytes
+
+
+class FakeStreamingModel:
+    """
+    Holds streaming state of a single session like MiniCPM-o does.
+    """
+
+    def __init__(self):
+        self.reset_session()
+
+    def reset_session(self):
+        self.session_id = None
+        self.new_user_msg = True
+        self.llm_generated = False
+        self.llm_generate_completed = False
+        self.llm_past_key_values = None
+        self.audio_past_key_values = None
+
+    def prefill(self, session_id: str, length: int):
+        if self.session_id != session_id:
+            self.reset_session()
+            self.session_id = session_id
+        kv = torch.full((1, 2, length, 4), float(length), dtype=torch.float32)
+        if self.llm_past_key_values is None:
+            self.llm_past_key_values = ((kv, kv.clone()),)
+        else:
+            keys, values = self.llm_past_key_values[0]
+            self.llm_past_key_values = ((torch.cat([keys, kv], dim=2), torch.cat([values, kv], dim=2)),)
+
+
+class TestMiniCPMSessionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.model = FakeStreamingModel()
+        self.kv_bytes = 2 * 2 * 100 * 4 * 4
+        self.manager = MiniCPMSessionCacheManager(self.model, device="cpu",
+                                                  device_budget_bytes=self.kv_bytes * 2,
+                                                  host_budget_bytes=self.kv_bytes)
+
+    def _prefill(self, session_key: str, length: int = 100):
+        with self.manager.use(session_key):
+            self.model.prefill(session_key, length)
+
+    def test_sessions_keep_their_state(self):
+        self.manager.device_budget_bytes = self.kv_bytes * 10
+        self._prefill("a", 100)
+        self._prefill("b", 50)
+        self._prefill("a", 100)
+        with self.manager.use("a"):
+            self.assertEqual(self.model.session_id, "a")
+            self.assertEqual(self.model.llm_past_key_values[0][0].shape[2], 200)
+        with self.manager.use("b"):
+            self.assertEqual(self.model.llm_past_key_values[0][0].shape[2], 50)
+        self.assertEqual(self.manager.get_entry("a").nbytes, 2 * self.kv_bytes)
+
+    def test_lru_offload_and_eviction(self):
+        self._prefill("a")
+        self._prefill("b")
+        self._prefill("c")
+        # a is least recently used, device budget holds two caches
+        self.assertTrue(self.manager.get_entry("a").offloaded)
+        self.assertFalse(self.manager.get_entry("b").offloaded)
+        with self.manager.use("a"):
+            self.assertEqual(self.model.llm_past_key_values[0][0].shape[2], 100)
+        self.assertFalse(self.manager.get_entry("a").offloaded)
+        self.assertTrue(self.manager.get_entry("b").offloaded)
+        self._prefill("d")
+        # host budget holds one cache, b and c no longer fit
+        stats = self.manager.get_stats()
+        self.assertLessEqual(stats["device_bytes"], self.kv_bytes * 2)
+        self.assertLessEqual(stats["host_bytes"], self.kv_bytes)
+        self.assertTrue(self.manager.get_entry("b").evicted)
+        with self.manager.use("b"):
+            self.assertIsNone(self.model.llm_past_key_values)
+
+    def test_remove_session(self):
+        self._prefill("a")
+        self.manager.remove("a")
+        self.assertIsNone(self.manager.get_entry("a"))
+        self.assertIsNone(self.model.llm_past_key_values)
+
+    def test_tensor_bytes(self):
+        kv = ((torch.zeros(2, 3), torch.zeros(2, 3)), [torch.zeros(4, dtype=torch.float16)])
+        self.assertEqual(tensor_bytes(kv), 2 * 6 * 4 + 4 * 2)
+
+
+class TestFairLock(unittest.TestCase):
+
+    def test_granted_in_request_order(self):
+        lock = FairLock()
+        order = []
+        lock.acquire()
+        threads = []
+        for i in range(5):
+            thread = threading.Thread(target=lambda x=i: (lock.acquire(), order.append(x), lock.release()))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)
+        lock.release()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from handlers.avatar.musetalk.avatar_musetalk_asset_store import AvatarAssetStore, convert_pickle_assets
+
+
+def make_avatar_data(frame_count=3):
+    rng = np.random.default_rng(0)
+    frame_list = [rng.integers(0, 255, (48, 64, 3), dtype=np.uint8) for _ in range(frame_count)]
+    coord_list = [(10 + i, 8, 40 + i, 44) for i in range(frame_count)]
+    latent_list = [torch.randn(1, 8, 32, 32).half() for _ in range(frame_count)]
+    frames = frame_list + frame_list[::-1]
+    coords = coord_list + coord_list[::-1]
+    latents = latent_list + latent_list[::-1]
+    # masks cover the crop box and differ in size from frame to frame
+    masks = [rng.integers(0, 255, (30 + i, 36), dtype=np.uint8) for i in range(len(frames))]
+    mask_coords = [[0, 0, 36, 30 + i] for i in range(len(frames))]
+    return frames, masks, coords, mask_coords, latents
+
+
+class TestAvatarAssetStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.tmp_dir.name, "assets")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_store_matches(self, store, frames, masks, coords, mask_coords, latents):
+        self.assertEqual(len(store.frames), len(frames))
+        for expected, actual in zip(frames, store.frames):
+            np.testing.assert_array_equal(actual, expected)
+        for expected, actual in zip(masks, store.masks):
+            np.testing.assert_array_equal(actual, expected)
+        self.assertEqual(store.coords, [tuple(c) for c in coords])
+        self.assertEqual(store.mask_coords, [tuple(c) for c in mask_coords])
+        for expected, actual in zip(latents, store.latents):
+            self.assertEqual(actual.shape, expected.shape)
+            self.assertTrue(torch.equal(actual, expected))
+
+    def test_write_and_open(self):
+        data = make_avatar_data()
+        AvatarAssetStore.write(self.store_dir, *data)
+        self.assertTrue(AvatarAssetStore.exists(self.store_dir))
+        store = AvatarAssetStore.open(self.store_dir)
+        self.assert_store_matches(store, *data)
+
+    def test_frames_are_read_only_views(self):
+        AvatarAssetStore.write(self.store_dir, *make_avatar_data())
+        frame = AvatarAssetStore.open(self.store_dir).frames[0]
+        self.assertIs(type(frame), np.ndarray)
+        self.assertFalse(frame.flags.writeable)
+        with self.assertRaises(ValueError):
+            frame[0, 0, 0] = 1
+
+    def test_mirrored_cycle_stored_once(self):
+        frames, masks, coords, mask_coords, latents = make_avatar_data(frame_count=4)
+        AvatarAssetStore.write(self.store_dir, frames, masks, coords, mask_coords, latents)
+        with open(os.path.join(self.store_dir, "index.json")) as f:
+            index = json.load(f)
+        self.assertEqual(len(index["frames"]["blocks"]), 4)
+        self.assertEqual(index["frames"]["order"], [0, 1, 2, 3, 3, 2, 1, 0])
+        self.assertEqual(len(index["masks"]["blocks"]), 8)
+        self.assertEqual(os.path.getsize(os.path.join(self.store_dir, "frames.bin")), 4 * frames[0].nbytes)
+
+    def test_unsupported_version(self):
+        AvatarAssetStore.write(self.store_dir, *make_avatar_data())
+        index_path = os.path.join(self.store_dir, "index.json")
+        with open(index_path) as f:
+            index = json.load(f)
+        index["version"] += 1
+        with open(index_path, "w") as f:
+            json.dump(index, f)
+        with self.assertRaises(ValueError):
+            AvatarAssetStore.open(self.store_dir)
+
+    def test_convert_pickle_assets(self):
+        frames, masks, coords, mask_coords, latents = make_avatar_data()
+        avatar_path = self.tmp_dir.name
+        for name, value in [("frames.pkl", frames), ("masks.pkl", masks), ("coords.pkl", coords),
+                            ("mask_coords.pkl", mask_coords)]:
+            with open(os.path.join(avatar_path, name), "wb") as f:
+                pickle.dump(value, f)
+        torch.save(latents, os.path.join(avatar_path, "latents.pt"))
+        store_dir = convert_pickle_assets(avatar_path)
+        self.assertEqual(store_dir, self.store_dir)
+        store = AvatarAssetStore.open(store_dir)
+        self.assert_store_matches(store, frames, masks, coords, mask_coords, latents)
+        # pickle keeps the shared references of the mirrored cycle, so frames are stored once after conversion
+        self.assertEqual(os.path.getsize(os.path.join(store_dir, "frames.bin")), 3 * frames[0].nbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
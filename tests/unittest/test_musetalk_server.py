@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+import unittest
+
+import numpy as np
+import torch
+
+from handlers.avatar.liteavatar.liteavatar_worker import Tts2FaceEvent
+from handlers.avatar.liteavatar.model.audio_input import SpeechAudio
+from handlers.avatar.musetalk.avatar_musetalk_config import AvatarMuseTalkConfig
+from handlers.avatar.musetalk.avatar_musetalk_server import AvatarMuseTalkServer
+
+FPS = 25
+SAMPLE_RATE = 24000
+FRAME_SAMPLES = SAMPLE_RATE // FPS
+
+
+class FakeAvatar:
+    """Whisper features carry the audio level, frames carry the level of the feature they were made from."""
+    device = "cpu"
+    weight_dtype = torch.float32
+
+    def __init__(self):
+        self.unet_batches = []
+        self.lock = threading.Lock()
+
+    def extract_whisper_feature(self, segment, sampling_rate):
+        level = round(float(np.median(np.abs(segment[segment != 0]))), 2)
+        return torch.full((FPS, 50, 384), level)
+
+    def generate_frames_unet(self, whisper_chunks, start_idx, batch_size, idx_list=None):
+        with self.lock:
+            self.unet_batches.append(whisper_chunks[:, 0, 0].tolist())
+        levels = whisper_chunks[:, 0, 0].reshape(batch_size, 1, 1, 1)
+        return [levels.expand(batch_size, 4, 32, 32).clone(), idx_list]
+
+    def generate_frames_vae(self, pred_latents, idx_list, batch_size):
+        return [(np.full((4, 4, 3), pred_latents[i, 0, 0, 0].item(), dtype=np.float32), idx_list[i])
+                for i in range(batch_size)]
+
+    def res2combined(self, res_frame, idx):
+        return res_frame.copy()
+
+    def generate_idle_frame(self, idx):
+        return np.full((4, 4, 3), -1, dtype=np.float32)
+
+
+class Session:
+    def __init__(self, server, session_id):
+        self.session_id = session_id
+        self.audio = queue.Queue()
+        self.video = queue.Queue()
+        self.events = queue.Queue()
+        server.open_session(session_id, self.audio, self.video, self.events)
+
+    def speaking_levels(self):
+        levels = []
+        while not self.video.empty():
+            frame = self.video.get_nowait()
+            if frame[0, 0, 0] >= 0:
+                levels.append(round(float(frame[0, 0, 0]), 2))
+        return levels
+
+
+def speech(speech_id, level, frames, end_of_speech=True):
+    audio = np.full(frames * FRAME_SAMPLES, level, dtype=np.float32)
+    return SpeechAudio(speech_id=speech_id, end_of_speech=end_of_speech, audio_data=audio.tobytes(),
+                       sample_rate=SAMPLE_RATE)
+
+
+class TestMuseTalkServer(unittest.TestCase):
+    def setUp(self):
+        self.avatar = FakeAvatar()
+        self.config = AvatarMuseTalkConfig(fps=FPS, batch_size=10, output_audio_sample_rate=SAMPLE_RATE,
+                                           unet_batch_wait=0.2)
+        self.server = AvatarMuseTalkServer(self.avatar, self.config)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _wait_for_events(self, sessions, timeout=3):
+        deadline = time.time() + timeout
+        while time.time() < deadline and any(session.events.empty() for session in sessions):
+            time.sleep(0.02)
+
+    def test_sessions_share_unet_batches(self):
+        first = Session(self.server, "a")
+        second = Session(self.server, "b")
+        self.server.add_audio("a", speech("speech-a", 0.25, 5, end_of_speech=False))
+        self.server.add_audio("b", speech("speech-b", 0.5, 5, end_of_speech=False))
+        for session in [first, second]:
+            self.server.start_session(session.session_id)
+        self.server.start()
+        deadline = time.time() + 3
+        while time.time() < deadline and self.server.unet_valid_count < 10:
+            time.sleep(0.02)
+        self.assertEqual(self.server.unet_batch_count, 1)
+        self.assertEqual(sorted(self.avatar.unet_batches[0]), [0.25] * 5 + [0.5] * 5)
+
+    def test_frames_dispatched_to_their_session(self):
+        first = Session(self.server, "a")
+        second = Session(self.server, "b")
+        self.server.start()
+        for session in [first, second]:
+            self.server.start_session(session.session_id)
+        self.server.add_audio("a", speech("speech-a", 0.25, 7))
+        self.server.add_audio("b", speech("speech-b", 0.5, 4))
+        self._wait_for_events([first, second])
+        time.sleep(0.1)
+        self.assertEqual(first.speaking_levels(), [0.25] * 7)
+        self.assertEqual(second.speaking_levels(), [0.5] * 4)
+        self.assertEqual(first.events.get_nowait(), Tts2FaceEvent.SPEAKING_TO_LISTENING)
+        self.assertEqual(second.events.get_nowait(), Tts2FaceEvent.SPEAKING_TO_LISTENING)
+        first_audio = np.concatenate([first.audio.get_nowait()[0] for _ in range(first.audio.qsize())])
+        self.assertEqual(len(first_audio), 7 * FRAME_SAMPLES)
+        np.testing.assert_allclose(first_audio, 0.25)
+
+    def test_padding_when_single_session(self):
+        session = Session(self.server, "a")
+        self.server.start()
+        self.server.start_session("a")
+        self.server.add_audio("a", speech("speech-a", 0.25, 3))
+        self._wait_for_events([session])
+        self.assertEqual(self.server.unet_batch_count, 1)
+        self.assertEqual(self.server.unet_valid_count, 3)
+        self.assertEqual(self.avatar.unet_batches[0], [0.25] * 3 + [0.0] * 7)
+
+    def test_interrupt_only_affects_its_session(self):
+        first = Session(self.server, "a")
+        second = Session(self.server, "b")
+        self.server.add_audio("a", speech("speech-a", 0.25, 20))
+        self.server.add_audio("b", speech("speech-b", 0.5, 20))
+        self.server.interrupt("a")
+        for session in [first, second]:
+            self.server.start_session(session.session_id)
+        self.server.start()
+        self._wait_for_events([second])
+        time.sleep(0.1)
+        self.assertEqual(first.speaking_levels(), [])
+        self.assertEqual(second.speaking_levels(), [0.5] * 20)
+
+    def test_interrupt_during_feature_extraction(self):
+        session = Session(self.server, "a")
+        extracting = threading.Event()
+        release = threading.Event()
+        extract_whisper_feature = self.avatar.extract_whisper_feature
+
+        def blocking_extract(segment, sampling_rate):
+            extracting.set()
+            release.wait(timeout=3)
+            return extract_whisper_feature(segment, sampling_rate)
+
+        self.avatar.extract_whisper_feature = blocking_extract
+        self.server.start()
+        self.server.start_session("a")
+        self.server.add_audio("a", speech("speech-a", 0.25, 20))
+        self.assertTrue(extracting.wait(timeout=3))
+        self.server.interrupt("a")
+        release.set()
+        time.sleep(0.3)
+        self.assertEqual(session.speaking_levels(), [])
+        self.assertEqual(self.server.unet_valid_count, 0)
+
+    def test_interrupt_signals_listening_only_when_speaking(self):
+        session = Session(self.server, "a")
+        self.server.start()
+        self.server.start_session("a")
+        self.server.interrupt("a")
+        self.assertTrue(session.events.empty())
+        self.server.add_audio("a", speech("speech-a", 0.25, 3))
+        self._wait_for_events([session])
+        self.assertEqual(session.events.get_nowait(), Tts2FaceEvent.SPEAKING_TO_LISTENING)
+        self.server.interrupt("a")
+        self.assertTrue(session.events.empty())
+        self.server.add_audio("a", speech("speech-b", 0.25, 20))
+        self.server.interrupt("a")
+        self.assertEqual(session.events.get_nowait(), Tts2FaceEvent.SPEAKING_TO_LISTENING)
+
+    def test_close_session(self):
+        session = Session(self.server, "a")
+        self.server.start()
+        self.server.start_session("a")
+        self.assertEqual(self.server.session_count, 1)
+        self.server.close_session("a")
+        self.assertEqual(self.server.session_count, 0)
+        self.server.add_audio("a", speech("speech-a", 0.25, 3))
+        self.assertTrue(session.events.empty())
+
+
+if __name__ == '__main__':
+    unittest.main()
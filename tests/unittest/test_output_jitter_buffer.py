@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from service.rtc_service.output_jitter_buffer import AudioJitterBuffer, VideoFramePacer
+
+
+class TestAudioJitterBuffer(unittest.TestCase):
+    def test_rechunk_to_frame_size(self):
+        buffer = AudioJitterBuffer(frame_size=4, capacity_samples=16)
+        buffer.write(np.arange(3, dtype=np.float32)[np.newaxis, :])
+        self.assertIsNone(buffer.read_frame())
+        buffer.write(np.arange(3, 9, dtype=np.float32))
+        frames = [buffer.read_frame(), buffer.read_frame()]
+        np.testing.assert_array_equal(frames[0], [[0, 1, 2, 3]])
+        np.testing.assert_array_equal(frames[1], [[4, 5, 6, 7]])
+        self.assertIsNone(buffer.read_frame())
+        self.assertEqual(buffer.available, 1)
+
+    def test_wraps_around_ring(self):
+        buffer = AudioJitterBuffer(frame_size=4, capacity_samples=8)
+        output = []
+        for start in range(0, 40, 6):
+            buffer.write(np.arange(start, start + 6, dtype=np.int16))
+            while buffer.has_frame():
+                output.append(buffer.read_frame()[0])
+        np.testing.assert_array_equal(np.concatenate(output), np.arange(40))
+        self.assertEqual(buffer.stats.overruns, 0)
+
+    def test_underrun_fills_silence_then_goes_idle(self):
+        buffer = AudioJitterBuffer(frame_size=4, capacity_samples=16, max_gap_frames=2)
+        buffer.write(np.ones(6, dtype=np.float32))
+        buffer.read_frame()
+        np.testing.assert_array_equal(buffer.read_frame(pad=True), [[1, 1, 0, 0]])
+        np.testing.assert_array_equal(buffer.read_frame(pad=True), [[0, 0, 0, 0]])
+        np.testing.assert_array_equal(buffer.read_frame(pad=True), [[0, 0, 0, 0]])
+        self.assertIsNone(buffer.read_frame(pad=True))
+        self.assertFalse(buffer.playing)
+        self.assertEqual(buffer.stats.underruns, 3)
+
+    def test_overrun_drops_oldest(self):
+        buffer = AudioJitterBuffer(frame_size=2, capacity_samples=4)
+        buffer.write(np.arange(3, dtype=np.float32))
+        buffer.write(np.arange(3, 6, dtype=np.float32))
+        self.assertEqual(buffer.stats.overruns, 1)
+        np.testing.assert_array_equal(buffer.read_frame(), [[2, 3]])
+        np.testing.assert_array_equal(buffer.read_frame(), [[4, 5]])
+
+
+class TestVideoFramePacer(unittest.TestCase):
+    def test_frames_are_spaced_by_interval(self):
+        pacer = VideoFramePacer(fps=10)
+        frame = np.zeros((2, 2, 3), dtype=np.uint8)
+        self.assertEqual(pacer.wait_time(0.0), 0.0)
+        pacer.on_frame(frame, now=0.0)
+        self.assertAlmostEqual(pacer.wait_time(0.02), 0.08)
+        pacer.on_frame(frame, now=0.1)
+        self.assertAlmostEqual(pacer.wait_time(0.1), 0.1)
+        # far behind schedule, the clock restarts instead of bursting frames
+        pacer.on_frame(frame, now=1.0)
+        self.assertAlmostEqual(pacer.wait_time(1.0), 0.1)
+
+    def test_repeat_last_frame_on_underrun(self):
+        pacer = VideoFramePacer(fps=10, max_repeat_frames=2)
+        self.assertIsNone(pacer.repeat_frame(now=0.0))
+        frame = np.ones((2, 2, 3), dtype=np.uint8)
+        pacer.on_frame(frame, now=0.0)
+        self.assertIs(pacer.repeat_frame(now=0.1), frame)
+        self.assertIs(pacer.repeat_frame(now=0.2), frame)
+        self.assertIsNone(pacer.repeat_frame(now=0.3))
+        self.assertEqual(pacer.stats.underruns, 2)
+
+    def test_drop_when_lagging(self):
+        pacer = VideoFramePacer(fps=10, max_lag_frames=5)
+        self.assertEqual(pacer.frames_to_drop(5), 0)
+        self.assertEqual(pacer.frames_to_drop(8), 3)
+        self.assertEqual(pacer.stats.overruns, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
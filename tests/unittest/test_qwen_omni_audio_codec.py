@@ -0,0 +1,63 @@
+import base64
+import unittest
+
+import numpy as np
+
+from handlers.llm.qwen_omni.qwen_omni_audio_codec import Pcm16Encoder, Pcm16DeltaDecoder
+
+
+class TestPcm16Encoder(unittest.TestCase):
+
+    def test_float_matches_reference(self):
+        encoder = Pcm16Encoder(initial_capacity=16)
+        audio = np.random.uniform(-1.2, 1.2, size=(1, 1600)).astype(np.float32)
+        expected = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        encoded = encoder.encode_base64(audio)
+        self.assertEqual(encoded, base64.b64encode(expected.tobytes()).decode("ascii"))
+
+    def test_buffer_is_reused(self):
+        encoder = Pcm16Encoder(initial_capacity=3200)
+        first = encoder.to_int16(np.zeros(1600, dtype=np.float32))
+        second = encoder.to_int16(np.ones(800, dtype=np.float32))
+        self.assertTrue(np.shares_memory(first, second))
+        self.assertEqual(second[0], 32767)
+
+    def test_int16_passthrough(self):
+        encoder = Pcm16Encoder()
+        audio = np.arange(10, dtype=np.int16)
+        self.assertIs(encoder.to_int16(audio).base, audio.base if audio.base is not None else audio)
+
+
+class TestPcm16DeltaDecoder(unittest.TestCase):
+
+    @staticmethod
+    def _b64(samples: np.ndarray) -> str:
+        return base64.b64encode(samples.astype(np.int16).tobytes()).decode("ascii")
+
+    def test_coalesce_frame_aligned(self):
+        decoder = Pcm16DeltaDecoder(frame_size=480, chunk_samples=960)
+        source = np.random.randint(-32767, 32767, size=3000, dtype=np.int16)
+        outputs = []
+        for start in range(0, 3000, 300):
+            outputs.extend(decoder.feed_base64(self._b64(source[start:start + 300])))
+        for output in outputs:
+            self.assertEqual(output.shape[0], 1)
+            self.assertEqual(output.dtype, np.float32)
+            self.assertEqual(output.shape[1] % 480, 0)
+            self.assertGreaterEqual(output.shape[1], 960)
+        tail = decoder.flush()
+        self.assertIsNotNone(tail)
+        outputs.append(tail)
+        self.assertIsNone(decoder.flush())
+        merged = np.concatenate(outputs, axis=1)[0]
+        np.testing.assert_allclose(merged, source.astype(np.float32) / 32767.0, rtol=1e-6)
+
+    def test_invalid_delta(self):
+        decoder = Pcm16DeltaDecoder()
+        self.assertEqual(decoder.feed(b"\x00\x01\x02"), [])
+        self.assertEqual(decoder.feed_base64(""), [])
+        self.assertEqual(decoder.staged_samples, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import threading
+import time
+import unittest
+
+from handlers.llm.qwen_omni.qwen_omni_connection_pool import HeartbeatScheduler, QwenOmniConnectionPool
+
+
+class FakeConversation:
+    """
+    Stand-in for OmniRealtimeConversation, on_open is invoked inside connect() like the real one.
+    """
+
+    connect_delay = 0.0
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.session_updates = []
+        self.closed = False
+
+    def connect(self):
+        time.sleep(self.connect_delay)
+        self.callback.on_open()
+
+    def update_session(self, **kwargs):
+        self.session_updates.append(kwargs)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.callback.on_close(1000, "closed")
+
+
+class RecordingCallback:
+    def __init__(self):
+        self.events = []
+        self.closed = False
+
+    def on_open(self):
+        pass
+
+    def on_event(self, message):
+        self.events.append(message)
+
+    def on_close(self, close_status_code, close_msg):
+        self.closed = True
+
+
+class TestHeartbeatScheduler(unittest.TestCase):
+
+    def test_single_thread_runs_all_targets(self):
+        scheduler = HeartbeatScheduler()
+        counts = {"a": 0, "b": 0}
+        threads = set()
+
+        def make_beat(key):
+            def _beat():
+                counts[key] += 1
+                threads.add(threading.current_thread().name)
+            return _beat
+
+        scheduler.start()
+        try:
+            scheduler.register("a", make_beat("a"), 0.05)
+            scheduler.register("b", make_beat("b"), 0.1)
+            time.sleep(0.35)
+            scheduler.unregister("a")
+            count_a = counts["a"]
+            time.sleep(0.15)
+        finally:
+            scheduler.stop()
+        self.assertGreaterEqual(count_a, 4)
+        self.assertEqual(counts["a"], count_a)
+        self.assertGreaterEqual(counts["b"], 2)
+        self.assertEqual(len(threads), 1)
+
+
+class TestQwenOmniConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = HeartbeatScheduler()
+        self.scheduler.start()
+        self.pool = QwenOmniConnectionPool(
+            conversation_factory=FakeConversation,
+            session_update_params={"voice": "Chelsie"},
+            pool_size=2,
+            heartbeat_scheduler=self.scheduler,
+            heartbeat_interval_sec=0.05,
+        )
+
+    def tearDown(self):
+        self.pool.stop()
+        self.scheduler.stop()
+
+    def _wait_idle(self, count, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while self.pool.idle_count < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.pool.idle_count
+
+    def test_prewarm_and_checkout(self):
+        self.pool.start()
+        self.assertEqual(self._wait_idle(2), 2)
+        callback = RecordingCallback()
+        pooled = self.pool.acquire(callback)
+        self.assertTrue(pooled.is_connected)
+        self.assertEqual(pooled.conversation.session_updates[0], {"voice": "Chelsie"})
+        pooled.on_event({"type": "response.done"})
+        self.assertEqual(callback.events, [{"type": "response.done"}])
+        # refilled in background after checkout
+        self.assertEqual(self._wait_idle(2), 2)
+
+    def test_used_conversation_is_recycled(self):
+        self.pool.start()
+        self._wait_idle(2)
+        callback = RecordingCallback()
+        pooled = self.pool.acquire(callback)
+        self.pool.release(pooled, reusable=False)
+        self.assertTrue(pooled.conversation.closed)
+        self.assertFalse(callback.closed)
+
+    def test_unused_conversation_is_returned(self):
+        self.pool.pool_size = 1
+        pooled = self.pool.acquire(RecordingCallback())
+        self.assertIsNotNone(pooled)
+        self.pool.release(pooled, reusable=True)
+        self.assertEqual(self.pool.idle_count, 1)
+        self.assertIs(self.pool.acquire(RecordingCallback()), pooled)
+
+    def test_idle_heartbeat_and_health_check(self):
+        self.pool.start()
+        self._wait_idle(2)
+        time.sleep(0.2)
+        with self.pool._lock:
+            idle = list(self.pool._idle)
+        self.assertGreater(len(idle[0].conversation.session_updates), 1)
+        # server side close of an idle conversation removes it from the pool
+        idle[0].conversation.close()
+        self.assertNotIn(idle[0], self.pool._idle)
+        self.assertEqual(self._wait_idle(2), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
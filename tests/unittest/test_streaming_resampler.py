@@ -0,0 +1,74 @@
+import unittest
+
+import librosa
+import numpy as np
+
+from engine_utils.streaming_resampler import StreamingResampler
+
+RATE_PAIRS = [(24000, 16000), (16000, 24000), (22050, 24000), (48000, 16000)]
+
+
+def make_audio(sample_rate: int, duration: float = 1.0) -> np.ndarray:
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    audio = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 1234 * t) \
+        + 0.1 * np.sin(2 * np.pi * 3500 * t)
+    return audio.astype(np.float32)
+
+
+class TestStreamingResampler(unittest.TestCase):
+    def test_matches_librosa(self):
+        for orig_sr, target_sr in RATE_PAIRS:
+            with self.subTest(orig_sr=orig_sr, target_sr=target_sr):
+                audio = make_audio(orig_sr)
+                resampler = StreamingResampler(orig_sr, target_sr)
+                output = resampler.process(audio)
+                reference = librosa.resample(audio, orig_sr=orig_sr, target_sr=target_sr)
+                # compensate the causal delay and skip the filter warm up at both ends
+                output = output[resampler.delay:]
+                reference = reference[:len(output)]
+                margin = target_sr // 100
+                error = output[margin:-margin] - reference[margin:-margin]
+                snr = 10 * np.log10(np.sum(reference[margin:-margin] ** 2) / np.sum(error ** 2))
+                self.assertGreater(snr, 60)
+
+    def test_chunked_equals_whole(self):
+        for orig_sr, target_sr in RATE_PAIRS:
+            with self.subTest(orig_sr=orig_sr, target_sr=target_sr):
+                audio = make_audio(orig_sr)
+                whole = StreamingResampler(orig_sr, target_sr).process(audio)
+                resampler = StreamingResampler(orig_sr, target_sr)
+                chunks = []
+                start = 0
+                for size in [1, 7, 333, 1000, 4410, 16000]:
+                    chunks.append(resampler.process(audio[start:start + size]))
+                    start += size
+                chunks.append(resampler.process(audio[start:]))
+                np.testing.assert_allclose(np.concatenate(chunks), whole, atol=1e-6)
+
+    def test_output_length(self):
+        resampler = StreamingResampler(24000, 16000)
+        self.assertEqual(len(resampler.process(np.zeros(24000, dtype=np.float32))), 16000)
+        self.assertEqual(len(resampler.process(np.zeros(1, dtype=np.float32))), 1)
+        self.assertEqual(len(resampler.process(np.zeros(2, dtype=np.float32))), 1)
+        self.assertEqual(len(resampler.process(np.zeros(3, dtype=np.float32))), 2)
+        resampler = StreamingResampler(22050, 24000)
+        total = sum(len(resampler.process(np.zeros(16000, dtype=np.float32))) for _ in range(10))
+        self.assertEqual(total, int(np.ceil(160000 * 24000 / 22050)))
+
+    def test_reset(self):
+        audio = make_audio(24000, 0.1)
+        resampler = StreamingResampler(24000, 16000)
+        first = resampler.process(audio)
+        resampler.process(audio)
+        resampler.reset()
+        np.testing.assert_array_equal(resampler.process(audio), first)
+
+    def test_same_rate(self):
+        audio = make_audio(16000, 0.1)
+        resampler = StreamingResampler(16000, 16000)
+        self.assertEqual(resampler.delay, 0)
+        np.testing.assert_array_equal(resampler.process(audio), audio)
+
+
+if __name__ == '__main__':
+    unittest.main()
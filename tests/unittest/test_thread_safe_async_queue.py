@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from engine_utils.thread_safe_async_queue import ThreadSafeAsyncQueue
+
+
+class TestThreadSafeAsyncQueue(unittest.TestCase):
+    def test_put_from_thread_wakes_waiting_get(self):
+        data_queue = ThreadSafeAsyncQueue("test")
+
+        def producer():
+            time.sleep(0.05)
+            data_queue.put_nowait(time.monotonic())
+
+        async def consume():
+            thread = threading.Thread(target=producer)
+            thread.start()
+            put_time = await asyncio.wait_for(data_queue.get(), 1.0)
+            wake_delay = time.monotonic() - put_time
+            thread.join()
+            return wake_delay
+
+        wake_delay = asyncio.run(consume())
+        self.assertLess(wake_delay, 0.02)
+        self.assertEqual(data_queue.stats.get_count, 1)
+
+    def test_items_keep_order_across_threads(self):
+        data_queue = ThreadSafeAsyncQueue("test")
+        count = 2000
+
+        def producer():
+            for i in range(count):
+                data_queue.put_nowait(i)
+
+        async def consume():
+            thread = threading.Thread(target=producer)
+            thread.start()
+            result = [await asyncio.wait_for(data_queue.get(), 1.0) for _ in range(count)]
+            thread.join()
+            return result
+
+        self.assertEqual(asyncio.run(consume()), list(range(count)))
+
+    def test_timed_out_get_does_not_lose_items(self):
+        data_queue = ThreadSafeAsyncQueue("test")
+
+        async def consume():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(data_queue.get(), 0.01)
+            threading.Thread(target=data_queue.put_nowait, args=("late",)).start()
+            return await asyncio.wait_for(data_queue.get(), 1.0)
+
+        self.assertEqual(asyncio.run(consume()), "late")
+
+    def test_capacity_drops_oldest(self):
+        data_queue = ThreadSafeAsyncQueue("test", capacity=3)
+        for i in range(5):
+            data_queue.put_nowait(i)
+        self.assertEqual(data_queue.qsize(), 3)
+        self.assertEqual(data_queue.get_nowait(), 2)
+        stats = data_queue.get_stats()
+        self.assertEqual(stats["dropped"], 2)
+        self.assertEqual(stats["max_depth"], 3)
+        self.assertEqual(data_queue.clear(), 2)
+        self.assertTrue(data_queue.empty())
+        with self.assertRaises(asyncio.QueueEmpty):
+            data_queue.get_nowait()
+
+
+if __name__ == '__main__':
+    unittest.main()
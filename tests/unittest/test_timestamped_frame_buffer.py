@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+
+from engine_utils.timestamped_frame_buffer import TimestampedFrameBuffer
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((1, 4, 6, 3), value, dtype=np.uint8)
+
+
+class TestTimestampedFrameBuffer(unittest.TestCase):
+
+    def test_range_query(self):
+        buffer = TimestampedFrameBuffer(capacity=8)
+        for ts in range(0, 8000, 1000):
+            buffer.put(ts, _frame(ts // 1000))
+        timestamps, frames = buffer.query(2000, 5000)
+        self.assertEqual(timestamps.tolist(), [2000, 3000, 4000])
+        self.assertEqual([int(x[0, 0, 0, 0]) for x in frames], [2, 3, 4])
+        self.assertEqual(buffer.query(8000, 9000)[0].tolist(), [])
+
+    def test_zero_copy_views(self):
+        buffer = TimestampedFrameBuffer(capacity=4)
+        buffer.put(0, _frame(1))
+        buffer.put(100, _frame(2))
+        _, frames_a = buffer.query(0, 200)
+        _, frames_b = buffer.query(0, 200)
+        self.assertTrue(np.shares_memory(frames_a[0], frames_b[0]))
+        self.assertFalse(frames_a[0].flags.owndata)
+
+    def test_out_of_order(self):
+        buffer = TimestampedFrameBuffer(capacity=8)
+        for ts in [300, 100, 400, 200, 0]:
+            self.assertTrue(buffer.put(ts, _frame(ts // 100)))
+        timestamps, frames = buffer.query(0, 1000)
+        self.assertEqual(timestamps.tolist(), [0, 100, 200, 300, 400])
+        self.assertEqual([int(x[0, 0, 0, 0]) for x in frames], [0, 1, 2, 3, 4])
+
+    def test_late_frame_rejected(self):
+        buffer = TimestampedFrameBuffer(capacity=8)
+        for ts in [0, 100, 200, 300]:
+            buffer.put(ts, _frame(ts // 100))
+        buffer.query(0, 200)
+        buffer.release_before(200)
+        self.assertEqual(len(buffer), 2)
+        # range already consumed
+        self.assertFalse(buffer.put(150, _frame(9)))
+        self.assertEqual(buffer.late_dropped, 1)
+        # late but not yet consumed
+        self.assertTrue(buffer.put(250, _frame(7)))
+        self.assertEqual(buffer.query(200, 400)[0].tolist(), [200, 250, 300])
+
+    def test_overflow_evicts_oldest(self):
+        buffer = TimestampedFrameBuffer(capacity=3)
+        for ts in range(5):
+            buffer.put(ts, _frame(ts))
+        timestamps, frames = buffer.query(0, 10)
+        self.assertEqual(timestamps.tolist(), [2, 3, 4])
+        self.assertEqual([int(x[0, 0, 0, 0]) for x in frames], [2, 3, 4])
+        self.assertEqual(buffer.overflow_dropped, 2)
+        # older than everything in a full buffer
+        self.assertFalse(buffer.put(1, _frame(1)))
+        self.assertEqual(buffer.latest_timestamp(), 4)
+
+    def test_full_buffer_grows_for_needed_frames(self):
+        buffer = TimestampedFrameBuffer(capacity=2, max_capacity=4)
+        buffer.put(0, _frame(0))
+        _, kept = buffer.query(0, 1)
+        for ts in range(1, 5):
+            buffer.put(ts, _frame(ts))
+        self.assertEqual(buffer.capacity, 4)
+        # grown up to max_capacity, then the oldest is evicted
+        self.assertEqual(buffer.query(0, 10)[0].tolist(), [1, 2, 3, 4])
+        self.assertEqual(buffer.overflow_dropped, 1)
+        self.assertEqual(int(kept[0][0, 0, 0, 0]), 0)
+
+    def test_full_buffer_drops_expired_frames_first(self):
+        buffer = TimestampedFrameBuffer(capacity=3, max_capacity=6, retention=100)
+        for ts in [0, 50, 120]:
+            buffer.put(ts, _frame(ts // 10))
+        self.assertTrue(buffer.put(160, _frame(16)))
+        # 0 and 50 are more than retention older than the newest frame
+        self.assertEqual(buffer.query(0, 1000)[0].tolist(), [120, 160])
+        self.assertEqual(buffer.capacity, 3)
+        self.assertEqual(buffer.expired_dropped, 2)
+        self.assertEqual(buffer.overflow_dropped, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+
+from service.rtc_service.video_encoding import EncoderBitrateControl, VideoEncodingController, VideoEncodingProfile
+
+
+PROFILES = [
+    VideoEncodingProfile(name="high", max_size=0, bitrate=2000000, fps=30),
+    VideoEncodingProfile(name="low", max_size=360, bitrate=500000, fps=15),
+]
+
+
+class FakeEncoder:
+    # as the aiortc vp8 encoder, a REMB from the receiver sets target_bitrate
+    def __init__(self, bitrate):
+        self._target_bitrate = bitrate
+
+    @property
+    def target_bitrate(self):
+        return self._target_bitrate
+
+    @target_bitrate.setter
+    def target_bitrate(self, bitrate):
+        self._target_bitrate = bitrate
+
+
+def make_sender(encoder):
+    sender = type("FakeSender", (), {})()
+    setattr(sender, "_RTCRtpSender__encoder", encoder)
+    return sender
+
+
+class TestEncoderBitrateControl(unittest.TestCase):
+    def test_caps_encoder_and_keeps_estimate(self):
+        encoder = FakeEncoder(3000000)
+        control = EncoderBitrateControl(make_sender(encoder))
+        self.assertEqual(control.update(2000000), 3000000)
+        self.assertEqual(encoder.target_bitrate, 2000000)
+        # no new estimate, the capped value is not mistaken for one
+        self.assertEqual(control.update(2500000), 3000000)
+        self.assertEqual(encoder.target_bitrate, 2500000)
+        encoder.target_bitrate = 400000
+        self.assertEqual(control.update(500000), 400000)
+        self.assertEqual(encoder.target_bitrate, 400000)
+
+    def test_no_encoder_accessible(self):
+        self.assertIsNone(EncoderBitrateControl(make_sender(None)).update(500000))
+        self.assertIsNone(EncoderBitrateControl(make_sender(object())).update(500000))
+
+
+class TestVideoEncodingController(unittest.TestCase):
+    def test_fixed_profile_ignores_bandwidth(self):
+        controller = VideoEncodingController(PROFILES, 30, "low")
+        controller.update_bandwidth(10000000, now=100)
+        self.assertEqual(controller.profile.name, "low")
+
+    def test_bandwidth_switches_down_at_once_and_up_after_interval(self):
+        controller = VideoEncodingController(PROFILES, 30, "auto", switch_interval=5)
+        self.assertEqual(controller.profile.name, "high")
+        controller.update_bandwidth(800000, now=controller._last_switch_time + 0.1)
+        self.assertEqual(controller.profile.name, "low")
+        switch_time = controller._last_switch_time
+        controller.update_bandwidth(3000000, now=switch_time + 1)
+        self.assertEqual(controller.profile.name, "low")
+        controller.update_bandwidth(3000000, now=switch_time + 6)
+        self.assertEqual(controller.profile.name, "high")
+        self.assertEqual(controller.switch_count, 2)
+
+    def test_loss_steps_down(self):
+        controller = VideoEncodingController(PROFILES, 30, "auto")
+        controller.update_loss(0.2)
+        self.assertEqual(controller.profile.name, "low")
+        controller.update_loss(0.2)
+        self.assertEqual(controller.profile.name, "low")
+
+    def test_process_downscales_and_decimates(self):
+        controller = VideoEncodingController(PROFILES, 30, "low")
+        frame = np.zeros((1280, 720, 3), dtype=np.uint8)
+        outputs = [controller.process(frame) for _ in range(30)]
+        kept = [x for x in outputs if x is not None]
+        self.assertEqual(len(kept), 15)
+        self.assertEqual(kept[0].shape, (360, 202, 3))
+        self.assertEqual(controller.decimated_frames, 15)
+
+    def test_high_profile_keeps_frame(self):
+        controller = VideoEncodingController(PROFILES, 30, "high")
+        frame = np.zeros((1280, 720, 3), dtype=np.uint8)
+        self.assertIs(controller.process(frame), frame)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from chat_engine.common.handler_base import HandlerDataInfo
+from chat_engine.core.chat_session import ChatSession, DataSink
+from chat_engine.data_models.chat_data_type import ChatDataType
+from engine_utils.video_ingest_filter import VideoIngestFilter
+
+
+class TestVideoIngestFilter(unittest.TestCase):
+    def test_decimate_to_max_rate(self):
+        ingest_filter = VideoIngestFilter(max_frame_rate=2)
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        passed = [ingest_filter.process(frame, i / 30) is not None for i in range(60)]
+        self.assertEqual([i for i, x in enumerate(passed) if x], [0, 15, 30, 45])
+        self.assertEqual(ingest_filter.stats.decimated, 56)
+
+    def test_downscale_to_max_size(self):
+        ingest_filter = VideoIngestFilter(max_frame_size=320)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.assertEqual(ingest_filter.process(frame, 0).shape, (240, 320, 3))
+        small_frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        self.assertIs(ingest_filter.process(small_frame, 1), small_frame)
+        self.assertEqual(ingest_filter.stats.resized, 1)
+
+    def test_unlimited_passes_everything(self):
+        ingest_filter = VideoIngestFilter()
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.assertTrue(all(ingest_filter.process(frame, 0) is frame for _ in range(5)))
+
+
+class TestMergeConsumeInfo(unittest.TestCase):
+    @staticmethod
+    def _sink(max_frame_size, max_frame_rate):
+        return DataSink(consume_info=HandlerDataInfo(type=ChatDataType.CAMERA_VIDEO, max_frame_size=max_frame_size,
+                                                     max_frame_rate=max_frame_rate))
+
+    def test_largest_requirement_wins(self):
+        merged = ChatSession.merge_consume_info(ChatDataType.CAMERA_VIDEO, [self._sink(640, 1), self._sink(1280, 2)])
+        self.assertEqual((merged.max_frame_size, merged.max_frame_rate), (1280, 2))
+
+    def test_unlimited_consumer_disables_limit(self):
+        merged = ChatSession.merge_consume_info(ChatDataType.CAMERA_VIDEO, [self._sink(640, 0), self._sink(0, 2)])
+        self.assertEqual((merged.max_frame_size, merged.max_frame_rate), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()